@@ -12,6 +12,7 @@ from fastapi import APIRouter
 # Asume que app/api/v1/endpoints/chat.py existe y define 'router'.
 try:
     from app.api.v1.endpoints import chat
+    from app.api.v1.endpoints import admin
     # from app.api.v1.endpoints import users # Ejemplo futuro
     ENDPOINTS_AVAILABLE = True
 except ImportError as e:
@@ -39,6 +40,13 @@ if ENDPOINTS_AVAILABLE:
          try: logging.getLogger(__name__).error("No se pudo incluir chat.router.")
          except NameError: print("[ERROR api_v1/api.py] No se pudo incluir chat.router.")
 
+    # Incluir el router de administración (cachés)
+    if 'admin' in locals() and hasattr(admin, 'router'):
+        router.include_router(admin.router, tags=["Admin"])
+    else:
+         try: logging.getLogger(__name__).error("No se pudo incluir admin.router.")
+         except NameError: print("[ERROR api_v1/api.py] No se pudo incluir admin.router.")
+
     # Ejemplo: Incluir otros routers v1 en el futuro
     # if 'users' in locals() and hasattr(users, 'router'):
     #     router.include_router(users.router, prefix="/users", tags=["Usuarios"])
@@ -0,0 +1,68 @@
+# app/api/v1/endpoints/admin.py
+# -*- coding: utf-8 -*-
+
+"""
+Endpoints de administración de la API KellyBot (protegidos con la API Key).
+GET /admin/cache/responses devuelve las métricas de las cachés de respuestas;
+DELETE /admin/cache/responses las vacía (caché exacta en memoria y disco, y
+caché semántica), p. ej. tras corregir documentos o cambiar el prompt. La
+purga solo alcanza la memoria del worker que atiende la petición (ver el
+endpoint).
+GET /admin/single-flight devuelve cuántas llamadas se compartieron.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict
+
+from fastapi import APIRouter, Depends
+
+from app.api.deps import get_api_key
+from app.services import rag_pipeline
+from app.services.single_flight import get_single_flight_stats
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.get(
+    "/admin/cache/responses",
+    summary="Métricas de las cachés de respuestas",
+    description="Tamaño, aciertos por nivel (memoria/disco), fallos y hit rate de la caché exacta y de la semántica.",
+    tags=["Admin"],
+)
+async def get_response_cache_stats(api_key: str = Depends(get_api_key)) -> Dict[str, Any]:
+    return {
+        "response_cache": await asyncio.to_thread(rag_pipeline.get_response_cache_stats), # Cuenta filas en SQLite
+        "answer_cache": rag_pipeline.get_answer_cache_stats(),
+    }
+
+
+@router.delete(
+    "/admin/cache/responses",
+    summary="Purgar las cachés de respuestas",
+    description=(
+        "Vacía la caché exacta (memoria y SQLite) y la caché semántica de respuestas. "
+        "El nivel SQLite es compartido, pero la memoria de la caché exacta y la caché semántica son por "
+        "proceso: con varios workers solo se vacían las del worker que atiende la petición; los demás "
+        "siguen sirviendo sus entradas hasta que expiran (RESPONSE_CACHE_TTL_SECONDS) o se reinician."
+    ),
+    tags=["Admin"],
+)
+async def purge_response_caches(api_key: str = Depends(get_api_key)) -> Dict[str, Any]:
+    purged = {
+        "response_cache": await asyncio.to_thread(rag_pipeline.purge_response_cache), # DELETE en SQLite
+        "answer_cache": rag_pipeline.clear_answer_cache(),
+    }
+    logger.warning(f"Cachés de respuestas purgadas por petición de administración: {purged}")
+    return {"purged": purged}
+
+
+@router.get(
+    "/admin/single-flight",
+    summary="Métricas de single-flight",
+    description="Por etapa (embed_query, search_documents, call_llm): llamadas ejecutadas, compartidas y en curso.",
+    tags=["Admin"],
+)
+async def get_single_flight_metrics(api_key: str = Depends(get_api_key)) -> Dict[str, Any]:
+    return get_single_flight_stats()
@@ -4,12 +4,19 @@
 """
 Endpoint para procesar mensajes de chat usando el pipeline RAG.
 Versión final consistente con la estructura y servicios definidos.
+POST /chat devuelve la respuesta completa; POST /chat/stream la emite por
+Server-Sent Events a medida que el LLM la genera.
 """
 
+import json
 import logging
-from typing import Dict, Any, List # Importar tipos necesarios
+from typing import Dict, Any, List, AsyncIterator # Importar tipos necesarios
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.services.resilience import request_deadline
 
 # Importar Schemas (Modelos Pydantic)
 # Asegúrate de que estos archivos existan en app/schemas/
@@ -80,11 +87,12 @@ async def handle_chat_message(
          )
 
     try:
-        # 1. Llamar al servicio RAG principal
-        response_data = await rag_pipeline.generate_response(
-            question=request.message,
-            session_id=request.session_id
-        )
+        # 1. Llamar al servicio RAG principal (las llamadas internas usan lo que quede del deadline)
+        with request_deadline(getattr(settings, 'REQUEST_DEADLINE_SECONDS', 30.0)):
+            response_data = await rag_pipeline.generate_response(
+                question=request.message,
+                session_id=request.session_id
+            )
 
         # 2. Validar respuesta del servicio (debe ser dict con 'answer')
         if not response_data or not isinstance(response_data, dict) or not response_data.get("answer"):
@@ -134,4 +142,53 @@ async def handle_chat_message(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Ocurrió un error interno al procesar tu mensaje.",
-        )
\ No newline at end of file
+        )
+
+
+def _format_sse(event: Dict[str, Any]) -> str:
+    """Serializa un evento del pipeline como mensaje SSE (`event:` + `data:` JSON)."""
+    data = {k: v for k, v in event.items() if k != "event"}
+    return f"event: {event['event']}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post(
+    "/chat/stream",
+    summary="Procesar un mensaje de chat en streaming (SSE)",
+    description=("Igual que /chat, pero emite Server-Sent Events: `sources`, `delta` (fragmentos del LLM según se "
+                 "generan), `done` (respuesta final postprocesada) y `error`."),
+    tags=["Chat"],
+    response_class=StreamingResponse,
+)
+async def handle_chat_message_stream(
+    request: ChatRequest,
+    api_key: str = Depends(get_api_key) if DEPS_AVAILABLE else "dummy_key_deps_off"
+) -> StreamingResponse:
+    """
+    Maneja las peticiones POST a /api/v1/chat/stream.
+    """
+    logger.info(f"Recibida petición (stream) para session_id: {request.session_id}")
+    if not RAG_SERVICE_AVAILABLE or not hasattr(rag_pipeline, 'generate_response_stream'):
+         logger.critical(f"Intento de llamada a RAG (stream) para session {request.session_id} pero el servicio no está disponible.")
+         raise HTTPException(
+              status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+              detail="Error interno del servidor: Servicio principal no disponible [RAG-IMP]."
+         )
+
+    async def event_stream() -> AsyncIterator[str]:
+        # El cuerpo se genera después de que el endpoint retorna: el deadline se fija aquí dentro
+        try:
+            with request_deadline(getattr(settings, 'REQUEST_DEADLINE_SECONDS', 30.0)):
+                async for event in rag_pipeline.generate_response_stream(
+                    question=request.message,
+                    session_id=request.session_id
+                ):
+                    yield _format_sse(event)
+        except Exception as e:
+            logger.exception(f"Error inesperado en stream de chat para session_id {request.session_id}: {e}")
+            yield _format_sse({"event": "error", "detail": "Ocurrió un error interno al procesar tu mensaje."})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}, # Sin buffering en proxies (nginx)
+    )
@@ -6,7 +6,10 @@ Endpoints para verificar el estado y la salud de la API KellyBot.
 """
 
 import logging # Añadir import de logging
-from fastapi import APIRouter
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from app.services import warmup_service
 
 # Importar el schema de respuesta
 # Asume que app/schemas/status.py existe y define StatusResponse correctamente
@@ -61,4 +64,27 @@ async def get_health_status():
     if SCHEMA_AVAILABLE:
         return StatusResponse(status="ok", message="API healthy.")
     else:
-         return {"status": "ok", "message": "API healthy."}
\ No newline at end of file
+         return {"status": "ok", "message": "API healthy."}
+
+
+@router.get(
+    "/ready", # Readiness para el balanceador (distinto de /health)
+    summary="Verificar si el Worker está Listo para Recibir Tráfico",
+    description="Devuelve 503 mientras el warm-up (modelo, Qdrant, LLM, contexto prioritario) no termina.",
+    tags=["Status"],
+    include_in_schema=False
+)
+async def get_readiness_status():
+    """
+    Devuelve 200 cuando el warm-up terminó y los componentes requeridos están disponibles;
+    503 con el detalle por componente en caso contrario.
+    """
+    readiness = warmup_service.get_readiness()
+    if warmup_service.is_ready():
+        return {"status": "ok", "message": "API ready.", "checks": readiness["checks"]}
+    message = "API not ready." if readiness["status"] == "failed" else "API warming up."
+    logger.info(f"GET /ready -> 503 (estado: {readiness['status']})")
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": readiness["status"], "message": message, "checks": readiness["checks"]},
+    )
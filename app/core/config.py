@@ -48,6 +48,12 @@ except NameError:
 # --- Tipos Específicos ---
 QdrantDistance = Literal["Cosine", "Dot", "Euclid"]
 EmbeddingDevice = Literal["auto", "cpu", "cuda"]
+EmbeddingExecutor = Literal["thread", "process"]
+EmbeddingBackend = Literal["sentence_transformers", "onnx"]
+EmbeddingReduction = Literal["none", "truncate", "pca"]
+VectorSearchBackend = Literal["qdrant", "local"]
+SearchPayloadMode = Literal["full", "source_id", "ids"]
+RetrievalMode = Literal["dense", "hybrid"]
 LogLevel = Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
 
 # --- Helper para resolver rutas ---
@@ -75,6 +81,13 @@ class Settings(BaseSettings):
     API_LOG_FILE: Optional[Path] = Field(default=None, alias='API_LOG_FILE')
     API_ACCESS_KEY: SecretStr = Field(..., alias='API_ACCESS_KEY')
     API_RELOAD: bool = Field(default=False, alias='API_RELOAD')
+    # Precarga de modelo/clientes al arrancar; /ready responde 503 hasta terminar
+    WARMUP_ON_STARTUP: bool = Field(default=True, alias='WARMUP_ON_STARTUP')
+    # Reintentos del warm-up si falla un componente requerido (backoff exponencial)
+    WARMUP_RETRY_INITIAL_SECONDS: float = Field(default=1.0, alias='WARMUP_RETRY_INITIAL_SECONDS', gt=0.0)
+    WARMUP_RETRY_MAX_SECONDS: float = Field(default=30.0, alias='WARMUP_RETRY_MAX_SECONDS', gt=0.0)
+    # Presupuesto total de un request de chat; las llamadas a Qdrant usan lo que queda (0 desactiva)
+    REQUEST_DEADLINE_SECONDS: float = Field(default=30.0, alias='REQUEST_DEADLINE_SECONDS', ge=0.0)
 
     # --- LLM ---
     DEEPSEEK_API_KEY: SecretStr = Field(..., alias='DEEPSEEK_API_KEY')
@@ -88,10 +101,70 @@ class Settings(BaseSettings):
     QDRANT_COLLECTION_NAME: str = Field(default="kellybot-docs-v1", alias='QDRANT_COLLECTION_NAME')
     DISTANCE_METRIC: QdrantDistance = Field(default="Cosine", alias='DISTANCE_METRIC')
     VECTOR_DIMENSION: PositiveInt = Field(..., alias='VECTOR_DIMENSION')
+    # Transporte del cliente: REST (httpx) o gRPC, pool de conexiones y timeouts
+    QDRANT_PREFER_GRPC: bool = Field(default=False, alias='QDRANT_PREFER_GRPC')
+    QDRANT_GRPC_PORT: PositiveInt = Field(default=6334, alias='QDRANT_GRPC_PORT')
+    QDRANT_HTTP2: bool = Field(default=False, alias='QDRANT_HTTP2')
+    QDRANT_POOL_MAX_CONNECTIONS: PositiveInt = Field(default=100, alias='QDRANT_POOL_MAX_CONNECTIONS')
+    QDRANT_POOL_MAX_KEEPALIVE: int = Field(default=20, alias='QDRANT_POOL_MAX_KEEPALIVE', ge=0)
+    QDRANT_KEEPALIVE_EXPIRY_SECONDS: float = Field(default=30.0, alias='QDRANT_KEEPALIVE_EXPIRY_SECONDS', ge=0.0)
+    QDRANT_TIMEOUT_SECONDS: PositiveInt = Field(default=10, alias='QDRANT_TIMEOUT_SECONDS')
+    QDRANT_SEARCH_TIMEOUT_SECONDS: float = Field(default=5.0, alias='QDRANT_SEARCH_TIMEOUT_SECONDS', gt=0.0)
+    # Cada cuánto se comprueba si QDRANT_COLLECTION_NAME (alias) apunta a otra colección (0 desactiva)
+    QDRANT_ALIAS_CHECK_SECONDS: float = Field(default=30.0, alias='QDRANT_ALIAS_CHECK_SECONDS', ge=0.0)
+    # Hedging: segunda búsqueda si la primera supera max(QDRANT_HEDGE_MIN_DELAY_MS, p95 observado)
+    QDRANT_HEDGING_ENABLED: bool = Field(default=False, alias='QDRANT_HEDGING_ENABLED')
+    QDRANT_HEDGE_MIN_DELAY_MS: float = Field(default=50.0, alias='QDRANT_HEDGE_MIN_DELAY_MS', ge=0.0)
+    # Circuit breaker: fallos seguidos que lo abren (0 desactiva) y enfriamiento antes de reintentar
+    QDRANT_BREAKER_FAILURE_THRESHOLD: int = Field(default=5, alias='QDRANT_BREAKER_FAILURE_THRESHOLD', ge=0)
+    QDRANT_BREAKER_COOLDOWN_SECONDS: float = Field(default=30.0, alias='QDRANT_BREAKER_COOLDOWN_SECONDS', gt=0.0)
+    # Parámetros de búsqueda (None = default del servidor); ver scripts/tune_search_params.py
+    QDRANT_HNSW_EF: Optional[PositiveInt] = Field(default=None, alias='QDRANT_HNSW_EF')
+    QDRANT_EXACT_SEARCH: bool = Field(default=False, alias='QDRANT_EXACT_SEARCH')
+    QDRANT_QUANTIZATION_RESCORE: Optional[bool] = Field(default=None, alias='QDRANT_QUANTIZATION_RESCORE')
+    QDRANT_QUANTIZATION_OVERSAMPLING: Optional[float] = Field(default=None, alias='QDRANT_QUANTIZATION_OVERSAMPLING', ge=1.0)
+    # Motor de búsqueda: 'qdrant' (remoto) o 'local' (instantánea en memoria, exacta/HNSW)
+    VECTOR_SEARCH_BACKEND: VectorSearchBackend = Field(default="qdrant", alias='VECTOR_SEARCH_BACKEND')
+    LOCAL_INDEX_SNAPSHOT_PATH: Optional[Path] = Field(default=None, alias='LOCAL_INDEX_SNAPSHOT_PATH')
+    LOCAL_INDEX_HNSW_THRESHOLD: PositiveInt = Field(default=50000, alias='LOCAL_INDEX_HNSW_THRESHOLD')
+    LOCAL_INDEX_HNSW_EF_SEARCH: PositiveInt = Field(default=64, alias='LOCAL_INDEX_HNSW_EF_SEARCH')
+    # Payload pedido a Qdrant: 'full' (completo), 'source_id' (proyección) o 'ids' (ninguno);
+    # en los dos últimos el texto sale del almacén local mmap PAYLOAD_STORE_PATH
+    SEARCH_PAYLOAD_MODE: SearchPayloadMode = Field(default="full", alias='SEARCH_PAYLOAD_MODE')
+    PAYLOAD_STORE_PATH: Optional[Path] = Field(default=PROJECT_ROOT / "data" / "payload_store.bin", alias='PAYLOAD_STORE_PATH')
+    # Caché de resultados de búsqueda (clave: colección, límite, filtro y vector cuantizado; 0 desactiva)
+    SEARCH_CACHE_SIZE: int = Field(default=1024, alias='SEARCH_CACHE_SIZE', ge=0)
+    SEARCH_CACHE_TTL_SECONDS: float = Field(default=300.0, alias='SEARCH_CACHE_TTL_SECONDS', ge=0.0)
+    SEARCH_CACHE_QUANTIZATION_STEP: float = Field(default=1e-3, alias='SEARCH_CACHE_QUANTIZATION_STEP', gt=0.0)
 
     # --- Embeddings ---
     EMBEDDING_MODEL_NAME: str = Field(..., alias='EMBEDDING_MODEL_NAME')
     EMBEDDING_DEVICE: EmbeddingDevice = Field(default="auto", alias='EMBEDDING_DEVICE')
+    # Ejecutor de model.encode(): 'thread' (asyncio.to_thread) o 'process' (pool de procesos)
+    EMBEDDING_EXECUTOR: EmbeddingExecutor = Field(default="thread", alias='EMBEDDING_EXECUTOR')
+    EMBEDDING_PROCESS_WORKERS: PositiveInt = Field(default=2, alias='EMBEDDING_PROCESS_WORKERS')
+    # Backend de inferencia: PyTorch (SentenceTransformer) u ONNX Runtime (CPU, int8 opcional)
+    EMBEDDING_BACKEND: EmbeddingBackend = Field(default="sentence_transformers", alias='EMBEDDING_BACKEND')
+    EMBEDDING_ONNX_DIR: Optional[Path] = Field(default=PROJECT_ROOT / "models" / "onnx", alias='EMBEDDING_ONNX_DIR')
+    EMBEDDING_ONNX_QUANTIZED: bool = Field(default=False, alias='EMBEDDING_ONNX_QUANTIZED')
+    EMBEDDING_ONNX_VERIFY: bool = Field(default=True, alias='EMBEDDING_ONNX_VERIFY')
+    EMBEDDING_ONNX_MIN_COSINE: float = Field(default=0.99, alias='EMBEDDING_ONNX_MIN_COSINE', ge=0.0, le=1.0)
+    # Micro-batching: agrupa queries concurrentes en una sola llamada a model.encode()
+    EMBEDDING_BATCHING_ENABLED: bool = Field(default=False, alias='EMBEDDING_BATCHING_ENABLED')
+    EMBEDDING_BATCH_WINDOW_MS: float = Field(default=5.0, alias='EMBEDDING_BATCH_WINDOW_MS', ge=0.0)
+    EMBEDDING_BATCH_MAX_SIZE: PositiveInt = Field(default=32, alias='EMBEDDING_BATCH_MAX_SIZE')
+    # Tamaño de bloque de embed_queries / iter_embed_queries (codificación de muchos textos)
+    EMBEDDING_ENCODE_CHUNK_SIZE: PositiveInt = Field(default=64, alias='EMBEDDING_ENCODE_CHUNK_SIZE')
+    # Caché en proceso de embeddings de queries (0 desactiva)
+    EMBEDDING_CACHE_SIZE: int = Field(default=2048, alias='EMBEDDING_CACHE_SIZE', ge=0)
+    EMBEDDING_CACHE_TTL_SECONDS: float = Field(default=3600.0, alias='EMBEDDING_CACHE_TTL_SECONDS', ge=0.0)
+    # Reducción de dimensión de los vectores enviados/almacenados en Qdrant
+    EMBEDDING_REDUCTION: EmbeddingReduction = Field(default="none", alias='EMBEDDING_REDUCTION')
+    EMBEDDING_REDUCED_DIMENSION: Optional[PositiveInt] = Field(default=None, alias='EMBEDDING_REDUCED_DIMENSION')
+    EMBEDDING_PCA_PATH: Optional[Path] = Field(default=PROJECT_ROOT / "models" / "pca_projection.npz", alias='EMBEDDING_PCA_PATH')
+    # Almacén mmap compartido entre workers y persistente entre reinicios (None desactiva)
+    EMBEDDING_STORE_PATH: Optional[Path] = Field(default=None, alias='EMBEDDING_STORE_PATH')
+    EMBEDDING_STORE_CAPACITY: PositiveInt = Field(default=65536, alias='EMBEDDING_STORE_CAPACITY')
 
     # --- MongoDB (Opcional) ---
     MONGO_URI: Optional[SecretStr] = Field(default=None, alias='MONGO_URI')
@@ -110,8 +183,28 @@ class Settings(BaseSettings):
     # --- RAG (Opcional) ---
     CHUNK_SIZE: PositiveInt = Field(default=1000)
     CHUNK_OVERLAP: int = Field(default=150, ge=0)
+    # Ingesta (scripts/ingest_documents.py): chunks por lote de embeddings, puntos por upsert y upserts en paralelo
+    INGEST_EMBED_BATCH_SIZE: PositiveInt = Field(default=256, alias='INGEST_EMBED_BATCH_SIZE')
+    INGEST_UPSERT_BATCH_SIZE: PositiveInt = Field(default=64, alias='INGEST_UPSERT_BATCH_SIZE')
+    INGEST_UPSERT_PARALLELISM: PositiveInt = Field(default=4, alias='INGEST_UPSERT_PARALLELISM')
     RAG_TOP_K: PositiveInt = Field(default=3, alias='RAG_TOP_K')
     RAG_MAX_CONTEXT_TOKENS: PositiveInt = Field(default=3000, alias='RAG_MAX_CONTEXT_TOKENS')
+    # Recuperación: 'dense' (solo Qdrant) o 'hybrid' (Qdrant + BM25 en memoria, fusión RRF)
+    RETRIEVAL_MODE: RetrievalMode = Field(default="dense", alias='RETRIEVAL_MODE')
+    HYBRID_CANDIDATES: PositiveInt = Field(default=10, alias='HYBRID_CANDIDATES')
+    RRF_K: PositiveInt = Field(default=60, alias='RRF_K')
+    BM25_K1: float = Field(default=1.2, alias='BM25_K1', gt=0.0)
+    BM25_B: float = Field(default=0.75, alias='BM25_B', ge=0.0, le=1.0)
+    # Caché semántica de respuestas: reutiliza la respuesta de una pregunta casi idéntica con las mismas fuentes (0 desactiva)
+    ANSWER_CACHE_SIZE: int = Field(default=0, alias='ANSWER_CACHE_SIZE', ge=0)
+    ANSWER_CACHE_TTL_SECONDS: float = Field(default=3600.0, alias='ANSWER_CACHE_TTL_SECONDS', ge=0.0)
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = Field(default=0.95, alias='ANSWER_CACHE_SIMILARITY_THRESHOLD', gt=0.0, le=1.0)
+    # Caché exacta de respuestas: misma pregunta normalizada, fuentes, historial y configuración del LLM (0 desactiva)
+    RESPONSE_CACHE_SIZE: int = Field(default=0, alias='RESPONSE_CACHE_SIZE', ge=0)
+    RESPONSE_CACHE_TTL_SECONDS: float = Field(default=3600.0, alias='RESPONSE_CACHE_TTL_SECONDS', ge=0.0)
+    RESPONSE_CACHE_SQLITE_PATH: Optional[Path] = Field(default=None, alias='RESPONSE_CACHE_SQLITE_PATH')
+    # Single-flight: llamadas idénticas en curso a embed_query / search_documents / call_llm comparten un resultado
+    SINGLE_FLIGHT_ENABLED: bool = Field(default=True, alias='SINGLE_FLIGHT_ENABLED')
 
     # --- Configuración del Modelo Pydantic Settings ---
     model_config = SettingsConfigDict(
@@ -123,7 +216,7 @@ class Settings(BaseSettings):
 
     # --- Validadores ---
     # Validador para rutas (se ejecuta ANTES de la validación de tipo Path)
-    @field_validator('API_LOG_FILE', 'PRIORITY_CONTEXT_FILE_PATH', mode='before')
+    @field_validator('API_LOG_FILE', 'PRIORITY_CONTEXT_FILE_PATH', 'EMBEDDING_ONNX_DIR', 'EMBEDDING_STORE_PATH', 'EMBEDDING_PCA_PATH', 'LOCAL_INDEX_SNAPSHOT_PATH', 'PAYLOAD_STORE_PATH', 'RESPONSE_CACHE_SQLITE_PATH', mode='before')
     @classmethod
     def validate_resolve_path(cls, value: Any) -> Optional[Path]:
         return _resolve_path(value)
@@ -143,6 +236,18 @@ class Settings(BaseSettings):
                   raise ValueError(f"CHUNK_OVERLAP ({chunk_overlap}) debe ser < CHUNK_SIZE ({chunk_size})")
         return self
 
+    # Validador para la reducción de dimensión (requiere dimensión reducida < VECTOR_DIMENSION)
+    @model_validator(mode='after')
+    def check_reduced_dimension(self) -> 'Settings':
+        if self.EMBEDDING_REDUCTION != "none":
+            reduced = self.EMBEDDING_REDUCED_DIMENSION
+            if reduced is None or reduced >= self.VECTOR_DIMENSION:
+                raise ValueError(
+                    f"EMBEDDING_REDUCTION={self.EMBEDDING_REDUCTION} requiere EMBEDDING_REDUCED_DIMENSION "
+                    f"< VECTOR_DIMENSION ({self.VECTOR_DIMENSION})"
+                )
+        return self
+
 # --- Instancia Global de Configuración ---
 # (Sin cambios aquí)
 try:
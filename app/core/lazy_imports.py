@@ -0,0 +1,49 @@
+# app/core/lazy_imports.py
+# -*- coding: utf-8 -*-
+
+"""
+Carga diferida de dependencias pesadas (torch, sentence-transformers,
+qdrant-client, openai, langchain-mongodb, onnxruntime...).
+
+Los servicios comprueban disponibilidad con `is_available()` (solo busca el
+paquete, no lo importa) y llaman a `optional_import()` la primera vez que lo
+necesitan: al crear el cliente/modelo o durante el warm-up del lifespan. Así
+importar la aplicación, /health, las pruebas o `scripts/run_api.py --help` no
+pagan segundos de importación ni cientos de MB de memoria.
+"""
+
+import importlib
+import importlib.util
+import logging
+import time
+from functools import lru_cache
+from types import ModuleType
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def is_available(module_name: str) -> bool:
+    """True si el módulo está instalado, sin importarlo (solo nombres de nivel superior)."""
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+@lru_cache(maxsize=None)
+def optional_import(module_name: str) -> Optional[ModuleType]:
+    """
+    Importa `module_name` la primera vez que se pide y lo cachea.
+    Devuelve None (y lo registra) si no está instalado o falla al importar.
+    """
+    start = time.perf_counter()
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError as e:
+        logger.error(f"No se pudo importar '{module_name}': {e}")
+        return None
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+    logger.debug(f"Módulo '{module_name}' importado bajo demanda en {elapsed_ms:.0f}ms.")
+    return module
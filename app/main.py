@@ -6,6 +6,7 @@ Punto de entrada principal para la aplicación API KellyBot con FastAPI.
 Versión final con lifespan, favicon y routers incluidos.
 """
 
+import asyncio
 import logging
 import time
 import sys
@@ -24,6 +25,7 @@ try:
     from app.core.config import settings
     from app.api.v1.api import router as api_v1_router
     from app.api.v1.endpoints.status import router as status_router
+    from app.services import warmup_service
     CONFIG_LOADED = True
 except ImportError as e:
      print(f"[ERROR CRÍTICO main.py] Fallo al importar módulos: {e}")
@@ -46,20 +48,27 @@ async def lifespan(app_instance: FastAPI):
     Maneja los eventos de inicio y apagado de la aplicación.
     """
     logger.info("--- Iniciando KellyBot API (Lifespan) ---")
+    warmup_task = None
     if CONFIG_LOADED:
         # Acceder a settings usando nombres en MAYÚSCULAS
         logger.info(f"Host: {settings.API_HOST}, Puerto: {settings.API_PORT}, LogLevel: {settings.LOG_LEVEL}")
         logger.info(f"Modelo LLM: {settings.DEEPSEEK_MODEL_NAME}")
         logger.info(f"Modelo Embeddings: {settings.EMBEDDING_MODEL_NAME} (Dim: {settings.VECTOR_DIMENSION}) en {settings.EMBEDDING_DEVICE}")
-        logger.info(f"Qdrant URL: {settings.QDRANT_URL}")
+        logger.info(f"Ejecutor Embeddings: {settings.EMBEDDING_EXECUTOR}" + (f" ({settings.EMBEDDING_PROCESS_WORKERS} procesos)" if settings.EMBEDDING_EXECUTOR == "process" else ""))
+        logger.info(f"Qdrant URL: {settings.QDRANT_URL} (transporte: {'gRPC' if settings.QDRANT_PREFER_GRPC else 'REST'})")
         logger.info(f"Qdrant Collection: {settings.QDRANT_COLLECTION_NAME}")
         if settings.MONGO_URI: logger.info("Configuración de MongoDB detectada.")
         else: logger.info("Historial MongoDB no configurado.")
         priority_path = settings.PRIORITY_CONTEXT_FILE_PATH
         if priority_path and isinstance(priority_path, Path) and priority_path.is_file(): logger.info(f"Contexto prioritario activo: {priority_path}")
         else: logger.info(f"Contexto prioritario no configurado o archivo '{priority_path}' no encontrado.")
-        logger.info("Verificando componentes necesarios...")
-        # Aquí podrías añadir verificaciones o precarga de modelos/clientes
+        if settings.WARMUP_ON_STARTUP:
+            # Warm-up en segundo plano: /health responde de inmediato, /ready da 503 hasta terminar
+            logger.info("Precargando modelo y clientes en segundo plano...")
+            warmup_task = asyncio.create_task(warmup_service.run_warmup())
+        else:
+            warmup_service.mark_ready()
+            logger.info("Warm-up desactivado (WARMUP_ON_STARTUP=false); carga perezosa en el primer request.")
     else:
         logger.error("La configuración no se cargó correctamente. La API puede no funcionar.")
 
@@ -69,6 +78,27 @@ async def lifespan(app_instance: FastAPI):
 
     logger.info("--- Deteniendo KellyBot API (Lifespan) ---")
     # Lógica de limpieza
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+        try:
+            await warmup_task
+        except asyncio.CancelledError:
+            pass
+    try:
+        from app.services import embedding_service
+        embedding_service.shutdown_executor()
+    except Exception as e_shutdown:
+        logger.error(f"Error deteniendo el ejecutor de embeddings: {e_shutdown}")
+    try:
+        from app.services import qdrant_service
+        await qdrant_service.close_client()
+    except Exception as e_shutdown:
+        logger.error(f"Error cerrando el cliente Qdrant: {e_shutdown}")
+    try:
+        from app.services import rag_pipeline
+        rag_pipeline.close_response_cache()
+    except Exception as e_shutdown:
+        logger.error(f"Error cerrando la caché de respuestas: {e_shutdown}")
     logger.info("--- KellyBot API Detenida (Lifespan) ---")
 
 
@@ -0,0 +1,189 @@
+# app/services/answer_cache.py
+# -*- coding: utf-8 -*-
+
+"""
+Caché semántica de respuestas para preguntas casi idénticas.
+
+Guarda ternas (embedding de la pregunta, source_ids recuperados, respuesta
+final). Una pregunta nueva reutiliza una respuesta si su embedding supera un
+umbral de similitud coseno estricto con el de una pregunta guardada Y la
+recuperación devolvió exactamente las mismas fuentes, en el mismo orden; así
+el LLM no se llama para paráfrasis de la misma pregunta.
+
+Los embeddings se guardan normalizados en una matriz de `max_size` filas y la
+búsqueda es un producto matricial (exacta). Las entradas expiran por TTL, se
+expulsa la menos usada al llenarse y todo se descarta cuando cambia la
+versión de la colección (`qdrant_service.get_collection_version`).
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticAnswerCache:
+    """
+    Caché LRU+TTL de respuestas indexada por embedding de la pregunta.
+
+    Args:
+        max_size: Entradas máximas (0 desactiva).
+        ttl_seconds: Vida de cada entrada (0 sin expiración).
+        similarity_threshold: Similitud coseno mínima para reutilizar una respuesta.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, similarity_threshold: float,
+                 clock: Callable[[], float] = time.monotonic):
+        if not 0.0 < similarity_threshold <= 1.0:
+            raise ValueError("similarity_threshold debe estar en (0, 1].")
+        self._max_size = max(0, int(max_size))
+        self._ttl = float(ttl_seconds)
+        self._threshold = float(similarity_threshold)
+        self._clock = clock
+        self._vectors: Optional[np.ndarray] = None # (max_size, dim) float32, filas normalizadas
+        self._valid: Optional[np.ndarray] = None
+        self._entries: Dict[int, Dict[str, Any]] = {} # fila -> {source_ids, answer, sources, stored_at}
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._version: Any = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.source_mismatches = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_size > 0
+
+    @staticmethod
+    def _normalize(vector: Any) -> Optional[np.ndarray]:
+        v = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm > 0 and np.isfinite(norm) else None
+
+    def _check_version(self, version: Any) -> None:
+        if version != self._version:
+            if self._entries:
+                logger.info(f"Caché semántica de respuestas invalidada (versión {self._version} -> {version}).")
+                self.invalidations += 1
+            self._clear_locked()
+            self._version = version
+
+    def _clear_locked(self) -> int:
+        removed = len(self._entries)
+        self._entries.clear()
+        self._lru.clear()
+        if self._valid is not None:
+            self._valid[:] = False
+        return removed
+
+    def _drop(self, row: int) -> None:
+        self._entries.pop(row, None)
+        self._lru.pop(row, None)
+        self._valid[row] = False # type: ignore[index]
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return self._ttl > 0 and (self._clock() - entry["stored_at"]) > self._ttl
+
+    def _best_matches(self, query: np.ndarray) -> List[Tuple[int, float]]:
+        """Filas con similitud >= umbral, de mayor a menor."""
+        if self._vectors is None or not self._entries or query.shape[0] != self._vectors.shape[1]:
+            return []
+        scores = self._vectors @ query
+        scores[~self._valid] = -np.inf
+        rows = np.flatnonzero(scores >= self._threshold)
+        return sorted(((int(r), float(scores[r])) for r in rows), key=lambda item: -item[1])
+
+    def get(self, vector: Any, source_ids: Sequence[str], version: Any = None) -> Optional[Dict[str, Any]]:
+        """
+        Respuesta cacheada {answer, sources, similarity} para una pregunta con
+        ese embedding y esas fuentes, o None.
+        """
+        if not self.enabled:
+            return None
+        query = self._normalize(vector)
+        with self._lock:
+            self._check_version(version)
+            if query is None:
+                self.misses += 1
+                return None
+            wanted = tuple(source_ids)
+            similar = False
+            for row, score in self._best_matches(query):
+                entry = self._entries[row]
+                if self._expired(entry):
+                    self._drop(row)
+                    self.expirations += 1
+                    continue
+                if entry["source_ids"] != wanted:
+                    similar = True
+                    continue
+                self._lru.move_to_end(row)
+                self.hits += 1
+                return {"answer": entry["answer"], "sources": list(entry["sources"]), "similarity": score}
+            self.misses += 1
+            if similar:
+                self.source_mismatches += 1
+            return None
+
+    def set(self, vector: Any, source_ids: Sequence[str], answer: str, sources: Sequence[Any], version: Any = None) -> None:
+        """Guarda una respuesta; reemplaza una entrada casi idéntica con las mismas fuentes."""
+        if not self.enabled or not answer:
+            return
+        query = self._normalize(vector)
+        if query is None:
+            return
+        with self._lock:
+            self._check_version(version)
+            if self._vectors is None or self._vectors.shape[1] != query.shape[0]:
+                self._vectors = np.zeros((self._max_size, query.shape[0]), dtype=np.float32)
+                self._valid = np.zeros(self._max_size, dtype=bool)
+                self._entries.clear()
+                self._lru.clear()
+            wanted = tuple(source_ids)
+            row = next((r for r, _ in self._best_matches(query) if self._entries[r]["source_ids"] == wanted), None)
+            if row is None:
+                free = np.flatnonzero(~self._valid)
+                if free.size:
+                    row = int(free[0])
+                else:
+                    row, _ = self._lru.popitem(last=False)
+                    self._entries.pop(row, None)
+                    self.evictions += 1
+            self._vectors[row] = query
+            self._valid[row] = True # type: ignore[index]
+            self._entries[row] = {"source_ids": wanted, "answer": answer, "sources": list(sources), "stored_at": self._clock()}
+            self._lru[row] = None
+            self._lru.move_to_end(row)
+
+    def clear(self) -> int:
+        """Vacía la caché. Devuelve el número de entradas eliminadas."""
+        with self._lock:
+            return self._clear_locked()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métricas de uso de la caché."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self._max_size,
+            "ttl_seconds": self._ttl,
+            "similarity_threshold": self._threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "source_mismatches": self.source_mismatches,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
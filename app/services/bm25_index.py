@@ -0,0 +1,116 @@
+# app/services/bm25_index.py
+# -*- coding: utf-8 -*-
+
+"""
+Índice invertido BM25 en memoria sobre los mismos documentos de la colección.
+
+Complementa la búsqueda densa con coincidencias exactas de términos de
+producto ("CFDI", "MiAdminXML") y códigos de error. Los términos se
+normalizan igual que las claves de la caché de embeddings (minúsculas, sin
+acentos). Cada posting guarda su peso BM25 precalculado, así una consulta es
+una suma vectorizada por término.
+"""
+
+import logging
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.embedding_cache import normalize_query
+from app.services.payload_store import content_from_payload, source_id_from_payload
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante como con contra cual cuales cuando de del desde donde
+el ella ellas ellos en entre era es esa ese eso esta este esto estos fue ha hay la las le les lo los mas
+me mi mis muy no nos o para pero por porque que se sea ser si sin sobre su sus tambien te tiene tu un una
+uno unos y ya yo puedo hago hacer quiero
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Términos normalizados (sin acentos ni stopwords); conserva números y códigos."""
+    return [t for t in _TOKEN_RE.findall(normalize_query(text)) if t not in STOPWORDS and (len(t) > 1 or t.isdigit())]
+
+
+class BM25Index:
+    """
+    Índice BM25 (Okapi) de documentos {id, texto, payload}.
+
+    Args:
+        documents: Tuplas (id, texto indexado, payload devuelto en los resultados).
+        k1, b: Parámetros de BM25.
+    """
+
+    def __init__(self, documents: Iterable[Tuple[Any, str, Dict[str, Any]]], k1: float = 1.2, b: float = 0.75):
+        self.ids: List[Any] = []
+        self.payloads: List[Dict[str, Any]] = []
+        term_counts: List[Counter] = []
+        for doc_id, text, payload in documents:
+            self.ids.append(doc_id)
+            self.payloads.append(payload)
+            term_counts.append(Counter(tokenize(text)))
+        if not self.ids:
+            raise ValueError("El índice BM25 necesita al menos un documento.")
+
+        lengths = np.array([sum(c.values()) for c in term_counts], dtype=np.float32)
+        avg_length = float(lengths.mean()) or 1.0
+        norms = k1 * (1.0 - b + b * lengths / avg_length)
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for doc, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                postings[term].append((doc, tf))
+
+        n_docs = len(self.ids)
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for term, entries in postings.items():
+            docs = np.fromiter((d for d, _ in entries), dtype=np.int32, count=len(entries))
+            tfs = np.fromiter((tf for _, tf in entries), dtype=np.float32, count=len(entries))
+            idf = np.log(1.0 + (n_docs - len(entries) + 0.5) / (len(entries) + 0.5))
+            self._postings[term] = (docs, (idf * tfs * (k1 + 1.0) / (tfs + norms[docs])).astype(np.float32))
+        logger.info(f"Índice BM25 construido: {n_docs} documentos, {len(self._postings)} términos.")
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._postings)
+
+    def search(self, query: str, top_k: int) -> List[Dict[str, Any]]:
+        """Top-k documentos por score BM25 (solo los que comparten algún término con la query)."""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        matched = False
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is not None:
+                docs, weights = posting
+                scores[docs] += weights
+                matched = True
+        if not matched or top_k <= 0:
+            return []
+        candidates = np.flatnonzero(scores)
+        if candidates.size > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [{"id": self.ids[i], "score": float(scores[i]), "payload": self.payloads[i]} for i in candidates.tolist()]
+
+    @classmethod
+    def from_points(cls, points: Iterable[Tuple[Any, Optional[Dict[str, Any]]]], **kwargs: Any) -> "BM25Index":
+        """
+        Construye el índice a partir de pares (point_id, payload) de la colección.
+        Indexa la pregunta y el contenido; el payload devuelto es {source_id, text}.
+        """
+        documents = []
+        for point_id, payload in points:
+            content = content_from_payload(payload)
+            if content is None:
+                continue
+            question = (payload or {}).get("question")
+            indexed = f"{question}\n{content}" if isinstance(question, str) and question not in content else content
+            documents.append((point_id, indexed, {"source_id": source_id_from_payload(payload), "text": content}))
+        return cls(documents, **kwargs)
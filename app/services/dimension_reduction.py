@@ -0,0 +1,157 @@
+# app/services/dimension_reduction.py
+# -*- coding: utf-8 -*-
+
+"""
+Reducción de dimensión de embeddings para búsquedas vectoriales más baratas.
+
+Modos:
+- 'truncate': conserva las primeras `output_dim` componentes (modelos
+  entrenados estilo Matryoshka) y re-normaliza.
+- 'pca': proyección PCA ajustada offline (scripts/fit_dimension_reduction.py)
+  y guardada como artefacto .npz; proyecta y re-normaliza.
+
+La colección de Qdrant debe crearse con `effective_vector_dimension()`.
+"""
+
+import hashlib
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def effective_vector_dimension(settings: Any) -> int:
+    """Dimensión de los vectores que se envían/almacenan en Qdrant según la configuración."""
+    full_dim = int(getattr(settings, 'VECTOR_DIMENSION', getattr(settings, 'vector_dimension', 0)))
+    mode = getattr(settings, 'EMBEDDING_REDUCTION', 'none')
+    reduced = getattr(settings, 'EMBEDDING_REDUCED_DIMENSION', None)
+    if mode != "none" and reduced:
+        return int(reduced)
+    return full_dim
+
+
+def _l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.clip(norms, 1e-12, None)
+
+
+class DimensionReducer:
+    """
+    Proyección de vectores `input_dim` → `output_dim` (float32, L2-normalizados).
+
+    Args:
+        mode: 'truncate' o 'pca'.
+        input_dim / output_dim: Dimensiones de entrada y salida.
+        mean / components: Solo PCA; media (input_dim,) y componentes (output_dim, input_dim).
+        model_name: Modelo con el que se ajustó (informativo/verificación).
+
+    `fingerprint` es un hash corto del artefacto (modo, dimensiones, mean y
+    components): dos ajustes PCA distintos a la misma dimensión tienen
+    fingerprints distintos.
+    """
+
+    def __init__(self, mode: str, input_dim: int, output_dim: int,
+                 mean: Optional[np.ndarray] = None, components: Optional[np.ndarray] = None,
+                 model_name: str = ""):
+        if mode not in ("truncate", "pca"):
+            raise ValueError(f"Modo de reducción no soportado: '{mode}'.")
+        if not 0 < output_dim < input_dim:
+            raise ValueError(f"output_dim ({output_dim}) debe estar entre 1 y input_dim ({input_dim}) - 1.")
+        if mode == "pca":
+            if mean is None or components is None:
+                raise ValueError("El modo 'pca' requiere mean y components.")
+            mean = np.ascontiguousarray(mean, dtype=np.float32)
+            components = np.ascontiguousarray(components, dtype=np.float32)
+            if mean.shape != (input_dim,) or components.shape != (output_dim, input_dim):
+                raise ValueError(f"Artefacto PCA con shapes inválidos: mean={mean.shape}, components={components.shape}.")
+            # Proyección como matriz (input_dim, output_dim) para un solo matmul
+            self._projection = np.ascontiguousarray(components.T)
+        self.mode = mode
+        self.input_dim = int(input_dim)
+        self.output_dim = int(output_dim)
+        self.mean = mean
+        self.components = components
+        self.model_name = model_name
+        digest = hashlib.blake2b(f"{mode}:{self.input_dim}:{self.output_dim}".encode("utf-8"), digest_size=6)
+        if mode == "pca":
+            digest.update(mean.tobytes())
+            digest.update(components.tobytes())
+        self.fingerprint = digest.hexdigest()
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        """Reduce un vector (dim,) o una matriz (N, dim); devuelve float32 L2-normalizado."""
+        array = np.asarray(vectors, dtype=np.float32)
+        if array.shape[-1] != self.input_dim:
+            raise ValueError(f"Dimensión de entrada {array.shape[-1]} != {self.input_dim}.")
+        if self.mode == "truncate":
+            reduced = array[..., :self.output_dim]
+        else:
+            reduced = (array - self.mean) @ self._projection
+        return np.ascontiguousarray(_l2_normalize(reduced), dtype=np.float32)
+
+    # --- Persistencia ---
+
+    def save(self, path: Path) -> Path:
+        """Guarda el artefacto (.npz con metadatos JSON)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {"mode": self.mode, "input_dim": self.input_dim, "output_dim": self.output_dim, "model_name": self.model_name}
+        arrays: Dict[str, np.ndarray] = {"meta": np.array(json.dumps(meta))}
+        if self.mode == "pca":
+            arrays["mean"] = self.mean
+            arrays["components"] = self.components
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+        logger.info(f"Artefacto de reducción guardado en {path} ({self.mode}, {self.input_dim}->{self.output_dim}).")
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> "DimensionReducer":
+        """Carga un artefacto guardado con save()."""
+        with np.load(Path(path), allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            return cls(
+                mode=meta["mode"],
+                input_dim=meta["input_dim"],
+                output_dim=meta["output_dim"],
+                mean=data["mean"] if "mean" in data else None,
+                components=data["components"] if "components" in data else None,
+                model_name=meta.get("model_name", ""),
+            )
+
+
+def fit_pca(matrix: np.ndarray, output_dim: int, model_name: str = "", center: bool = False) -> DimensionReducer:
+    """
+    Ajusta una proyección PCA (SVD) sobre una muestra de embeddings (N, input_dim).
+
+    Por defecto no centra los datos: la SVD sin centrar conserva mejor los
+    productos internos (coseno) que usa la búsqueda. Con `center=True` se
+    comporta como un PCA clásico.
+    """
+    data = np.asarray(matrix, dtype=np.float64)
+    if data.ndim != 2 or data.shape[0] < 2:
+        raise ValueError("Se necesita una matriz (N, dim) con N >= 2 para ajustar PCA.")
+    if output_dim > min(data.shape):
+        raise ValueError(f"output_dim ({output_dim}) no puede superar min(N, dim) = {min(data.shape)}.")
+    mean = data.mean(axis=0) if center else np.zeros(data.shape[1])
+    _, singular_values, vt = np.linalg.svd(data - mean, full_matrices=False)
+    explained = (singular_values ** 2)
+    ratio = float(explained[:output_dim].sum() / explained.sum()) if explained.sum() > 0 else 0.0
+    logger.info(f"PCA ajustado: {data.shape[1]}->{output_dim}, varianza explicada {ratio:.3f}.")
+    return DimensionReducer("pca", data.shape[1], output_dim, mean=mean, components=vt[:output_dim], model_name=model_name)
+
+
+def recall_at_k(corpus_full: np.ndarray, queries_full: np.ndarray,
+                corpus_reduced: np.ndarray, queries_reduced: np.ndarray, k: int) -> float:
+    """
+    Recall@k de la búsqueda por coseno con vectores reducidos frente a la
+    búsqueda con vectores completos (vecinos exactos como referencia).
+    """
+    k = min(k, corpus_full.shape[0])
+    truth = np.argsort(-(_l2_normalize(queries_full) @ _l2_normalize(corpus_full).T), axis=1)[:, :k]
+    approx = np.argsort(-(_l2_normalize(queries_reduced) @ _l2_normalize(corpus_reduced).T), axis=1)[:, :k]
+    hits = sum(len(set(t).intersection(a)) for t, a in zip(truth.tolist(), approx.tolist()))
+    return hits / float(truth.size) if truth.size else 0.0
@@ -0,0 +1,176 @@
+# app/services/embedding_batcher.py
+# -*- coding: utf-8 -*-
+
+"""
+Coalescedor (micro-batching) de peticiones de embedding.
+
+Agrupa las queries que llegan dentro de una ventana corta (o hasta un tamaño
+máximo de lote) en una sola llamada a la función de codificación por lotes,
+y devuelve a cada llamador la fila del resultado que le corresponde.
+Registra métricas de tamaño de lote y tiempo de espera en cola para poder
+ajustar la ventana contra la latencia p99.
+"""
+
+import logging
+import asyncio
+import math
+import time
+from collections import deque
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tipo de la función que codifica un lote completo: recibe N textos y devuelve matriz (N, dim)
+BatchEncodeFn = Callable[[List[str]], Awaitable[Any]]
+
+# Número de muestras de espera en cola que se conservan para calcular percentiles
+_WAIT_SAMPLES_WINDOW = 2048
+# Cada cuántos lotes se emite un resumen de métricas a nivel INFO
+_STATS_LOG_EVERY_N_BATCHES = 500
+
+
+class EmbeddingBatcher:
+    """
+    Agrupa peticiones individuales de embedding en lotes.
+
+    Cada llamada a `submit()` encola el texto y espera su vector. El lote se
+    despacha cuando se cumple la ventana de tiempo (`window_ms`) desde la
+    primera petición pendiente, o inmediatamente al alcanzar `max_batch_size`.
+    """
+
+    def __init__(self, encode_batch: BatchEncodeFn, window_ms: float = 5.0, max_batch_size: int = 32):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size debe ser >= 1.")
+        self._encode_batch = encode_batch
+        self._window_s = max(0.0, float(window_ms)) / 1000.0
+        self._max_batch_size = int(max_batch_size)
+
+        # Pendientes: (texto, future, instante de encolado)
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._inflight: set = set() # Tareas de lotes en curso (evita que el GC las recoja)
+
+        # Métricas
+        self._total_batches = 0
+        self._total_items = 0
+        self._max_batch_seen = 0
+        self._batch_size_histogram: Dict[int, int] = {}
+        self._wait_samples_ms: deque = deque(maxlen=_WAIT_SAMPLES_WINDOW)
+        self._encode_samples_ms: deque = deque(maxlen=_WAIT_SAMPLES_WINDOW)
+
+    @property
+    def window_ms(self) -> float:
+        return self._window_s * 1000.0
+
+    @property
+    def max_batch_size(self) -> int:
+        return self._max_batch_size
+
+    async def submit(self, text: str) -> Any:
+        """
+        Encola un texto y espera el vector resultante (una fila de la matriz del lote).
+        """
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+
+        if len(self._pending) >= self._max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            if self._window_s > 0:
+                self._flush_handle = loop.call_later(self._window_s, self._flush)
+            else:
+                # Ventana 0: despachar en la siguiente iteración del loop para
+                # aprovechar las peticiones que llegaron en la misma iteración.
+                self._flush_handle = loop.call_soon(self._flush) # type: ignore[assignment]
+
+        return await future
+
+    def _flush(self) -> None:
+        """Toma hasta max_batch_size pendientes y lanza su codificación como tarea."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+
+        batch = self._pending[:self._max_batch_size]
+        self._pending = self._pending[self._max_batch_size:]
+
+        task = asyncio.ensure_future(self._run_batch(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+        # Si quedaron pendientes (ráfaga > max_batch_size), programar el siguiente lote
+        if self._pending:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_soon(self._flush) # type: ignore[assignment]
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future, float]]) -> None:
+        """Codifica un lote y reparte cada fila al future correspondiente."""
+        dispatched_at = time.perf_counter()
+        texts = [item[0] for item in batch]
+        for _, _, enqueued_at in batch:
+            self._wait_samples_ms.append((dispatched_at - enqueued_at) * 1000.0)
+
+        try:
+            matrix = await self._encode_batch(texts)
+            rows = getattr(matrix, "shape", (len(matrix),))[0]
+            if rows != len(batch):
+                raise ValueError(f"El lote devolvió {rows} vectores para {len(batch)} textos.")
+        except Exception as e:
+            logger.error(f"Fallo codificando lote de {len(batch)} embeddings: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._record_batch(len(batch), (time.perf_counter() - dispatched_at) * 1000.0)
+
+        for i, (_, future, _) in enumerate(batch):
+            if not future.done(): # El llamador pudo haber cancelado
+                future.set_result(matrix[i])
+
+    def _record_batch(self, size: int, encode_ms: float) -> None:
+        self._total_batches += 1
+        self._total_items += size
+        self._max_batch_seen = max(self._max_batch_seen, size)
+        self._batch_size_histogram[size] = self._batch_size_histogram.get(size, 0) + 1
+        self._encode_samples_ms.append(encode_ms)
+        logger.debug(f"Lote de embeddings codificado: tamaño={size}, encode={encode_ms:.1f}ms")
+        if self._total_batches % _STATS_LOG_EVERY_N_BATCHES == 0:
+            stats = self.get_stats()
+            logger.info(
+                f"Micro-batching embeddings: lotes={stats['total_batches']}, "
+                f"tamaño medio={stats['avg_batch_size']:.2f}, "
+                f"espera p50={stats['queue_wait_ms_p50']:.2f}ms p99={stats['queue_wait_ms_p99']:.2f}ms"
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Devuelve métricas de tamaño de lote y espera en cola (ms)."""
+        waits = list(self._wait_samples_ms)
+        encodes = list(self._encode_samples_ms)
+        return {
+            "window_ms": self.window_ms,
+            "max_batch_size": self._max_batch_size,
+            "total_batches": self._total_batches,
+            "total_items": self._total_items,
+            "avg_batch_size": (self._total_items / self._total_batches) if self._total_batches else 0.0,
+            "max_batch_size_seen": self._max_batch_seen,
+            "batch_size_histogram": dict(sorted(self._batch_size_histogram.items())),
+            "pending": len(self._pending),
+            "queue_wait_ms_p50": _percentile(waits, 50),
+            "queue_wait_ms_p99": _percentile(waits, 99),
+            "queue_wait_ms_max": max(waits) if waits else 0.0,
+            "encode_ms_p50": _percentile(encodes, 50),
+            "encode_ms_p99": _percentile(encodes, 99),
+        }
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    """Percentil simple (nearest-rank) sin depender de numpy."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return float(ordered[index])
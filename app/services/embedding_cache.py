@@ -0,0 +1,89 @@
+# app/services/embedding_cache.py
+# -*- coding: utf-8 -*-
+
+"""
+Caché en proceso de embeddings de queries.
+
+Las claves son la query normalizada (minúsculas, sin acentos y con espacios
+colapsados), de modo que "Cómo activo  MiAdminXML" y "como activo miadminxml"
+comparten entrada. La caché queda etiquetada con el modelo y la dimensión de
+embeddings: si cambian EMBEDDING_MODEL_NAME o VECTOR_DIMENSION se vacía sola.
+"""
+
+import logging
+import re
+import unicodedata
+from typing import Any, Dict, Hashable, Optional
+
+from app.services.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normaliza una query para usarla como clave de caché:
+    minúsculas, acentos/diacríticos eliminados y espacios colapsados.
+    """
+    if not text:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", text)
+    without_marks = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return _WHITESPACE_RE.sub(" ", without_marks.casefold()).strip()
+
+
+class EmbeddingCache:
+    """
+    Caché LRU+TTL de vectores de query, invalidada al cambiar la etiqueta del modelo.
+
+    La etiqueta (`tag`) es cualquier tupla hashable que identifique el espacio
+    vectorial (p.ej. nombre del modelo y dimensión). Cada get/set recibe la
+    etiqueta vigente; si difiere de la guardada, la caché se vacía.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self._cache = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self._tag: Optional[Hashable] = None
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._cache.enabled
+
+    def _check_tag(self, tag: Hashable) -> None:
+        if tag != self._tag:
+            if self._tag is not None:
+                removed = self._cache.clear()
+                self.invalidations += 1
+                logger.info(f"Caché de embeddings invalidada por cambio de modelo ({self._tag} -> {tag}); {removed} entradas eliminadas.")
+            self._tag = tag
+
+    def get(self, query: str, tag: Hashable) -> Optional[Any]:
+        """Devuelve el vector cacheado para la query (normalizada) o None."""
+        if not self._cache.enabled:
+            return None
+        self._check_tag(tag)
+        return self._cache.get(normalize_query(query))
+
+    def set(self, query: str, vector: Any, tag: Hashable) -> None:
+        """Guarda el vector de la query bajo la etiqueta vigente."""
+        if not self._cache.enabled:
+            return
+        self._check_tag(tag)
+        key = normalize_query(query)
+        if key:
+            self._cache.set(key, vector)
+
+    def clear(self) -> int:
+        return self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self._cache.get_stats()
+        stats["invalidations"] = self.invalidations
+        stats["tag"] = list(self._tag) if isinstance(self._tag, tuple) else self._tag
+        return stats
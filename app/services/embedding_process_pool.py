@@ -0,0 +1,113 @@
+# app/services/embedding_process_pool.py
+# -*- coding: utf-8 -*-
+
+"""
+Backend de embeddings basado en un pool de procesos.
+
+Cada proceso worker carga el modelo SentenceTransformer una sola vez (en el
+initializer) y atiende trabajos de codificación. Los resultados vuelven como
+buffers crudos float32 (bytes) en lugar de arrays pickleados, y el proceso
+principal los reconstruye sin copia con np.frombuffer. Así la tokenización y
+el pooling escalan entre núcleos sin competir por el GIL del worker FastAPI.
+"""
+
+import logging
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple, Any
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    print("[ERROR embedding_process_pool.py] Numpy no instalado. Ejecuta: pip install numpy")
+    np = None # type: ignore
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# --- Estado dentro de cada proceso worker ---
+_worker_model: Any = None
+
+
+def _init_worker(model_name: str, device: str, torch_threads: int,
+                 backend: str = "sentence_transformers", onnx_dir: str = "", onnx_quantized: bool = False) -> None:
+    """Initializer del worker: limita hilos de inferencia y carga el modelo una vez."""
+    global _worker_model
+    if backend == "onnx":
+        from app.services.onnx_embedding_backend import OnnxEmbeddingModel
+        _worker_model = OnnxEmbeddingModel(model_dir=onnx_dir, quantized=onnx_quantized, intra_op_threads=torch_threads)
+        return
+    try:
+        import torch
+        if torch_threads > 0:
+            torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name_or_path=model_name, device=device)
+
+
+def _encode_in_worker(texts: List[str]) -> Tuple[bytes, int, int]:
+    """Codifica en el worker y devuelve (buffer float32, filas, dimensión)."""
+    if _worker_model is None:
+        raise RuntimeError("Modelo no inicializado en el proceso worker.")
+    matrix = _worker_model.encode(
+        texts,
+        batch_size=len(texts),
+        show_progress_bar=False,
+        convert_to_numpy=True,
+    )
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    return matrix.tobytes(), matrix.shape[0], matrix.shape[1]
+
+
+class EmbeddingProcessPool:
+    """
+    Pool de procesos que codifican embeddings con un modelo cargado por proceso.
+
+    Usa el contexto 'spawn' (seguro con torch/CUDA). Los hilos de torch por
+    worker se reparten entre los núcleos disponibles para no sobre-suscribir la CPU.
+    """
+
+    def __init__(self, workers: int, model_name: str, device: str = "cpu", torch_threads: Optional[int] = None,
+                 backend: str = "sentence_transformers", onnx_dir: str = "", onnx_quantized: bool = False):
+        if workers < 1:
+            raise ValueError("workers debe ser >= 1.")
+        self.workers = workers
+        self.model_name = model_name
+        self.device = device
+        if torch_threads is None:
+            torch_threads = max(1, (os.cpu_count() or 1) // workers)
+        self.torch_threads = torch_threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, device, torch_threads, backend, onnx_dir, onnx_quantized),
+        )
+        logger.info(
+            f"Pool de procesos de embeddings creado: {workers} workers, backend '{backend}', "
+            f"modelo '{model_name}' en '{device}', {torch_threads} hilos/worker."
+        )
+
+    async def encode(self, texts: List[str]) -> "np.ndarray":
+        """Codifica textos en un worker y devuelve matriz float32 (N, dim)."""
+        loop = asyncio.get_running_loop()
+        buffer, rows, dim = await loop.run_in_executor(self._executor, _encode_in_worker, list(texts))
+        return np.frombuffer(buffer, dtype=np.float32).reshape(rows, dim)
+
+    async def warm_up(self) -> None:
+        """Arranca todos los workers (cada uno carga su modelo) con una codificación trivial."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self._executor, _encode_in_worker, ["warm-up"])
+            for _ in range(self.workers)
+        ))
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Detiene los procesos worker."""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        logger.info("Pool de procesos de embeddings detenido.")
@@ -4,11 +4,13 @@
 """
 Servicio para cargar modelos SentenceTransformer y generar embeddings para textos (queries).
 MODIFICADO: Usa asyncio.to_thread para la llamada bloqueante a model.encode().
+Backend, ejecutor, caché, lotes y reducción de dimensión se configuran en
+settings (EMBEDDING_*); cada función documenta lo que le afecta.
 """
 
 import logging
 import asyncio # Para asyncio.to_thread
-from typing import List, Optional, Any, Dict, Tuple, TypeAlias # Añadir TypeAlias
+from typing import List, Optional, Any, AsyncIterator, Dict, Iterable, Tuple, TypeAlias # Añadir TypeAlias
 from functools import lru_cache
 
 # Importar configuración (con fallback)
@@ -44,53 +46,53 @@ except ImportError:
     NumpyArray: TypeAlias = Any # Fallback a Any si numpy falta
     NUMPY_AVAILABLE = False
 
-try:
-    from sentence_transformers import SentenceTransformer
-    SENTENCE_TRANSFORMERS_AVAILABLE = True
-except ImportError:
+# sentence-transformers y torch se importan bajo demanda (al cargar el modelo / warm-up)
+from app.core.lazy_imports import is_available, optional_import
+
+SENTENCE_TRANSFORMERS_AVAILABLE = is_available("sentence_transformers")
+if not SENTENCE_TRANSFORMERS_AVAILABLE:
     print("[ERROR embedding_service.py] sentence-transformers no instalado. Ejecuta: pip install sentence-transformers")
-    SentenceTransformer = None # type: ignore
-    SENTENCE_TRANSFORMERS_AVAILABLE = False
+TORCH_AVAILABLE = is_available("torch")
 
-try:
-    import torch
-    TORCH_AVAILABLE = True
-except ImportError:
-    print("[ADVERTENCIA embedding_service.py] PyTorch no instalado. Detección/uso GPU no funcionará.")
-    torch = None # type: ignore
-    TORCH_AVAILABLE = False
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_cache import EmbeddingCache, normalize_query
+from app.services.embedding_process_pool import EmbeddingProcessPool
+from app.services.embedding_store import EmbeddingStore
+from app.services import onnx_embedding_backend
+from app.services.single_flight import SingleFlight
+from app.services.vector_utils import freeze
+from app.services.dimension_reduction import DimensionReducer, effective_vector_dimension
 
 
 logger = logging.getLogger(__name__)
 
-# --- Carga Cacheada del Modelo ---
+def _sentence_transformer_class() -> Any:
+    """Importa SentenceTransformer (y con él torch) la primera vez que se necesita."""
+    module = optional_import("sentence_transformers")
+    if module is None:
+        raise ImportError("sentence-transformers no disponible.")
+    return module.SentenceTransformer
 
-@lru_cache(maxsize=1) # Cachear solo una instancia del modelo
-def get_embedding_model() -> Optional[SentenceTransformer]:
-    """
-    Carga y devuelve la instancia del modelo SentenceTransformer configurado.
-    Utiliza caché y maneja la selección de dispositivo (auto/cpu/cuda).
-    """
-    if not SENTENCE_TRANSFORMERS_AVAILABLE or not NUMPY_AVAILABLE or not CONFIG_LOADED:
-        logger.critical("Dependencias (numpy/sentence-transformers) o Configuración no disponibles.")
-        return None
+def _cuda_available() -> bool:
+    torch = optional_import("torch") if TORCH_AVAILABLE else None
+    return bool(torch is not None and torch.cuda.is_available())
 
-    # Usar nombres en MAYUSCULAS de settings
-    model_name = settings.EMBEDDING_MODEL_NAME
+# --- Selección de Dispositivo ---
+
+def _resolve_device() -> str:
+    """Determina el dispositivo final ('cpu' o 'cuda') a partir de EMBEDDING_DEVICE."""
     device_setting = settings.EMBEDDING_DEVICE.lower()
-    expected_dim = settings.VECTOR_DIMENSION
 
-    # Determinar dispositivo final
     final_device = "cpu" # Default
     if device_setting == "cuda":
-        if TORCH_AVAILABLE and torch.cuda.is_available():
+        if _cuda_available():
             final_device = "cuda"
             logger.info("Configurado para usar CUDA y está disponible.")
         else:
             logger.warning("Configurado para usar CUDA pero no disponible/PyTorch no instalado. Usando CPU.")
             final_device = "cpu"
     elif device_setting == "auto":
-        if TORCH_AVAILABLE and torch.cuda.is_available():
+        if _cuda_available():
             final_device = "cuda"
             logger.info("Modo 'auto': CUDA detectado, usando GPU.")
         else:
@@ -102,9 +104,79 @@ def get_embedding_model() -> Optional[SentenceTransformer]:
     else:
          logger.warning(f"Valor de EMBEDDING_DEVICE ('{settings.EMBEDDING_DEVICE}') no reconocido. Usando CPU.")
          final_device = "cpu"
+    return final_device
+
+# --- Backend ONNX ---
+
+def _load_onnx_model() -> Optional[Any]:
+    """
+    Carga el modelo ONNX exportado y verifica paridad con VECTOR_DIMENSION y,
+    si EMBEDDING_ONNX_VERIFY, similitud coseno contra el modelo de referencia.
+    Si la similitud no alcanza el umbral, usa el modelo PyTorch de referencia.
+    """
+    model_dir = getattr(settings, 'EMBEDDING_ONNX_DIR', None)
+    quantized = getattr(settings, 'EMBEDDING_ONNX_QUANTIZED', False)
+    expected_dim = settings.VECTOR_DIMENSION
+    try:
+        onnx_model = onnx_embedding_backend.OnnxEmbeddingModel(
+            model_dir=model_dir, quantized=quantized, intra_op_threads=0
+        )
+    except Exception as e:
+        logger.critical(f"No se pudo cargar el modelo ONNX desde '{model_dir}': {e}")
+        return None
+
+    loaded_dim = onnx_model.get_sentence_embedding_dimension()
+    if loaded_dim != expected_dim:
+        logger.critical(f"¡DISCREPANCIA DE DIMENSIÓN! Modelo ONNX={loaded_dim}, Config={expected_dim}.")
+        return None
+    if onnx_model.config.get("model_name") != settings.EMBEDDING_MODEL_NAME:
+        logger.warning(
+            f"El modelo ONNX se exportó desde '{onnx_model.config.get('model_name')}' "
+            f"pero EMBEDDING_MODEL_NAME='{settings.EMBEDDING_MODEL_NAME}'."
+        )
+
+    if getattr(settings, 'EMBEDDING_ONNX_VERIFY', True):
+        if not SENTENCE_TRANSFORMERS_AVAILABLE:
+            logger.warning("EMBEDDING_ONNX_VERIFY activo pero sentence-transformers no está instalado. Se omite la verificación.")
+            return onnx_model
+        min_cosine = getattr(settings, 'EMBEDDING_ONNX_MIN_COSINE', 0.99)
+        reference = _sentence_transformer_class()(model_name_or_path=settings.EMBEDDING_MODEL_NAME, device="cpu")
+        _, observed = onnx_embedding_backend.check_parity(onnx_model, reference, expected_dim)
+        if observed < min_cosine:
+            logger.critical(
+                f"Modelo ONNX no concuerda con la referencia (coseno mínimo {observed:.4f} < {min_cosine}). "
+                "Usando el modelo PyTorch de referencia."
+            )
+            return reference
+        logger.info(f"Paridad ONNX verificada (coseno mínimo {observed:.4f} >= {min_cosine}).")
+        del reference
+
+    return onnx_model
+
+# --- Carga Cacheada del Modelo ---
+
+@lru_cache(maxsize=1) # Cachear solo una instancia del modelo
+def get_embedding_model() -> Optional[Any]:
+    """
+    Carga y devuelve la instancia del modelo de embeddings configurado.
+    Por defecto un SentenceTransformer (con selección de dispositivo auto/cpu/cuda);
+    con EMBEDDING_BACKEND='onnx', un OnnxEmbeddingModel con la misma interfaz.
+    """
+    if getattr(settings, 'EMBEDDING_BACKEND', 'sentence_transformers') == "onnx" and CONFIG_LOADED:
+        return _load_onnx_model()
+
+    if not SENTENCE_TRANSFORMERS_AVAILABLE or not NUMPY_AVAILABLE or not CONFIG_LOADED:
+        logger.critical("Dependencias (numpy/sentence-transformers) o Configuración no disponibles.")
+        return None
+
+    # Usar nombres en MAYUSCULAS de settings
+    model_name = settings.EMBEDDING_MODEL_NAME
+    expected_dim = settings.VECTOR_DIMENSION
+    final_device = _resolve_device()
 
     try:
         logger.info(f"Cargando modelo SentenceTransformer: '{model_name}' en dispositivo '{final_device}'...")
+        SentenceTransformer = _sentence_transformer_class()
         model = SentenceTransformer(model_name_or_path=model_name, device=final_device)
 
         # Verificar dimensión cargada vs esperada
@@ -127,41 +199,280 @@ def get_embedding_model() -> Optional[SentenceTransformer]:
         logger.exception(f"Error inesperado al cargar modelo '{model_name}': {e}")
         return None
 
+# --- Caché de Embeddings de Queries ---
+
+_embedding_cache = EmbeddingCache(
+    max_size=getattr(settings, 'EMBEDDING_CACHE_SIZE', 2048),
+    ttl_seconds=getattr(settings, 'EMBEDDING_CACHE_TTL_SECONDS', 3600.0),
+)
+
+# Queries idénticas (normalizadas) en curso comparten un solo cálculo
+_single_flight = SingleFlight("embed_query", enabled=getattr(settings, 'SINGLE_FLIGHT_ENABLED', True))
+
+# --- Reducción de Dimensión ---
+
+@lru_cache(maxsize=1)
+def get_dimension_reducer() -> Optional[DimensionReducer]:
+    """
+    Devuelve el reductor configurado (EMBEDDING_REDUCTION) o None si está desactivado.
+    Lanza ValueError si está configurado pero el artefacto no es válido: enviar
+    vectores completos a una colección reducida fallaría en cada búsqueda.
+    """
+    mode = getattr(settings, 'EMBEDDING_REDUCTION', 'none')
+    if mode == "none":
+        return None
+    full_dim = int(getattr(settings, 'VECTOR_DIMENSION', 0))
+    reduced_dim = effective_vector_dimension(settings)
+    if mode == "truncate":
+        reducer = DimensionReducer("truncate", full_dim, reduced_dim, model_name=settings.EMBEDDING_MODEL_NAME)
+    else:
+        pca_path = getattr(settings, 'EMBEDDING_PCA_PATH', None)
+        try:
+            reducer = DimensionReducer.load(pca_path)
+        except Exception as e:
+            logger.critical(f"No se pudo cargar el artefacto PCA '{pca_path}': {e}")
+            raise ValueError("Reducción de dimensión configurada pero no disponible.") from e
+        if (reducer.input_dim, reducer.output_dim) != (full_dim, reduced_dim):
+            logger.critical(
+                f"Artefacto PCA {reducer.input_dim}->{reducer.output_dim} no coincide con la configuración {full_dim}->{reduced_dim}."
+            )
+            raise ValueError("Artefacto PCA incompatible con la configuración.")
+        if reducer.model_name and reducer.model_name != settings.EMBEDDING_MODEL_NAME:
+            logger.warning(f"Artefacto PCA ajustado con '{reducer.model_name}', modelo actual '{settings.EMBEDDING_MODEL_NAME}'.")
+    logger.info(f"Reducción de dimensión activa: {reducer.mode} {reducer.input_dim}->{reducer.output_dim}.")
+    return reducer
+
+def _model_tag() -> Tuple[str, int]:
+    """
+    Etiqueta del espacio vectorial vigente (modelo + reducción, dimensión); un
+    cambio invalida la caché y el almacén compartido. Con reducción incluye el
+    fingerprint del artefacto, así reajustar la PCA a la misma dimensión
+    también invalida los vectores cacheados.
+    """
+    model_name = str(getattr(settings, 'EMBEDDING_MODEL_NAME', getattr(settings, 'embedding_model_name', '')))
+    mode = getattr(settings, 'EMBEDDING_REDUCTION', 'none')
+    if mode != "none":
+        reducer = get_dimension_reducer()
+        model_name = f"{model_name}+{mode}:{reducer.fingerprint}" if reducer is not None else f"{model_name}+{mode}"
+    return (model_name, effective_vector_dimension(settings))
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Métricas de la caché de embeddings (aciertos, fallos, tamaño, invalidaciones)."""
+    return _embedding_cache.get_stats()
+
+def clear_embedding_cache() -> int:
+    """Vacía la caché de embeddings. Devuelve el número de entradas eliminadas."""
+    return _embedding_cache.clear()
+
+# --- Almacén Compartido en Disco (mmap) ---
+
+@lru_cache(maxsize=1)
+def _get_embedding_store() -> Optional[EmbeddingStore]:
+    """Abre (una vez por proceso) el almacén mmap compartido, o None si no está configurado."""
+    store_path = getattr(settings, 'EMBEDDING_STORE_PATH', None)
+    if not store_path or not CONFIG_LOADED:
+        return None
+    model_name, dim = _model_tag()
+    try:
+        return EmbeddingStore(
+            path=store_path,
+            model_name=model_name,
+            dim=dim,
+            capacity=getattr(settings, 'EMBEDDING_STORE_CAPACITY', 65536),
+        )
+    except Exception as e:
+        logger.error(f"No se pudo abrir el almacén de embeddings '{store_path}': {e}. Se continúa sin él.")
+        return None
+
+def get_store_stats() -> Optional[Dict[str, Any]]:
+    """Métricas del almacén compartido, o None si no está activo."""
+    store = _get_embedding_store()
+    return store.get_stats() if store is not None else None
+
+def _lookup_cached(query: str, tag: Tuple[str, int]) -> Optional[NumpyArray]:
+    """Busca en la caché en proceso y luego en el almacén compartido (promoviendo el acierto)."""
+    cached = _embedding_cache.get(query, tag)
+    if cached is not None:
+        return cached
+    store = _get_embedding_store()
+    if store is not None:
+        stored = store.get(query, tag)
+        if stored is not None:
+            _embedding_cache.set(query, stored, tag)
+            return stored
+    return None
+
+def _remember(query: str, row: NumpyArray, tag: Tuple[str, int]) -> None:
+    """Guarda el embedding en la caché en proceso y en el almacén compartido."""
+    _embedding_cache.set(query, row, tag)
+    store = _get_embedding_store()
+    if store is not None:
+        try:
+            store.set(query, row, tag)
+        except OSError as e:
+            logger.warning(f"No se pudo escribir en el almacén de embeddings: {e}")
+
+# --- Ejecutor de Codificación (thread / process) ---
+
+_process_pool: Optional[EmbeddingProcessPool] = None
+
+def _executor_mode() -> str:
+    return str(getattr(settings, 'EMBEDDING_EXECUTOR', 'thread')).lower()
+
+def _get_process_pool() -> EmbeddingProcessPool:
+    """Crea (una vez) el pool de procesos de embeddings."""
+    global _process_pool
+    if _process_pool is None:
+        if not NUMPY_AVAILABLE or not CONFIG_LOADED:
+            raise ValueError("Servicio de Embeddings no disponible.")
+        backend = getattr(settings, 'EMBEDDING_BACKEND', 'sentence_transformers')
+        _process_pool = EmbeddingProcessPool(
+            workers=getattr(settings, 'EMBEDDING_PROCESS_WORKERS', 2),
+            model_name=settings.EMBEDDING_MODEL_NAME,
+            device=_resolve_device() if backend != "onnx" else "cpu",
+            backend=backend,
+            onnx_dir=str(getattr(settings, 'EMBEDDING_ONNX_DIR', '') or ''),
+            onnx_quantized=getattr(settings, 'EMBEDDING_ONNX_QUANTIZED', False),
+        )
+    return _process_pool
+
+def shutdown_executor() -> None:
+    """Detiene el pool de procesos si se creó (llamar al apagar la aplicación)."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown()
+        _process_pool = None
+
+# --- Micro-batching de Queries ---
+
+_batcher: Optional[EmbeddingBatcher] = None
+_batcher_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _encode_texts_sync(model: Any, texts: List[str]) -> NumpyArray:
+    """Codifica un lote de textos de forma síncrona y devuelve matriz float32 (N, dim)."""
+    embeddings_result = model.encode(
+        texts,
+        batch_size=len(texts),
+        show_progress_bar=False,
+        convert_to_numpy=True
+    )
+    return np.asarray(embeddings_result, dtype=np.float32)
+
+async def _encode_batch(texts: List[str], reduce: bool = True) -> NumpyArray:
+    """
+    Codifica un lote completo con el ejecutor configurado: thread pool por
+    defecto, o pool de procesos con EMBEDDING_EXECUTOR='process'. Aplica la
+    reducción de dimensión configurada salvo que `reduce=False`.
+    """
+    matrix = await _encode_full_batch(texts)
+    reducer = get_dimension_reducer() if reduce else None
+    return reducer.transform(matrix) if reducer is not None else matrix
+
+async def _encode_full_batch(texts: List[str]) -> NumpyArray:
+    """Codifica a la dimensión completa del modelo (VECTOR_DIMENSION)."""
+    if _executor_mode() == "process":
+        matrix = await _get_process_pool().encode(texts)
+        expected_dim = getattr(settings, 'VECTOR_DIMENSION', None)
+        if expected_dim and matrix.shape[1] != expected_dim:
+            raise ValueError(f"¡DISCREPANCIA DE DIMENSIÓN! Worker={matrix.shape[1]}, Config={expected_dim}.")
+        return matrix
+    model = get_embedding_model()
+    if model is None:
+        raise ValueError("Servicio de Embeddings no disponible.")
+    return await asyncio.to_thread(_encode_texts_sync, model, texts)
+
+def _get_batcher() -> EmbeddingBatcher:
+    """Devuelve el EmbeddingBatcher del event loop actual (lo crea si no existe)."""
+    global _batcher, _batcher_loop
+    loop = asyncio.get_running_loop()
+    if _batcher is None or _batcher_loop is not loop:
+        _batcher = EmbeddingBatcher(
+            encode_batch=_encode_batch,
+            window_ms=getattr(settings, 'EMBEDDING_BATCH_WINDOW_MS', 5.0),
+            max_batch_size=getattr(settings, 'EMBEDDING_BATCH_MAX_SIZE', 32),
+        )
+        _batcher_loop = loop
+        logger.info(f"Micro-batching de embeddings activo (ventana={_batcher.window_ms}ms, max={_batcher.max_batch_size}).")
+    return _batcher
+
+def get_batching_stats() -> Optional[Dict[str, Any]]:
+    """Métricas del micro-batching (tamaño de lote, espera en cola) o None si no está activo."""
+    return _batcher.get_stats() if _batcher is not None else None
+
+async def warm_up() -> None:
+    """
+    Carga el modelo fuera del event loop (o arranca los workers del pool) y
+    ejecuta una codificación de prueba. Lanza ValueError si el modelo no está disponible.
+    """
+    if _executor_mode() == "process":
+        await _get_process_pool().warm_up()
+        return
+    model = await asyncio.to_thread(get_embedding_model)
+    if model is None:
+        raise ValueError("Servicio de Embeddings no disponible.")
+    await _encode_batch(["warm-up"])
+
 # --- Función Pública del Servicio ---
 
-async def embed_query(query: str) -> List[float]:
+async def embed_query(query: str) -> NumpyArray:
     """
     Genera el embedding vectorial para una única consulta (string).
     Ejecuta model.encode en un hilo separado para no bloquear asyncio.
+    Con EMBEDDING_BATCHING_ENABLED, la query se agrupa con otras concurrentes.
+    Las queries repetidas se sirven desde la caché en proceso (LRU+TTL) o el
+    almacén mmap compartido entre workers (EMBEDDING_STORE_PATH). Llamadas
+    concurrentes con la misma query normalizada comparten un solo cálculo
+    (single-flight).
+
+    Returns:
+        Vector float32 1-D contiguo y de solo lectura (compartido con la caché).
     """
     if not query or not isinstance(query, str):
         logger.error("Se recibió una query inválida para generar embedding.")
         raise ValueError("Query inválida proporcionada.")
 
-    model = get_embedding_model() # Obtener modelo cacheado
+    # Un acierto de caché (proceso o almacén compartido) evita el salto a thread y el modelo
+    tag = _model_tag()
+    cached = _lookup_cached(query, tag)
+    if cached is not None:
+        logger.debug("Embedding servido desde caché.")
+        return cached
 
-    if model is None:
-        logger.critical("El modelo de embeddings no está disponible o no pudo cargarse.")
-        raise ValueError("Servicio de Embeddings no disponible.")
+    return await _single_flight.do((normalize_query(query), tag), lambda: _embed_uncached(query, tag))
 
-    logger.debug(f"Generando embedding para query (en thread): '{query[:80]}...'")
+async def _embed_uncached(query: str, tag: Tuple[str, int]) -> NumpyArray:
+    """Calcula (lote, hilo o proceso) y cachea el embedding de una query que no estaba en caché."""
+    if getattr(settings, 'EMBEDDING_BATCHING_ENABLED', False):
+        try:
+            # Copia propia de la fila: no retener la matriz completa del lote
+            row = freeze(np.array(await _get_batcher().submit(query), dtype=np.float32))
+            _remember(query, row, tag)
+            logger.debug(f"Embedding generado en lote (dim: {row.shape[0]})")
+            return row
+        except Exception as e:
+            logger.exception(f"Error generando embedding (micro-batching) para query '{query[:80]}...': {e}")
+            raise ValueError(f"Error interno al generar embedding.") from e
+
+    executor_mode = _executor_mode()
+    if executor_mode != "process":
+        model = get_embedding_model() # Obtener modelo cacheado
+
+        if model is None:
+            logger.critical("El modelo de embeddings no está disponible o no pudo cargarse.")
+            raise ValueError("Servicio de Embeddings no disponible.")
+
+    logger.debug(f"Generando embedding para query (en {executor_mode}): '{query[:80]}...'")
     try:
-        # Ejecutar la función síncrona model.encode en el thread pool por defecto
-        embeddings_result: Optional[NumpyArray] = await asyncio.to_thread(
-            model.encode, # La función síncrona
-            [query],      # Argumentos posicionales
-            # Argumentos keyword:
-            batch_size=1,
-            show_progress_bar=False,
-            convert_to_numpy=True
-        )
+        # Ejecutar model.encode fuera del event loop (thread pool o pool de procesos)
+        embeddings_result: Optional[NumpyArray] = await _encode_batch([query])
 
         # Validar el resultado
         if embeddings_result is not None and isinstance(embeddings_result, np.ndarray) and embeddings_result.shape[0] == 1:
-             # Extraer, asegurar float32, y convertir a lista Python
-             vector: List[float] = embeddings_result[0].astype(np.float32).tolist()
-             logger.debug(f"Embedding generado (dim: {len(vector)})")
-             return vector
+             # Extraer como float32 contiguo de solo lectura y cachear (sin pasar a lista Python)
+             row = freeze(np.ascontiguousarray(embeddings_result[0], dtype=np.float32))
+             _remember(query, row, tag)
+             logger.debug(f"Embedding generado (dim: {row.shape[0]})")
+             return row
         else:
              shape_info = getattr(embeddings_result, 'shape', 'N/A')
              type_info = type(embeddings_result).__name__
@@ -172,6 +483,96 @@ async def embed_query(query: str) -> List[float]:
         logger.exception(f"Error inesperado generando embedding para query '{query[:80]}...': {e}")
         raise ValueError(f"Error interno al generar embedding.") from e
 
+# --- Codificación en Lote (muchos textos) ---
+
+def _validate_texts(texts: List[Any]) -> None:
+    for i, text in enumerate(texts):
+        if not text or not isinstance(text, str):
+            raise ValueError(f"Texto inválido en la posición {i}.")
+
+def _chunk_size(chunk_size: Optional[int]) -> int:
+    size = chunk_size if chunk_size is not None else getattr(settings, 'EMBEDDING_ENCODE_CHUNK_SIZE', 64)
+    if size < 1:
+        raise ValueError("chunk_size debe ser >= 1.")
+    return int(size)
+
+async def _encode_sorted_into(texts: List[str], out: NumpyArray, chunk_size: int, reduce: bool = True) -> None:
+    """
+    Codifica `texts` por bloques tras ordenarlos por longitud (menos padding por
+    bloque) y escribe cada fila en `out` en el orden original.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    for start in range(0, len(order), chunk_size):
+        indices = order[start:start + chunk_size]
+        matrix = await _encode_batch([texts[i] for i in indices], reduce=reduce)
+        if matrix.shape != (len(indices), out.shape[1]):
+            raise ValueError(f"Resultado inesperado de model.encode. Shape: {matrix.shape}")
+        out[indices] = matrix
+
+async def embed_queries(texts: List[str], chunk_size: Optional[int] = None, reduce: bool = True) -> NumpyArray:
+    """
+    Genera embeddings para muchos textos.
+
+    Ordena los textos por longitud, los codifica en bloques de `chunk_size`
+    (default EMBEDDING_ENCODE_CHUNK_SIZE) con el ejecutor configurado y
+    devuelve una única matriz float32 (N, dim) en el orden de entrada.
+    No usa la caché de queries (pensado para trabajos offline). Con
+    `reduce=False` devuelve vectores a dimensión completa aunque haya reducción activa.
+    """
+    texts = list(texts)
+    _validate_texts(texts)
+    size = _chunk_size(chunk_size)
+    _, dim = _model_tag()
+    if not reduce:
+        dim = int(getattr(settings, 'VECTOR_DIMENSION', dim))
+    out = np.empty((len(texts), dim), dtype=np.float32)
+    if not texts:
+        return out
+    logger.info(f"Codificando {len(texts)} textos en bloques de {size}...")
+    try:
+        await _encode_sorted_into(texts, out, size, reduce=reduce)
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.exception(f"Error inesperado codificando lote de {len(texts)} textos: {e}")
+        raise ValueError("Error interno al generar embeddings.") from e
+    return out
+
+async def iter_embed_queries(
+    texts: Iterable[str],
+    chunk_size: Optional[int] = None,
+    window_chunks: int = 8,
+) -> AsyncIterator[NumpyArray]:
+    """
+    Versión en streaming de embed_queries para entradas muy grandes.
+
+    Consume `texts` en ventanas de `window_chunks * chunk_size` textos, ordena
+    cada ventana por longitud y produce su matriz float32 (en orden de entrada),
+    de modo que la memoria queda acotada por el tamaño de la ventana.
+    Concatenar las matrices producidas equivale a embed_queries(texts).
+    """
+    size = _chunk_size(chunk_size)
+    window_size = size * max(1, window_chunks)
+    _, dim = _model_tag()
+    window: List[str] = []
+    offset = 0
+
+    async def _flush(batch: List[str]) -> NumpyArray:
+        _validate_texts(batch)
+        out = np.empty((len(batch), dim), dtype=np.float32)
+        await _encode_sorted_into(batch, out, size)
+        return out
+
+    for text in texts:
+        window.append(text)
+        if len(window) >= window_size:
+            logger.debug(f"Codificando ventana de {len(window)} textos (desde {offset}).")
+            yield await _flush(window)
+            offset += len(window)
+            window = []
+    if window:
+        yield await _flush(window)
+
 # --- Bloque para pruebas rápidas ---
 if __name__ == "__main__":
     import asyncio
@@ -183,16 +584,17 @@ if __name__ == "__main__":
             from app.core.config import settings
             # Necesita que .env tenga las variables requeridas por Settings (QDRANT_URL, etc.)
             print(f"Usando modelo: {settings.EMBEDDING_MODEL_NAME} en device: {settings.EMBEDDING_DEVICE}")
-            print(f"Dimensión esperada: {settings.VECTOR_DIMENSION}")
+            expected_dim = effective_vector_dimension(settings) # Dimensión tras la reducción, si hay
+            print(f"Dimensión esperada: {expected_dim} (modelo: {settings.VECTOR_DIMENSION})")
 
             test_query = "Esta es una consulta de prueba para el servicio de embeddings."
             vector = await embed_query(test_query)
-            if vector:
+            if vector is not None and vector.size:
                 print(f"\nQuery: {test_query}")
                 print(f"Vector generado (Primeros 5 / Últimos 5 de {len(vector)} dims):")
                 print(f"  Inicio: {[f'{x:.4f}' for x in vector[:5]]}") # Formatear floats
                 print(f"  Fin:    {[f'{x:.4f}' for x in vector[-5:]]}")
-                assert len(vector) == settings.VECTOR_DIMENSION, "¡Dimensión incorrecta!"
+                assert len(vector) == expected_dim, "¡Dimensión incorrecta!"
                 print("\nPrueba de embedding completada exitosamente.")
             else:
                 print("\nFallo al generar embedding (vector es None/vacío).")
@@ -0,0 +1,237 @@
+# app/services/embedding_store.py
+# -*- coding: utf-8 -*-
+
+"""
+Almacén persistente de embeddings en un archivo mapeado en memoria (mmap),
+compartido por todos los workers de uvicorn y persistente entre reinicios.
+
+Formato del archivo:
+- Cabecera (4 KiB): magic, versión, dimensión, capacidad, número de entradas y
+  nombre del modelo. La pareja (modelo, dimensión) es la etiqueta del almacén.
+- Índice: `capacity` claves uint64 (hash de la query normalizada; 0 = vacío)
+  con direccionamiento abierto y sondeo lineal.
+- Matriz: `capacity x dim` float32; la fila i pertenece a la clave i.
+
+Las lecturas no toman lock. Las escrituras toman un lock de archivo (fcntl)
+y escriben primero la fila y después la clave, de modo que un lector que ve
+la clave siempre ve el vector completo. Las entradas nunca se sobrescriben;
+al llegar a MAX_LOAD_FACTOR el almacén deja de aceptar entradas nuevas.
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError: # Windows
+    fcntl = None # type: ignore
+    FCNTL_AVAILABLE = False
+
+from app.services.embedding_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"KEMBSTR1"
+FORMAT_VERSION = 1
+HEADER_SIZE = 4096
+MAX_MODEL_NAME_BYTES = 512
+MAX_LOAD_FACTOR = 0.75
+# magic, versión, dimensión, capacidad, entradas, longitud del nombre del modelo
+_HEADER_STRUCT = struct.Struct("<8sIIQQI")
+_COUNT_OFFSET = 8 + 4 + 4 + 8
+
+
+def _hash_key(normalized: str) -> int:
+    """Hash de 64 bits de la query normalizada (nunca 0, reservado para 'vacío')."""
+    value = int.from_bytes(hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest(), "little")
+    return value or 1
+
+
+class EmbeddingStore:
+    """
+    Caché de embeddings en disco compartida entre procesos.
+
+    Args:
+        path: Ruta del archivo del almacén.
+        model_name: Modelo que generó los vectores (parte de la etiqueta).
+        dim: Dimensión de los vectores.
+        capacity: Número máximo de filas (ranuras del índice).
+    """
+
+    def __init__(self, path: Path, model_name: str, dim: int, capacity: int):
+        if not FCNTL_AVAILABLE:
+            raise OSError("EmbeddingStore requiere fcntl (solo POSIX).")
+        if dim <= 0 or capacity <= 0:
+            raise ValueError("dim y capacity deben ser > 0.")
+        self.path = Path(path)
+        self.model_name = model_name
+        self.dim = int(dim)
+        self.capacity = int(capacity)
+        self.tag: Tuple[str, int] = (model_name, self.dim)
+        self._lock_path = self.path.with_name(self.path.name + ".lock")
+        self._file_size = HEADER_SIZE + self.capacity * 8 + self.capacity * self.dim * 4
+        self._full_logged = False
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._locked():
+            if not self._header_matches():
+                self._initialize_file()
+        self._open_mapping()
+
+    # --- Archivo / mmap ---
+
+    def _locked(self) -> "_FileLock":
+        return _FileLock(self._lock_path)
+
+    def _header_matches(self) -> bool:
+        """True si el archivo existe con la misma etiqueta, dimensión y capacidad."""
+        try:
+            if self.path.stat().st_size != self._file_size:
+                return False
+            with open(self.path, "rb") as f:
+                raw = f.read(HEADER_SIZE)
+        except OSError:
+            return False
+        magic, version, dim, capacity, _, name_len = _HEADER_STRUCT.unpack_from(raw)
+        name = raw[_HEADER_STRUCT.size:_HEADER_STRUCT.size + name_len].decode("utf-8", errors="replace")
+        return (magic == MAGIC and version == FORMAT_VERSION and dim == self.dim
+                and capacity == self.capacity and name == self.model_name)
+
+    def _initialize_file(self) -> None:
+        """Crea un archivo vacío con la etiqueta actual (reemplazo atómico)."""
+        name_bytes = self.model_name.encode("utf-8")[:MAX_MODEL_NAME_BYTES]
+        header = bytearray(HEADER_SIZE)
+        _HEADER_STRUCT.pack_into(header, 0, MAGIC, FORMAT_VERSION, self.dim, self.capacity, 0, len(name_bytes))
+        header[_HEADER_STRUCT.size:_HEADER_STRUCT.size + len(name_bytes)] = name_bytes
+
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            f.truncate(self._file_size) # Archivo disperso: el resto queda en ceros
+        os.replace(tmp_path, self.path)
+        logger.info(
+            f"Almacén de embeddings inicializado en {self.path} "
+            f"(modelo '{self.model_name}', dim={self.dim}, capacidad={self.capacity})."
+        )
+
+    def _open_mapping(self) -> None:
+        self._file = open(self.path, "r+b")
+        self._mm = mmap.mmap(self._file.fileno(), self._file_size, access=mmap.ACCESS_WRITE)
+        self._keys = np.frombuffer(self._mm, dtype=np.uint64, count=self.capacity, offset=HEADER_SIZE)
+        self._vectors = np.frombuffer(
+            self._mm, dtype=np.float32, count=self.capacity * self.dim, offset=HEADER_SIZE + self.capacity * 8
+        ).reshape(self.capacity, self.dim)
+
+    def close(self) -> None:
+        """Libera el mapeo y el descriptor de archivo."""
+        if getattr(self, "_mm", None) is None:
+            return
+        del self._keys, self._vectors
+        self._mm.close()
+        self._file.close()
+        self._mm = None
+
+    # --- Índice ---
+
+    def _probe(self, key: int) -> Tuple[int, bool]:
+        """Devuelve (ranura, encontrada). Si no se encuentra, la ranura es la primera vacía (o -1)."""
+        slot = key % self.capacity
+        for _ in range(self.capacity):
+            current = int(self._keys[slot])
+            if current == key:
+                return slot, True
+            if current == 0:
+                return slot, False
+            slot = (slot + 1) % self.capacity
+        return -1, False
+
+    def __len__(self) -> int:
+        return int(struct.unpack_from("<Q", self._mm, _COUNT_OFFSET)[0])
+
+    # --- API pública ---
+
+    def get(self, query: str, tag: Hashable) -> Optional[np.ndarray]:
+        """Vector float32 (copia de solo lectura) para la query, o None si no está o la etiqueta difiere."""
+        if tag != self.tag:
+            return None
+        normalized = normalize_query(query)
+        if not normalized:
+            return None
+        slot, found = self._probe(_hash_key(normalized))
+        if not found:
+            self.misses += 1
+            return None
+        self.hits += 1
+        vector = self._vectors[slot].copy()
+        vector.setflags(write=False)
+        return vector
+
+    def set(self, query: str, vector: Any, tag: Hashable) -> bool:
+        """Añade el vector de la query. Devuelve True si se escribió una entrada nueva."""
+        if tag != self.tag:
+            return False
+        normalized = normalize_query(query)
+        row = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if not normalized or row.shape[0] != self.dim:
+            return False
+        key = _hash_key(normalized)
+
+        with self._locked():
+            count = len(self)
+            if count >= int(self.capacity * MAX_LOAD_FACTOR):
+                if not self._full_logged:
+                    logger.warning(f"Almacén de embeddings lleno ({count}/{self.capacity}); no se aceptan entradas nuevas.")
+                    self._full_logged = True
+                return False
+            slot, found = self._probe(key)
+            if found or slot < 0:
+                return False
+            # Primero el vector, después la clave: un lector sin lock nunca ve una fila a medias
+            self._vectors[slot] = row
+            self._keys[slot] = np.uint64(key)
+            struct.pack_into("<Q", self._mm, _COUNT_OFFSET, count + 1)
+        self.writes += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "size": len(self),
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "writes": self.writes,
+            "tag": list(self.tag),
+        }
+
+
+class _FileLock:
+    """Lock exclusivo entre procesos sobre un archivo auxiliar (fcntl.flock)."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def __enter__(self) -> "_FileLock":
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
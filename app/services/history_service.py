@@ -8,7 +8,7 @@ Usa la integración con Langchain y asyncio.to_thread para operaciones potencial
 
 import logging
 import asyncio # NUEVO: Para asyncio.to_thread
-from typing import List, Optional, Any
+from typing import List, Optional, Any, TYPE_CHECKING
 
 # Importar configuración (con fallback)
 try:
@@ -32,23 +32,21 @@ except ImportError:
      print("[WARN history_service.py] No se pudo importar HistoryServiceError.")
      HistoryServiceError = Exception # Fallback a Exception genérica
 
-# Importar dependencias de Langchain y MongoDB
-try:
-    from langchain_mongodb.chat_message_histories import MongoDBChatMessageHistory
-    from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
-    # Importar excepciones de Pymongo si quieres capturarlas específicamente
-    # from pymongo.errors import ConnectionFailure, OperationFailure
-    LANGCHAIN_MONGO_AVAILABLE = True
-except ImportError:
+# Dependencias de Langchain y MongoDB: se importan al crear el primer historial
+from app.core.lazy_imports import is_available, optional_import
+
+LANGCHAIN_MONGO_AVAILABLE = is_available("langchain_mongodb") and is_available("langchain_core")
+if not LANGCHAIN_MONGO_AVAILABLE:
     print("[ERROR history_service.py] Dependencias Langchain/Mongo no instaladas.")
-    BaseMessage=Any; HumanMessage=Any; AIMessage=Any; MongoDBChatMessageHistory=None; LANGCHAIN_MONGO_AVAILABLE = False
-    # ConnectionFailure = ConnectionError; OperationFailure = Exception # Dummies para except
+if TYPE_CHECKING:
+    from langchain_mongodb.chat_message_histories import MongoDBChatMessageHistory
+    from langchain_core.messages import BaseMessage
 
 logger = logging.getLogger(__name__)
 
 # --- Funciones del Servicio ---
 
-def _get_mongo_history_sync(session_id: str) -> Optional[MongoDBChatMessageHistory]:
+def _get_mongo_history_sync(session_id: str) -> Optional["MongoDBChatMessageHistory"]:
     """
     Función SÍNCRONA interna para obtener una instancia de MongoDBChatMessageHistory.
     Separada para facilitar el uso con asyncio.to_thread si la creación es bloqueante.
@@ -67,8 +65,11 @@ def _get_mongo_history_sync(session_id: str) -> Optional[MongoDBChatMessageHisto
         return None
 
     try:
+        histories = optional_import("langchain_mongodb.chat_message_histories")
+        if histories is None:
+            return None
         # La creación de la instancia puede implicar conexión inicial
-        history = MongoDBChatMessageHistory(
+        history = histories.MongoDBChatMessageHistory(
             connection_string=connection_string,
             session_id=session_id,
             database_name=db_name,
@@ -81,7 +82,7 @@ def _get_mongo_history_sync(session_id: str) -> Optional[MongoDBChatMessageHisto
         return None
 
 # Funciones auxiliares síncronas para pasar a to_thread
-def _get_messages_sync(history: MongoDBChatMessageHistory, max_messages: Optional[int]) -> List[BaseMessage]:
+def _get_messages_sync(history: "MongoDBChatMessageHistory", max_messages: Optional[int]) -> List["BaseMessage"]:
      """Obtiene mensajes de forma síncrona."""
      messages = history.messages # Acceso a propiedad puede ser bloqueante
      if max_messages is not None and max_messages > 0:
@@ -91,13 +92,13 @@ def _get_messages_sync(history: MongoDBChatMessageHistory, max_messages: Optiona
      else:
           return messages
 
-def _add_messages_sync(history: MongoDBChatMessageHistory, human_message: str, ai_message: str) -> None:
+def _add_messages_sync(history: "MongoDBChatMessageHistory", human_message: str, ai_message: str) -> None:
      """Añade mensajes de forma síncrona."""
      history.add_user_message(human_message) # Puede ser bloqueante
      history.add_ai_message(ai_message) # Puede ser bloqueante
 
 
-async def get_chat_history(session_id: str, max_messages: Optional[int] = 6) -> List[BaseMessage]:
+async def get_chat_history(session_id: str, max_messages: Optional[int] = 6) -> List["BaseMessage"]:
     """
     Recupera los últimos mensajes del historial de chat para una sesión dada.
     Usa asyncio.to_thread para operaciones potencialmente bloqueantes.
@@ -0,0 +1,197 @@
+# app/services/hybrid_retrieval.py
+# -*- coding: utf-8 -*-
+
+"""
+Recuperación híbrida: búsqueda densa (embedding + search_documents) y BM25 en
+paralelo, fusionadas con reciprocal-rank fusion (RRF).
+
+Cada recuperador aporta HYBRID_CANDIDATES candidatos; la fusión ordena por
+sum(1 / (RRF_K + rango)) y devuelve RAG_TOP_K resultados con el mismo formato
+{id, score, payload} que `search_documents`, de modo que
+`_format_context_from_qdrant` no cambia. La latencia de cada recuperador se
+registra y se acumula en `get_retrieval_stats()`.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# Importar configuración (con fallback)
+try:
+    from app.core.config import settings
+    CONFIG_LOADED = True
+except Exception:
+    class DummySettings:
+        RETRIEVAL_MODE: str = "dense"; HYBRID_CANDIDATES: int = 10; RRF_K: int = 60
+        BM25_K1: float = 1.2; BM25_B: float = 0.75; RAG_TOP_K: int = 3
+    settings = DummySettings() # type: ignore
+    CONFIG_LOADED = False
+
+from app.services import embedding_service, qdrant_service
+from app.services.bm25_index import BM25Index
+
+logger = logging.getLogger(__name__)
+
+_bm25_index: Optional[BM25Index] = None
+_bm25_lock: Optional[asyncio.Lock] = None
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+def hybrid_enabled() -> bool:
+    return getattr(settings, 'RETRIEVAL_MODE', 'dense') == 'hybrid'
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[Dict[str, Any]]], top_k: int, k: int = 60) -> List[Dict[str, Any]]:
+    """
+    Fusiona listas ordenadas de resultados por RRF, identificando los
+    resultados por su id. El payload se toma de la primera lista que lo trae
+    (orden de `rankings`).
+
+    Returns:
+        Lista de {id, score (RRF), payload, ranks: {recuperador: rango 1-based}}.
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for retriever, results in rankings.items():
+        for rank, result in enumerate(results, start=1):
+            key = str(result["id"])
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = {"id": result["id"], "score": 0.0, "payload": result.get("payload") or {}, "ranks": {}}
+            entry["score"] += 1.0 / (k + rank)
+            entry["ranks"][retriever] = rank
+    ordered = sorted(fused.values(), key=lambda e: (-e["score"], min(e["ranks"].values())))
+    return ordered[:top_k]
+
+
+def _record(name: str, elapsed_ms: float) -> None:
+    stats = _stats.setdefault(name, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0})
+    stats["calls"] += 1
+    stats["total_ms"] += elapsed_ms
+    stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+
+def get_retrieval_stats() -> Dict[str, Dict[str, float]]:
+    """Latencia acumulada por etapa (llamadas, media y máximo en ms)."""
+    return {
+        name: {"calls": s["calls"], "avg_ms": round(s["total_ms"] / s["calls"], 3), "max_ms": round(s["max_ms"], 3)}
+        for name, s in _stats.items() if s["calls"]
+    }
+
+
+# --- Índice BM25 ---
+
+async def _collection_points() -> List[Tuple[Any, Dict[str, Any]]]:
+    """(point_id, payload) de la colección: del índice local si está activo, si no de Qdrant."""
+    if qdrant_service._local_backend_enabled():
+        index = await qdrant_service.get_local_index()
+        return list(zip(index.ids, index.payloads)) if index is not None else []
+    client = qdrant_service._get_qdrant_client()
+    if client is None:
+        return []
+    collection_name = getattr(settings, 'QDRANT_COLLECTION_NAME', 'default_collection')
+    points: List[Tuple[Any, Dict[str, Any]]] = []
+    offset = None
+    while True:
+        batch, offset = await client.scroll(
+            collection_name=collection_name, limit=256, offset=offset, with_payload=True, with_vectors=False,
+        )
+        points.extend((point.id, point.payload or {}) for point in batch)
+        if offset is None:
+            return points
+
+
+def set_bm25_index(index: Optional[BM25Index]) -> None:
+    """Instala (o quita) el índice BM25; usado en pruebas y benchmarks."""
+    global _bm25_index
+    _bm25_index = index
+
+
+async def load_bm25_index(rebuild: bool = False) -> Optional[BM25Index]:
+    """Construye el índice BM25 desde la colección (una vez, o de nuevo con `rebuild`)."""
+    global _bm25_index, _bm25_lock
+    if _bm25_index is not None and not rebuild:
+        return _bm25_index
+    if _bm25_lock is None:
+        _bm25_lock = asyncio.Lock()
+    async with _bm25_lock:
+        if _bm25_index is not None and not rebuild:
+            return _bm25_index
+        try:
+            points = await _collection_points()
+            if not points:
+                logger.error("No hay documentos para construir el índice BM25.")
+                return None
+            options = {"k1": getattr(settings, 'BM25_K1', 1.2), "b": getattr(settings, 'BM25_B', 0.75)}
+            _bm25_index = await asyncio.to_thread(BM25Index.from_points, points, **options)
+        except Exception as e:
+            logger.exception(f"No se pudo construir el índice BM25: {e}")
+            return None
+        return _bm25_index
+
+
+# --- Recuperación ---
+
+async def _timed(name: str, coro: Any, timings: Dict[str, float]) -> Any:
+    start = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        timings[name] = (time.perf_counter() - start) * 1000.0
+        _record(name, timings[name])
+
+
+async def _dense(question: str, candidates: int, timings: Dict[str, float]) -> List[Dict[str, Any]]:
+    vector = await _timed("embedding", embedding_service.embed_query(question), timings)
+    if vector is None:
+        return []
+    return await _timed("dense_search", qdrant_service.search_documents(vector=vector, top_k=candidates), timings)
+
+
+async def _sparse(question: str, candidates: int) -> List[Dict[str, Any]]:
+    index = _bm25_index
+    if index is None:
+        index = await load_bm25_index()
+    if index is None:
+        return []
+    return await asyncio.to_thread(index.search, question, candidates)
+
+
+async def retrieve(question: str, top_k: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    """
+    Ejecuta la recuperación densa y BM25 en paralelo y fusiona con RRF.
+    Si un recuperador falla, se usa solo el otro.
+
+    Returns:
+        (resultados fusionados, latencias en ms por etapa: embedding,
+        dense_search, dense, bm25, fusion, total).
+    """
+    top_k = top_k if top_k is not None else getattr(settings, 'RAG_TOP_K', 3)
+    candidates = max(top_k, getattr(settings, 'HYBRID_CANDIDATES', 10))
+    timings: Dict[str, float] = {}
+    start = time.perf_counter()
+
+    dense, sparse = await asyncio.gather(
+        _timed("dense", _dense(question, candidates, timings), timings),
+        _timed("bm25", _sparse(question, candidates), timings),
+        return_exceptions=True,
+    )
+    rankings: Dict[str, List[Dict[str, Any]]] = {}
+    for name, result in (("dense", dense), ("bm25", sparse)):
+        if isinstance(result, BaseException):
+            logger.error(f"Recuperador '{name}' falló: {result}")
+            continue
+        rankings[name] = result
+
+    fusion_start = time.perf_counter()
+    fused = reciprocal_rank_fusion(rankings, top_k=top_k, k=getattr(settings, 'RRF_K', 60))
+    timings["fusion"] = (time.perf_counter() - fusion_start) * 1000.0
+    _record("fusion", timings["fusion"])
+    timings["total"] = (time.perf_counter() - start) * 1000.0
+
+    logger.info(
+        "Recuperación híbrida: "
+        + ", ".join(f"{name}={len(results)}" for name, results in rankings.items())
+        + f" -> {len(fused)} | " + " ".join(f"{k}={v:.1f}ms" for k, v in timings.items())
+    )
+    return fused, timings
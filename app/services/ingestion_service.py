@@ -0,0 +1,518 @@
+# app/services/ingestion_service.py
+# -*- coding: utf-8 -*-
+
+"""
+Ingesta masiva de documentos y FAQs en la colección de Qdrant.
+
+Lee las fuentes de disco en streaming, las divide en chunks con CHUNK_SIZE y
+CHUNK_OVERLAP, genera embeddings en lotes grandes y hace upsert en lotes
+paralelos. La memoria queda acotada por una ventana de INGEST_EMBED_BATCH_SIZE
+chunks más INGEST_UPSERT_PARALLELISM lotes en vuelo.
+
+Cada punto lleva el payload que espera rag_pipeline: `source_id`, `text`
+(el chunk) y `answer_chunks`, además de `question` en las FAQs, y el
+`content_hash` de su fuente. Con él, `reindex_incremental` solo re-embebe lo
+que cambió; `rebuild_blue_green` reconstruye en una colección nueva y cambia
+el alias QDRANT_COLLECTION_NAME de forma atómica.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Importar configuración (con fallback)
+try:
+    from app.core.config import settings
+    CONFIG_LOADED = True
+except Exception:
+    class DummySettings:
+        QDRANT_COLLECTION_NAME: str = "default_collection"; DISTANCE_METRIC: str = "Cosine"
+        CHUNK_SIZE: int = 1000; CHUNK_OVERLAP: int = 150
+        INGEST_EMBED_BATCH_SIZE: int = 256; INGEST_UPSERT_BATCH_SIZE: int = 64; INGEST_UPSERT_PARALLELISM: int = 4
+    settings = DummySettings() # type: ignore
+    CONFIG_LOADED = False
+
+from app.core.lazy_imports import optional_import
+from app.services import embedding_service, qdrant_service
+from app.services.dimension_reduction import effective_vector_dimension
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None # type: ignore
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_SUFFIXES = (".txt", ".md")
+RECORD_SUFFIXES = (".jsonl", ".json")
+# Espacio de nombres de los ids de punto: el mismo chunk de la misma fuente conserva su id
+POINT_ID_NAMESPACE = uuid.UUID("5b0c8f0e-3d3b-4f7e-9a51-6c1f3f7a2d10")
+_LINE_COMMENT_RE = re.compile(r"^\s*//.*$", re.MULTILINE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+# --- Chunking ---
+
+def _chunk_params(chunk_size: Optional[int], chunk_overlap: Optional[int]) -> Tuple[int, int]:
+    size = chunk_size if chunk_size is not None else getattr(settings, 'CHUNK_SIZE', 1000)
+    overlap = chunk_overlap if chunk_overlap is not None else getattr(settings, 'CHUNK_OVERLAP', 150)
+    return int(size), int(overlap)
+
+def chunk_text(text: str, chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None) -> List[str]:
+    """
+    Divide `text` en chunks de hasta `chunk_size` caracteres que se solapan
+    hasta `chunk_overlap` caracteres. Corta preferentemente en un salto de
+    línea o espacio dentro de la segunda mitad del chunk, y el solape empieza
+    en un límite de palabra, para no partir palabras.
+    """
+    size, overlap = _chunk_params(chunk_size, chunk_overlap)
+    if overlap >= size:
+        raise ValueError(f"chunk_overlap ({overlap}) debe ser < chunk_size ({size}).")
+    text = text.strip()
+    if len(text) <= size:
+        return [text] if text else []
+
+    chunks: List[str] = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            cut = max(text.rfind("\n", start + size // 2, end), text.rfind(" ", start + size // 2, end))
+            if cut > start:
+                end = cut
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        # El siguiente chunk empieza en el primer límite de palabra del solape
+        boundary = _WHITESPACE_RE.search(text, max(end - overlap, start + 1), end)
+        start = boundary.end() if boundary else end
+    return chunks
+
+
+def point_id_for(source_id: str, chunk_index: int) -> str:
+    """Id determinista (UUID5) del punto de un chunk."""
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{source_id}#{chunk_index}"))
+
+
+def content_hash(document: Dict[str, Any], chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None) -> str:
+    """
+    SHA-256 del contenido de una fuente (pregunta y texto) junto con los
+    parámetros que cambian sus vectores (chunking y modelo de embeddings).
+    """
+    size, overlap = _chunk_params(chunk_size, chunk_overlap)
+    digest = hashlib.sha256()
+    for part in (document.get("question") or "", document["text"], f"{size}/{overlap}",
+                 str(getattr(settings, 'EMBEDDING_MODEL_NAME', '')), str(effective_vector_dimension(settings))):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+# --- Lectura de fuentes ---
+
+def _faq_record(raw: Dict[str, Any], default_id: str) -> Optional[Dict[str, Any]]:
+    """Normaliza un registro JSON (FAQ o documento) a {source_id, text, question}."""
+    text = raw.get("text") or raw.get("answer") or raw.get("a") or raw.get("answer_full")
+    if not isinstance(text, str) or not text.strip():
+        return None
+    question = raw.get("question") or raw.get("q")
+    source_id = raw.get("source_id") or raw.get("id") or raw.get("original_faq_id") or default_id
+    return {"source_id": str(source_id), "text": text, "question": question if isinstance(question, str) else None}
+
+
+def _iter_file(path: Path, root: Path) -> Iterator[Dict[str, Any]]:
+    relative = path.relative_to(root).as_posix() if path != root else path.name
+    suffix = path.suffix.lower()
+    if suffix in DOCUMENT_SUFFIXES:
+        text = path.read_text(encoding="utf-8")
+        if text.strip():
+            yield {"source_id": relative, "text": text, "question": None}
+    elif suffix == ".jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                record = _faq_record(json.loads(line), f"{relative}:{line_number}")
+                if record is not None:
+                    yield record
+    elif suffix == ".json":
+        # Acepta el formato de priority_context.json (lista "faqs", comentarios //)
+        data = json.loads(_LINE_COMMENT_RE.sub("", path.read_text(encoding="utf-8")))
+        items = data.get("faqs", []) if isinstance(data, dict) else data
+        for position, raw in enumerate(items):
+            record = _faq_record(raw, f"{relative}:{position}") if isinstance(raw, dict) else None
+            if record is not None:
+                yield record
+
+
+def iter_source_documents(paths: Iterable[Path], failures: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Recorre archivos y directorios (recursivamente, en orden) y produce un
+    documento {source_id, text, question} por archivo .txt/.md o por registro
+    de .jsonl/.json. Los archivos se leen de uno en uno.
+
+    Un archivo ilegible o con un registro inválido se registra y se salta (sus
+    registros posteriores no se producen); si se pasa `failures`, se añade
+    "ruta: error" para que quien llama no tome sus fuentes por eliminadas.
+    """
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            files = sorted(p for p in path.rglob("*") if p.is_file() and p.suffix.lower() in DOCUMENT_SUFFIXES + RECORD_SUFFIXES)
+            root = path
+        else:
+            files, root = [path], path.parent
+        for file in files:
+            try:
+                yield from _iter_file(file, root)
+            except (OSError, ValueError, UnicodeDecodeError) as e:
+                logger.error(f"No se pudo leer '{file}': {e}")
+                if failures is not None:
+                    failures.append(f"{file}: {e}")
+
+
+def iter_chunk_records(
+    documents: Iterable[Dict[str, Any]],
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Produce (point_id, texto a embeber, payload) por chunk. En las FAQs el
+    texto embebido antepone la pregunta y `answer_chunks` guarda la respuesta
+    completa, de modo que cualquier chunk recupera la respuesta entera; en los
+    documentos `answer_chunks` solo contiene el propio chunk. Todos los chunks
+    llevan el `content_hash` de su fuente (reindexado incremental).
+    """
+    for document in documents:
+        chunks = document.get("chunks") or chunk_text(document["text"], chunk_size, chunk_overlap)
+        digest = document.get("content_hash") or content_hash(document, chunk_size, chunk_overlap)
+        question = document.get("question")
+        for index, chunk in enumerate(chunks):
+            payload: Dict[str, Any] = {
+                "source_id": document["source_id"],
+                "chunk_index": index,
+                "chunk_count": len(chunks),
+                "content_hash": digest,
+                "text": chunk,
+                "answer_chunks": chunks if question else [chunk],
+            }
+            if question:
+                payload["question"] = question
+            yield point_id_for(document["source_id"], index), f"{question}\n{chunk}" if question else chunk, payload
+
+
+# --- Pipeline ---
+
+def peak_memory_mb() -> Optional[float]:
+    """Pico de memoria residente del proceso en MB (None si no se puede medir)."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0 # ru_maxrss en KB (Linux)
+
+
+async def ensure_collection(client: Any, collection_name: str, recreate: bool = False) -> None:
+    """Crea la colección con la dimensión efectiva y DISTANCE_METRIC si no existe (o la recrea)."""
+    models = optional_import("qdrant_client.models")
+    vectors_config = models.VectorParams(
+        size=effective_vector_dimension(settings),
+        distance=models.Distance(getattr(settings, 'DISTANCE_METRIC', 'Cosine')),
+    )
+    exists = await client.collection_exists(collection_name=collection_name)
+    if exists and recreate:
+        await client.delete_collection(collection_name=collection_name)
+        logger.info(f"Colección '{collection_name}' eliminada para recrearla.")
+    if not exists or recreate:
+        await client.create_collection(collection_name=collection_name, vectors_config=vectors_config)
+        logger.info(f"Colección '{collection_name}' creada.")
+
+
+async def _iter_windows(records: Iterator[Tuple[str, str, Dict[str, Any]]], size: int) -> AsyncIterator[List[Tuple[str, str, Dict[str, Any]]]]:
+    window: List[Tuple[str, str, Dict[str, Any]]] = []
+    for record in records:
+        window.append(record)
+        if len(window) >= size:
+            yield window
+            window = []
+            await asyncio.sleep(0) # Cede el loop a los upserts en vuelo
+    if window:
+        yield window
+
+
+def _resolve(client: Any, collection_name: Optional[str]) -> Tuple[Any, str]:
+    collection_name = collection_name or getattr(settings, 'QDRANT_COLLECTION_NAME', 'default_collection')
+    client = client if client is not None else qdrant_service._get_qdrant_client()
+    if client is None:
+        raise RuntimeError("Cliente Qdrant no disponible.")
+    return client, collection_name
+
+
+def _finish_stats(stats: Dict[str, Any], start: float) -> Dict[str, Any]:
+    elapsed = time.perf_counter() - start
+    stats.update({
+        "seconds": round(elapsed, 3),
+        "documents_per_second": round(stats["documents"] / elapsed, 2) if elapsed > 0 else None,
+        "chunks_per_second": round(stats["chunks"] / elapsed, 2) if elapsed > 0 else None,
+        "peak_memory_mb": peak_memory_mb(),
+    })
+    return stats
+
+
+async def _write_records(
+    client: Any,
+    collection_name: str,
+    records: Iterator[Tuple[str, str, Dict[str, Any]]],
+    stats: Dict[str, Any],
+    embed_batch_size: Optional[int] = None,
+    upsert_batch_size: Optional[int] = None,
+    parallelism: Optional[int] = None,
+) -> None:
+    """
+    Embebe `records` por ventanas y los escribe con upserts paralelos acotados.
+    Mientras se embebe una ventana, los upserts de la anterior siguen en vuelo
+    (como máximo `parallelism` lotes). Si un upsert falla, propaga el error.
+    """
+    embed_batch_size = embed_batch_size or getattr(settings, 'INGEST_EMBED_BATCH_SIZE', 256)
+    upsert_batch_size = upsert_batch_size or getattr(settings, 'INGEST_UPSERT_BATCH_SIZE', 64)
+    parallelism = parallelism or getattr(settings, 'INGEST_UPSERT_PARALLELISM', 4)
+    models = optional_import("qdrant_client.models")
+
+    async def _upsert(batch: List[Any]) -> None:
+        await client.upsert(collection_name=collection_name, points=batch, wait=True)
+        stats["points"] += len(batch)
+
+    async def _drain(pending: set, limit: int) -> set:
+        """Espera hasta que queden menos de `limit` upserts en vuelo; propaga errores."""
+        while len(pending) >= max(limit, 1):
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        return pending
+
+    pending: set = set()
+    try:
+        async for window in _iter_windows(records, embed_batch_size):
+            vectors = await embedding_service.embed_queries([text for _, text, _ in window])
+            stats["chunks"] += len(window)
+            for offset in range(0, len(window), upsert_batch_size):
+                batch = [
+                    models.PointStruct(id=point_id, vector=vectors[offset + i].tolist(), payload=payload)
+                    for i, (point_id, _, payload) in enumerate(window[offset:offset + upsert_batch_size])
+                ]
+                pending = await _drain(pending, parallelism)
+                pending.add(asyncio.create_task(_upsert(batch)))
+            del vectors
+            logger.info(f"Ingesta: {stats['chunks']} chunks embebidos, {stats['points']} puntos escritos.")
+        pending = await _drain(pending, 1)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def ingest(
+    paths: Iterable[Path],
+    collection_name: Optional[str] = None,
+    client: Any = None,
+    recreate: bool = False,
+    embed_batch_size: Optional[int] = None,
+    upsert_batch_size: Optional[int] = None,
+    parallelism: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+    refresh: bool = True,
+) -> Dict[str, Any]:
+    """
+    Ingresa todas las fuentes de `paths` en la colección y, con `refresh`,
+    refresca los derivados (caché, almacén de payloads, índices locales) con
+    `qdrant_service.on_collection_reindexed`.
+
+    Returns:
+        Estadísticas: documents, chunks, points, failed_files (archivos que no
+        se pudieron leer), seconds, documents_per_second, chunks_per_second y
+        peak_memory_mb.
+    """
+    client, collection_name = _resolve(client, collection_name)
+    await ensure_collection(client, collection_name, recreate=recreate)
+
+    stats: Dict[str, Any] = {"documents": 0, "chunks": 0, "points": 0, "failed_files": []}
+
+    def _counted(documents: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for document in documents:
+            stats["documents"] += 1
+            yield document
+
+    start = time.perf_counter()
+    records = iter_chunk_records(_counted(iter_source_documents(paths, stats["failed_files"])), chunk_size, chunk_overlap)
+    await _write_records(client, collection_name, records, stats, embed_batch_size, upsert_batch_size, parallelism)
+    _finish_stats(stats, start)
+    logger.info(f"Ingesta en '{collection_name}' completada: {stats}")
+    if refresh:
+        await qdrant_service.on_collection_reindexed(collection_name)
+    return stats
+
+
+# --- Reindexado Incremental y Blue/Green ---
+
+async def existing_sources(client: Any, collection_name: str, batch_size: int = 1024) -> Dict[str, Dict[str, Any]]:
+    """{source_id: {"hash": content_hash o None, "ids": set(point_id)}} leyendo la colección sin vectores."""
+    sources: Dict[str, Dict[str, Any]] = {}
+    offset = None
+    while True:
+        batch, offset = await client.scroll(
+            collection_name=collection_name, limit=batch_size, offset=offset,
+            with_payload=["source_id", "content_hash"], with_vectors=False,
+        )
+        for point in batch:
+            payload = point.payload or {}
+            source_id = payload.get("source_id")
+            if source_id is None:
+                continue
+            entry = sources.setdefault(str(source_id), {"hash": payload.get("content_hash"), "ids": set()})
+            if entry["hash"] != payload.get("content_hash"):
+                entry["hash"] = None # Chunks con hashes distintos: ingesta previa a medias, se rehace
+            entry["ids"].add(str(point.id))
+        if offset is None:
+            return sources
+
+
+async def _delete_points(client: Any, collection_name: str, point_ids: List[str], batch_size: int = 512) -> None:
+    models = optional_import("qdrant_client.models")
+    for offset in range(0, len(point_ids), batch_size):
+        await client.delete(
+            collection_name=collection_name,
+            points_selector=models.PointIdsList(points=point_ids[offset:offset + batch_size]),
+            wait=True,
+        )
+
+
+async def reindex_incremental(
+    paths: Iterable[Path],
+    collection_name: Optional[str] = None,
+    client: Any = None,
+    embed_batch_size: Optional[int] = None,
+    upsert_batch_size: Optional[int] = None,
+    parallelism: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    chunk_overlap: Optional[int] = None,
+    force: bool = False,
+) -> Dict[str, Any]:
+    """
+    Reindexa solo lo que cambió: compara el `content_hash` de cada fuente con
+    el guardado en la colección, re-embebe y escribe las fuentes nuevas o
+    modificadas, y borra los chunks sobrantes y las fuentes que ya no existen.
+    Los borrados se hacen después de escribir, así ninguna fuente desaparece
+    a medias.
+
+    Si algún archivo no se pudo leer, no se borra ninguna fuente ausente (sus
+    fuentes parecerían eliminadas) salvo `force=True`.
+
+    Returns:
+        Estadísticas de `ingest` más added, changed, unchanged, removed,
+        kept_missing (fuentes ausentes conservadas) y deleted_points.
+    """
+    client, collection_name = _resolve(client, collection_name)
+    await ensure_collection(client, collection_name)
+    existing = await existing_sources(client, collection_name)
+
+    stats: Dict[str, Any] = {"documents": 0, "chunks": 0, "points": 0, "failed_files": [],
+                             "added": 0, "changed": 0, "unchanged": 0, "removed": 0, "kept_missing": 0, "deleted_points": 0}
+    seen = set()
+    stale_ids: List[str] = []
+
+    def _changed(documents: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for document in documents:
+            stats["documents"] += 1
+            source_id = document["source_id"]
+            seen.add(source_id)
+            digest = content_hash(document, chunk_size, chunk_overlap)
+            previous = existing.get(source_id)
+            if previous is not None and previous["hash"] == digest:
+                stats["unchanged"] += 1
+                continue
+            chunks = chunk_text(document["text"], chunk_size, chunk_overlap)
+            if previous is not None:
+                stats["changed"] += 1
+                stale_ids.extend(previous["ids"] - {point_id_for(source_id, i) for i in range(len(chunks))})
+            else:
+                stats["added"] += 1
+            yield {**document, "chunks": chunks, "content_hash": digest}
+
+    start = time.perf_counter()
+    records = iter_chunk_records(_changed(iter_source_documents(paths, stats["failed_files"])), chunk_size, chunk_overlap)
+    await _write_records(client, collection_name, records, stats, embed_batch_size, upsert_batch_size, parallelism)
+
+    missing = existing.keys() - seen
+    if stats["failed_files"] and not force:
+        stats["kept_missing"] = len(missing)
+        if missing:
+            logger.warning(f"{len(stats['failed_files'])} archivo(s) no se pudieron leer; se conservan {len(missing)} "
+                           f"fuente(s) ausentes en lugar de borrarlas (usa force para borrarlas).")
+        missing = set()
+    for source_id in missing:
+        stats["removed"] += 1
+        stale_ids.extend(existing[source_id]["ids"])
+    if stale_ids:
+        await _delete_points(client, collection_name, stale_ids)
+        stats["deleted_points"] = len(stale_ids)
+
+    _finish_stats(stats, start)
+    logger.info(f"Reindexado incremental de '{collection_name}': {stats}")
+    if stats["points"] or stats["deleted_points"]:
+        await qdrant_service.on_collection_reindexed(collection_name)
+    return stats
+
+
+async def rebuild_blue_green(
+    paths: Iterable[Path],
+    alias: Optional[str] = None,
+    client: Any = None,
+    keep_old: bool = False,
+    migrate: bool = False,
+    force: bool = False,
+    **options: Any,
+) -> Dict[str, Any]:
+    """
+    Reconstrucción completa sin cortes: ingresa todo en una colección nueva
+    (`<alias>_<timestamp>`), cambia el alias QDRANT_COLLECTION_NAME a ella de
+    forma atómica y borra la colección anterior (salvo `keep_old`). Las
+    búsquedas siguen usando la colección anterior hasta el cambio de alias.
+    Si la ingesta falla, la colección nueva se elimina y el alias no cambia;
+    también si algún archivo no se pudo leer (la colección nueva no tendría
+    sus fuentes), salvo `force=True`.
+
+    Si `alias` es todavía una colección física, falla antes de ingresar salvo
+    `migrate=True`: la migración única borra esa colección justo antes de crear
+    el alias (breve ventana en la que las búsquedas fallan).
+
+    Returns:
+        Estadísticas de `ingest` más collection y previous_collection.
+    """
+    client, alias = _resolve(client, alias)
+    if not migrate and await qdrant_service.resolve_collection_alias(alias, client) is None \
+            and await client.collection_exists(collection_name=alias):
+        raise ValueError(f"'{alias}' es una colección física, no un alias. Usa --rebuild --migrate para convertirla una vez.")
+    new_collection = f"{alias}_{time.strftime('%Y%m%d%H%M%S')}"
+    try:
+        stats = await ingest(paths, collection_name=new_collection, client=client, recreate=True, refresh=False, **options)
+        if stats["failed_files"] and not force:
+            raise RuntimeError(f"No se pudieron leer {len(stats['failed_files'])} archivo(s): {stats['failed_files']}. "
+                               f"Corrígelos o usa force para cambiar el alias sin sus fuentes.")
+    except BaseException:
+        logger.error(f"Reconstrucción fallida; se elimina la colección '{new_collection}'. El alias '{alias}' no cambia.")
+        await client.delete_collection(collection_name=new_collection)
+        raise
+
+    previous = await qdrant_service.switch_collection_alias(alias, new_collection, client=client, migrate=migrate)
+    if previous is not None and previous != new_collection and not keep_old:
+        await client.delete_collection(collection_name=previous)
+        logger.info(f"Colección anterior '{previous}' eliminada.")
+    await qdrant_service.on_collection_reindexed(alias)
+    stats.update({"collection": new_collection, "previous_collection": previous})
+    return stats
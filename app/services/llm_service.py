@@ -6,8 +6,11 @@ Servicio para interactuar con el LLM Generativo (ej. DeepSeek)
 usando la librería 'openai'.
 """
 
+import hashlib
+import json
 import logging
-from typing import List, Dict, Any, Optional
+import time
+from typing import AsyncIterator, List, Dict, Any, NamedTuple, Optional
 from functools import lru_cache
 
 # Importar configuración (con fallback)
@@ -29,24 +32,46 @@ except Exception as config_err:
          DEEPSEEK_API_KEY: Optional[Any]=None; DEEPSEEK_BASE_URL: str="https://api.deepseek.com/"; DEEPSEEK_MODEL_NAME:str="deepseek-chat"; LLM_REQUEST_TIMEOUT:float=120.0
      settings = DummySettings(); CONFIG_LOADED = False
 
-# Importar cliente OpenAI y sus excepciones
-try:
-    from typing import TYPE_CHECKING
-    if TYPE_CHECKING: from openai import AsyncOpenAI
+# Cliente OpenAI: la librería se importa al crear el cliente (warm-up o primera llamada)
+from typing import TYPE_CHECKING
+from app.core.lazy_imports import is_available, optional_import
 
-    from openai import AsyncOpenAI as OpenAIClient
-    from openai import RateLimitError, APIError, AuthenticationError, APIConnectionError, APITimeoutError, BadRequestError
-    OPENAI_AVAILABLE = True
-except ImportError:
+if TYPE_CHECKING: from openai import AsyncOpenAI
+
+OPENAI_AVAILABLE = is_available("openai")
+if not OPENAI_AVAILABLE:
     print("[ERROR llm_service.py] Librería 'openai' no instalada. Ejecuta: pip install openai")
-    OpenAIClient = None; RateLimitError = ConnectionError; APIError = ConnectionError; AuthenticationError = ConnectionError; APIConnectionError = ConnectionError; APITimeoutError = TimeoutError; BadRequestError = ValueError; OPENAI_AVAILABLE = False
+
+from app.services.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+
+
+class LLMCompletion(NamedTuple):
+    """Respuesta sin streaming del LLM y cómo terminó ('stop' = completa; 'length' = cortada por max_tokens)."""
+    text: str
+    finish_reason: Optional[str]
+
+    @property
+    def complete(self) -> bool:
+        return self.finish_reason == "stop"
+
+
+class LLMStreamError(Exception):
+    """El stream del LLM falló a mitad de la respuesta (error de la API o de la conexión)."""
+
+    def __init__(self, message: str, finish_reason: Optional[str] = None):
+        super().__init__(message)
+        self.finish_reason = finish_reason
+
+# Prompts idénticos en curso comparten una sola llamada al LLM
+_single_flight = SingleFlight("call_llm", enabled=getattr(settings, 'SINGLE_FLIGHT_ENABLED', True))
+
 # --- Cliente LLM Cacheado ---
 
 @lru_cache(maxsize=1) # Cachear una única instancia del cliente
-def _get_llm_client() -> Optional[OpenAIClient]:
+def _get_llm_client() -> Optional["AsyncOpenAI"]:
     """Inicializa y devuelve una instancia cacheada del cliente OpenAI/DeepSeek Async."""
     if not OPENAI_AVAILABLE:
         logger.critical("Librería 'openai' no disponible. Servicio LLM desactivado.")
@@ -70,7 +95,10 @@ def _get_llm_client() -> Optional[OpenAIClient]:
 
     try:
         logger.info(f"Inicializando cliente LLM Async para: {base_url}")
-        client = OpenAIClient(api_key=api_key, base_url=base_url, timeout=timeout)
+        openai = optional_import("openai")
+        if openai is None:
+            return None
+        client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=timeout)
         return client
     except Exception as e:
         logger.exception(f"Error inesperado al inicializar el cliente LLM: {e}")
@@ -92,7 +120,28 @@ async def call_llm(
         max_tokens: Límite máximo de tokens a generar.
 
     Returns:
-        La respuesta de texto generada por el LLM como string, o None si ocurre un error.
+        La respuesta de texto generada por el LLM como string (aunque haya
+        quedado cortada; ver `call_llm_completion`), o None si ocurre un error.
+    """
+    completion = await call_llm_completion(messages, temperature=temperature, max_tokens=max_tokens)
+    return completion.text if completion is not None else None
+
+
+async def call_llm_completion(
+    messages: List[Dict[str, str]],
+    temperature: float = 0.5,
+    max_tokens: int = 1500
+    ) -> Optional[LLMCompletion]:
+    """
+    Igual que `call_llm`, pero devuelve también el finish_reason: una respuesta
+    cortada (p. ej. 'length') se puede mostrar, pero no debe cachearse.
+
+    Llamadas concurrentes con los mismos mensajes, modelo y parámetros
+    comparten una sola petición (single-flight).
+
+    Returns:
+        LLMCompletion(text, finish_reason), o None si ocurre un error o la
+        respuesta llegó vacía.
     """
     client = _get_llm_client()
     if client is None:
@@ -106,6 +155,17 @@ async def call_llm(
         return None
 
     model_name = settings.DEEPSEEK_MODEL_NAME
+    # Prompts idénticos en curso (mismo modelo y parámetros) comparten una sola llamada
+    prompt_hash = hashlib.sha256(json.dumps(messages, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+    return await _single_flight.do(
+        (model_name, float(temperature), int(max_tokens), prompt_hash),
+        lambda: _complete(client, model_name, messages, temperature, max_tokens),
+    )
+
+
+async def _complete(client: Any, model_name: str, messages: List[Dict[str, str]],
+                    temperature: float, max_tokens: int) -> Optional[LLMCompletion]:
+    """Llamada sin streaming a la API del LLM; None en error o respuesta vacía."""
     logger.debug(f"Llamando a LLM '{model_name}' con {len(messages)} mensajes...")
     if messages: logger.debug(f"  Último mensaje ({messages[-1].get('role', '?')}): '{messages[-1].get('content', '')[:100]}...'")
 
@@ -124,41 +184,136 @@ async def call_llm(
             finish_reason = response.choices[0].finish_reason
             logger.debug(f"Respuesta LLM recibida (finish_reason: {finish_reason}). Inicio: '{llm_answer[:100] if llm_answer else 'VACÍO'}...'")
 
-            if llm_answer: return llm_answer.strip()
-            else: logger.warning(f"LLM devolvió respuesta sin contenido (finish_reason: {finish_reason})."); return None
+            if not llm_answer:
+                logger.warning(f"LLM devolvió respuesta sin contenido (finish_reason: {finish_reason}).")
+                return None
+            if finish_reason != "stop": # Cortada (p. ej. 'length'): se sirve, pero quien llama no debe cachearla
+                logger.warning(f"LLM devolvió una respuesta incompleta (finish_reason: {finish_reason}).")
+            return LLMCompletion(llm_answer.strip(), finish_reason)
         else:
             logger.warning(f"Respuesta inesperada de API LLM (sin choices/message): {str(response)[:500]}...")
             return None
 
-    # Manejo de Errores Específicos (usando los importados de openai)
-    except AuthenticationError as e:
-        logger.error(f"Error de autenticación con API LLM: {e}. Verifica DEEPSEEK_API_KEY.")
-        # raise LLMServiceError("Error de autenticación LLM", status_code=500) from e # Ejemplo con excepción custom
+    except Exception as e:
+        _log_llm_error(e)
         return None
-    except RateLimitError as e:
+
+
+class LLMStream:
+    """
+    Respuesta del LLM en streaming: se recorre con `async for` y produce los
+    fragmentos de texto (deltas). Al terminar, `finish_reason` indica cómo
+    acabó y `complete` si la respuesta está completa ('stop'); una respuesta
+    cortada (p. ej. 'length') termina sin error.
+
+    Raises (al iterar):
+        LLMStreamError: Error de la API o de la conexión a mitad del stream.
+    """
+
+    def __init__(self, client: Any, messages: List[Dict[str, str]], temperature: float, max_tokens: int):
+        self._client = client
+        self._messages = messages
+        self._temperature = temperature
+        self._max_tokens = max_tokens
+        self.finish_reason: Optional[str] = None
+
+    @property
+    def complete(self) -> bool:
+        return self.finish_reason == "stop"
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._deltas()
+
+    async def _deltas(self) -> AsyncIterator[str]:
+        if self._client is None or not self._messages:
+            return
+        model_name = settings.DEEPSEEK_MODEL_NAME
+        logger.debug(f"Llamando a LLM '{model_name}' en streaming con {len(self._messages)} mensajes...")
+        start = time.perf_counter()
+        first_token_at: Optional[float] = None
+        stream = None
+        try:
+            stream = await self._client.chat.completions.create(
+                model=model_name,
+                messages=self._messages, # type: ignore
+                temperature=self._temperature,
+                max_tokens=self._max_tokens,
+                stream=True
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                self.finish_reason = choice.finish_reason or self.finish_reason
+                delta = choice.delta.content if choice.delta else None
+                if not delta:
+                    continue
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                    logger.debug(f"Primer token del LLM en {(first_token_at - start) * 1000:.0f}ms.")
+                yield delta
+            logger.debug(f"Stream LLM terminado en {time.perf_counter() - start:.2f}s (finish_reason: {self.finish_reason}).")
+        except Exception as e:
+            _log_llm_error(e)
+            raise LLMStreamError(f"Error en el stream del LLM: {e}", self.finish_reason) from e
+        finally:
+            if stream is not None and hasattr(stream, "close"):
+                try:
+                    await stream.close() # Libera la conexión si el consumidor cortó antes del final
+                except Exception:
+                    pass
+        if not self.complete:
+            logger.warning(f"Stream LLM incompleto (finish_reason: {self.finish_reason}).")
+
+
+def call_llm_stream(
+    messages: List[Dict[str, str]],
+    temperature: float = 0.5,
+    max_tokens: int = 1500
+    ) -> LLMStream:
+    """
+    Variante en streaming de `call_llm` (`stream=True`): devuelve un
+    `LLMStream` que produce los fragmentos de texto (deltas) a medida que el
+    LLM los genera.
+
+    Si la API falla a mitad del stream se lanza LLMStreamError después de los
+    fragmentos ya producidos. Si el stream termina con un finish_reason
+    distinto de 'stop' (p. ej. 'length') no hay error: `LLMStream.complete`
+    queda en False. Sin cliente o sin mensajes el iterador termina sin
+    producir nada.
+
+    Args:
+        messages: Lista de diccionarios de mensajes [{"role": ..., "content": ...}].
+        temperature: Temperatura para la generación.
+        max_tokens: Límite máximo de tokens a generar.
+    """
+    client = _get_llm_client()
+    if client is None:
+        logger.error("Intento de llamar al LLM (stream) sin cliente inicializado.")
+    elif not messages:
+        logger.warning("Se llamó a call_llm_stream sin mensajes.")
+    return LLMStream(client, messages, temperature, max_tokens)
+
+
+def _log_llm_error(e: Exception) -> None:
+    """Registra un error de la API del LLM con el mensaje adecuado a su tipo."""
+    openai = optional_import("openai") # Ya importado al crear el cliente; aquí solo para las excepciones
+    if openai is None:
+        logger.exception(f"Error inesperado durante llamada a API LLM: {e}")
+    elif isinstance(e, openai.AuthenticationError):
+        logger.error(f"Error de autenticación con API LLM: {e}. Verifica DEEPSEEK_API_KEY.")
+    elif isinstance(e, openai.RateLimitError):
         logger.error(f"Límite de tasa alcanzado con API LLM: {e}.")
-        # raise LLMServiceError("Límite de tasa LLM excedido", status_code=429) from e
-        return None
-    except APIConnectionError as e:
-        logger.error(f"Error de conexión con API LLM en {settings.DEEPSEEK_BASE_URL}: {e}")
-        # raise LLMServiceError("Error de conexión con LLM", status_code=504) from e
-        return None
-    except APITimeoutError as e:
+    elif isinstance(e, openai.APITimeoutError): # Subclase de APIConnectionError: comprobar antes
         logger.error(f"Timeout esperando respuesta de API LLM (límite: {settings.LLM_REQUEST_TIMEOUT}s): {e}")
-        # raise LLMServiceError("Timeout esperando LLM", status_code=504) from e
-        return None
-    except BadRequestError as e: # Ej: Prompt muy largo
-         logger.error(f"Error 'Bad Request' (400) de API LLM: {e}. ¿Prompt demasiado largo?")
-         # raise LLMServiceError(f"Error 400 del LLM: {e}", status_code=400) from e
-         return None
-    except APIError as e: # Otros errores 4xx/5xx
+    elif isinstance(e, openai.APIConnectionError):
+        logger.error(f"Error de conexión con API LLM en {settings.DEEPSEEK_BASE_URL}: {e}")
+    elif isinstance(e, openai.BadRequestError): # Ej: Prompt muy largo
+        logger.error(f"Error 'Bad Request' (400) de API LLM: {e}. ¿Prompt demasiado largo?")
+    elif isinstance(e, openai.APIError): # Otros errores 4xx/5xx
         logger.error(f"Error en API LLM: Status={getattr(e, 'status_code', 'N/A')}, Respuesta={getattr(e, 'body', 'N/A')}")
-        # raise LLMServiceError(f"Error API LLM {getattr(e, 'status_code', 'N/A')}", status_code=502) from e
-        return None
-    except Exception as e: # Capturar cualquier otro error inesperado
+    else: # Cualquier otro error inesperado
         logger.exception(f"Error inesperado durante llamada a API LLM: {e}")
-        # raise LLMServiceError("Error inesperado en servicio LLM") from e
-        return None
 
 
 
@@ -0,0 +1,209 @@
+# app/services/local_vector_index.py
+# -*- coding: utf-8 -*-
+
+"""
+Índice vectorial en proceso: alternativa local a Qdrant para colecciones que
+caben en RAM (VECTOR_SEARCH_BACKEND=local) y sustituto offline en pruebas y
+benchmarks.
+
+Carga una instantánea de la colección (ids, vectores y payloads) en una matriz
+float32 contigua y resuelve top-k con un único producto matriz-vector. A
+partir de LOCAL_INDEX_HNSW_THRESHOLD puntos construye un índice HNSW (hnswlib,
+extra opcional 'ann') para las búsquedas sin filtro; las búsquedas con
+`query_filter` se evalúan siempre de forma exacta sobre los puntos que cumplen
+el filtro. Devuelve lo mismo que `qdrant_service.search_documents`.
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.lazy_imports import is_available, optional_import
+from app.services.payload_filter import filter_mask
+from app.services.vector_utils import VectorLike, as_float32_vector
+
+logger = logging.getLogger(__name__)
+
+HNSWLIB_AVAILABLE = is_available("hnswlib")
+SNAPSHOT_FORMAT_VERSION = 1
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+_HNSW_SPACES = {"Cosine": "cosine", "Dot": "ip", "Euclid": "l2"}
+
+
+def _l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.clip(norms, 1e-12, None)
+
+
+class LocalVectorIndex:
+    """
+    Instantánea en memoria de una colección de Qdrant.
+
+    Args:
+        ids: Ids de los puntos (int o UUID en texto), en el orden de `vectors`.
+        vectors: Matriz (N, dim).
+        payloads: Payload de cada punto (dict o None).
+        distance: Métrica de Qdrant: 'Cosine', 'Dot' o 'Euclid'.
+        hnsw_threshold: A partir de cuántos puntos usar HNSW (si hnswlib está instalado).
+        ef_search: Parámetro `ef` de HNSW en búsqueda (se eleva a top_k si es menor).
+    """
+
+    def __init__(self, ids: Sequence[Any], vectors: Any, payloads: Sequence[Optional[Dict[str, Any]]],
+                 distance: str = "Cosine", hnsw_threshold: int = 50000, ef_search: int = 64):
+        if distance not in _HNSW_SPACES:
+            raise ValueError(f"Métrica no soportada por el índice local: '{distance}'.")
+        matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] == 0:
+            raise ValueError(f"Se esperaba una matriz (N, dim) no vacía (shape={matrix.shape}).")
+        if not (len(ids) == len(payloads) == matrix.shape[0]):
+            raise ValueError("ids, vectors y payloads deben tener la misma longitud.")
+        if distance == "Cosine":
+            matrix = np.ascontiguousarray(_l2_normalize(matrix), dtype=np.float32)
+        self.ids: List[Any] = list(ids)
+        self.payloads: List[Dict[str, Any]] = [p or {} for p in payloads]
+        self.distance = distance
+        self.ef_search = int(ef_search)
+        self._matrix = matrix
+        self._matrix.setflags(write=False)
+        self._sq_norms = np.einsum("ij,ij->i", matrix, matrix) if distance == "Euclid" else None
+        self._hnsw = self._build_hnsw() if len(self) >= hnsw_threshold else None
+        logger.info(
+            f"Índice local cargado: {len(self)} puntos, dim={self.dim}, métrica={distance}, "
+            f"modo={'hnsw' if self._hnsw is not None else 'exacto'}."
+        )
+
+    def __len__(self) -> int:
+        return self._matrix.shape[0]
+
+    @property
+    def dim(self) -> int:
+        return self._matrix.shape[1]
+
+    @property
+    def mode(self) -> str:
+        return "hnsw" if self._hnsw is not None else "exact"
+
+    # --- Construcción HNSW ---
+
+    def _build_hnsw(self) -> Optional[Any]:
+        hnswlib = optional_import("hnswlib") if HNSWLIB_AVAILABLE else None
+        if hnswlib is None:
+            logger.warning(f"Índice local con {len(self)} puntos sin hnswlib instalado; se usa búsqueda exacta.")
+            return None
+        index = hnswlib.Index(space=_HNSW_SPACES[self.distance], dim=self.dim)
+        index.init_index(max_elements=len(self), ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+        index.add_items(self._matrix, np.arange(len(self)))
+        index.set_ef(self.ef_search)
+        return index
+
+    # --- Búsqueda ---
+
+    def search(self, vector: VectorLike, top_k: int, query_filter: Any = None) -> List[Dict[str, Any]]:
+        """
+        Top-k puntos más cercanos a `vector` que cumplen `query_filter`.
+
+        Returns:
+            Lista de {'id', 'score', 'payload'} ordenada como Qdrant (score
+            descendente; para 'Euclid' el score es la distancia, ascendente).
+
+        Raises:
+            ValueError: Vector de dimensión incorrecta o filtro no soportado.
+        """
+        query = as_float32_vector(vector, expected_dim=self.dim)
+        if top_k <= 0:
+            return []
+        if self.distance == "Cosine":
+            query = _l2_normalize(query)
+
+        if query_filter is not None:
+            rows = np.flatnonzero(np.fromiter(filter_mask(self.payloads, self.ids, query_filter), dtype=bool, count=len(self)))
+            if rows.size == 0:
+                return []
+            positions, scores = self._exact(query, top_k, rows)
+        elif self._hnsw is not None:
+            positions, scores = self._ann(query, top_k)
+        else:
+            positions, scores = self._exact(query, top_k, None)
+        return [
+            {"id": self.ids[i], "score": float(s), "payload": self.payloads[i]}
+            for i, s in zip(positions.tolist(), scores.tolist())
+        ]
+
+    def _exact(self, query: np.ndarray, top_k: int, rows: Optional[np.ndarray]):
+        matrix = self._matrix if rows is None else self._matrix[rows]
+        similarity = matrix @ query
+        if self.distance == "Euclid":
+            sq_norms = self._sq_norms if rows is None else self._sq_norms[rows]
+            # Ordenar por -distancia² (mayor es mejor) y devolver la distancia
+            similarity = -np.maximum(sq_norms - 2.0 * similarity + float(query @ query), 0.0)
+        k = min(top_k, similarity.shape[0])
+        best = np.argpartition(-similarity, k - 1)[:k] if k < similarity.shape[0] else np.arange(similarity.shape[0])
+        best = best[np.argsort(-similarity[best], kind="stable")]
+        scores = similarity[best]
+        if self.distance == "Euclid":
+            scores = np.sqrt(-scores)
+        positions = best if rows is None else rows[best]
+        return positions, scores
+
+    def _ann(self, query: np.ndarray, top_k: int):
+        k = min(top_k, len(self))
+        if self.ef_search < k:
+            self._hnsw.set_ef(k)
+        labels, distances = self._hnsw.knn_query(query, k=k)
+        labels, distances = labels[0].astype(np.int64), distances[0]
+        # hnswlib: 'cosine'/'ip' devuelven 1 - similitud y 'l2' la distancia al cuadrado
+        scores = np.sqrt(distances) if self.distance == "Euclid" else 1.0 - distances
+        return labels, scores
+
+    # --- Instantáneas ---
+
+    def save(self, path: Path) -> Path:
+        """Guarda la instantánea (.npz con vectores e ids/payloads en JSON)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {"version": SNAPSHOT_FORMAT_VERSION, "distance": self.distance, "ids": self.ids, "payloads": self.payloads}
+        with open(path, "wb") as f:
+            np.savez(f, vectors=self._matrix, meta=np.array(json.dumps(meta, ensure_ascii=False)))
+        logger.info(f"Instantánea del índice local guardada en {path} ({len(self)} puntos).")
+        return path
+
+    @classmethod
+    def load(cls, path: Path, **kwargs: Any) -> "LocalVectorIndex":
+        """Carga una instantánea guardada con save(); `kwargs` van al constructor."""
+        with np.load(Path(path), allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != SNAPSHOT_FORMAT_VERSION:
+                raise ValueError(f"Versión de instantánea no soportada: {meta.get('version')}.")
+            kwargs.setdefault("distance", meta["distance"])
+            return cls(meta["ids"], data["vectors"], meta["payloads"], **kwargs)
+
+    @classmethod
+    async def from_qdrant(cls, client: Any, collection_name: str, batch_size: int = 256, **kwargs: Any) -> "LocalVectorIndex":
+        """Lee todos los puntos de la colección (scroll con vectores) y construye el índice."""
+        ids: List[Any] = []
+        vectors: List[Any] = []
+        payloads: List[Dict[str, Any]] = []
+        offset = None
+        while True:
+            points, offset = await client.scroll(
+                collection_name=collection_name, limit=batch_size, offset=offset,
+                with_payload=True, with_vectors=True,
+            )
+            for point in points:
+                vector = point.vector
+                if isinstance(vector, dict): # Vectores con nombre: solo se admite uno
+                    if len(vector) != 1:
+                        raise ValueError(f"La colección '{collection_name}' tiene varios vectores con nombre.")
+                    vector = next(iter(vector.values()))
+                ids.append(point.id if isinstance(point.id, int) else str(point.id))
+                vectors.append(vector)
+                payloads.append(point.payload or {})
+            if offset is None:
+                break
+        if not vectors:
+            raise ValueError(f"La colección '{collection_name}' está vacía.")
+        return cls(ids, np.asarray(vectors, dtype=np.float32), payloads, **kwargs)
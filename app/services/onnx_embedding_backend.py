@@ -0,0 +1,259 @@
+# app/services/onnx_embedding_backend.py
+# -*- coding: utf-8 -*-
+
+"""
+Backend de embeddings con ONNX Runtime para nodos solo-CPU.
+
+Incluye:
+- Exportación del modelo SentenceTransformer configurado a ONNX (transformer
+  base + configuración de pooling), con cuantización dinámica int8 opcional.
+- `OnnxEmbeddingModel`: sirve el modelo exportado con ONNX Runtime y su propio
+  tokenizer (`tokenizers`), sin cargar PyTorch. Expone `encode()` y
+  `get_sentence_embedding_dimension()` igual que SentenceTransformer.
+- Verificación de paridad (dimensión y similitud coseno) contra el modelo de referencia.
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    print("[ERROR onnx_embedding_backend.py] Numpy no instalado. Ejecuta: pip install numpy")
+    np = None # type: ignore
+    NUMPY_AVAILABLE = False
+
+# onnxruntime y tokenizers se importan al crear el primer OnnxEmbeddingModel
+from app.core.lazy_imports import is_available, optional_import
+
+ONNXRUNTIME_AVAILABLE = is_available("onnxruntime")
+TOKENIZERS_AVAILABLE = is_available("tokenizers")
+
+logger = logging.getLogger(__name__)
+
+# Nombres de archivo dentro del directorio exportado
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+CONFIG_FILE = "embedding_config.json"
+
+# Frases usadas para comparar el modelo ONNX contra el de referencia
+PARITY_SAMPLE_SENTENCES = [
+    "Hola",
+    "¿Cómo activo MiAdminXML?",
+    "No descarga mis XML del SAT",
+    "¿Dónde consulto mis CFDI cancelados en MiExpedienteContable?",
+    "Me aparece un error al validar la contraseña del SAT y no puedo continuar con la descarga masiva.",
+]
+
+_SUPPORTED_POOLING = ("mean", "cls", "max")
+
+
+# --- Exportación ---
+
+def _describe_sentence_transformer(st_model: Any) -> Dict[str, Any]:
+    """Extrae pooling/normalización de los módulos del SentenceTransformer."""
+    from sentence_transformers.models import Pooling, Normalize, Transformer
+
+    pooling_mode: Optional[str] = None
+    normalize = False
+    for module in st_model:
+        if isinstance(module, Transformer):
+            continue
+        if isinstance(module, Pooling):
+            if module.pooling_mode_mean_tokens:
+                pooling_mode = "mean"
+            elif module.pooling_mode_cls_token:
+                pooling_mode = "cls"
+            elif module.pooling_mode_max_tokens:
+                pooling_mode = "max"
+            continue
+        if isinstance(module, Normalize):
+            normalize = True
+            continue
+        raise ValueError(f"Módulo '{type(module).__name__}' no soportado por el backend ONNX.")
+
+    if pooling_mode not in _SUPPORTED_POOLING:
+        raise ValueError("Modo de pooling no soportado por el backend ONNX (solo mean/cls/max).")
+    return {"pooling_mode": pooling_mode, "normalize": normalize}
+
+
+def export_onnx_model(model_name: str, output_dir: Path, quantize: bool = False, opset: int = 14) -> Path:
+    """
+    Exporta `model_name` (SentenceTransformer) a ONNX en `output_dir`.
+
+    Escribe model.onnx, tokenizer.json y embedding_config.json; con
+    `quantize=True` añade model_quantized.onnx (cuantización dinámica int8).
+    Devuelve la ruta del directorio exportado.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    logger.info(f"Cargando modelo de referencia '{model_name}' para exportar a ONNX...")
+    st_model = SentenceTransformer(model_name_or_path=model_name, device="cpu")
+    description = _describe_sentence_transformer(st_model)
+    auto_model = st_model[0].auto_model
+    hf_tokenizer = st_model.tokenizer
+    auto_model.eval()
+
+    dummy = hf_tokenizer(["hola mundo", "texto de ejemplo un poco más largo"], padding=True, return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+
+    class _HiddenStateWrapper(torch.nn.Module):
+        """Devuelve solo last_hidden_state para que el grafo ONNX tenga una salida."""
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *args):
+            return self.model(**dict(zip(input_names, args)))[0]
+
+    onnx_path = output_dir / ONNX_MODEL_FILE
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            _HiddenStateWrapper(auto_model),
+            tuple(dummy[name] for name in input_names),
+            str(onnx_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+        )
+    logger.info(f"Modelo exportado a {onnx_path}")
+
+    hf_tokenizer.save_pretrained(str(output_dir))
+    if not (output_dir / TOKENIZER_FILE).is_file():
+        raise ValueError("El tokenizer del modelo no es 'fast'; no se generó tokenizer.json.")
+
+    config = {
+        "model_name": model_name,
+        "dimension": int(st_model.get_sentence_embedding_dimension()),
+        "max_seq_length": int(st_model.max_seq_length),
+        "pad_token": hf_tokenizer.pad_token,
+        "pad_token_id": int(hf_tokenizer.pad_token_id),
+        "input_names": input_names,
+        **description,
+    }
+    (output_dir / CONFIG_FILE).write_text(json.dumps(config, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantized_path = output_dir / ONNX_QUANTIZED_MODEL_FILE
+        quantize_dynamic(str(onnx_path), str(quantized_path), weight_type=QuantType.QInt8)
+        logger.info(f"Modelo cuantizado (int8 dinámico) guardado en {quantized_path}")
+
+    return output_dir
+
+
+# --- Inferencia ---
+
+class OnnxEmbeddingModel:
+    """
+    Modelo de embeddings servido con ONNX Runtime.
+
+    Compatible (duck-typing) con el uso que hace embedding_service de
+    SentenceTransformer: `encode(textos, batch_size=..., ...)` y
+    `get_sentence_embedding_dimension()`.
+    """
+
+    def __init__(self, model_dir: Path, quantized: bool = False, intra_op_threads: int = 0):
+        ort = optional_import("onnxruntime") if ONNXRUNTIME_AVAILABLE else None
+        tokenizers = optional_import("tokenizers") if TOKENIZERS_AVAILABLE else None
+        if ort is None or tokenizers is None or not NUMPY_AVAILABLE:
+            raise ImportError("Backend ONNX requiere 'onnxruntime', 'tokenizers' y 'numpy'. Ejecuta: pip install -e .[onnx]")
+
+        self.model_dir = Path(model_dir)
+        config_path = self.model_dir / CONFIG_FILE
+        if not config_path.is_file():
+            raise FileNotFoundError(f"No se encontró {config_path}. Exporta el modelo con scripts/export_onnx_embeddings.py")
+        self.config: Dict[str, Any] = json.loads(config_path.read_text(encoding="utf-8"))
+
+        model_file = ONNX_QUANTIZED_MODEL_FILE if quantized else ONNX_MODEL_FILE
+        model_path = self.model_dir / model_file
+        if not model_path.is_file():
+            raise FileNotFoundError(f"No se encontró el modelo ONNX {model_path}.")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        self._session = ort.InferenceSession(str(model_path), sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_names = [i.name for i in self._session.get_inputs()]
+
+        self._tokenizer = tokenizers.Tokenizer.from_file(str(self.model_dir / TOKENIZER_FILE))
+        self._tokenizer.enable_truncation(max_length=int(self.config.get("max_seq_length", 512)))
+        self._tokenizer.enable_padding(
+            pad_id=int(self.config.get("pad_token_id", 0)),
+            pad_token=str(self.config.get("pad_token", "[PAD]")),
+        )
+        self.quantized = quantized
+        logger.info(
+            f"Modelo ONNX cargado desde {model_path} (dim={self.get_sentence_embedding_dimension()}, "
+            f"pooling={self.config.get('pooling_mode')}, normalize={self.config.get('normalize')})"
+        )
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return int(self.config["dimension"])
+
+    def _encode_chunk(self, texts: List[str]) -> "np.ndarray":
+        encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.asarray([e.type_ids for e in encodings], dtype=np.int64)
+        feeds = {name: value for name, value in feeds.items() if name in self._input_names}
+
+        hidden = self._session.run(None, feeds)[0].astype(np.float32, copy=False)
+        pooling = self.config.get("pooling_mode", "mean")
+        if pooling == "cls":
+            pooled = hidden[:, 0]
+        elif pooling == "max":
+            masked = np.where(attention_mask[:, :, None] > 0, hidden, -np.inf)
+            pooled = masked.max(axis=1)
+        else:
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        if self.config.get("normalize"):
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            pooled = pooled / np.clip(norms, 1e-12, None)
+        return np.ascontiguousarray(pooled, dtype=np.float32)
+
+    def encode(self, sentences: Any, batch_size: int = 32, show_progress_bar: bool = False,
+               convert_to_numpy: bool = True, **kwargs: Any) -> "np.ndarray":
+        """Codifica uno o varios textos y devuelve matriz float32 (N, dim) (o vector si se pasa un str)."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        batch_size = max(1, int(batch_size))
+        chunks = [self._encode_chunk(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        matrix = np.vstack(chunks)
+        return matrix[0] if single else matrix
+
+
+def check_parity(candidate: Any, reference: Any, expected_dim: int,
+                 sentences: Optional[List[str]] = None) -> Tuple[bool, float]:
+    """
+    Compara `candidate` (ONNX) con `reference` (SentenceTransformer).
+
+    Returns:
+        (dimensión_ok, similitud coseno mínima entre ambos sobre las frases de muestra)
+    """
+    sentences = sentences or PARITY_SAMPLE_SENTENCES
+    dim_ok = candidate.get_sentence_embedding_dimension() == expected_dim
+    a = np.asarray(candidate.encode(sentences, batch_size=len(sentences)), dtype=np.float32)
+    b = np.asarray(reference.encode(sentences, batch_size=len(sentences), convert_to_numpy=True), dtype=np.float32)
+    if a.shape != b.shape:
+        return False, 0.0
+    cos = (a * b).sum(axis=1) / np.clip(np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1), 1e-12, None)
+    return dim_ok, float(cos.min())
@@ -0,0 +1,191 @@
+# app/services/payload_filter.py
+# -*- coding: utf-8 -*-
+
+"""
+Evaluación en Python de filtros de Qdrant sobre payloads locales.
+
+Acepta `qdrant_client.models.Filter` o su forma dict equivalente (sin importar
+qdrant-client) y reproduce la semántica de Qdrant para las condiciones más
+usadas:
+- Filter: must / should / must_not / min_should y filtros anidados.
+- FieldCondition: match (value, any, except, text), range, values_count,
+  is_empty, is_null. Claves con puntos ('a.b') y arrays ('a[].b').
+- IsEmptyCondition, IsNullCondition, HasIdCondition, NestedCondition.
+
+Un payload cuyo campo es una lista cumple la condición si algún elemento la
+cumple (como en Qdrant). Condiciones no soportadas (geo, fechas) lanzan
+ValueError en lugar de evaluarse mal.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+_MISSING = object()
+
+
+def _attr(obj: Any, name: str, default: Any = None) -> Any:
+    """Lee un atributo de un modelo de qdrant-client o una clave de su forma dict."""
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def _as_list(conditions: Any) -> List[Any]:
+    """Qdrant acepta una condición suelta o una lista en must/should/must_not."""
+    if conditions is None:
+        return []
+    if isinstance(conditions, (list, tuple)):
+        return list(conditions)
+    return [conditions]
+
+
+def _payload_values(payload: Any, key: str) -> List[Any]:
+    """
+    Valores del payload en la ruta `key` ('a.b', 'a[].b'), aplanando listas.
+    Devuelve [] si la ruta no existe.
+    """
+    current: List[Any] = [payload]
+    for part in key.split("."):
+        flatten = part.endswith("[]")
+        name = part[:-2] if flatten else part
+        next_values: List[Any] = []
+        for value in current:
+            if isinstance(value, list):
+                candidates = [v for v in value if isinstance(v, dict)]
+            else:
+                candidates = [value] if isinstance(value, dict) else []
+            for candidate in candidates:
+                found = candidate.get(name, _MISSING)
+                if found is _MISSING:
+                    continue
+                if flatten and isinstance(found, list):
+                    next_values.extend(found)
+                else:
+                    next_values.append(found)
+        current = next_values
+    values: List[Any] = []
+    for value in current:
+        if isinstance(value, list):
+            values.extend(value)
+        else:
+            values.append(value)
+    return values
+
+
+def _key_is_null(payload: Any, key: str) -> bool:
+    """True si la ruta existe y su valor es null (IsNullCondition)."""
+    parent_key, _, leaf = key.rpartition(".")
+    parents = _payload_values(payload, parent_key) if parent_key else [payload]
+    return any(isinstance(p, dict) and leaf in p and p[leaf] is None for p in parents)
+
+
+def _same_value(stored: Any, expected: Any) -> bool:
+    # Qdrant no considera True == 1
+    if isinstance(stored, bool) != isinstance(expected, bool):
+        return False
+    return stored == expected
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _in_range(value: float, bounds: Any) -> bool:
+    gt, gte, lt, lte = (_attr(bounds, name) for name in ("gt", "gte", "lt", "lte"))
+    return ((gt is None or value > gt) and (gte is None or value >= gte)
+            and (lt is None or value < lt) and (lte is None or value <= lte))
+
+
+def _match(values: List[Any], match: Any) -> bool:
+    value = _attr(match, "value", _MISSING)
+    if value is not _MISSING and value is not None:
+        return any(_same_value(v, value) for v in values)
+    any_of = _attr(match, "any")
+    if any_of is not None:
+        return any(_same_value(v, expected) for v in values for expected in any_of)
+    except_of = _attr(match, "except_") if not isinstance(match, dict) else match.get("except")
+    if except_of is not None:
+        return any(not any(_same_value(v, excluded) for excluded in except_of) for v in values)
+    text = _attr(match, "text")
+    if text is not None:
+        return any(isinstance(v, str) and text in v for v in values)
+    raise ValueError(f"Condición match no soportada: {match!r}")
+
+
+def _field_condition(payload: Any, condition: Any) -> bool:
+    key = _attr(condition, "key")
+    values = [v for v in _payload_values(payload, key) if v is not None]
+    match = _attr(condition, "match")
+    if match is not None:
+        return _match(values, match)
+    bounds = _attr(condition, "range")
+    if bounds is not None:
+        bound_values = [_attr(bounds, name) for name in ("gt", "gte", "lt", "lte")]
+        if any(b is not None and not _is_number(b) for b in bound_values):
+            raise ValueError("Rangos de fecha no soportados por el filtro local.")
+        return any(_is_number(v) and _in_range(v, bounds) for v in values)
+    count = _attr(condition, "values_count")
+    if count is not None:
+        return _in_range(len(values), count)
+    if _attr(condition, "is_empty") is not None:
+        return (not values) == bool(_attr(condition, "is_empty"))
+    if _attr(condition, "is_null") is not None:
+        return _key_is_null(payload, key) == bool(_attr(condition, "is_null"))
+    raise ValueError(f"FieldCondition no soportada por el filtro local (key='{key}').")
+
+
+def _condition(payload: Any, point_id: Any, condition: Any) -> bool:
+    if _attr(condition, "key") is not None:
+        return _field_condition(payload, condition)
+    has_id = _attr(condition, "has_id")
+    if has_id is not None:
+        return str(point_id) in {str(i) for i in has_id}
+    is_empty = _attr(condition, "is_empty")
+    if is_empty is not None:
+        return not [v for v in _payload_values(payload, _attr(is_empty, "key")) if v is not None]
+    is_null = _attr(condition, "is_null")
+    if is_null is not None:
+        return _key_is_null(payload, _attr(is_null, "key"))
+    nested = _attr(condition, "nested")
+    if nested is not None:
+        items = _payload_values(payload, _attr(nested, "key"))
+        inner = _attr(nested, "filter")
+        return any(isinstance(item, dict) and matches_filter(item, inner, point_id) for item in items)
+    if any(_attr(condition, name) is not None for name in ("must", "should", "must_not", "min_should")):
+        return matches_filter(payload, condition, point_id)
+    raise ValueError(f"Condición de filtro no soportada por el filtro local: {condition!r}")
+
+
+def matches_filter(payload: Optional[Dict[str, Any]], query_filter: Any, point_id: Any = None) -> bool:
+    """
+    True si el payload (y el id del punto) cumple `query_filter`.
+
+    Raises:
+        ValueError: Si el filtro usa condiciones no soportadas localmente.
+    """
+    if query_filter is None:
+        return True
+    payload = payload or {}
+
+    def holds(condition: Any) -> bool:
+        return _condition(payload, point_id, condition)
+
+    if not all(holds(c) for c in _as_list(_attr(query_filter, "must"))):
+        return False
+    if any(holds(c) for c in _as_list(_attr(query_filter, "must_not"))):
+        return False
+    should = _as_list(_attr(query_filter, "should"))
+    if should and not any(holds(c) for c in should):
+        return False
+    min_should = _attr(query_filter, "min_should")
+    if min_should is not None:
+        satisfied = sum(1 for c in _as_list(_attr(min_should, "conditions")) if holds(c))
+        if satisfied < int(_attr(min_should, "min_count", 0)):
+            return False
+    return True
+
+
+def filter_mask(payloads: Iterable[Optional[Dict[str, Any]]], ids: Iterable[Any], query_filter: Any) -> List[bool]:
+    """Evalúa el filtro sobre cada (payload, id); útil para enmascarar una matriz de vectores."""
+    return [matches_filter(payload, query_filter, point_id) for payload, point_id in zip(payloads, ids)]
@@ -0,0 +1,192 @@
+# app/services/payload_store.py
+# -*- coding: utf-8 -*-
+
+"""
+Almacén local de payloads (texto de cada fuente) en un archivo mapeado en
+memoria, para buscar en Qdrant sin traer payloads (SEARCH_PAYLOAD_MODE=ids)
+o trayendo solo `source_id` (SEARCH_PAYLOAD_MODE=source_id).
+
+Formato del archivo:
+- Magic (8 bytes) + longitud del índice (uint64 little-endian).
+- Índice JSON: {source_id: [offset, longitud]}, {point_id: source_id} y metadatos.
+- Blob UTF-8 con el contenido de cada fuente, leído bajo demanda desde el mmap.
+
+El archivo se reescribe de forma atómica (os.replace) al reindexar; cada
+worker detecta el cambio de inodo/mtime y vuelve a mapearlo.
+"""
+
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"KPAYLD01"
+_LENGTH_STRUCT = struct.Struct("<Q")
+# Cada cuánto se comprueba si otro proceso reescribió el archivo
+RELOAD_CHECK_SECONDS = 5.0
+
+
+def source_id_from_payload(payload: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Id de la fuente de un payload (`source_id` u `original_faq_id`)."""
+    payload = payload or {}
+    source_id = payload.get("source_id") or payload.get("original_faq_id")
+    return str(source_id) if source_id else None
+
+
+def content_from_payload(payload: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Texto de contexto de un payload, con la misma prioridad que el pipeline RAG."""
+    payload = payload or {}
+    content = (
+        payload.get("text")
+        or payload.get("answer_full")
+        or "\n".join(payload.get("answer_chunks", []) or [])
+        or payload.get("question")
+    )
+    return content if isinstance(content, str) and content.strip() else None
+
+
+class PayloadStore:
+    """
+    Lector de un almacén de payloads mapeado en memoria.
+
+    Args:
+        path: Archivo generado con `PayloadStore.write()`.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = None
+        self._mm: Optional[mmap.mmap] = None
+        self._open()
+
+    def _open(self) -> None:
+        file = open(self.path, "rb")
+        try:
+            stat = os.fstat(file.fileno())
+            mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            file.close()
+            raise
+        try:
+            if mm[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"'{self.path}' no es un almacén de payloads válido.")
+            index_length = _LENGTH_STRUCT.unpack_from(mm, len(MAGIC))[0]
+            index_start = len(MAGIC) + _LENGTH_STRUCT.size
+            index = json.loads(mm[index_start:index_start + index_length].decode("utf-8"))
+        except (ValueError, struct.error) as e:
+            mm.close()
+            file.close()
+            raise ValueError(f"Almacén de payloads inválido '{self.path}': {e}") from e
+        self.close()
+        self._file, self._mm = file, mm
+        self._blob_start = index_start + index_length
+        self._entries: Dict[str, Tuple[int, int]] = {k: (v[0], v[1]) for k, v in index["entries"].items()}
+        self._points: Dict[str, str] = index["points"]
+        self.meta: Dict[str, Any] = index.get("meta", {})
+        self._signature = (stat.st_ino, stat.st_mtime_ns)
+        self._last_check = time.monotonic()
+        logger.info(f"Almacén de payloads abierto: {self.path} ({len(self._entries)} fuentes, {len(self._points)} puntos).")
+
+    def reload_if_changed(self) -> bool:
+        """Vuelve a mapear el archivo si otro proceso lo reescribió. Devuelve True si recargó."""
+        now = time.monotonic()
+        if now - self._last_check < RELOAD_CHECK_SECONDS:
+            return False
+        self._last_check = now
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        if (stat.st_ino, stat.st_mtime_ns) == self._signature:
+            return False
+        try:
+            self._open()
+        except (OSError, ValueError) as e:
+            logger.error(f"No se pudo recargar el almacén de payloads '{self.path}': {e}")
+            return False
+        return True
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = None
+            self._file = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, source_id: str) -> Optional[str]:
+        """Contenido de la fuente, leído del mmap, o None si no está."""
+        entry = self._entries.get(str(source_id))
+        if entry is None or self._mm is None:
+            return None
+        offset, length = entry
+        start = self._blob_start + offset
+        return self._mm[start:start + length].decode("utf-8")
+
+    def source_id_for(self, point_id: Any) -> Optional[str]:
+        """source_id del punto de Qdrant (para búsquedas sin payload)."""
+        return self._points.get(str(point_id))
+
+    # --- Escritura ---
+
+    @staticmethod
+    def write(path: Path, points: Iterable[Tuple[Any, Dict[str, Any]]], meta: Optional[Dict[str, Any]] = None) -> Tuple[int, int]:
+        """
+        Escribe el almacén a partir de pares (point_id, payload) de forma atómica.
+        Los chunks de una misma fuente comparten contenido (el primero gana).
+        Devuelve (fuentes, puntos).
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entries: Dict[str, Tuple[int, int]] = {}
+        point_sources: Dict[str, str] = {}
+        blob = bytearray()
+        for point_id, payload in points:
+            source_id = source_id_from_payload(payload)
+            if source_id is None:
+                continue
+            point_sources[str(point_id)] = source_id
+            if source_id in entries:
+                continue
+            content = content_from_payload(payload)
+            if content is None:
+                continue
+            encoded = content.strip().encode("utf-8")
+            entries[source_id] = (len(blob), len(encoded))
+            blob.extend(encoded)
+        index = json.dumps({"entries": entries, "points": point_sources, "meta": meta or {}}, ensure_ascii=False).encode("utf-8")
+
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(_LENGTH_STRUCT.pack(len(index)))
+            f.write(index)
+            f.write(blob)
+        os.replace(tmp_path, path)
+        logger.info(f"Almacén de payloads escrito en {path}: {len(entries)} fuentes, {len(point_sources)} puntos, {len(blob)} bytes.")
+        return len(entries), len(point_sources)
+
+    @classmethod
+    async def build_from_qdrant(cls, client: Any, collection_name: str, path: Path, batch_size: int = 256) -> "PayloadStore":
+        """Lee todos los payloads de la colección (scroll sin vectores), escribe el archivo y lo abre."""
+        points = []
+        offset = None
+        while True:
+            batch, offset = await client.scroll(
+                collection_name=collection_name, limit=batch_size, offset=offset,
+                with_payload=True, with_vectors=False,
+            )
+            points.extend((point.id, point.payload or {}) for point in batch)
+            if offset is None:
+                break
+        await asyncio.to_thread(cls.write, path, points, {"collection": collection_name, "created_at": time.time()})
+        return cls(path)
@@ -7,10 +7,12 @@ CORREGIDO: Eliminado argumento 'with_vector' de client.search().
 """
 
 import logging
-from typing import List, Dict, Any, Optional, Tuple, Union # Añadido Union
+import math
+import time
+from typing import List, Dict, Any, Optional, Tuple, Union, TYPE_CHECKING # Añadido Union
 from functools import lru_cache
-import numpy as np # Para el bloque de prueba
-import asyncio # Para el bloque de prueba
+import numpy as np
+import asyncio
 
 # Importar configuración (con fallback)
 try:
@@ -32,15 +34,25 @@ except Exception as config_err:
          QDRANT_URL: str = "http://localhost:6333"; QDRANT_API_KEY: Optional[Any]=None; QDRANT_COLLECTION_NAME: str="default"; RAG_TOP_K:int=3; vector_dimension:int=384
      settings = DummySettings(); CONFIG_LOADED = False
 
-# Importar cliente Qdrant y modelos/excepciones
-try:
+# Cliente Qdrant: se importa al crear el cliente (warm-up o primera búsqueda)
+from app.core.lazy_imports import is_available, optional_import
+
+if TYPE_CHECKING:
     from qdrant_client import AsyncQdrantClient, models
-    from qdrant_client.http.models import PointStruct, Distance, VectorParams, ScoredPoint, Filter
-    from qdrant_client.http.exceptions import UnexpectedResponse
-    QDRANT_AVAILABLE = True
-except ImportError:
+
+QDRANT_AVAILABLE = is_available("qdrant_client")
+if not QDRANT_AVAILABLE:
     print("[ERROR qdrant_service.py] 'qdrant-client' no instalado. Ejecuta: pip install qdrant-client")
-    AsyncQdrantClient = None; models = None; ScoredPoint = Any; Filter = Any; UnexpectedResponse = ConnectionError; QDRANT_AVAILABLE = False
+
+from app.services.vector_utils import VectorLike, as_float32_vector
+from app.services.dimension_reduction import effective_vector_dimension
+from app.services.local_vector_index import LocalVectorIndex
+from app.services.search_cache import SearchResultCache
+from app.services.single_flight import SingleFlight
+from app.services.search_tuning import to_search_params
+from app.services.payload_store import PayloadStore, source_id_from_payload
+from app.services import resilience
+from app.services.resilience import CircuitBreaker, LatencyTracker
 
 logger = logging.getLogger(__name__)
 
@@ -52,9 +64,38 @@ def _decode_qdrant_error_content(content: Optional[bytes]) -> str:
         except Exception: return repr(content)
     return str(content)
 
+def _unexpected_response_class() -> type:
+    """Excepción UnexpectedResponse de qdrant-client (o una que nunca se lanza si no está)."""
+    exceptions = optional_import("qdrant_client.http.exceptions") if QDRANT_AVAILABLE else None
+    return exceptions.UnexpectedResponse if exceptions is not None else _QdrantUnavailable
+
+class _QdrantUnavailable(Exception):
+    """Marcador usado cuando qdrant-client no está instalado."""
+
+def _client_options() -> Dict[str, Any]:
+    """
+    Argumentos de transporte de AsyncQdrantClient según la configuración.
+    Nota: sin `limits` explícitos qdrant-client desactiva el keep-alive para
+    localhost, lo que obliga a abrir una conexión TCP por búsqueda.
+    """
+    options: Dict[str, Any] = {
+        "prefer_grpc": bool(getattr(settings, 'QDRANT_PREFER_GRPC', False)),
+        "grpc_port": int(getattr(settings, 'QDRANT_GRPC_PORT', 6334)),
+        "timeout": int(getattr(settings, 'QDRANT_TIMEOUT_SECONDS', 10)),
+        "http2": bool(getattr(settings, 'QDRANT_HTTP2', False)),
+    }
+    httpx = optional_import("httpx")
+    if httpx is not None:
+        options["limits"] = httpx.Limits(
+            max_connections=int(getattr(settings, 'QDRANT_POOL_MAX_CONNECTIONS', 100)),
+            max_keepalive_connections=int(getattr(settings, 'QDRANT_POOL_MAX_KEEPALIVE', 20)),
+            keepalive_expiry=float(getattr(settings, 'QDRANT_KEEPALIVE_EXPIRY_SECONDS', 30.0)),
+        )
+    return options
+
 # --- Cliente Qdrant Cacheado ---
 @lru_cache(maxsize=1)
-def _get_qdrant_client() -> Optional[AsyncQdrantClient]:
+def _get_qdrant_client() -> Optional["AsyncQdrantClient"]:
     """Inicializa y devuelve una instancia cacheada del cliente AsyncQdrantClient."""
     if not QDRANT_AVAILABLE:
         logger.critical("Librería 'qdrant-client' no disponible.")
@@ -72,9 +113,16 @@ def _get_qdrant_client() -> Optional[AsyncQdrantClient]:
         logger.error("QDRANT_URL no configurada. Servicio Qdrant desactivado.")
         return None
 
-    logger.info(f"Inicializando cliente AsyncQdrantClient para URL: {qdrant_url}...")
+    options = _client_options()
+    logger.info(
+        f"Inicializando cliente AsyncQdrantClient para URL: {qdrant_url} "
+        f"({'gRPC:' + str(options['grpc_port']) if options['prefer_grpc'] else 'REST'})..."
+    )
     try:
-        client = AsyncQdrantClient(url=qdrant_url, api_key=api_key)
+        qdrant_client = optional_import("qdrant_client")
+        if qdrant_client is None:
+            return None
+        client = qdrant_client.AsyncQdrantClient(url=qdrant_url, api_key=api_key, **options)
         logger.info("Instancia de AsyncQdrantClient creada.")
         # Podríamos añadir una verificación de conexión aquí si fuera crítico al inicio
         # ej. await client.health_check() dentro de una función async separada
@@ -83,74 +131,648 @@ def _get_qdrant_client() -> Optional[AsyncQdrantClient]:
         logger.exception(f"Error inesperado al inicializar AsyncQdrantClient: {e}")
         return None
 
+async def close_client() -> None:
+    """Cierra el cliente cacheado (conexiones HTTP/gRPC) si llegó a crearse. Se llama al apagar la app."""
+    if _get_qdrant_client.cache_info().currsize == 0:
+        return
+    client = _get_qdrant_client()
+    _get_qdrant_client.cache_clear()
+    if client is None:
+        return
+    try:
+        await client.close()
+        logger.info("Cliente Qdrant cerrado.")
+    except Exception as e:
+        logger.error(f"Error cerrando el cliente Qdrant: {e}")
+
+def _search_timeout() -> float:
+    return float(getattr(settings, 'QDRANT_SEARCH_TIMEOUT_SECONDS', 5.0))
+
+# --- Resiliencia: deadline del request, hedging y circuit breaker ---
+_breaker = CircuitBreaker(
+    "qdrant",
+    failure_threshold=getattr(settings, 'QDRANT_BREAKER_FAILURE_THRESHOLD', 5),
+    cooldown_seconds=getattr(settings, 'QDRANT_BREAKER_COOLDOWN_SECONDS', 30.0),
+)
+_latency = LatencyTracker(window=200, min_samples=20)
+_resilience_counters: Dict[str, int] = {"hedged": 0, "degraded": 0, "deadline_exceeded": 0}
+
+def _hedge_delay() -> Optional[float]:
+    """Retardo antes de la búsqueda de cobertura: max(QDRANT_HEDGE_MIN_DELAY_MS, p95), o None sin hedging."""
+    if not getattr(settings, 'QDRANT_HEDGING_ENABLED', False):
+        return None
+    floor = float(getattr(settings, 'QDRANT_HEDGE_MIN_DELAY_MS', 50.0)) / 1000.0
+    p95 = _latency.percentile(95)
+    return floor if p95 is None else max(floor, p95)
+
+def _search_params() -> Optional["models.SearchParams"]:
+    """SearchParams a partir de QDRANT_HNSW_EF / QDRANT_EXACT_SEARCH / QDRANT_QUANTIZATION_*; None = defaults del servidor."""
+    return to_search_params({
+        "hnsw_ef": getattr(settings, 'QDRANT_HNSW_EF', None),
+        "exact": getattr(settings, 'QDRANT_EXACT_SEARCH', False),
+        "rescore": getattr(settings, 'QDRANT_QUANTIZATION_RESCORE', None),
+        "oversampling": getattr(settings, 'QDRANT_QUANTIZATION_OVERSAMPLING', None),
+    })
+
+def _record_timeout(timeout: float) -> None:
+    """
+    Timeout del lado del cliente. Solo cuenta como fallo del breaker si se
+    agotó el timeout configurado de Qdrant; si lo acortó el deadline del
+    request (`resilience.call_timeout`), la lentitud es del llamador.
+    """
+    if timeout >= _search_timeout():
+        _breaker.record_failure()
+    else:
+        _resilience_counters["deadline_exceeded"] += 1
+
+def _count_hedge() -> None:
+    _resilience_counters["hedged"] += 1
+
+def get_resilience_stats() -> Dict[str, Any]:
+    """Estado del circuit breaker, latencias observadas y contadores de hedging/degradación."""
+    p50, p95 = _latency.percentile(50), _latency.percentile(95)
+    return {
+        "breaker": _breaker.get_stats(),
+        "latency_ms": {"p50": round(p50 * 1000.0, 3) if p50 is not None else None,
+                       "p95": round(p95 * 1000.0, 3) if p95 is not None else None,
+                       "samples": len(_latency)},
+        **_resilience_counters,
+    }
+
+async def _degraded_search(query_vector: np.ndarray, limit: int, query_filter: Any, cache_key: Any, reason: str) -> List[Dict[str, Any]]:
+    """
+    Respuesta sin Qdrant: resultado cacheado aunque haya expirado o, si no hay,
+    el índice local (ya cargado o desde LOCAL_INDEX_SNAPSHOT_PATH). Si nada
+    aplica devuelve [].
+    """
+    _resilience_counters["degraded"] += 1
+    if cache_key is not None:
+        stale = _search_cache.get_stale(cache_key)
+        if stale is not None:
+            logger.warning(f"Qdrant no disponible ({reason}); sirviendo {len(stale)} resultados cacheados.")
+            return stale
+    snapshot_path = getattr(settings, 'LOCAL_INDEX_SNAPSHOT_PATH', None)
+    index = _local_index
+    if index is None and snapshot_path is not None and snapshot_path.exists():
+        index = await get_local_index() # Carga la instantánea, sin tocar Qdrant
+    if index is not None:
+        try:
+            results = await asyncio.to_thread(index.search, query_vector, limit, query_filter)
+            logger.warning(f"Qdrant no disponible ({reason}); sirviendo {len(results)} resultados del índice local.")
+            return results
+        except ValueError as e:
+            logger.error(f"Búsqueda local degradada inválida: {e}")
+    logger.warning(f"Qdrant no disponible ({reason}) y sin datos locales; sin resultados.")
+    return []
+
+# --- Caché de Resultados ---
+_search_cache = SearchResultCache(
+    max_size=getattr(settings, 'SEARCH_CACHE_SIZE', 1024),
+    ttl_seconds=getattr(settings, 'SEARCH_CACHE_TTL_SECONDS', 300.0),
+    quantization_step=getattr(settings, 'SEARCH_CACHE_QUANTIZATION_STEP', 1e-3),
+)
+
+def invalidate_search_cache(collection_name: Optional[str] = None) -> int:
+    """
+    Invalida los resultados cacheados de una colección (o de todas con None).
+    Debe llamarse al reindexar o modificar la colección.
+    """
+    return _search_cache.invalidate(collection_name)
+
+def get_search_cache_stats() -> Dict[str, Any]:
+    """Métricas de la caché de resultados de búsqueda."""
+    return _search_cache.get_stats()
+
+# Búsquedas idénticas en curso (misma clave que la caché) comparten una sola petición
+_search_flight = SingleFlight("search_documents", enabled=getattr(settings, 'SINGLE_FLIGHT_ENABLED', True))
+
+# --- Almacén Local de Payloads (SEARCH_PAYLOAD_MODE=source_id|ids) ---
+_payload_store: Optional[PayloadStore] = None
+# Campos que se piden a Qdrant en modo 'source_id'
+SOURCE_ID_FIELDS = ["source_id", "original_faq_id"]
+
+def _payload_mode() -> str:
+    return getattr(settings, 'SEARCH_PAYLOAD_MODE', 'full')
+
+def _with_payload_selector() -> Any:
+    """Valor de `with_payload` para client.search según SEARCH_PAYLOAD_MODE."""
+    mode = _payload_mode()
+    if mode == "ids":
+        return False
+    if mode == "source_id":
+        return list(SOURCE_ID_FIELDS)
+    return True
+
+async def load_payload_store(rebuild: bool = False) -> Optional[PayloadStore]:
+    """
+    Abre el almacén de payloads (PAYLOAD_STORE_PATH) o lo construye desde la
+    colección si no existe o si `rebuild=True` (p. ej. tras reindexar).
+    """
+    global _payload_store
+    path = getattr(settings, 'PAYLOAD_STORE_PATH', None)
+    if path is None:
+        logger.error("SEARCH_PAYLOAD_MODE requiere PAYLOAD_STORE_PATH.")
+        return None
+    try:
+        if path.exists() and not rebuild:
+            store = await asyncio.to_thread(PayloadStore, path)
+        else:
+            client = _get_qdrant_client()
+            if client is None:
+                return None
+            collection_name = getattr(settings, 'QDRANT_COLLECTION_NAME', 'default_collection')
+            store = await PayloadStore.build_from_qdrant(client, collection_name, path)
+    except Exception as e:
+        logger.exception(f"No se pudo cargar el almacén de payloads '{path}': {e}")
+        return None
+    previous, _payload_store = _payload_store, store
+    if previous is not None:
+        previous.close()
+    return store
+
+async def _hydrate_payloads(client: Any, collection_name: str, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Completa los resultados de una búsqueda sin payload (o con solo source_id)
+    con el texto del almacén local. Los puntos que no estén en el almacén se
+    piden a Qdrant con `retrieve` (payload completo).
+    """
+    store = _payload_store
+    if store is not None:
+        store.reload_if_changed()
+    missing: List[Dict[str, Any]] = []
+    for result in results:
+        source_id = source_id_from_payload(result["payload"]) or (store.source_id_for(result["id"]) if store else None)
+        content = store.get(source_id) if store is not None and source_id else None
+        if content is None:
+            missing.append(result)
+            continue
+        result["payload"] = {"source_id": source_id, "text": content}
+    if missing:
+        logger.warning(f"{len(missing)} resultados sin entrada en el almacén de payloads; se piden a Qdrant.")
+        try:
+            points = await client.retrieve(collection_name=collection_name, ids=[r["id"] for r in missing], with_payload=True)
+        except Exception as e:
+            logger.error(f"No se pudieron recuperar los payloads faltantes: {e}")
+            return results
+        payloads = {str(point.id): point.payload or {} for point in points}
+        for result in missing:
+            result["payload"] = payloads.get(str(result["id"]), result["payload"])
+    return results
+
+# --- Índice Local (VECTOR_SEARCH_BACKEND=local) ---
+_local_index: Optional[LocalVectorIndex] = None
+_local_index_lock: Optional[asyncio.Lock] = None
+# Por debajo de este tamaño la búsqueda exacta es sub-milisegundo y se hace inline
+_LOCAL_INLINE_MAX_POINTS = 10000
+
+def _local_backend_enabled() -> bool:
+    return getattr(settings, 'VECTOR_SEARCH_BACKEND', 'qdrant') == 'local'
+
+def set_local_index(index: Optional[LocalVectorIndex]) -> None:
+    """Instala (o quita con None) el índice local; usado por pruebas, benchmarks y recargas."""
+    global _local_index
+    _local_index = index
+
+async def get_local_index(reload: bool = False) -> Optional[LocalVectorIndex]:
+    """
+    Devuelve el índice local, cargándolo la primera vez: desde
+    LOCAL_INDEX_SNAPSHOT_PATH si existe o, si no, leyendo la colección de Qdrant
+    (y guardando la instantánea si hay ruta configurada). Con `reload=True`
+    vuelve a leer la colección de Qdrant y reescribe la instantánea.
+    """
+    global _local_index, _local_index_lock
+    if _local_index is not None and not reload:
+        return _local_index
+    if _local_index_lock is None:
+        _local_index_lock = asyncio.Lock()
+    async with _local_index_lock:
+        if _local_index is not None and not reload:
+            return _local_index
+        snapshot_path = getattr(settings, 'LOCAL_INDEX_SNAPSHOT_PATH', None)
+        options = {
+            "distance": getattr(settings, 'DISTANCE_METRIC', 'Cosine'),
+            "hnsw_threshold": getattr(settings, 'LOCAL_INDEX_HNSW_THRESHOLD', 50000),
+            "ef_search": getattr(settings, 'LOCAL_INDEX_HNSW_EF_SEARCH', 64),
+        }
+        try:
+            if snapshot_path is not None and snapshot_path.exists() and not reload:
+                index = await asyncio.to_thread(LocalVectorIndex.load, snapshot_path, **options)
+            else:
+                client = _get_qdrant_client()
+                if client is None:
+                    logger.error("Índice local sin instantánea y sin cliente Qdrant para construirlo.")
+                    return None
+                collection_name = getattr(settings, 'QDRANT_COLLECTION_NAME', 'default_collection')
+                index = await LocalVectorIndex.from_qdrant(client, collection_name, **options)
+                if snapshot_path is not None:
+                    await asyncio.to_thread(index.save, snapshot_path)
+        except Exception as e:
+            logger.exception(f"No se pudo cargar el índice vectorial local: {e}")
+            return None
+        _local_index = index
+        return index
+
+async def _search_local(query_vector: np.ndarray, limit: int, query_filter: Any) -> List[Dict[str, Any]]:
+    index = await get_local_index()
+    if index is None:
+        logger.error("Intento de búsqueda local sin índice cargado.")
+        return []
+    try:
+        if len(index) <= _LOCAL_INLINE_MAX_POINTS:
+            results = index.search(query_vector, limit, query_filter)
+        else:
+            results = await asyncio.to_thread(index.search, query_vector, limit, query_filter)
+    except ValueError as e:
+        logger.error(f"Búsqueda local inválida: {e}")
+        return []
+    logger.info(f"Búsqueda local ({index.mode}) completada. Encontrados {len(results)} resultados.")
+    return results
+
+async def on_collection_reindexed(collection_name: Optional[str] = None) -> None:
+    """
+    Refresca todo lo derivado de la colección tras reindexarla: versión de la
+    colección (get_collection_version), caché de resultados, almacén de payloads (si SEARCH_PAYLOAD_MODE != full), índice
+    local (si VECTOR_SEARCH_BACKEND=local) e índice BM25 (si RETRIEVAL_MODE=hybrid).
+    """
+    collection_name = collection_name or getattr(settings, 'QDRANT_COLLECTION_NAME', 'default_collection')
+    _collection_versions[collection_name] = _collection_versions.get(collection_name, 0) + 1
+    invalidate_search_cache(collection_name)
+    if _payload_mode() != "full":
+        await load_payload_store(rebuild=True)
+    if _local_backend_enabled():
+        await get_local_index(reload=True)
+    from app.services import hybrid_retrieval # Importación diferida: hybrid_retrieval importa este módulo
+    if hybrid_retrieval.hybrid_enabled():
+        await hybrid_retrieval.load_bm25_index(rebuild=True)
+
+# --- Alias de Colección (reindexado blue/green) ---
+# Versión de cada colección/alias: sube en cada reindexado para que las cachés derivadas la usen en sus claves
+_collection_versions: Dict[str, int] = {}
+# Última colección física a la que apuntaba el alias y cuándo se comprobó
+_alias_target: Optional[str] = None
+_alias_checked_at: float = 0.0
+_alias_check_task: Optional["asyncio.Task"] = None
+
+def get_collection_version(collection_name: Optional[str] = None) -> int:
+    """Versión de la colección en este proceso; cambia con cada `on_collection_reindexed`."""
+    collection_name = collection_name or getattr(settings, 'QDRANT_COLLECTION_NAME', 'default_collection')
+    return _collection_versions.get(collection_name, 0)
+
+async def resolve_collection_alias(alias: str, client: Any = None) -> Optional[str]:
+    """Colección física a la que apunta `alias`, o None si no es un alias."""
+    client = client if client is not None else _get_qdrant_client()
+    if client is None:
+        return None
+    response = await client.get_aliases()
+    for description in getattr(response, 'aliases', []) or []:
+        if description.alias_name == alias:
+            return description.collection_name
+    return None
+
+async def switch_collection_alias(alias: str, collection_name: str, client: Any = None, migrate: bool = False) -> Optional[str]:
+    """
+    Apunta `alias` a `collection_name`. Si `alias` ya es un alias, el cambio es
+    una sola petición `update_collection_aliases` (borrar y crear el alias), así
+    las búsquedas ven la colección anterior o la nueva. Devuelve la colección a
+    la que apuntaba antes, o None.
+
+    Si `alias` es todavía una colección física, falla con ValueError salvo
+    `migrate=True` (migración única a alias): entonces la colección se elimina
+    antes de crear el alias y, durante ese paso, las búsquedas fallan.
+    """
+    client = client if client is not None else _get_qdrant_client()
+    if client is None:
+        raise RuntimeError("Cliente Qdrant no disponible.")
+    models = optional_import("qdrant_client.models")
+    previous = await resolve_collection_alias(alias, client)
+    operations: List[Any] = []
+    if previous is not None:
+        operations.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias)))
+    elif await client.collection_exists(collection_name=alias):
+        if not migrate:
+            raise ValueError(f"'{alias}' es una colección física, no un alias. Usa la migración explícita (--migrate) para convertirla.")
+        logger.warning(f"Migración a alias: se elimina la colección física '{alias}' y se crea el alias a '{collection_name}'. Las búsquedas fallan hasta terminar.")
+        await client.delete_collection(collection_name=alias)
+    operations.append(models.CreateAliasOperation(
+        create_alias=models.CreateAlias(collection_name=collection_name, alias_name=alias)
+    ))
+    await client.update_collection_aliases(change_aliases_operations=operations)
+    logger.info(f"Alias '{alias}' -> '{collection_name}' (antes: {previous}).")
+    global _alias_target
+    _alias_target = collection_name
+    return previous
+
+async def _check_alias_target() -> None:
+    """Detecta cambios del alias hechos por otro proceso y refresca los derivados."""
+    global _alias_target
+    alias = getattr(settings, 'QDRANT_COLLECTION_NAME', 'default_collection')
+    try:
+        target = await resolve_collection_alias(alias)
+    except Exception as e:
+        logger.warning(f"No se pudo resolver el alias '{alias}': {e}")
+        return
+    previous, _alias_target = _alias_target, target
+    if previous is not None and target is not None and target != previous:
+        logger.info(f"El alias '{alias}' cambió de '{previous}' a '{target}'; refrescando derivados.")
+        await on_collection_reindexed(alias)
+
+def _maybe_check_alias() -> None:
+    """Lanza en segundo plano la comprobación del alias cada QDRANT_ALIAS_CHECK_SECONDS (0 desactiva)."""
+    global _alias_checked_at, _alias_check_task
+    interval = float(getattr(settings, 'QDRANT_ALIAS_CHECK_SECONDS', 30.0) or 0.0)
+    now = time.monotonic()
+    if interval <= 0 or now - _alias_checked_at < interval or (_alias_check_task is not None and not _alias_check_task.done()):
+        return
+    _alias_checked_at = now
+    _alias_check_task = asyncio.create_task(_check_alias_target())
+
+# --- Verificación de Conexión ---
+async def probe_collection() -> bool:
+    """
+    Verifica que Qdrant responda y que la colección configurada exista.
+    Usado en el arranque (warm-up) para abrir la conexión antes del primer request.
+    Con el backend local carga el índice en memoria y verifica su dimensión.
+    """
+    if _local_backend_enabled():
+        index = await get_local_index()
+        expected_dim = effective_vector_dimension(settings)
+        if index is None:
+            return False
+        if expected_dim and index.dim != expected_dim:
+            logger.error(f"Índice local con dimensión {index.dim}; se esperaba {expected_dim}.")
+            return False
+        return True
+    client = _get_qdrant_client()
+    if client is None:
+        return False
+    collection_name = getattr(settings, 'QDRANT_COLLECTION_NAME', 'default_collection')
+    UnexpectedResponse = _unexpected_response_class()
+    try:
+        info = await asyncio.wait_for(client.get_collection(collection_name=collection_name), timeout=_search_timeout())
+        logger.info(f"Colección Qdrant '{collection_name}' disponible ({getattr(info, 'points_count', '?')} puntos).")
+        # La colección debe tener la dimensión efectiva (reducida si EMBEDDING_REDUCTION está activo)
+        vectors_config = getattr(getattr(getattr(info, 'config', None), 'params', None), 'vectors', None)
+        collection_dim = getattr(vectors_config, 'size', None)
+        expected_dim = effective_vector_dimension(settings)
+        if collection_dim is not None and expected_dim and collection_dim != expected_dim:
+            logger.error(f"Colección '{collection_name}' tiene dimensión {collection_dim}; se esperaba {expected_dim}.")
+            return False
+        return True
+    except UnexpectedResponse as e:
+        content_str = _decode_qdrant_error_content(e.content)
+        logger.error(f"Colección Qdrant '{collection_name}' no disponible: Status={e.status_code}, Contenido={content_str}")
+        return False
+    except Exception as e:
+        logger.error(f"No se pudo contactar Qdrant al verificar '{collection_name}': {e}")
+        return False
+
 # --- Función Pública del Servicio ---
+def _points_to_results(points: Optional[List[Any]]) -> List[Dict[str, Any]]:
+    """ScoredPoint de Qdrant -> {id, score, payload}."""
+    return [
+        {"id": point.id, "score": point.score, "payload": point.payload if point.payload is not None else {}}
+        for point in points or []
+    ]
+
 async def search_documents(
-    vector: List[float],
+    vector: VectorLike,
     top_k: Optional[int] = None,
-    query_filter: Optional[models.Filter] = None # Permitir filtros
+    query_filter: Optional["models.Filter"] = None # Permitir filtros
 ) -> List[Dict[str, Any]]:
     """
     Busca en Qdrant los puntos más similares a un vector de consulta dado.
+    Con VECTOR_SEARCH_BACKEND=local se resuelve en el índice en memoria
+    (app/services/local_vector_index.py) con el mismo contrato. Búsquedas
+    concurrentes con la misma clave de caché comparten una sola
+    petición (single-flight). La petición compartida usa el deadline de quien
+    la lanzó: si era más corto, las demás reciben también la respuesta
+    degradada aunque a ellas les quedara presupuesto.
 
     Args:
-        vector: El vector embedding de la consulta del usuario.
+        vector: El vector embedding de la consulta (np.ndarray float32, memoryview o lista).
         top_k: El número máximo de resultados a devolver. Usa RAG_TOP_K de settings si es None.
         query_filter: (Opcional) Un filtro de Qdrant.
 
     Returns:
         Lista de diccionarios con 'id', 'score', 'payload', o lista vacía en error/sin resultados.
     """
-    client = _get_qdrant_client()
-    if client is None:
-        logger.error("Intento de búsqueda en Qdrant sin cliente inicializado.")
-        return []
-
     # Usar getattr para acceso seguro a settings
     collection_name = getattr(settings, 'QDRANT_COLLECTION_NAME', 'default_collection')
     limit = top_k if top_k is not None else getattr(settings, 'RAG_TOP_K', 3)
 
-    if not vector or not isinstance(vector, list):
-         logger.error("Intento de búsqueda con vector inválido.")
+    try:
+        query_vector = as_float32_vector(vector, expected_dim=effective_vector_dimension(settings) or None)
+    except ValueError as e:
+         logger.error(f"Intento de búsqueda con vector inválido: {e}")
          return []
 
+    if _local_backend_enabled():
+        return await _search_local(query_vector, limit, query_filter)
+
+    _maybe_check_alias() # Detecta un cambio de alias hecho por otro proceso (reindexado blue/green)
+    cache_key = _search_cache.make_key(collection_name, limit, query_vector, query_filter) if _search_cache.enabled else None
+    if cache_key is not None:
+        cached = _search_cache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"Resultados de búsqueda servidos desde caché ({len(cached)} resultados).")
+            return cached
+
+    # Búsquedas idénticas en curso comparten una sola petición (copia propia de la lista para cada una)
+    flight_key = cache_key if cache_key is not None else _search_cache.make_key(collection_name, limit, query_vector, query_filter)
+    results = await _search_flight.do(
+        flight_key, lambda: _search_remote(collection_name, query_vector, limit, query_filter, cache_key)
+    )
+    return list(results)
+
+async def _search_remote(
+    collection_name: str,
+    query_vector: np.ndarray,
+    limit: int,
+    query_filter: Optional["models.Filter"],
+    cache_key: Any,
+) -> List[Dict[str, Any]]:
+    """Búsqueda en Qdrant (deadline, breaker, hedging, degradación) de una query no cacheada."""
+    client = _get_qdrant_client()
+    if client is None:
+        logger.error("Intento de búsqueda en Qdrant sin cliente inicializado.")
+        return []
+
+    # Timeout por llamada: lo que quede del deadline del request, como máximo QDRANT_SEARCH_TIMEOUT_SECONDS
+    timeout = resilience.call_timeout(_search_timeout())
+    if timeout <= 0:
+        _resilience_counters["deadline_exceeded"] += 1
+        return await _degraded_search(query_vector, limit, query_filter, cache_key, "deadline del request agotado")
+    if not _breaker.allow():
+        return await _degraded_search(query_vector, limit, query_filter, cache_key, "circuito abierto")
+
     logger.debug(f"Buscando {limit} documentos en '{collection_name}'...")
+    UnexpectedResponse = _unexpected_response_class()
+    search_kwargs = dict(
+        collection_name=collection_name,
+        query_vector=query_vector, # ndarray float32; el cliente lo serializa al enviar
+        query_filter=query_filter,
+        search_params=_search_params(), # hnsw_ef / exact / cuantización (QDRANT_HNSW_EF, ...)
+        limit=limit,
+        with_payload=_with_payload_selector(), # Completo, solo source_id o nada (SEARCH_PAYLOAD_MODE)
+        timeout=math.ceil(timeout), # Lo aplica el servidor; wait_for corta del lado del cliente
+    )
     try:
-        # La llamada a search ya fue corregida (sin with_vector=False)
-        search_result: List[ScoredPoint] = await client.search(
-            collection_name=collection_name,
-            query_vector=vector,
-            query_filter=query_filter,
-            limit=limit,
-            with_payload=True  # Esencial para obtener los metadatos
+        start = time.perf_counter()
+        # Con hedging, si la búsqueda tarda más que el p95 se lanza una segunda y gana la primera que responda
+        search_result = await asyncio.wait_for(
+            resilience.hedged(lambda: client.search(**search_kwargs), _hedge_delay(), on_hedge=_count_hedge),
+            timeout=timeout,
         )
+        _latency.record(time.perf_counter() - start)
+        _breaker.record_success()
 
         # Procesar resultados
-        results_list = []
-        if search_result:
-            for point in search_result:
-                 payload_content = point.payload if point.payload is not None else {}
-                 results_list.append({
-                     "id": point.id, # El UUID del punto
-                     "score": point.score,
-                     "payload": payload_content
-                 })
+        results_list = _points_to_results(search_result)
+        if results_list:
+            if _payload_mode() != "full":
+                results_list = await _hydrate_payloads(client, collection_name, results_list)
             logger.info(f"Búsqueda Qdrant completada. Encontrados {len(results_list)} resultados.")
         else:
             logger.info("Búsqueda Qdrant completada. No se encontraron resultados.")
+        if cache_key is not None: # Solo se cachean respuestas correctas, nunca errores
+            _search_cache.set(cache_key, results_list)
         return results_list
 
     except UnexpectedResponse as e:
+        _breaker.record_failure()
         content_str = _decode_qdrant_error_content(e.content)
         logger.error(f"Error de Qdrant durante búsqueda en '{collection_name}': Status={e.status_code}, Contenido={content_str}")
-        # Aquí podríamos lanzar QdrantServiceError si lo definimos en exceptions.py
-        # raise QdrantServiceError(f"Error Qdrant {e.status_code}", status_code=503) from e
-        return [] # Devolver vacío por ahora
+        return await _degraded_search(query_vector, limit, query_filter, cache_key, f"status {e.status_code}")
+    except asyncio.TimeoutError:
+        _record_timeout(timeout)
+        logger.error(f"Búsqueda en Qdrant '{collection_name}' excedió {timeout:.3f}s.")
+        return await _degraded_search(query_vector, limit, query_filter, cache_key, "timeout")
     except Exception as e:
+        _breaker.record_failure()
         logger.exception(f"Error inesperado durante búsqueda en Qdrant en '{collection_name}': {e}")
-        # raise QdrantServiceError("Error inesperado en búsqueda Qdrant") from e
-        return []
+        return await _degraded_search(query_vector, limit, query_filter, cache_key, "error")
     # No es necesario cerrar el cliente aquí explícitamente si se maneja globalmente o al apagar la app.
 
+async def search_documents_batch(
+    vectors: List[VectorLike],
+    top_k: Optional[int] = None,
+    query_filters: Optional[List[Optional["models.Filter"]]] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Busca varios vectores de consulta con una sola petición `search_batch`.
+
+    Mismo contrato que `search_documents` para cada query (caché, backend
+    local, deadline, circuit breaker, hedging y respuesta degradada), pero las
+    queries no cacheadas viajan juntas: N queries cuestan un viaje de red.
+
+    Args:
+        vectors: Vectores de consulta.
+        top_k: Resultados por query (RAG_TOP_K si es None).
+        query_filters: Filtro por query (misma longitud que `vectors`) o None.
+
+    Returns:
+        Una lista de resultados {id, score, payload} por query, en el orden de
+        entrada. Una query con vector inválido devuelve [].
+    """
+    collection_name = getattr(settings, 'QDRANT_COLLECTION_NAME', 'default_collection')
+    limit = top_k if top_k is not None else getattr(settings, 'RAG_TOP_K', 3)
+    if query_filters is not None and len(query_filters) != len(vectors):
+        raise ValueError("query_filters debe tener un filtro (o None) por vector.")
+    filters = list(query_filters) if query_filters is not None else [None] * len(vectors)
+    results: List[List[Dict[str, Any]]] = [[] for _ in vectors]
+
+    expected_dim = effective_vector_dimension(settings) or None
+    queries: List[Tuple[int, np.ndarray]] = []
+    for i, vector in enumerate(vectors):
+        try:
+            queries.append((i, as_float32_vector(vector, expected_dim=expected_dim)))
+        except ValueError as e:
+            logger.error(f"Query {i} del lote con vector inválido: {e}")
+    if not queries:
+        return results
+
+    if _local_backend_enabled():
+        for i, query_vector in queries:
+            results[i] = await _search_local(query_vector, limit, filters[i])
+        return results
+
+    _maybe_check_alias()
+    pending: List[Tuple[int, np.ndarray, Any]] = []
+    for i, query_vector in queries:
+        cache_key = _search_cache.make_key(collection_name, limit, query_vector, filters[i]) if _search_cache.enabled else None
+        cached = _search_cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.append((i, query_vector, cache_key))
+    if not pending:
+        logger.debug(f"Lote de {len(queries)} búsquedas servido desde caché.")
+        return results
+
+    async def _degrade_all(reason: str) -> List[List[Dict[str, Any]]]:
+        for i, query_vector, cache_key in pending:
+            results[i] = await _degraded_search(query_vector, limit, filters[i], cache_key, reason)
+        return results
+
+    client = _get_qdrant_client()
+    if client is None:
+        logger.error("Intento de búsqueda en lote en Qdrant sin cliente inicializado.")
+        return results
+    timeout = resilience.call_timeout(_search_timeout())
+    if timeout <= 0:
+        _resilience_counters["deadline_exceeded"] += 1
+        return await _degrade_all("deadline del request agotado")
+    if not _breaker.allow():
+        return await _degrade_all("circuito abierto")
+
+    models = optional_import("qdrant_client.models")
+    with_payload = _with_payload_selector()
+    params = _search_params()
+    requests = [
+        models.SearchRequest(vector=query_vector, filter=filters[i], params=params, limit=limit, with_payload=with_payload)
+        for i, query_vector, _ in pending
+    ]
+    UnexpectedResponse = _unexpected_response_class()
+    try:
+        start = time.perf_counter()
+        batch_result = await asyncio.wait_for(
+            resilience.hedged(
+                lambda: client.search_batch(collection_name=collection_name, requests=requests, timeout=math.ceil(timeout)),
+                _hedge_delay(), on_hedge=_count_hedge,
+            ),
+            timeout=timeout,
+        )
+        _latency.record(time.perf_counter() - start)
+        _breaker.record_success()
+    except UnexpectedResponse as e:
+        _breaker.record_failure()
+        logger.error(f"Error de Qdrant en búsqueda en lote en '{collection_name}': Status={e.status_code}, "
+                     f"Contenido={_decode_qdrant_error_content(e.content)}")
+        return await _degrade_all(f"status {e.status_code}")
+    except asyncio.TimeoutError:
+        _record_timeout(timeout)
+        logger.error(f"Búsqueda en lote en Qdrant '{collection_name}' excedió {timeout:.3f}s.")
+        return await _degrade_all("timeout")
+    except Exception as e:
+        _breaker.record_failure()
+        logger.exception(f"Error inesperado en búsqueda en lote en Qdrant '{collection_name}': {e}")
+        return await _degrade_all("error")
+
+    per_query = [_points_to_results(points) for points in batch_result]
+    if _payload_mode() != "full":
+        # Una sola hidratación (y a lo sumo un retrieve) para todo el lote
+        flat = await _hydrate_payloads(client, collection_name, [r for query in per_query for r in query])
+        offset = 0
+        for n, query in enumerate(per_query):
+            per_query[n] = flat[offset:offset + len(query)]
+            offset += len(query)
+    for (i, _, cache_key), query_results in zip(pending, per_query):
+        results[i] = query_results
+        if cache_key is not None:
+            _search_cache.set(cache_key, query_results)
+    logger.info(f"Búsqueda en lote completada: {len(queries)} queries ({len(pending)} a Qdrant en 1 petición).")
+    return results
+
 # --- Bloque para pruebas rápidas (sin cambios funcionales) ---
 if __name__ == "__main__":
     # ... (código del bloque de prueba sin cambios)...
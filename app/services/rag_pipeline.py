@@ -12,7 +12,7 @@ import logging
 import re
 import time
 import asyncio
-from typing import Dict, Any, List, Optional, Tuple
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
 
 try:
     from app.core.config import settings
@@ -54,19 +54,21 @@ try:
         qdrant_service,
         llm_service,
         priority_context_service,
-        history_service
+        history_service,
+        hybrid_retrieval
     )
-    from langchain_core.messages import BaseMessage
+    # Los servicios cargan sus dependencias pesadas (torch, qdrant-client, openai,
+    # langchain-mongodb) bajo demanda; importar el pipeline no las arrastra.
     SERVICES_AVAILABLE = True
 except ImportError as e:
     print(f"[ERROR rag_pipeline.py] Fallo al importar servicios: {e}. Usando dummies.")
     SERVICES_AVAILABLE = False
 
     class DummyService:
-        async def embed_query(self, text: str) -> List[float]:
+        async def embed_query(self, text: str) -> Any:
             return [0.1] * settings.vector_dimension
 
-        async def search_documents(self, vector: List[float], top_k: int,
+        async def search_documents(self, vector: Any, top_k: int,
                                    query_filter: Optional[Any] = None) -> List[Dict]:
             return []
 
@@ -74,6 +76,15 @@ except ImportError as e:
                            max_tokens: int = 1500) -> Optional[str]:
             return "Respuesta dummy: LLM no implementado."
 
+        async def call_llm_completion(self, messages: List[Dict], temperature: float = 0.5,
+                                      max_tokens: int = 1500) -> Any:
+            from types import SimpleNamespace
+            return SimpleNamespace(text="Respuesta dummy: LLM no implementado.", finish_reason="stop", complete=True)
+
+        async def call_llm_stream(self, messages: List[Dict], temperature: float = 0.5,
+                                  max_tokens: int = 1500) -> AsyncIterator[str]:
+            yield "Respuesta dummy: LLM no implementado."
+
         async def find_priority_answer(self, query: str) -> Optional[str]:
             return None
 
@@ -83,15 +94,67 @@ except ImportError as e:
         async def add_chat_messages(self, session_id: str, human_msg: str, ai_msg: str) -> None:
             pass
 
+        def hybrid_enabled(self) -> bool:
+            return False
+
     embedding_service = DummyService()
     qdrant_service = DummyService()
     llm_service = DummyService()
     priority_context_service = DummyService()
     history_service = DummyService()
-    BaseMessage = Dict  # type: ignore
+    hybrid_retrieval = DummyService()
+
+from app.services import stream_postprocessor
+from app.services.stream_postprocessor import StreamingPostProcessor, is_forbidden_line
+from app.services.answer_cache import SemanticAnswerCache
+from app.services import response_cache
+from app.services.response_cache import ResponseCache
 
 logger = logging.getLogger(__name__)
 
+# Caché semántica de respuestas (ANSWER_CACHE_SIZE=0 la desactiva)
+_answer_cache = SemanticAnswerCache(
+    max_size=getattr(settings, 'ANSWER_CACHE_SIZE', 0),
+    ttl_seconds=getattr(settings, 'ANSWER_CACHE_TTL_SECONDS', 3600.0),
+    similarity_threshold=getattr(settings, 'ANSWER_CACHE_SIMILARITY_THRESHOLD', 0.95),
+)
+
+
+def get_answer_cache_stats() -> Dict[str, Any]:
+    """Métricas de la caché semántica de respuestas."""
+    return _answer_cache.get_stats()
+
+
+def clear_answer_cache() -> int:
+    """Vacía la caché semántica de respuestas. Devuelve las entradas eliminadas."""
+    return _answer_cache.clear()
+
+# Caché exacta de respuestas (RESPONSE_CACHE_SIZE=0 la desactiva)
+_response_cache = ResponseCache(
+    max_size=getattr(settings, 'RESPONSE_CACHE_SIZE', 0),
+    ttl_seconds=getattr(settings, 'RESPONSE_CACHE_TTL_SECONDS', 3600.0),
+    sqlite_path=getattr(settings, 'RESPONSE_CACHE_SQLITE_PATH', None),
+)
+
+
+def get_response_cache_stats() -> Dict[str, Any]:
+    """Métricas de la caché exacta de respuestas."""
+    return _response_cache.get_stats()
+
+
+def purge_response_cache() -> Dict[str, int]:
+    """Vacía la caché exacta de respuestas (memoria y disco)."""
+    return _response_cache.purge()
+
+
+def close_response_cache() -> None:
+    """Cierra el nivel en disco de la caché exacta (apagado de la API)."""
+    _response_cache.close()
+
+# Parámetros de generación (forman parte de la clave de la caché exacta)
+LLM_TEMPERATURE = 0.5
+LLM_MAX_TOKENS = 1500
+
 # Prompt del Sistema con Personalidad Mejorada y ajuste en EVITA
 RAG_SYSTEM_PROMPT_TEMPLATE = """
 Eres Kely, la asistente virtual de Computo Contable Soft. Tu misión es **ayudar a contadores, personal administrativo y usuarios con conocimientos tecnológicos básicos** a resolver dudas sobre los productos MiAdminXML y MiExpedienteContable.
@@ -228,18 +291,9 @@ def _remove_forbidden_phrases(text: str) -> str:
     """
     lines = text.splitlines()
     filtered_lines = []
-    phrases_to_avoid = [
-        "recurso que muestra",
-        "indica el total",
-        "icono en el escritorio",
-        "lo siento",
-        "lamentablemente",
-        "disculpa"
-    ]
     for line in lines:
-        lower_line = line.lower().strip()
         # Si alguna de las frases prohibidas aparece en esa línea, se descarta toda la línea:
-        if any(phrase in lower_line for phrase in phrases_to_avoid):
+        if is_forbidden_line(line):
             continue
         if line.strip():
             filtered_lines.append(line)
@@ -249,12 +303,15 @@ def _convert_md_asterisks_to_html(text: str) -> str:
     """
     Convierte patrones de Markdown básicos en etiquetas HTML simples,
     para que Telegram (parse_mode='HTML') los interprete como negritas/itálicas.
+    El cierre debe estar a EMPHASIS_MAX_CHARS caracteres como mucho (mismo
+    límite que StreamingPostProcessor); si no, el marcador queda literal.
     """
+    span = stream_postprocessor.EMPHASIS_MAX_CHARS
     # Doble asterisco (**Texto**) -> <b>Texto</b>
-    text = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', text, flags=re.DOTALL)
+    text = re.sub(rf'\*\*(.{{0,{span}}}?)\*\*', r'<b>\1</b>', text, flags=re.DOTALL)
 
     # Asterisco simple (*Texto*) -> <i>Texto</i>
-    text = re.sub(r'\*(.*?)\*', r'<i>\1</i>', text, flags=re.DOTALL)
+    text = re.sub(rf'\*(.{{0,{span}}}?)\*', r'<i>\1</i>', text, flags=re.DOTALL)
 
     return text
 
@@ -290,134 +347,200 @@ def _post_process_llm_answer(llm_answer: str) -> str:
 
 # --- Función Principal del Pipeline RAG ---
 
-async def generate_response(question: str, session_id: str) -> Dict[str, Any]:
-    """
-    Orquesta el pipeline RAG completo y aplica postprocesado a la respuesta.
-    """
-    if not SERVICES_AVAILABLE:
-        logger.critical("Servicios RAG no disponibles (importación falló).")
-        return {"answer": DEFAULT_ERROR_MESSAGE, "sources": []}
+async def _save_history(session_id: str, question: str, answer: str, stage: str) -> None:
+    """Guarda el par pregunta/respuesta en el historial (si MongoDB está configurado)."""
+    if not settings.MONGO_URI:
+        return
+    try:
+        await history_service.add_chat_messages(session_id, question, answer)
+        logger.debug(f"Historial guardado para session_id: {session_id}")
+    except Exception as e_hist_save:
+        logger.error(f"Error guardando en historial ({stage}) para session {session_id}: {e_hist_save}", exc_info=False)
 
-    logger.info(f"Pipeline RAG iniciado para session_id: {session_id}")
-    final_answer: str = DEFAULT_ERROR_MESSAGE
-    final_sources: List[SourceInfo] = []
 
-    try:
-        # 1. Contexto Prioritario
-        logger.debug("Buscando en contexto prioritario...")
-        priority_answer = await priority_context_service.find_priority_answer(question)
-        if priority_answer:
-            logger.info("Respuesta encontrada en contexto prioritario.")
-            clean_priority_answer = _post_process_llm_answer(priority_answer)
-            if settings.MONGO_URI:
-                try:
-                    await history_service.add_chat_messages(session_id, question, clean_priority_answer)
-                except Exception as e_hist_save:
-                    logger.error(
-                        f"Error guardando en historial (priority) para session {session_id}: {e_hist_save}",
-                        exc_info=False
-                    )
-            return {
-                "answer": clean_priority_answer,
-                "sources": (
-                    [SourceInfo(source_id="priority_context", score=1.0)]
-                    if SCHEMA_AVAILABLE
-                    else [{"source_id": "priority_context", "score": 1.0}]
-                )
-            }
-        logger.debug("No se encontró respuesta prioritaria.")
-
-        # 2. Historial
-        formatted_history = ""
-        if settings.MONGO_URI:
-            logger.debug("Recuperando historial de chat...")
-            try:
-                max_hist = getattr(settings, 'RAG_HISTORY_MESSAGES', 6)
-                history_messages = await history_service.get_chat_history(session_id, max_messages=max_hist)
-                formatted_history = _format_history_for_prompt(history_messages)
-            except Exception as e_hist:
-                logger.error(f"Error recuperando historial: {e_hist}", exc_info=False)
-        else:
-            logger.info("Historial MongoDB no configurado.")
+async def _prepare_llm_call(question: str, session_id: str) -> Dict[str, Any]:
+    """
+    Pasos 1-6 del pipeline (contexto prioritario, historial, recuperación y
+    armado del prompt).
+
+    Returns:
+        {"answer", "sources"} si la respuesta no necesita al LLM (contexto
+        prioritario, sin contexto o acierto de caché; el historial ya quedó
+        guardado), o {"messages", "sources", "cache_probe", "response_key"}
+        con el prompt listo para el LLM.
+    """
+    # 1. Contexto Prioritario
+    logger.debug("Buscando en contexto prioritario...")
+    priority_answer = await priority_context_service.find_priority_answer(question)
+    if priority_answer:
+        logger.info("Respuesta encontrada en contexto prioritario.")
+        clean_priority_answer = _post_process_llm_answer(priority_answer)
+        await _save_history(session_id, question, clean_priority_answer, "priority")
+        return {
+            "answer": clean_priority_answer,
+            "sources": (
+                [SourceInfo(source_id="priority_context", score=1.0)]
+                if SCHEMA_AVAILABLE
+                else [{"source_id": "priority_context", "score": 1.0}]
+            )
+        }
+    logger.debug("No se encontró respuesta prioritaria.")
 
+    # 2. Historial
+    formatted_history = ""
+    if settings.MONGO_URI:
+        logger.debug("Recuperando historial de chat...")
+        try:
+            max_hist = getattr(settings, 'RAG_HISTORY_MESSAGES', 6)
+            history_messages = await history_service.get_chat_history(session_id, max_messages=max_hist)
+            formatted_history = _format_history_for_prompt(history_messages)
+        except Exception as e_hist:
+            logger.error(f"Error recuperando historial: {e_hist}", exc_info=False)
+    else:
+        logger.info("Historial MongoDB no configurado.")
+
+    rag_top_k = getattr(settings, 'RAG_TOP_K', 3)
+    query_vector = None
+    if hybrid_retrieval.hybrid_enabled():
+        # 3-4. Recuperación híbrida: embedding + Qdrant y BM25 en paralelo, fusionados con RRF
+        search_results, _timings = await hybrid_retrieval.retrieve(question, top_k=rag_top_k)
+    else:
         # 3. Embedding
         logger.debug("Generando embedding para query...")
         query_vector = await embedding_service.embed_query(question)
         logger.debug("Embedding generado.")
 
         # 4. Búsqueda Qdrant
-        rag_top_k = getattr(settings, 'RAG_TOP_K', 3)
         logger.debug(f"Buscando en Qdrant (top_k={rag_top_k})...")
         search_results = await qdrant_service.search_documents(vector=query_vector, top_k=rag_top_k)
         logger.debug(f"Qdrant devolvió {len(search_results)} resultados.")
 
-        # 5. Formatear Contexto Qdrant
-        rag_max_tokens = getattr(settings, 'RAG_MAX_CONTEXT_TOKENS', 3000)
-        approx_prompt_overhead = (
-            len(RAG_SYSTEM_PROMPT_TEMPLATE)
-            + len(question)
-            + len(formatted_history)
-            + 500
-        )
-        max_context_len_chars = rag_max_tokens * 3
-        available_qdrant_context_len = max(0, max_context_len_chars - approx_prompt_overhead)
+    # 5. Formatear Contexto Qdrant
+    rag_max_tokens = getattr(settings, 'RAG_MAX_CONTEXT_TOKENS', 3000)
+    approx_prompt_overhead = (
+        len(RAG_SYSTEM_PROMPT_TEMPLATE)
+        + len(question)
+        + len(formatted_history)
+        + 500
+    )
+    max_context_len_chars = rag_max_tokens * 3
+    available_qdrant_context_len = max(0, max_context_len_chars - approx_prompt_overhead)
 
-        qdrant_context_str, sources_list = _format_context_from_qdrant(
-            search_results,
-            max_length=available_qdrant_context_len
-        )
-        final_sources = sources_list
-
-        # 6. Fallback si no hay contexto ni historial
-        if not qdrant_context_str and not formatted_history.strip():
-            logger.warning("Sin contexto Qdrant ni historial relevante. Usando NO_CONTEXT_ANSWER.")
-            final_answer = NO_CONTEXT_ANSWER
-            if settings.MONGO_URI:
-                try:
-                    await history_service.add_chat_messages(session_id, question, final_answer)
-                except Exception as e_hist_save_noctx:
-                    logger.error(
-                        f"Error guardando en historial (no_context) para session {session_id}: {e_hist_save_noctx}",
-                        exc_info=False
-                    )
-            return {"answer": final_answer, "sources": []}
+    qdrant_context_str, sources_list = _format_context_from_qdrant(
+        search_results,
+        max_length=available_qdrant_context_len
+    )
 
-        # 7. Llamada al LLM
-        logger.debug("Construyendo prompt y llamando al LLM generativo...")
-        final_llm_context = qdrant_context_str if qdrant_context_str else "No se encontró información específica en los documentos para esta pregunta."
-        history_section_for_prompt = (
-            formatted_history if formatted_history.strip()
-            else "# No hay historial relevante para esta conversación."
+    # 6. Fallback si no hay contexto ni historial
+    if not qdrant_context_str and not formatted_history.strip():
+        logger.warning("Sin contexto Qdrant ni historial relevante. Usando NO_CONTEXT_ANSWER.")
+        await _save_history(session_id, question, NO_CONTEXT_ANSWER, "no_context")
+        return {"answer": NO_CONTEXT_ANSWER, "sources": []}
+
+    source_ids = [s.source_id if hasattr(s, "source_id") else s["source_id"] for s in sources_list]
+
+    # 6b. Caché exacta: misma pregunta normalizada, fuentes, contexto, historial y configuración del LLM
+    response_key = None
+    if _response_cache.enabled:
+        response_key = response_cache.make_key(
+            question, source_ids, qdrant_context_str, formatted_history,
+            model=getattr(settings, 'DEEPSEEK_MODEL_NAME', ''), temperature=LLM_TEMPERATURE,
+            max_tokens=LLM_MAX_TOKENS, prompt_template=RAG_SYSTEM_PROMPT_TEMPLATE,
         )
+        cached_answer = await _response_cache.get(response_key)
+        if cached_answer is not None:
+            logger.info("Respuesta servida desde la caché exacta.")
+            await _save_history(session_id, question, cached_answer, "response_cache")
+            return {"answer": cached_answer, "sources": sources_list}
+
+    # 6c. Caché semántica: solo preguntas sin historial (la respuesta depende únicamente de pregunta y fuentes)
+    cache_probe = None
+    if _answer_cache.enabled and qdrant_context_str and not formatted_history.strip():
+        if query_vector is None: # Recuperación híbrida: el embedding sale de la caché de embeddings
+            query_vector = await embedding_service.embed_query(question)
+        version = qdrant_service.get_collection_version()
+        cached = _answer_cache.get(query_vector, source_ids, version)
+        if cached is not None:
+            logger.info(f"Respuesta servida desde la caché semántica (similitud {cached['similarity']:.3f}).")
+            await _save_history(session_id, question, cached["answer"], "answer_cache")
+            return {"answer": cached["answer"], "sources": sources_list}
+        cache_probe = (query_vector, source_ids, version)
+
+    logger.debug("Construyendo prompt para el LLM generativo...")
+    final_llm_context = qdrant_context_str if qdrant_context_str else "No se encontró información específica en los documentos para esta pregunta."
+    history_section_for_prompt = (
+        formatted_history if formatted_history.strip()
+        else "# No hay historial relevante para esta conversación."
+    )
 
-        system_prompt_content = RAG_SYSTEM_PROMPT_TEMPLATE.format(
-            history_section=history_section_for_prompt,
-            context=final_llm_context,
-            question=question
-        )
-        messages_for_llm = [{"role": "system", "content": system_prompt_content}]
+    system_prompt_content = RAG_SYSTEM_PROMPT_TEMPLATE.format(
+        history_section=history_section_for_prompt,
+        context=final_llm_context,
+        question=question
+    )
+    return {
+        "messages": [{"role": "system", "content": system_prompt_content}],
+        "sources": sources_list,
+        "cache_probe": cache_probe,
+        "response_key": response_key,
+    }
+
+
+async def _remember_answer(prepared: Dict[str, Any], answer: str, complete: bool = True) -> None:
+    """
+    Guarda en las cachés de respuestas una respuesta del LLM. Nunca guarda
+    mensajes de error ni respuestas incompletas (cortadas por max_tokens).
+    """
+    if not answer or answer == DEFAULT_ERROR_MESSAGE:
+        return
+    if not complete:
+        logger.warning("Respuesta del LLM incompleta: se sirve pero no se guarda en las cachés.")
+        return
+    if prepared.get("response_key") is not None:
+        await _response_cache.set(prepared["response_key"], answer)
+    probe = prepared.get("cache_probe")
+    if probe is not None:
+        query_vector, source_ids, version = probe
+        _answer_cache.set(query_vector, source_ids, answer, prepared["sources"], version)
+
+
+async def generate_response(question: str, session_id: str) -> Dict[str, Any]:
+    """
+    Orquesta el pipeline RAG completo y aplica postprocesado a la respuesta.
+    """
+    if not SERVICES_AVAILABLE:
+        logger.critical("Servicios RAG no disponibles (importación falló).")
+        return {"answer": DEFAULT_ERROR_MESSAGE, "sources": []}
+
+    logger.info(f"Pipeline RAG iniciado para session_id: {session_id}")
+    final_answer: str = DEFAULT_ERROR_MESSAGE
+    final_sources: List[SourceInfo] = []
+
+    try:
+        prepared = await _prepare_llm_call(question, session_id)
+        if "answer" in prepared:
+            return {"answer": prepared["answer"], "sources": prepared["sources"]}
+        final_sources = prepared["sources"]
 
-        llm_raw_answer = await llm_service.call_llm(messages=messages_for_llm)
+        # 7. Llamada al LLM
+        completion = await llm_service.call_llm_completion(
+            messages=prepared["messages"], temperature=LLM_TEMPERATURE, max_tokens=LLM_MAX_TOKENS
+        )
 
-        if not llm_raw_answer:
+        if not completion or not completion.text:
             logger.error("LLM devolvió respuesta vacía o None.")
             final_answer = DEFAULT_ERROR_MESSAGE
         else:
-            final_answer = _post_process_llm_answer(llm_raw_answer)
+            final_answer = _post_process_llm_answer(completion.text)
+            await _remember_answer(prepared, final_answer, complete=completion.complete)
             logger.info(f"Respuesta RAG generada y limpiada para session_id: {session_id}")
 
     except Exception as e:
         logger.exception(f"Error fatal en RAG pipeline para session {session_id}: {e}")
         final_answer = DEFAULT_ERROR_MESSAGE
-        final_sources = locals().get("final_sources", [])
 
     # 9. Guardar en historial
-    if settings.MONGO_URI:
-        try:
-            await history_service.add_chat_messages(session_id, question, final_answer)
-            logger.debug(f"Historial guardado para session_id: {session_id}")
-        except Exception as e_hist_save:
-            logger.error(f"Error guardando en historial para session {session_id} tras RAG: {e_hist_save}", exc_info=False)
+    await _save_history(session_id, question, final_answer, "rag")
 
     return {
         "answer": final_answer,
@@ -425,6 +548,103 @@ async def generate_response(question: str, session_id: str) -> Dict[str, Any]:
     }
 
 
+def _sources_as_dicts(sources: List[Any]) -> List[Dict[str, Any]]:
+    return [s.model_dump() if hasattr(s, "model_dump") else dict(s) for s in sources]
+
+
+async def generate_response_stream(question: str, session_id: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Variante en streaming de `generate_response`. Produce eventos:
+
+    - {"event": "sources", "sources": [...]}: en cuanto termina la recuperación.
+    - {"event": "delta", "text": ...}: fragmentos de HTML ya postprocesados
+      (StreamingPostProcessor), según llegan del LLM.
+    - {"event": "done", "answer": ..., "sources": [...]}: respuesta final; es la
+      concatenación de los `delta` y la que se guarda en el historial. Si el
+      LLM la cortó (finish_reason distinto de 'stop', p. ej. 'length') lleva
+      además "incomplete": True y "finish_reason", y no se guarda en las cachés.
+    - {"event": "error", "detail": ...}: el stream del LLM falló (API o
+      conexión) después de emitir fragmentos; no hay `done` y la respuesta
+      parcial no se guarda en el historial ni en las cachés.
+
+    Las respuestas que no pasan por el LLM (contexto prioritario, sin contexto,
+    error antes del primer fragmento) se emiten como un único `delta` seguido
+    de `done`. El historial se guarda después del último fragmento; si el
+    cliente corta el stream antes, no se guarda nada.
+    """
+    if not SERVICES_AVAILABLE:
+        logger.critical("Servicios RAG no disponibles (importación falló).")
+        yield {"event": "delta", "text": DEFAULT_ERROR_MESSAGE}
+        yield {"event": "done", "answer": DEFAULT_ERROR_MESSAGE, "sources": []}
+        return
+
+    logger.info(f"Pipeline RAG (stream) iniciado para session_id: {session_id}")
+    sources: List[Any] = []
+    try:
+        prepared = await _prepare_llm_call(question, session_id)
+    except Exception as e:
+        logger.exception(f"Error fatal en RAG pipeline (stream) para session {session_id}: {e}")
+        prepared = {"answer": None, "sources": []}
+
+    if "answer" in prepared:
+        answer = prepared["answer"]
+        if answer is None: # Error antes de llegar al LLM
+            answer = DEFAULT_ERROR_MESSAGE
+            await _save_history(session_id, question, answer, "rag")
+        sources = _sources_as_dicts(prepared["sources"])
+        yield {"event": "sources", "sources": sources}
+        yield {"event": "delta", "text": answer}
+        yield {"event": "done", "answer": answer, "sources": sources}
+        return
+
+    sources = _sources_as_dicts(prepared["sources"])
+    yield {"event": "sources", "sources": sources}
+
+    # 7. Llamada al LLM en streaming, postprocesando cada fragmento
+    processor = StreamingPostProcessor()
+    received = False
+    emitted = False
+    llm_stream = llm_service.call_llm_stream(
+        messages=prepared["messages"], temperature=LLM_TEMPERATURE, max_tokens=LLM_MAX_TOKENS
+    )
+    try:
+        async for delta in llm_stream:
+            received = received or bool(delta.strip())
+            fragment = processor.feed(delta)
+            if fragment:
+                emitted = True
+                yield {"event": "delta", "text": fragment}
+        fragment = processor.finish()
+    except Exception as e: # LLMStreamError: fallo de la API o de la conexión a mitad del stream
+        logger.error(f"Stream del LLM interrumpido para session {session_id}: {e}")
+        if emitted:
+            # El cliente ya recibió parte de la respuesta: se avisa del corte y no se guarda ni se cachea nada
+            yield {"event": "error", "detail": "La respuesta se interrumpió antes de completarse."}
+            return
+        received, fragment = False, "" # Nada mostrado aún: se responde con el mensaje de error
+    if fragment:
+        yield {"event": "delta", "text": fragment}
+
+    # Iteradores sin finish_reason (dummies) se consideran completos
+    finish_reason = getattr(llm_stream, "finish_reason", "stop")
+    done: Dict[str, Any] = {}
+    if not received:
+        logger.error("LLM (stream) no devolvió contenido.")
+        final_answer = DEFAULT_ERROR_MESSAGE
+        yield {"event": "delta", "text": final_answer}
+    else:
+        # Una respuesta cortada (p. ej. 'length') se entrega y se guarda en el historial, pero no se cachea
+        final_answer = processor.text
+        await _remember_answer(prepared, final_answer, complete=finish_reason == "stop")
+        if finish_reason != "stop":
+            done = {"incomplete": True, "finish_reason": finish_reason}
+        logger.info(f"Respuesta RAG (stream) generada y limpiada para session_id: {session_id}")
+
+    # 9. Guardar en historial, una vez completado el stream
+    await _save_history(session_id, question, final_answer, "rag")
+    yield {"event": "done", "answer": final_answer, "sources": sources, **done}
+
+
 # --- Bloque de pruebas rápidas ---
 if __name__ == "__main__":
     import asyncio
@@ -0,0 +1,222 @@
+# app/services/resilience.py
+# -*- coding: utf-8 -*-
+
+"""
+Utilidades de resiliencia para llamadas a servicios externos:
+
+- Deadline por request (contextvar): el endpoint fija el presupuesto total y
+  cada llamada usa como timeout lo que queda de él.
+- LatencyTracker: ventana móvil de latencias para estimar p50/p95.
+- hedged(): lanza una segunda petición idéntica si la primera no respondió
+  tras un retardo, y se queda con la primera respuesta correcta.
+- CircuitBreaker: tras N fallos seguidos deja de llamar al servicio durante
+  un enfriamiento y después permite una sola petición de prueba.
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterator, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# --- Deadline por Request ---
+
+# Instante (time.monotonic) en que vence el request actual; None sin deadline
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def request_deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Fija el deadline del request para el bloque (y las tareas que cree).
+    Un deadline externo más cercano se respeta. `seconds` None o <= 0 no añade límite.
+    """
+    current = _deadline.get()
+    deadline = time.monotonic() + seconds if seconds and seconds > 0 else None
+    if current is not None and (deadline is None or current < deadline):
+        deadline = current
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_budget() -> Optional[float]:
+    """Segundos que le quedan al request actual (puede ser <= 0), o None sin deadline."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def call_timeout(default: float) -> float:
+    """Timeout de una llamada: `default` acotado por el presupuesto restante del request."""
+    remaining = remaining_budget()
+    return default if remaining is None else min(default, remaining)
+
+
+# --- Latencias ---
+
+class LatencyTracker:
+    """
+    Ventana móvil de latencias (segundos) con percentiles.
+
+    Args:
+        window: Número de muestras recientes que se conservan.
+        min_samples: Muestras necesarias antes de reportar percentiles.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self._samples: Deque[float] = deque(maxlen=max(1, int(window)))
+        self._min_samples = max(1, int(min_samples))
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(float(seconds))
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Percentil `q` (0-100) de la ventana, o None con pocas muestras."""
+        with self._lock:
+            if len(self._samples) < self._min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(q / 100.0 * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+# --- Peticiones con Cobertura (hedging) ---
+
+async def hedged(
+    factory: Callable[[], Awaitable[T]],
+    delay: Optional[float],
+    on_hedge: Optional[Callable[[], None]] = None,
+) -> T:
+    """
+    Ejecuta `factory()`; si no terminó tras `delay` segundos, lanza una segunda
+    llamada y devuelve la primera que termine bien (la otra se cancela). Si
+    ambas fallan se propaga el último error. `delay` None desactiva la cobertura.
+    """
+    first = asyncio.ensure_future(factory())
+    if delay is None:
+        return await first
+    tasks = {first}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=max(0.0, delay))
+        if done:
+            return first.result()
+        if on_hedge is not None:
+            on_hedge()
+        tasks.add(asyncio.ensure_future(factory()))
+        error: Optional[BaseException] = None
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error # type: ignore[misc]
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+# --- Circuit Breaker ---
+
+class CircuitBreaker:
+    """
+    Circuit breaker de tres estados: `closed` (llamadas normales), `open`
+    (se rechazan durante `cooldown_seconds`) y `half_open` (una llamada de
+    prueba; si va bien se cierra, si falla se vuelve a abrir).
+
+    Args:
+        name: Nombre para logs y métricas.
+        failure_threshold: Fallos consecutivos que abren el circuito (<= 0 lo desactiva).
+        cooldown_seconds: Tiempo abierto antes de probar de nuevo.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, cooldown_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self._threshold = int(failure_threshold)
+        self._cooldown = float(cooldown_seconds)
+        self._clock = clock
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.opened = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._threshold > 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and self._clock() - self._opened_at >= self._cooldown:
+                return "half_open"
+            return self._state
+
+    def allow(self) -> bool:
+        """True si se puede llamar al servicio ahora."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open" and self._clock() - self._opened_at >= self._cooldown:
+                self._state = "half_open"
+                self._probe_in_flight = False
+            # Una sola prueba a la vez; si la prueba nunca informó (p. ej. cancelada), se permite otra tras el enfriamiento
+            if self._state == "half_open" and (not self._probe_in_flight or self._clock() - self._probe_started >= self._cooldown):
+                self._probe_in_flight = True
+                self._probe_started = self._clock()
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != "closed":
+                logger.info(f"Circuito '{self.name}' cerrado: el servicio respondió de nuevo.")
+            self._state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self._threshold:
+                if self._state != "open":
+                    self.opened += 1
+                    logger.warning(f"Circuito '{self.name}' abierto tras {self._failures} fallos; "
+                                   f"se omite el servicio durante {self._cooldown:.0f}s.")
+                self._state = "open"
+                self._opened_at = self._clock()
+                self._probe_in_flight = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "failure_threshold": self._threshold,
+            "cooldown_seconds": self._cooldown,
+        }
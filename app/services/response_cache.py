@@ -0,0 +1,266 @@
+# app/services/response_cache.py
+# -*- coding: utf-8 -*-
+
+"""
+Caché exacta de respuestas del LLM.
+
+Dos peticiones con la misma pregunta normalizada, las mismas fuentes (en el
+mismo orden y con el mismo texto), el mismo historial y la misma
+configuración del LLM producen el mismo prompt: la respuesta guardada se
+reutiliza sin llamar al LLM. La clave es un hash de todas esas partes
+(`make_key`), así que cualquier cambio en el contexto recuperado, el
+historial, el modelo, la temperatura o la plantilla del prompt da otra clave.
+
+Nivel en memoria (LRU+TTL) y nivel opcional en disco (SQLite) que sobrevive a
+reinicios y se comparte entre workers de la misma máquina. Un acierto en disco
+se promueve a memoria conservando su hora de expiración.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence
+
+from app.services.embedding_cache import normalize_query
+from app.services.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Cada cuántas escrituras se borran del disco las entradas expiradas
+_DISK_PRUNE_EVERY = 256
+
+
+def fingerprint(text: str) -> str:
+    """Hash corto y estable de un texto (contexto, historial, plantilla)."""
+    return hashlib.blake2b((text or "").encode("utf-8"), digest_size=16).hexdigest()
+
+
+def make_key(
+    question: str,
+    source_ids: Sequence[str],
+    context: str,
+    history: str,
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    prompt_template: str,
+) -> str:
+    """
+    Clave de caché de una llamada al LLM. La pregunta se normaliza
+    (`embedding_cache.normalize_query`); el resto entra tal cual o como
+    fingerprint. Las partes se serializan en JSON para que no se puedan
+    confundir sus límites.
+    """
+    parts = [
+        normalize_query(question),
+        list(source_ids),
+        fingerprint(context),
+        fingerprint(history),
+        model,
+        float(temperature),
+        int(max_tokens),
+        fingerprint(prompt_template),
+    ]
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Caché de respuestas por clave exacta, con nivel en memoria y nivel
+    opcional en SQLite.
+
+    Args:
+        max_size: Entradas en memoria (0 desactiva la caché completa).
+        ttl_seconds: Vida de cada respuesta en ambos niveles (0 sin expiración).
+        sqlite_path: Archivo SQLite del nivel en disco (None lo desactiva).
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, sqlite_path: Optional[Path] = None,
+                 clock: Callable[[], float] = time.time):
+        self._ttl = float(ttl_seconds)
+        self._clock = clock
+        # La expiración la decide `expires_at` (reloj de pared, común a ambos niveles)
+        self._memory = TTLCache(max_size=max_size, ttl_seconds=0)
+        self._sqlite_path = Path(sqlite_path) if sqlite_path else None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disk_failed = False
+        self._disk_lock = threading.Lock()
+        self._writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.disk_errors = 0
+        self.purges = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._memory.enabled
+
+    @property
+    def disk_enabled(self) -> bool:
+        return self.enabled and self._sqlite_path is not None and not self._disk_failed
+
+    def _expires_at(self) -> Optional[float]:
+        return self._clock() + self._ttl if self._ttl > 0 else None
+
+    def _alive(self, expires_at: Optional[float]) -> bool:
+        return expires_at is None or self._clock() <= expires_at
+
+    # --- Nivel en disco (bloqueante; se llama desde hilos) ---
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._conn is None and not self._disk_failed and self._sqlite_path is not None:
+            try:
+                self._sqlite_path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(self._sqlite_path), timeout=5.0, check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, answer TEXT NOT NULL, expires_at REAL)"
+                )
+                conn.commit()
+                self._conn = conn
+                logger.info(f"Nivel en disco de la caché de respuestas: {self._sqlite_path}")
+            except (sqlite3.Error, OSError) as e:
+                self._disk_error(e)
+        return self._conn
+
+    def _disk_error(self, error: Exception) -> None:
+        self.disk_errors += 1
+        self._disk_failed = True
+        logger.error(f"Caché de respuestas en disco desactivada ({self._sqlite_path}): {error}")
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+            self._conn = None
+
+    def _disk_get(self, key: str) -> Optional[tuple]:
+        with self._disk_lock:
+            conn = self._connection()
+            if conn is None:
+                return None
+            try:
+                return conn.execute("SELECT answer, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                self._disk_error(e)
+                return None
+
+    def _disk_set(self, key: str, answer: str, expires_at: Optional[float]) -> None:
+        with self._disk_lock:
+            conn = self._connection()
+            if conn is None:
+                return
+            try:
+                conn.execute("INSERT OR REPLACE INTO responses (key, answer, expires_at) VALUES (?, ?, ?)",
+                             (key, answer, expires_at))
+                self._writes += 1
+                if self._writes % _DISK_PRUNE_EVERY == 0:
+                    conn.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at < ?", (self._clock(),))
+                conn.commit()
+            except sqlite3.Error as e:
+                self._disk_error(e)
+
+    def _disk_purge(self) -> int:
+        with self._disk_lock:
+            conn = self._connection()
+            if conn is None:
+                return 0
+            try:
+                removed = conn.execute("DELETE FROM responses").rowcount
+                conn.commit()
+                return max(0, removed)
+            except sqlite3.Error as e:
+                self._disk_error(e)
+                return 0
+
+    def _disk_size(self) -> Optional[int]:
+        with self._disk_lock:
+            if self._conn is None:
+                return None
+            try:
+                return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            except sqlite3.Error:
+                return None
+
+    # --- API ---
+
+    async def get(self, key: str) -> Optional[str]:
+        """Respuesta cacheada para la clave (memoria y después disco) o None."""
+        if not self.enabled:
+            return None
+        entry = self._memory.peek(key)
+        if entry is not None:
+            answer, expires_at = entry
+            if self._alive(expires_at):
+                self._memory.get(key) # Marca la entrada como reciente
+                self.memory_hits += 1
+                return answer
+            self._memory.invalidate(key)
+            self.expirations += 1
+        if self.disk_enabled:
+            row = await asyncio.to_thread(self._disk_get, key)
+            if row is not None:
+                answer, expires_at = row
+                if self._alive(expires_at):
+                    self._memory.set(key, (answer, expires_at))
+                    self.disk_hits += 1
+                    return answer
+                self.expirations += 1
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, answer: str) -> None:
+        """Guarda la respuesta en memoria y, si está configurado, en disco."""
+        if not self.enabled or not answer:
+            return
+        expires_at = self._expires_at()
+        self._memory.set(key, (answer, expires_at))
+        if self.disk_enabled:
+            await asyncio.to_thread(self._disk_set, key, answer, expires_at)
+
+    def purge(self) -> Dict[str, int]:
+        """Vacía ambos niveles. Devuelve las entradas eliminadas de cada uno."""
+        removed = {"memory": self._memory.clear(), "disk": self._disk_purge() if self.disk_enabled else 0}
+        self.purges += 1
+        logger.info(f"Caché de respuestas purgada: {removed['memory']} en memoria, {removed['disk']} en disco.")
+        return removed
+
+    def close(self) -> None:
+        """Cierra la conexión SQLite (si está abierta)."""
+        with self._disk_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __len__(self) -> int:
+        return len(self._memory)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métricas de uso de la caché."""
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "size": len(self._memory),
+            "max_size": self._memory.max_size,
+            "ttl_seconds": self._ttl,
+            "disk_path": str(self._sqlite_path) if self._sqlite_path else None,
+            "disk_enabled": self.disk_enabled,
+            "disk_size": self._disk_size(),
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (hits / lookups) if lookups else 0.0,
+            "evictions": self._memory.evictions,
+            "expirations": self.expirations,
+            "disk_errors": self.disk_errors,
+            "purges": self.purges,
+        }
@@ -0,0 +1,107 @@
+# app/services/search_cache.py
+# -*- coding: utf-8 -*-
+
+"""
+Caché de resultados de búsqueda vectorial (Qdrant).
+
+La clave combina la colección, el límite, una huella del filtro y una huella
+del vector de consulta cuantizado: cada componente se redondea a múltiplos de
+`quantization_step`, de modo que vectores idénticos o casi idénticos (p. ej.
+la misma pregunta con otra puntuación, o diferencias de redondeo float32)
+comparten entrada. Los valores son las listas de dicts {id, score, payload}
+que devuelve `search_documents`.
+
+`invalidate(collection)` descarta de inmediato todas las entradas de una
+colección (p. ej. tras reindexarla) subiendo su generación, que forma parte
+de la clave.
+"""
+
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def vector_fingerprint(vector: np.ndarray, quantization_step: float) -> bytes:
+    """Huella de 16 bytes del vector cuantizado a múltiplos de `quantization_step`."""
+    quantized = np.rint(np.asarray(vector, dtype=np.float64) / quantization_step).astype(np.int64)
+    return hashlib.blake2b(quantized.tobytes(), digest_size=16).digest()
+
+
+def filter_fingerprint(query_filter: Any) -> str:
+    """Huella estable de un filtro de Qdrant (modelo pydantic o dict); '' sin filtro."""
+    if query_filter is None:
+        return ""
+    if hasattr(query_filter, "model_dump"):
+        query_filter = query_filter.model_dump(mode="json", exclude_none=True)
+    canonical = json.dumps(query_filter, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class SearchResultCache:
+    """
+    Caché LRU+TTL de resultados de búsqueda con invalidación por colección.
+
+    Args:
+        max_size: Entradas máximas (0 desactiva).
+        ttl_seconds: Vida de cada entrada (0 sin expiración).
+        quantization_step: Resolución de la cuantización del vector de consulta.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, quantization_step: float = 1e-3):
+        if quantization_step <= 0:
+            raise ValueError("quantization_step debe ser > 0.")
+        self._cache = TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+        self._quantization_step = float(quantization_step)
+        self._generations: Dict[str, int] = {}
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._cache.enabled
+
+    def make_key(self, collection_name: str, limit: int, vector: np.ndarray, query_filter: Any = None) -> Tuple[Hashable, ...]:
+        return (
+            collection_name,
+            self._generations.get(collection_name, 0),
+            int(limit),
+            filter_fingerprint(query_filter),
+            vector_fingerprint(vector, self._quantization_step),
+        )
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[List[Dict[str, Any]]]:
+        """Copia de los resultados cacheados para la clave, o None."""
+        results = self._cache.get(key, keep_expired=True) # Las expiradas quedan para get_stale()
+        return [dict(r) for r in results] if results is not None else None
+
+    def get_stale(self, key: Tuple[Hashable, ...]) -> Optional[List[Dict[str, Any]]]:
+        """Como get() pero ignorando el TTL; para respuestas degradadas cuando Qdrant no responde."""
+        results = self._cache.peek(key)
+        return [dict(r) for r in results] if results is not None else None
+
+    def set(self, key: Tuple[Hashable, ...], results: List[Dict[str, Any]]) -> None:
+        if self._cache.enabled:
+            self._cache.set(key, [dict(r) for r in results])
+
+    def invalidate(self, collection_name: Optional[str] = None) -> int:
+        """
+        Invalida las entradas de una colección (o todas con None).
+        Devuelve el número de entradas eliminadas (0 si solo se cambió la generación).
+        """
+        self.invalidations += 1
+        if collection_name is None:
+            removed = self._cache.clear()
+            logger.info(f"Caché de búsquedas vaciada ({removed} entradas).")
+            return removed
+        self._generations[collection_name] = self._generations.get(collection_name, 0) + 1
+        logger.info(f"Caché de búsquedas invalidada para la colección '{collection_name}'.")
+        return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._cache.get_stats(), "invalidations": self.invalidations, "quantization_step": self._quantization_step}
@@ -0,0 +1,215 @@
+# app/services/search_tuning.py
+# -*- coding: utf-8 -*-
+
+"""
+Ajuste de los parámetros de búsqueda de Qdrant (hnsw_ef, búsqueda exacta,
+re-puntuado/oversampling de cuantización y RAG_TOP_K).
+
+Para un conjunto fijo de vectores de consulta se calcula la verdad de
+referencia con búsqueda exacta y, para cada combinación de parámetros, el
+recall@k contra ella junto con la latencia p50/p99. `choose_best` elige la
+combinación más rápida que alcanza el recall mínimo y `settings_for` la
+traduce a las variables que lee `qdrant_service.search_documents`.
+
+Lo usa scripts/tune_search_params.py.
+"""
+
+import itertools
+import logging
+import math
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.lazy_imports import optional_import
+
+logger = logging.getLogger(__name__)
+
+# --- Métricas ---
+
+def recall_at_k(truth: Sequence[Any], found: Sequence[Any], k: int) -> float:
+    """Fracción de los k ids de referencia que aparecen en los k primeros encontrados."""
+    expected = set(list(truth)[:k])
+    if not expected:
+        return 1.0
+    return len(expected & set(list(found)[:k])) / len(expected)
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Percentil por rango más cercano (0.0 sin muestras)."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+# --- Combinaciones de Parámetros ---
+
+def parameter_grid(
+    top_ks: Iterable[int],
+    hnsw_efs: Iterable[Optional[int]] = (None,),
+    oversamplings: Iterable[Optional[float]] = (None,),
+    rescores: Iterable[Optional[bool]] = (None,),
+    include_exact: bool = True,
+) -> List[Dict[str, Any]]:
+    """
+    Combinaciones {top_k, hnsw_ef, exact, rescore, oversampling} a medir.
+    `None` significa default del servidor; con `include_exact` se añade la
+    búsqueda exacta de cada top_k como línea base.
+    """
+    grid: List[Dict[str, Any]] = []
+    for top_k in top_ks:
+        if include_exact:
+            grid.append({"top_k": top_k, "hnsw_ef": None, "exact": True, "rescore": None, "oversampling": None})
+        for hnsw_ef, oversampling, rescore in itertools.product(hnsw_efs, oversamplings, rescores):
+            grid.append({"top_k": top_k, "hnsw_ef": hnsw_ef, "exact": False, "rescore": rescore, "oversampling": oversampling})
+    unique: List[Dict[str, Any]] = []
+    for config in grid:
+        if config not in unique:
+            unique.append(config)
+    return unique
+
+
+def to_search_params(config: Dict[str, Any]) -> Optional[Any]:
+    """models.SearchParams de una combinación (None si todo queda en el default del servidor)."""
+    if config.get("hnsw_ef") is None and not config.get("exact") and config.get("rescore") is None and config.get("oversampling") is None:
+        return None
+    models = optional_import("qdrant_client.models")
+    quantization = None
+    if config.get("rescore") is not None or config.get("oversampling") is not None:
+        quantization = models.QuantizationSearchParams(rescore=config.get("rescore"), oversampling=config.get("oversampling"))
+    return models.SearchParams(hnsw_ef=config.get("hnsw_ef"), exact=bool(config.get("exact")), quantization=quantization)
+
+
+def describe(config: Dict[str, Any]) -> str:
+    """Etiqueta corta para la tabla de resultados."""
+    if config.get("exact"):
+        return "exact"
+    parts = [f"ef={config['hnsw_ef']}" if config.get("hnsw_ef") is not None else "ef=default"]
+    if config.get("oversampling") is not None:
+        parts.append(f"os={config['oversampling']:g}")
+    if config.get("rescore") is not None:
+        parts.append("rescore" if config["rescore"] else "no-rescore")
+    return " ".join(parts)
+
+
+# --- Medición ---
+
+async def ground_truth(client: Any, collection_name: str, vectors: np.ndarray, limit: int) -> List[List[Any]]:
+    """Ids de referencia por query con búsqueda exacta (sin HNSW ni cuantización)."""
+    models = optional_import("qdrant_client.models")
+    exact = models.SearchParams(exact=True)
+    truth = []
+    for vector in vectors:
+        points = await client.search(collection_name=collection_name, query_vector=vector, limit=limit,
+                                     search_params=exact, with_payload=False)
+        truth.append([point.id for point in points])
+    return truth
+
+
+async def evaluate(
+    client: Any,
+    collection_name: str,
+    vectors: np.ndarray,
+    truth: List[List[Any]],
+    config: Dict[str, Any],
+    repeats: int = 1,
+) -> Dict[str, Any]:
+    """Recall@k medio y latencias (ms) de una combinación sobre todas las queries."""
+    params = to_search_params(config)
+    top_k = int(config["top_k"])
+    latencies: List[float] = []
+    recalls: List[float] = []
+    await client.search(collection_name=collection_name, query_vector=vectors[0], limit=top_k,
+                        search_params=params, with_payload=False) # Calentamiento
+    for vector, expected in zip(vectors, truth):
+        for attempt in range(max(1, repeats)):
+            start = time.perf_counter()
+            points = await client.search(collection_name=collection_name, query_vector=vector, limit=top_k,
+                                         search_params=params, with_payload=False)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+            if attempt == 0:
+                recalls.append(recall_at_k(expected, [point.id for point in points], top_k))
+    return {
+        **config,
+        "recall": float(np.mean(recalls)) if recalls else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+async def sweep(
+    client: Any,
+    collection_name: str,
+    vectors: np.ndarray,
+    grid: List[Dict[str, Any]],
+    repeats: int = 1,
+) -> List[Dict[str, Any]]:
+    """Mide todas las combinaciones de `grid` contra la misma verdad de referencia."""
+    if len(vectors) == 0 or not grid:
+        return []
+    truth = await ground_truth(client, collection_name, vectors, max(int(c["top_k"]) for c in grid))
+    results = []
+    for config in grid:
+        result = await evaluate(client, collection_name, vectors, truth, config, repeats=repeats)
+        logger.info(f"top_k={config['top_k']} {describe(config)}: recall={result['recall']:.3f} "
+                    f"p50={result['p50_ms']:.2f}ms p99={result['p99_ms']:.2f}ms")
+        results.append(result)
+    return results
+
+
+# --- Elección y Configuración ---
+
+def choose_best(results: List[Dict[str, Any]], min_recall: float, top_k: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """
+    Combinación con menor p99 (después p50) cuyo recall alcanza `min_recall`,
+    restringida a `top_k` si se indica. None si ninguna lo alcanza.
+    """
+    candidates = [r for r in results if r["recall"] >= min_recall and (top_k is None or r["top_k"] == top_k)]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda r: (r["p99_ms"], r["p50_ms"]))
+
+
+def settings_for(config: Dict[str, Any]) -> Dict[str, str]:
+    """Variables de entorno que aplican la combinación en search_documents ('' = default del servidor)."""
+    def fmt(value: Any) -> str:
+        if value is None:
+            return ""
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        return f"{value:g}" if isinstance(value, float) else str(value)
+
+    return {
+        "RAG_TOP_K": fmt(int(config["top_k"])),
+        "QDRANT_HNSW_EF": fmt(config.get("hnsw_ef")),
+        "QDRANT_EXACT_SEARCH": fmt(bool(config.get("exact"))),
+        "QDRANT_QUANTIZATION_RESCORE": fmt(config.get("rescore")),
+        "QDRANT_QUANTIZATION_OVERSAMPLING": fmt(config.get("oversampling")),
+    }
+
+
+def write_env(path: Path, values: Dict[str, str]) -> None:
+    """
+    Escribe `values` en un archivo .env: reemplaza las líneas `CLAVE=...`
+    existentes (no las comentadas) y añade al final las que falten. Un valor
+    vacío elimina la línea para que rija el default de la configuración.
+    """
+    path = Path(path)
+    lines = path.read_text(encoding="utf-8").splitlines() if path.exists() else []
+    pending = dict(values)
+    output: List[str] = []
+    for line in lines:
+        match = re.match(r"\s*([A-Z0-9_]+)\s*=", line)
+        if match and match.group(1) in pending:
+            value = pending.pop(match.group(1))
+            if value != "":
+                output.append(f"{match.group(1)}={value}")
+            continue
+        output.append(line)
+    output.extend(f"{key}={value}" for key, value in pending.items() if value != "")
+    path.write_text("\n".join(output) + "\n", encoding="utf-8")
@@ -0,0 +1,102 @@
+# app/services/single_flight.py
+# -*- coding: utf-8 -*-
+
+"""
+De-duplicación "single-flight" de trabajo en curso.
+
+Cuando varias corrutinas piden a la vez el mismo resultado (misma clave),
+solo la primera lanza el trabajo; las demás esperan la misma tarea y reciben
+el mismo resultado o la misma excepción. No es una caché: la clave se olvida
+en cuanto el trabajo termina, así que la siguiente petición vuelve a
+ejecutarlo (o lo sirve la caché del servicio).
+
+El trabajo corre en una tarea propia (con el contexto de quien lo lanzó,
+incluido su deadline de `resilience.request_deadline`): las llamadas que se
+unen heredan ese deadline aunque el suyo sea más largo. Si quien espera se
+cancela, la tarea sigue para los demás; solo se cancela cuando ya no queda
+nadie esperándola.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Grupos creados en el proceso, por nombre (para métricas)
+_groups: Dict[str, "SingleFlight"] = {}
+
+
+class SingleFlight:
+    """
+    Grupo de llamadas de-duplicadas por clave.
+
+    Args:
+        name: Nombre del grupo en las métricas (p. ej. "embed_query").
+        enabled: Con False, `do` ejecuta siempre el trabajo (sin compartir).
+    """
+
+    def __init__(self, name: str, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self._calls: Dict[Hashable, Dict[str, Any]] = {} # clave -> {"task", "waiters"}
+        self.executions = 0
+        self.shared = 0
+        _groups[name] = self
+
+    def _forget(self, key: Hashable, call: Dict[str, Any]) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        task = call["task"]
+        if not task.cancelled():
+            task.exception() # Marca la excepción como recuperada aunque nadie quede esperando
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Devuelve el resultado de `fn()`. Si ya hay una llamada en curso con la
+        misma clave, espera esa en lugar de lanzar otra.
+        """
+        if not self.enabled:
+            return await fn()
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.ensure_future(fn())
+            call = {"task": task, "waiters": 0}
+            self._calls[key] = call
+            task.add_done_callback(lambda _task, key=key, call=call: self._forget(key, call))
+            self.executions += 1
+        else:
+            self.shared += 1
+            logger.debug(f"Single-flight '{self.name}': uniendo llamada en curso.")
+        call["waiters"] += 1
+        try:
+            return await asyncio.shield(call["task"])
+        except asyncio.CancelledError:
+            if call["waiters"] == 1 and not call["task"].done():
+                call["task"].cancel() # Nadie más la espera; una llamada nueva lanzará otra
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            raise
+        finally:
+            call["waiters"] -= 1
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métricas del grupo."""
+        calls = self.executions + self.shared
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._calls),
+            "executions": self.executions,
+            "shared": self.shared,
+            "shared_rate": (self.shared / calls) if calls else 0.0,
+        }
+
+
+def get_single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    """Métricas de todos los grupos single-flight del proceso, por nombre."""
+    return {name: group.get_stats() for name, group in _groups.items()}
@@ -0,0 +1,285 @@
+# app/services/stream_postprocessor.py
+# -*- coding: utf-8 -*-
+
+"""
+Postprocesado incremental de la respuesta del LLM (Markdown -> HTML de
+Telegram) para el chat en streaming.
+
+`StreamingPostProcessor` consume los fragmentos del LLM según llegan y emite
+fragmentos de HTML. Hace lo mismo que `rag_pipeline._post_process_llm_answer`
+sobre el texto completo, en una sola pasada y por etapas:
+
+1. Líneas: cada línea se descarta (frases prohibidas o vacía) o se emite en
+   cuanto termina.
+2. `**texto**` -> `<b>texto</b>` y después `*texto*` -> `<i>texto</i>`. Tras
+   un marcador de apertura se retienen como mucho EMPHASIS_MAX_CHARS
+   caracteres; si el cierre no aparece en ese tramo el marcador queda literal
+   (la versión por lotes aplica el mismo límite).
+3. Encabezados (`#`, `##`...) al inicio de línea.
+4. Saltos de línea excesivos y espacios al inicio/final.
+
+La concatenación de lo emitido es idéntica a la salida por lotes para el mismo
+texto final, y nunca se emite un fragmento con una etiqueta <b>/<i> abierta
+por el propio postprocesado (las etiquetas literales del LLM no retienen nada).
+"""
+
+import re
+from typing import Iterable, List, Optional, Tuple
+
+# Líneas que se eliminan completas si contienen alguna de estas frases (en minúsculas)
+FORBIDDEN_PHRASES: Tuple[str, ...] = (
+    "recurso que muestra",
+    "indica el total",
+    "icono en el escritorio",
+    "lo siento",
+    "lamentablemente",
+    "disculpa",
+)
+
+# Distancia máxima (caracteres) entre un marcador ** / * y su cierre
+EMPHASIS_MAX_CHARS = 300
+
+# Las etapas de énfasis escriben <b>/<i> con no-caracteres Unicode en lugar de
+# '<' y '>' (misma longitud, así EMPHASIS_MAX_CHARS cuenta igual que por lotes);
+# _TagGate las traduce al emitir. Así solo retienen la salida las etiquetas
+# abiertas por el postprocesado, no las etiquetas literales del LLM.
+_LT, _GT = "\ufdd0", "\ufdd1"
+_B_OPEN, _B_CLOSE, _I_OPEN, _I_CLOSE = (f"{_LT}{tag}{_GT}" for tag in ("b", "/b", "i", "/i"))
+_SENTINEL_RE = re.compile(f"{_LT}(/?)[bi]{_GT}")
+
+
+def is_forbidden_line(line: str, phrases: Iterable[str] = FORBIDDEN_PHRASES) -> bool:
+    """True si la línea contiene alguna frase prohibida."""
+    lower_line = line.lower().strip()
+    return any(phrase in lower_line for phrase in phrases)
+
+
+# --- Etapas ---
+
+class _LineFilter:
+    """Emite las líneas completas que no están vacías ni contienen frases prohibidas, unidas por '\\n'."""
+
+    def __init__(self, phrases: Tuple[str, ...]):
+        self._phrases = phrases
+        self._buffer = ""
+        self._first = True
+
+    def _emit(self, line: str) -> str:
+        if not line.strip() or is_forbidden_line(line, self._phrases):
+            return ""
+        prefix = "" if self._first else "\n"
+        self._first = False
+        return prefix + line
+
+    def feed(self, text: str) -> str:
+        self._buffer += text
+        pieces = self._buffer.splitlines(keepends=True)
+        out: List[str] = []
+        self._buffer = ""
+        for piece in pieces:
+            content = piece.splitlines()[0] if piece else ""
+            if len(content) < len(piece): # Terminó con salto de línea ('\r' + '\n' posterior solo añade una línea vacía)
+                out.append(self._emit(content))
+            else:
+                self._buffer = piece # Última línea, aún incompleta
+        return "".join(out)
+
+    def finish(self) -> str:
+        line, self._buffer = self._buffer, ""
+        return self._emit(line) if line else ""
+
+
+class _EmphasisPass:
+    """`marker texto marker` -> `open texto close`, con la semántica de re.sub y un cierre a <= max_span caracteres."""
+
+    def __init__(self, marker: str, open_tag: str, close_tag: str, max_span: int):
+        self._marker = marker
+        self._open = open_tag
+        self._close = close_tag
+        self._max_span = max_span
+        self._buffer = ""
+
+    def _drain(self, final: bool) -> str:
+        marker, m = self._marker, len(self._marker)
+        buf = self._buffer
+        out: List[str] = []
+        while True:
+            i = buf.find(marker)
+            if i == -1:
+                keep = 0
+                if not final: # Un marcador podría estar empezando al final
+                    keep = next((n for n in range(m - 1, 0, -1) if buf.endswith(marker[:n])), 0)
+                out.append(buf[:len(buf) - keep])
+                buf = buf[len(buf) - keep:]
+                break
+            k = buf.find(marker, i + m)
+            if k != -1 and k - (i + m) <= self._max_span:
+                out.append(buf[:i] + self._open + buf[i + m:k] + self._close)
+                buf = buf[k + m:]
+            elif final or k != -1 or len(buf) >= i + 2 * m + self._max_span:
+                out.append(buf[:i + 1]) # Sin cierre posible: el primer carácter queda literal
+                buf = buf[i + 1:]
+            else:
+                out.append(buf[:i]) # Esperar más texto tras la apertura
+                buf = buf[i:]
+                break
+        self._buffer = buf
+        return "".join(out)
+
+    def feed(self, text: str) -> str:
+        self._buffer += text
+        return self._drain(final=False)
+
+    def finish(self) -> str:
+        return self._drain(final=True)
+
+
+class _HeaderStripper:
+    """Equivale a re.sub(r'^\\s*#+\\s*', '', texto, flags=re.MULTILINE)."""
+
+    def __init__(self):
+        self._state = "start" # start | hashes | trail | normal
+        self._pending = "" # Espacios al inicio de línea, aún sin decidir
+        self._last = ""
+
+    def feed(self, text: str) -> str:
+        out: List[str] = []
+        for ch in text:
+            state = self._state
+            if state == "trail":
+                if ch.isspace():
+                    self._last = ch
+                    continue
+                # Fin del encabezado; si terminó en '\n', ch está al inicio de una línea
+                state = "start" if self._last == "\n" else "normal"
+                self._pending = ""
+            if state == "normal":
+                out.append(ch)
+                if ch == "\n":
+                    state, self._pending = "start", ""
+            elif state == "start":
+                if ch.isspace():
+                    self._pending += ch
+                elif ch == "#":
+                    state, self._pending = "hashes", ""
+                else:
+                    out.append(self._pending + ch)
+                    state, self._pending = "normal", ""
+            elif state == "hashes":
+                if ch.isspace():
+                    state, self._last = "trail", ch
+                elif ch != "#":
+                    out.append(ch)
+                    state = "normal"
+            self._state = state
+        return "".join(out)
+
+    def finish(self) -> str:
+        pending = self._pending if self._state == "start" else ""
+        self._state, self._pending = "start", ""
+        return pending
+
+
+class _WhitespaceTrim:
+    """Equivale a re.sub(r'\\n{3,}', '\\n\\n', texto).strip(): retiene los espacios hasta ver qué sigue."""
+
+    def __init__(self):
+        self._started = False
+        self._spaces = ""
+
+    def feed(self, text: str) -> str:
+        out: List[str] = []
+        for ch in text:
+            if ch.isspace():
+                if self._started:
+                    self._spaces += ch
+                continue
+            if self._spaces:
+                out.append(re.sub(r"\n{3,}", "\n\n", self._spaces))
+                self._spaces = ""
+            out.append(ch)
+            self._started = True
+        return "".join(out)
+
+    def finish(self) -> str:
+        self._spaces = "" # Espacios finales: strip()
+        return ""
+
+
+def _render_tags(text: str) -> str:
+    return text.replace(_LT, "<").replace(_GT, ">")
+
+
+class _TagGate:
+    """Retiene la salida mientras haya un énfasis abierto por _EmphasisPass y traduce sus marcas a <b>/<i>."""
+
+    def __init__(self):
+        self._held = ""
+        self._depth = 0
+
+    def feed(self, text: str) -> str:
+        start = len(self._held)
+        self._held += text
+        release = 0
+        for match in _SENTINEL_RE.finditer(self._held, start):
+            self._depth += -1 if match.group(1) else 1
+            if self._depth == 0:
+                release = match.end()
+        if self._depth == 0:
+            release = len(self._held)
+        out, self._held = self._held[:release], self._held[release:]
+        return _render_tags(out)
+
+    def finish(self) -> str:
+        out, self._held, self._depth = self._held, "", 0
+        return _render_tags(out)
+
+
+# --- Postprocesador ---
+
+class StreamingPostProcessor:
+    """
+    Postprocesador incremental: `feed(fragmento)` devuelve el HTML que ya se
+    puede mostrar (puede ser "") y `finish()` lo que quedaba retenido.
+
+    Args:
+        forbidden_phrases: Frases que eliminan la línea que las contiene.
+        max_span: Distancia máxima entre un marcador ** / * y su cierre.
+    """
+
+    def __init__(self, forbidden_phrases: Iterable[str] = FORBIDDEN_PHRASES, max_span: Optional[int] = None):
+        span = EMPHASIS_MAX_CHARS if max_span is None else max_span
+        self._stages = [
+            _LineFilter(tuple(forbidden_phrases)),
+            _EmphasisPass("**", _B_OPEN, _B_CLOSE, span),
+            _EmphasisPass("*", _I_OPEN, _I_CLOSE, span),
+            _HeaderStripper(),
+            _WhitespaceTrim(),
+            _TagGate(),
+        ]
+        self._output: List[str] = []
+        self._finished = False
+
+    def feed(self, chunk: str) -> str:
+        if self._finished:
+            raise RuntimeError("StreamingPostProcessor ya finalizado.")
+        out = chunk
+        for stage in self._stages:
+            out = stage.feed(out)
+        self._output.append(out)
+        return out
+
+    def finish(self) -> str:
+        if self._finished:
+            return ""
+        out = ""
+        for stage in self._stages:
+            out = stage.feed(out) + stage.finish()
+        self._output.append(out)
+        self._finished = True
+        return out
+
+    @property
+    def text(self) -> str:
+        """Todo lo emitido hasta ahora (tras finish(), la respuesta final)."""
+        return "".join(self._output)
@@ -0,0 +1,121 @@
+# app/services/ttl_cache.py
+# -*- coding: utf-8 -*-
+
+"""
+Caché en memoria acotada por tamaño (LRU) y por tiempo de vida (TTL).
+
+Utilidad genérica para los servicios: guarda pares clave/valor, expulsa la
+entrada menos usada al superar `max_size` y descarta las que superan
+`ttl_seconds`. Lleva contadores de aciertos/fallos para métricas.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Caché LRU con expiración por TTL y contadores de aciertos/fallos.
+
+    Es segura para usarse desde el event loop y desde hilos (asyncio.to_thread).
+    `max_size <= 0` desactiva la caché (get siempre falla, set no guarda nada).
+    `ttl_seconds <= 0` desactiva la expiración por tiempo.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self._max_size = int(max_size)
+        self._ttl = float(ttl_seconds)
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._max_size > 0
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @property
+    def ttl_seconds(self) -> float:
+        return self._ttl
+
+    def get(self, key: Hashable, default: Any = None, keep_expired: bool = False) -> Any:
+        """
+        Devuelve el valor cacheado (y lo marca como reciente) o `default`.
+        Con `keep_expired` una entrada expirada cuenta como fallo pero no se
+        borra, de modo que `peek()` aún puede leerla (respuestas degradadas).
+        """
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            stored_at, value = entry # type: ignore[misc]
+            if self._ttl > 0 and (self._clock() - stored_at) > self._ttl:
+                if not keep_expired:
+                    del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Como get() pero sin tocar contadores ni orden LRU, e ignorando el TTL."""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            return default if entry is _MISSING else entry[1] # type: ignore[index]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Guarda un valor; expulsa el menos usado si se supera max_size."""
+        if self._max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self._clock(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self._max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Elimina una clave. Devuelve True si existía."""
+        with self._lock:
+            return self._data.pop(key, _MISSING) is not _MISSING
+
+    def clear(self) -> int:
+        """Vacía la caché. Devuelve el número de entradas eliminadas."""
+        with self._lock:
+            removed = len(self._data)
+            self._data.clear()
+            return removed
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.peek(key, _MISSING) is not _MISSING
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Métricas de uso de la caché."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self._max_size,
+            "ttl_seconds": self._ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
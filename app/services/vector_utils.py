@@ -0,0 +1,64 @@
+# app/services/vector_utils.py
+# -*- coding: utf-8 -*-
+
+"""
+Utilidades para manejar vectores de consulta como arrays float32 contiguos.
+
+El camino embedding → búsqueda trabaja con `np.ndarray` float32 de una
+dimensión (o memoryviews sobre buffers float32); la conversión a lista de
+floats Python ocurre solo al serializar hacia Qdrant (el propio cliente lo
+hace con arrays NumPy).
+"""
+
+from typing import Any, List, Optional, Sequence, Union
+
+import numpy as np
+
+# Formas aceptadas para un vector de consulta
+VectorLike = Union[np.ndarray, memoryview, Sequence[float]]
+
+
+def as_float32_vector(vector: Any, expected_dim: Optional[int] = None) -> np.ndarray:
+    """
+    Convierte `vector` a un array float32 1-D contiguo, sin copiar si ya lo es.
+
+    Acepta np.ndarray, memoryview (p. ej. sobre un buffer float32 compartido)
+    o secuencias de números.
+
+    Raises:
+        ValueError: Si el vector está vacío, no es 1-D (o (1, dim)), contiene
+            valores no finitos o su dimensión no coincide con `expected_dim`.
+    """
+    if vector is None:
+        raise ValueError("Vector nulo.")
+    if isinstance(vector, memoryview):
+        array = np.frombuffer(vector, dtype=np.float32) if vector.format == "f" else np.asarray(vector, dtype=np.float32)
+    elif isinstance(vector, (str, bytes)):
+        raise ValueError("Tipo de vector no soportado.")
+    else:
+        try:
+            array = np.asarray(vector, dtype=np.float32)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Vector no convertible a float32: {e}") from e
+
+    if array.ndim == 2 and array.shape[0] == 1:
+        array = array[0]
+    if array.ndim != 1 or array.size == 0:
+        raise ValueError(f"Se esperaba un vector 1-D no vacío (shape={array.shape}).")
+    if expected_dim is not None and array.shape[0] != expected_dim:
+        raise ValueError(f"Dimensión de vector {array.shape[0]} != esperada {expected_dim}.")
+    if not np.isfinite(array).all():
+        raise ValueError("El vector contiene valores NaN/Inf.")
+    return np.ascontiguousarray(array)
+
+
+def freeze(vector: np.ndarray) -> np.ndarray:
+    """Devuelve el vector marcado como solo-lectura (seguro para compartir desde cachés)."""
+    if vector.flags.writeable:
+        vector.setflags(write=False)
+    return vector
+
+
+def to_wire(vector: VectorLike) -> List[float]:
+    """Conversión final a lista de floats para serializar (JSON/gRPC)."""
+    return as_float32_vector(vector).tolist()
@@ -0,0 +1,176 @@
+# app/services/warmup_service.py
+# -*- coding: utf-8 -*-
+
+"""
+Calentamiento (warm-up) de los servicios al arrancar y estado de readiness.
+
+Construye en paralelo el modelo de embeddings, el cliente Qdrant, el cliente
+LLM, el almacén de payloads (si SEARCH_PAYLOAD_MODE != full), el índice BM25
+(si RETRIEVAL_MODE=hybrid) y el índice de contexto prioritario, ejecuta una codificación de prueba y
+verifica la colección de Qdrant. Hasta que termina, GET /ready responde 503
+para que el balanceador no envíe tráfico a un worker frío. Si falla un
+componente requerido, los pasos fallidos se reintentan con backoff
+exponencial hasta que pasan y el estado vuelve de `failed` a `ready`.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+try:
+    from app.core.config import settings
+except Exception: # ImportError o ValidationError: se usan los defaults
+    settings = None # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Componentes sin los cuales el worker no puede atender /chat
+REQUIRED_COMPONENTS = ("embeddings", "qdrant")
+
+_state: Dict[str, Any] = {
+    "status": "starting", # starting | warming_up | ready | failed
+    "checks": {},
+    "started_at": None,
+    "duration_seconds": None,
+    "attempts": 0,
+}
+
+
+def is_ready() -> bool:
+    """True si el warm-up terminó y los componentes requeridos están disponibles."""
+    return _state["status"] == "ready"
+
+
+def get_readiness() -> Dict[str, Any]:
+    """Copia del estado de readiness (status, checks por componente, duración)."""
+    return {**_state, "checks": dict(_state["checks"])}
+
+
+def mark_ready(reason: str = "warm-up desactivado") -> None:
+    """Marca el worker como listo sin calentar (WARMUP_ON_STARTUP=false)."""
+    _state.update(status="ready", checks={"warmup": reason}, started_at=None, duration_seconds=0.0, attempts=0)
+
+
+def reset() -> None:
+    """Vuelve al estado inicial (usado en pruebas)."""
+    _state.update(status="starting", checks={}, started_at=None, duration_seconds=None, attempts=0)
+
+
+# --- Pasos del warm-up ---
+
+async def _warm_embeddings() -> None:
+    from app.services import embedding_service
+    await embedding_service.warm_up()
+
+
+async def _warm_qdrant() -> None:
+    from app.services import qdrant_service
+    if not qdrant_service._local_backend_enabled():
+        # Importar qdrant-client y construir el cliente bloquea: fuera del event loop
+        await asyncio.to_thread(qdrant_service._get_qdrant_client)
+    if not await qdrant_service.probe_collection():
+        raise ConnectionError("Colección Qdrant no disponible.")
+
+
+async def _warm_payload_store() -> None:
+    from app.services import qdrant_service
+    if qdrant_service._payload_mode() == "full" or qdrant_service._local_backend_enabled():
+        return
+    if await qdrant_service.load_payload_store() is None:
+        raise FileNotFoundError("Almacén de payloads no disponible; las búsquedas pedirán el payload a Qdrant.")
+
+
+async def _warm_bm25() -> None:
+    from app.services import hybrid_retrieval
+    if not hybrid_retrieval.hybrid_enabled():
+        return
+    if await hybrid_retrieval.load_bm25_index() is None:
+        raise ValueError("Índice BM25 no disponible; la recuperación híbrida usará solo la búsqueda densa.")
+
+
+async def _warm_llm() -> None:
+    from app.services import llm_service
+    if await asyncio.to_thread(llm_service._get_llm_client) is None: # Importa openai: fuera del event loop
+        raise ValueError("Cliente LLM no disponible.")
+
+
+async def _warm_priority_context() -> None:
+    from app.services import priority_context_service
+    faqs = await asyncio.to_thread(priority_context_service._load_priority_data)
+    logger.info(f"Contexto prioritario precargado ({len(faqs)} FAQs).")
+
+
+DEFAULT_STEPS: Dict[str, Callable[[], Awaitable[None]]] = {
+    "embeddings": _warm_embeddings,
+    "qdrant": _warm_qdrant,
+    "payload_store": _warm_payload_store,
+    "bm25": _warm_bm25,
+    "llm": _warm_llm,
+    "priority_context": _warm_priority_context,
+}
+
+
+async def _run_step(name: str, step: Callable[[], Awaitable[None]]) -> None:
+    start = time.perf_counter()
+    try:
+        await step()
+        _state["checks"][name] = "ok"
+        logger.info(f"Warm-up '{name}' completado en {time.perf_counter() - start:.2f}s.")
+    except Exception as e:
+        _state["checks"][name] = f"error: {e}"
+        logger.error(f"Warm-up '{name}' falló tras {time.perf_counter() - start:.2f}s: {e}")
+
+
+def _failed_required(steps: Dict[str, Callable[[], Awaitable[None]]]) -> list:
+    return [name for name in REQUIRED_COMPONENTS if name in steps and _state["checks"].get(name) != "ok"]
+
+
+async def run_warmup(
+    steps: Optional[Dict[str, Callable[[], Awaitable[None]]]] = None,
+    max_attempts: Optional[int] = None,
+    retry_initial_seconds: Optional[float] = None,
+    retry_max_seconds: Optional[float] = None,
+) -> bool:
+    """
+    Ejecuta todos los pasos de warm-up en paralelo y actualiza el estado.
+
+    Si algún componente requerido falla, el estado pasa a `failed` (/ready en
+    503) y los pasos que no están en "ok" se reintentan con backoff exponencial
+    (WARMUP_RETRY_INITIAL_SECONDS, duplicándose hasta WARMUP_RETRY_MAX_SECONDS)
+    hasta que los requeridos pasan; entonces el estado vuelve a `ready`.
+
+    Args:
+        steps: Pasos {nombre: corrutina}; por defecto DEFAULT_STEPS.
+        max_attempts: Intentos máximos (None = hasta que pase).
+
+    Returns:
+        True si los componentes requeridos quedaron disponibles.
+    """
+    steps = steps if steps is not None else DEFAULT_STEPS
+    delay = retry_initial_seconds if retry_initial_seconds is not None else getattr(settings, 'WARMUP_RETRY_INITIAL_SECONDS', 1.0)
+    max_delay = retry_max_seconds if retry_max_seconds is not None else getattr(settings, 'WARMUP_RETRY_MAX_SECONDS', 30.0)
+    _state.update(status="warming_up", checks={}, started_at=time.time(), duration_seconds=None, attempts=0)
+    start = time.perf_counter()
+    logger.info(f"Iniciando warm-up de servicios: {', '.join(steps)}...")
+
+    pending = dict(steps)
+    while True:
+        _state["attempts"] += 1
+        await asyncio.gather(*(_run_step(name, step) for name, step in pending.items()))
+        _state["duration_seconds"] = round(time.perf_counter() - start, 3)
+        failed_required = _failed_required(steps)
+        if not failed_required:
+            break
+        _state["status"] = "failed"
+        if max_attempts is not None and _state["attempts"] >= max_attempts:
+            logger.critical(f"Warm-up incompleto tras {_state['attempts']} intentos; componentes requeridos no disponibles: {failed_required}. /ready seguirá en 503.")
+            return False
+        logger.error(f"Componentes requeridos no disponibles: {failed_required}. /ready en 503; reintento en {delay:.1f}s.")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, max_delay)
+        pending = {name: step for name, step in steps.items() if _state["checks"].get(name) != "ok"}
+
+    _state["status"] = "ready"
+    logger.info(f"Warm-up completado en {_state['duration_seconds']}s ({_state['attempts']} intento(s)). Worker listo para recibir tráfico.")
+    return True
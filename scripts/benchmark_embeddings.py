@@ -0,0 +1,121 @@
+# scripts/benchmark_embeddings.py
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark de throughput de embeddings: compara el ejecutor 'thread'
+(asyncio.to_thread) contra el ejecutor 'process' (pool de procesos).
+
+Lanza N queries únicas con una concurrencia dada a través de
+embedding_service.embed_query y reporta queries/s y latencias p50/p99.
+La caché de embeddings se desactiva para medir solo la codificación.
+
+Uso:
+    python scripts/benchmark_embeddings.py --queries 500 --concurrency 32
+    python scripts/benchmark_embeddings.py --executors process --workers 4 --batching
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+logging.basicConfig(level='WARNING', format='%(asctime)s - %(name)s [%(levelname)s] - %(message)s')
+logger = logging.getLogger("benchmark_embeddings")
+
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from app.core.config import settings # noqa: E402
+from app.services import embedding_service # noqa: E402
+from app.services.embedding_cache import EmbeddingCache # noqa: E402
+
+SAMPLE_QUESTIONS = [
+    "¿Cómo activo MiAdminXML en una computadora nueva?",
+    "No descarga mis XML del SAT, ¿qué hago?",
+    "¿Dónde consulto mis CFDI cancelados?",
+    "¿Cómo subo mi e.firma a MiExpedienteContable?",
+    "Me aparece un error al validar la contraseña del SAT",
+    "¿Puedo usar la misma licencia en dos equipos?",
+    "¿Cómo genero el reporte de nómina del mes?",
+    "Quiero cambiar el RFC de la empresa registrada",
+]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def _run_mode(executor: str, queries: List[str], concurrency: int) -> Dict[str, float]:
+    """Ejecuta todas las queries con el ejecutor indicado y devuelve métricas."""
+    settings.EMBEDDING_EXECUTOR = executor # type: ignore[assignment]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def _one(q: str) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await embedding_service.embed_query(q)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+
+    # Calentamiento: carga del modelo (o arranque de los workers) fuera de la medición
+    if executor == "process":
+        await embedding_service._get_process_pool().warm_up()
+    else:
+        await embedding_service.embed_query("calentamiento del modelo")
+
+    start_total = time.perf_counter()
+    await asyncio.gather(*(_one(q) for q in queries))
+    elapsed = time.perf_counter() - start_total
+
+    return {
+        "queries": len(queries),
+        "seconds": elapsed,
+        "qps": len(queries) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": _percentile(latencies, 50),
+        "p99_ms": _percentile(latencies, 99),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de ejecutores de embeddings (thread vs process).")
+    parser.add_argument("--queries", type=int, default=300, help="Número de queries a codificar.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Queries en vuelo simultáneamente.")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos worker (default: EMBEDDING_PROCESS_WORKERS).")
+    parser.add_argument("--executors", nargs="+", choices=["thread", "process"], default=["thread", "process"])
+    parser.add_argument("--batching", action="store_true", help="Activa el micro-batching durante el benchmark.")
+    args = parser.parse_args()
+
+    if args.workers:
+        settings.EMBEDDING_PROCESS_WORKERS = args.workers # type: ignore[assignment]
+    settings.EMBEDDING_BATCHING_ENABLED = args.batching # type: ignore[assignment]
+    # Desactivar la caché: cada query debe llegar al modelo
+    embedding_service._embedding_cache = EmbeddingCache(max_size=0, ttl_seconds=0)
+
+    queries = [f"{SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)]} (#{i})" for i in range(args.queries)]
+
+    print(f"Modelo: {settings.EMBEDDING_MODEL_NAME} | queries={args.queries} | concurrencia={args.concurrency} | batching={args.batching}")
+    results = {}
+    try:
+        for executor in args.executors:
+            results[executor] = await _run_mode(executor, queries, args.concurrency)
+            r = results[executor]
+            extra = f" ({settings.EMBEDDING_PROCESS_WORKERS} workers)" if executor == "process" else ""
+            print(f"[{executor}{extra}] {r['qps']:.1f} q/s | total {r['seconds']:.2f}s | p50 {r['p50_ms']:.1f}ms | p99 {r['p99_ms']:.1f}ms")
+    finally:
+        embedding_service.shutdown_executor()
+
+    if "thread" in results and "process" in results and results["thread"]["qps"] > 0:
+        print(f"Speedup process/thread: {results['process']['qps'] / results['thread']['qps']:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
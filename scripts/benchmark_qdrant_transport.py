@@ -0,0 +1,211 @@
+# scripts/benchmark_qdrant_transport.py
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark de transporte del cliente Qdrant: REST con los límites por defecto
+de qdrant-client, REST con el pool configurado (QDRANT_POOL_*) y gRPC.
+
+Por defecto levanta en un subproceso un stand-in compatible con Qdrant
+(REST `POST /collections/{name}/points/search` y gRPC `Points/Search`)
+respaldado por el índice vectorial local, con payloads grandes y sintéticos,
+y lanza búsquedas top-k concurrentes contra él. Con --url se mide una
+instancia real de Qdrant.
+
+Uso:
+    python scripts/benchmark_qdrant_transport.py --points 5000 --payload-bytes 4000 --top-k 10 --concurrency 16
+    python scripts/benchmark_qdrant_transport.py --url http://localhost:6333 --grpc-port 6334 --collection kellybot-docs-v1
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+logging.basicConfig(level='WARNING', format='%(asctime)s - %(name)s [%(levelname)s] - %(message)s')
+logger = logging.getLogger("benchmark_qdrant_transport")
+
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from app.core.config import settings # noqa: E402
+from app.services import qdrant_service # noqa: E402
+from app.services.local_vector_index import LocalVectorIndex # noqa: E402
+
+STANDIN_COLLECTION = "benchmark"
+TRANSPORTS = ("rest-default", "rest", "grpc")
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _unit_vectors(n: int, dim: int, seed: int) -> np.ndarray:
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+# --- Stand-in compatible con Qdrant ---
+
+def _standin_index(points: int, dim: int, payload_bytes: int) -> LocalVectorIndex:
+    filler = ("Respuesta de ejemplo para medir el costo de serializar payloads grandes. " * (payload_bytes // 70 + 1))[:payload_bytes]
+    payloads = [
+        {"source_id": f"faq-{i}", "question": f"Pregunta sintética {i}", "category": ["ventas", "soporte", "facturas"][i % 3],
+         "text": filler, "answer_chunks": [filler[:payload_bytes // 4]] * 2}
+        for i in range(points)
+    ]
+    return LocalVectorIndex(list(range(points)), _unit_vectors(points, dim, seed=0), payloads)
+
+
+async def _serve_standin(args: argparse.Namespace) -> None:
+    """Sirve el índice por REST (uvicorn) y gRPC (grpc.aio) hasta que se mate el proceso."""
+    import grpc
+    import uvicorn
+    from fastapi import Body, FastAPI
+    from qdrant_client import grpc as grpc_api, models
+    from qdrant_client.conversions.conversion import GrpcToRest, RestToGrpc
+
+    index = _standin_index(args.points, args.dim, args.payload_bytes)
+    app = FastAPI()
+
+    @app.post("/collections/{collection_name}/points/search")
+    async def rest_search(collection_name: str, body: Dict[str, Any] = Body(...)):
+        start = time.perf_counter()
+        query_filter = models.Filter.model_validate(body["filter"]) if body.get("filter") else None
+        results = index.search(body["vector"], int(body.get("limit", 10)), query_filter)
+        return {
+            "result": [{"id": r["id"], "version": 0, "score": r["score"], "payload": r["payload"], "vector": None} for r in results],
+            "status": "ok", "time": time.perf_counter() - start,
+        }
+
+    class PointsServicer(grpc_api.PointsServicer):
+        async def Search(self, request, context):
+            start = time.perf_counter()
+            query_filter = GrpcToRest.convert_filter(request.filter) if request.HasField("filter") else None
+            results = index.search(np.asarray(request.vector, dtype=np.float32), request.limit, query_filter)
+            scored = [RestToGrpc.convert_scored_point(models.ScoredPoint(id=r["id"], version=0, score=r["score"], payload=r["payload"]))
+                      for r in results]
+            return grpc_api.SearchResponse(result=scored, time=time.perf_counter() - start)
+
+    grpc_server = grpc.aio.server(options=[("grpc.max_send_message_length", 64 * 1024 * 1024)])
+    grpc_api.add_PointsServicer_to_server(PointsServicer(), grpc_server)
+    grpc_server.add_insecure_port(f"127.0.0.1:{args.grpc_port}")
+    await grpc_server.start()
+    rest_server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.rest_port, log_level="warning"))
+    await rest_server.serve()
+    await grpc_server.stop(grace=None)
+
+
+def _wait_for_port(port: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.2)
+    raise SystemExit(f"El stand-in no abrió el puerto {port} en {timeout:.0f}s.")
+
+
+# --- Benchmark ---
+
+def _make_client(transport: str, url: str, grpc_port: int):
+    from qdrant_client import AsyncQdrantClient
+
+    if transport == "rest-default":
+        return AsyncQdrantClient(url=url, grpc_port=grpc_port, timeout=settings.QDRANT_TIMEOUT_SECONDS)
+    options = {**qdrant_service._client_options(), "grpc_port": grpc_port, "prefer_grpc": transport == "grpc"}
+    return AsyncQdrantClient(url=url, **options)
+
+
+async def _run_transport(transport: str, args: argparse.Namespace, url: str, queries: np.ndarray) -> Dict[str, float]:
+    client = _make_client(transport, url, args.grpc_port)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: List[float] = []
+
+    async def one(vector: np.ndarray, record: bool) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await client.search(collection_name=args.collection, query_vector=vector, limit=args.top_k, with_payload=True)
+            if record:
+                latencies.append((time.perf_counter() - start) * 1000.0)
+
+    try:
+        await asyncio.gather(*(one(v, False) for v in queries[:args.concurrency])) # Calentamiento
+        start = time.perf_counter()
+        await asyncio.gather(*(one(v, True) for v in queries))
+        elapsed = time.perf_counter() - start
+    finally:
+        await client.close()
+    return {
+        "qps": len(queries) / elapsed,
+        "mean_ms": float(np.mean(latencies)),
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+    }
+
+
+async def _benchmark(args: argparse.Namespace) -> int:
+    process = None
+    url = args.url
+    if url is None:
+        command = [sys.executable, __file__, "--serve", "--points", str(args.points), "--dim", str(args.dim),
+                   "--payload-bytes", str(args.payload_bytes), "--rest-port", str(args.rest_port), "--grpc-port", str(args.grpc_port)]
+        process = subprocess.Popen(command)
+        _wait_for_port(args.rest_port)
+        _wait_for_port(args.grpc_port)
+        url = f"http://127.0.0.1:{args.rest_port}"
+        args.collection = STANDIN_COLLECTION
+        print(f"Stand-in: {args.points} puntos, dim={args.dim}, payload≈{args.payload_bytes}B/punto")
+    try:
+        queries = _unit_vectors(args.queries, args.dim, seed=1)
+        print(f"{args.queries} búsquedas top-{args.top_k}, concurrencia {args.concurrency}")
+        print(f"{'transporte':<13} {'qps':>8} {'media':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+        for transport in args.transports:
+            m = await _run_transport(transport, args, url, queries)
+            print(f"{transport:<13} {m['qps']:>8.1f} {m['mean_ms']:>7.2f}ms {m['p50_ms']:>7.2f}ms {m['p95_ms']:>7.2f}ms {m['p99_ms']:>7.2f}ms")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compara REST vs. gRPC (y el pool de conexiones) del cliente Qdrant.")
+    parser.add_argument("--url", default=None, help="Qdrant real (default: stand-in local en subproceso).")
+    parser.add_argument("--collection", default=settings.QDRANT_COLLECTION_NAME)
+    parser.add_argument("--rest-port", type=int, default=16333, help="Puerto REST del stand-in.")
+    parser.add_argument("--grpc-port", type=int, default=None, help="Puerto gRPC (default: 16334 stand-in / QDRANT_GRPC_PORT).")
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=settings.VECTOR_DIMENSION)
+    parser.add_argument("--payload-bytes", type=int, default=4000, help="Tamaño aproximado del texto de cada payload.")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--transports", nargs="+", choices=TRANSPORTS, default=list(TRANSPORTS))
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS) # Modo interno del subproceso
+    args = parser.parse_args()
+    if args.grpc_port is None:
+        args.grpc_port = settings.QDRANT_GRPC_PORT if args.url else 16334
+
+    if args.serve:
+        asyncio.run(_serve_standin(args))
+        return 0
+    return asyncio.run(_benchmark(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+# scripts/export_onnx_embeddings.py
+# -*- coding: utf-8 -*-
+
+"""
+Exporta el modelo de embeddings configurado (EMBEDDING_MODEL_NAME) a ONNX para
+servirlo con EMBEDDING_BACKEND=onnx. Opcionalmente genera una variante
+cuantizada int8 y verifica la paridad contra el modelo PyTorch.
+
+Uso:
+    python scripts/export_onnx_embeddings.py
+    python scripts/export_onnx_embeddings.py --output models/onnx --quantize --verify
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+logging.basicConfig(level='INFO', format='%(asctime)s - %(name)s [%(levelname)s] - %(message)s')
+logger = logging.getLogger("export_onnx_embeddings")
+
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from app.core.config import settings # noqa: E402
+from app.services import onnx_embedding_backend # noqa: E402
+
+
+def _verify(output_dir: Path, quantized: bool, min_cosine: float) -> bool:
+    """Compara el modelo exportado contra el SentenceTransformer de referencia."""
+    from sentence_transformers import SentenceTransformer
+
+    reference = SentenceTransformer(model_name_or_path=settings.EMBEDDING_MODEL_NAME, device="cpu")
+    candidate = onnx_embedding_backend.OnnxEmbeddingModel(model_dir=output_dir, quantized=quantized)
+    dim_ok, observed = onnx_embedding_backend.check_parity(candidate, reference, settings.VECTOR_DIMENSION)
+    label = "int8" if quantized else "fp32"
+    print(f"[{label}] dimensión OK: {dim_ok} | coseno mínimo vs. referencia: {observed:.5f} (umbral {min_cosine})")
+    return dim_ok and observed >= min_cosine
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Exporta el modelo de embeddings a ONNX.")
+    parser.add_argument("--output", type=Path, default=settings.EMBEDDING_ONNX_DIR,
+                        help="Directorio de salida (default: EMBEDDING_ONNX_DIR).")
+    parser.add_argument("--quantize", action="store_true", help="Genera también model_quantized.onnx (int8 dinámico).")
+    parser.add_argument("--verify", action="store_true", help="Verifica dimensión y similitud coseno contra PyTorch.")
+    parser.add_argument("--opset", type=int, default=14, help="Versión de opset ONNX.")
+    args = parser.parse_args()
+
+    output_dir = onnx_embedding_backend.export_onnx_model(
+        settings.EMBEDDING_MODEL_NAME, args.output, quantize=args.quantize, opset=args.opset
+    )
+    print(f"Modelo '{settings.EMBEDDING_MODEL_NAME}' exportado en {output_dir}")
+
+    if not args.verify:
+        return 0
+    ok = _verify(output_dir, quantized=False, min_cosine=settings.EMBEDDING_ONNX_MIN_COSINE)
+    if args.quantize:
+        ok = _verify(output_dir, quantized=True, min_cosine=settings.EMBEDDING_ONNX_MIN_COSINE) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
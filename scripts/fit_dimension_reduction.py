@@ -0,0 +1,122 @@
+# scripts/fit_dimension_reduction.py
+# -*- coding: utf-8 -*-
+
+"""
+Ajusta y evalúa la reducción de dimensión de embeddings (PCA o truncamiento).
+
+Codifica un corpus a dimensión completa, reserva una parte como queries (o usa
+--queries), y para cada dimensión candidata reporta recall@k de la búsqueda
+por coseno reducida frente a la búsqueda con vectores completos, junto con el
+tamaño por vector. Con --save guarda el artefacto para EMBEDDING_PCA_PATH.
+
+Uso:
+    python scripts/fit_dimension_reduction.py --corpus data/corpus.txt --dims 64 128 256
+    python scripts/fit_dimension_reduction.py --from-qdrant 5000 --mode pca --dims 128 --save 128
+    python scripts/fit_dimension_reduction.py --corpus data/corpus.txt --mode truncate --dims 128 256
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import sys
+from pathlib import Path
+from typing import List
+
+logging.basicConfig(level='WARNING', format='%(asctime)s - %(name)s [%(levelname)s] - %(message)s')
+logger = logging.getLogger("fit_dimension_reduction")
+
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from app.core.config import settings # noqa: E402
+from app.services import embedding_service # noqa: E402
+from app.services.dimension_reduction import DimensionReducer, fit_pca, recall_at_k # noqa: E402
+
+
+def _read_lines(path: Path) -> List[str]:
+    return [line.strip() for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+async def _texts_from_qdrant(limit: int) -> List[str]:
+    """Lee textos de los payloads de la colección configurada (text/answer_full/question)."""
+    from app.services.qdrant_service import _get_qdrant_client
+
+    client = _get_qdrant_client()
+    if client is None:
+        raise SystemExit("Cliente Qdrant no disponible.")
+    texts: List[str] = []
+    offset = None
+    while len(texts) < limit:
+        points, offset = await client.scroll(
+            collection_name=settings.QDRANT_COLLECTION_NAME, limit=min(256, limit - len(texts)),
+            offset=offset, with_payload=True, with_vectors=False,
+        )
+        for point in points:
+            payload = point.payload or {}
+            text = payload.get("text") or payload.get("answer_full") or payload.get("question")
+            if isinstance(text, str) and text.strip():
+                texts.append(text.strip())
+        if offset is None:
+            break
+    return texts
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Ajusta/evalúa reducción de dimensión (recall@k vs. vectores completos).")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--corpus", type=Path, help="Archivo de textos del corpus (uno por línea).")
+    source.add_argument("--from-qdrant", type=int, metavar="N", help="Usa hasta N textos de los payloads de la colección.")
+    parser.add_argument("--queries", type=Path, default=None, help="Archivo de queries (default: 10%% del corpus reservado).")
+    parser.add_argument("--mode", choices=["pca", "truncate"], default="pca")
+    parser.add_argument("--dims", type=int, nargs="+", default=[64, 128, 256], help="Dimensiones candidatas.")
+    parser.add_argument("--k", type=int, default=5, help="k para recall@k.")
+    parser.add_argument("--save", type=int, default=None, metavar="DIM", help="Guarda el artefacto para esta dimensión.")
+    parser.add_argument("--output", type=Path, default=settings.EMBEDDING_PCA_PATH, help="Ruta del artefacto (default: EMBEDDING_PCA_PATH).")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    texts = _read_lines(args.corpus) if args.corpus else await _texts_from_qdrant(args.from_qdrant)
+    if args.queries:
+        corpus, queries = texts, _read_lines(args.queries)
+    else:
+        shuffled = texts[:]
+        random.Random(args.seed).shuffle(shuffled)
+        n_queries = max(1, len(shuffled) // 10)
+        queries, corpus = shuffled[:n_queries], shuffled[n_queries:]
+    if len(corpus) < 2 or not queries:
+        raise SystemExit("Se necesitan al menos 2 textos de corpus y 1 query.")
+
+    print(f"Modelo: {settings.EMBEDDING_MODEL_NAME} (dim {settings.VECTOR_DIMENSION}) | corpus={len(corpus)} | queries={len(queries)} | k={args.k}")
+    corpus_full = await embedding_service.embed_queries(corpus, reduce=False)
+    queries_full = await embedding_service.embed_queries(queries, reduce=False)
+    full_dim = corpus_full.shape[1]
+
+    reducers = {}
+    print(f"{'modo':<9} {'dim':>5} {'recall@k':>9} {'bytes/vector':>13}")
+    print(f"{'completo':<9} {full_dim:>5} {1.0:>9.4f} {full_dim * 4:>13}")
+    for dim in sorted(set(args.dims)):
+        if not 0 < dim < full_dim:
+            print(f"Dimensión {dim} ignorada (debe ser < {full_dim}).")
+            continue
+        if args.mode == "pca":
+            reducer = fit_pca(corpus_full, dim, model_name=settings.EMBEDDING_MODEL_NAME)
+        else:
+            reducer = DimensionReducer("truncate", full_dim, dim, model_name=settings.EMBEDDING_MODEL_NAME)
+        reducers[dim] = reducer
+        recall = recall_at_k(corpus_full, queries_full, reducer.transform(corpus_full), reducer.transform(queries_full), args.k)
+        print(f"{args.mode:<9} {dim:>5} {recall:>9.4f} {dim * 4:>13}")
+
+    if args.save is not None:
+        if args.save not in reducers:
+            raise SystemExit(f"--save {args.save} debe estar entre las dimensiones evaluadas.")
+        reducers[args.save].save(args.output)
+        print(f"Artefacto guardado en {args.output}. Configura EMBEDDING_REDUCTION={args.mode}, "
+              f"EMBEDDING_REDUCED_DIMENSION={args.save} y crea la colección con size={args.save}.")
+    embedding_service.shutdown_executor()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,93 @@
+# scripts/ingest_documents.py
+# -*- coding: utf-8 -*-
+
+"""
+Ingresa documentos (.txt/.md) y FAQs (.jsonl/.json) en la colección de Qdrant
+configurada: chunking con CHUNK_SIZE/CHUNK_OVERLAP, embeddings en lotes y
+upserts paralelos. Reporta documentos/s y el pico de memoria.
+
+Modos:
+    (default)      Ingresa todo en la colección (upsert; no borra nada).
+    --incremental  Solo re-embebe las fuentes cuyo content_hash cambió y borra las eliminadas.
+    --rebuild      Reconstruye en una colección nueva y cambia el alias QDRANT_COLLECTION_NAME.
+    --migrate      Con --rebuild, migración única: si QDRANT_COLLECTION_NAME es todavía
+                   una colección física, la borra y la sustituye por el alias. Entre el
+                   borrado y la creación del alias las búsquedas fallan; sin esta opción
+                   --rebuild se niega a tocar una colección física.
+    --force        Con --incremental/--rebuild, borra las fuentes ausentes o cambia el
+                   alias aunque algún archivo no se haya podido leer (sin esta opción,
+                   --incremental las conserva y --rebuild aborta).
+
+Uso:
+    python scripts/ingest_documents.py data/faqs.jsonl data/manuales/
+    python scripts/ingest_documents.py data/docs --incremental
+    python scripts/ingest_documents.py data/docs --rebuild --embed-batch-size 512 --parallelism 8
+    python scripts/ingest_documents.py data/docs --rebuild --migrate   # Solo la primera vez
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from pathlib import Path
+
+logging.basicConfig(level='INFO', format='%(asctime)s - %(name)s [%(levelname)s] - %(message)s')
+logger = logging.getLogger("ingest_documents")
+
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from app.core.config import settings # noqa: E402
+from app.services import embedding_service, ingestion_service, qdrant_service # noqa: E402
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Ingresa documentos y FAQs en Qdrant.")
+    parser.add_argument("paths", nargs="+", type=Path, help="Archivos o directorios de origen.")
+    parser.add_argument("--collection", default=settings.QDRANT_COLLECTION_NAME)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--recreate", action="store_true", help="Borra y recrea la colección antes de ingresar.")
+    mode.add_argument("--incremental", action="store_true", help="Solo fuentes nuevas o modificadas; borra las eliminadas.")
+    mode.add_argument("--rebuild", action="store_true", help="Reconstrucción blue/green detrás del alias --collection.")
+    parser.add_argument("--keep-old", action="store_true", help="Con --rebuild, conserva la colección anterior.")
+    parser.add_argument("--migrate", action="store_true",
+                        help="Con --rebuild, convierte una colección física --collection en alias (la borra; breve corte).")
+    parser.add_argument("--force", action="store_true",
+                        help="Con --incremental/--rebuild, aplica borrados/alias aunque fallen archivos de entrada.")
+    parser.add_argument("--embed-batch-size", type=int, default=settings.INGEST_EMBED_BATCH_SIZE)
+    parser.add_argument("--upsert-batch-size", type=int, default=settings.INGEST_UPSERT_BATCH_SIZE)
+    parser.add_argument("--parallelism", type=int, default=settings.INGEST_UPSERT_PARALLELISM)
+    parser.add_argument("--chunk-size", type=int, default=settings.CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=settings.CHUNK_OVERLAP)
+    args = parser.parse_args()
+
+    if args.migrate and not args.rebuild:
+        parser.error("--migrate requiere --rebuild")
+    missing = [str(p) for p in args.paths if not p.exists()]
+    if missing:
+        raise SystemExit(f"No existen: {', '.join(missing)}")
+
+    options = {
+        "embed_batch_size": args.embed_batch_size, "upsert_batch_size": args.upsert_batch_size,
+        "parallelism": args.parallelism, "chunk_size": args.chunk_size, "chunk_overlap": args.chunk_overlap,
+    }
+    try:
+        if args.rebuild:
+            stats = await ingestion_service.rebuild_blue_green(args.paths, alias=args.collection, keep_old=args.keep_old,
+                                                               migrate=args.migrate, force=args.force, **options)
+        elif args.incremental:
+            stats = await ingestion_service.reindex_incremental(args.paths, collection_name=args.collection,
+                                                                force=args.force, **options)
+        else:
+            stats = await ingestion_service.ingest(args.paths, collection_name=args.collection, recreate=args.recreate, **options)
+    finally:
+        embedding_service.shutdown_executor()
+        await qdrant_service.close_client()
+    print(json.dumps(stats, ensure_ascii=False, indent=2))
+    return 1 if stats.get("failed_files") else 0 # Archivos ilegibles: salida distinta de 0 para cron/CI
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,75 @@
+# scripts/snapshot_local_index.py
+# -*- coding: utf-8 -*-
+
+"""
+Genera la instantánea del índice vectorial local (VECTOR_SEARCH_BACKEND=local)
+leyendo la colección de Qdrant configurada, y opcionalmente compara sus
+resultados con Qdrant para un conjunto de queries.
+
+Uso:
+    python scripts/snapshot_local_index.py --output data/local_index.npz
+    python scripts/snapshot_local_index.py --output data/local_index.npz --compare data/queries.txt --k 5
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+logging.basicConfig(level='WARNING', format='%(asctime)s - %(name)s [%(levelname)s] - %(message)s')
+logger = logging.getLogger("snapshot_local_index")
+
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from app.core.config import settings # noqa: E402
+from app.services import embedding_service, qdrant_service # noqa: E402
+from app.services.local_vector_index import LocalVectorIndex # noqa: E402
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Crea la instantánea del índice local desde Qdrant.")
+    parser.add_argument("--output", type=Path, default=settings.LOCAL_INDEX_SNAPSHOT_PATH,
+                        help="Ruta del .npz (default: LOCAL_INDEX_SNAPSHOT_PATH).")
+    parser.add_argument("--compare", type=Path, default=None, help="Archivo de queries (una por línea) para comparar con Qdrant.")
+    parser.add_argument("--k", type=int, default=settings.RAG_TOP_K)
+    args = parser.parse_args()
+    if args.output is None:
+        raise SystemExit("Indica --output o configura LOCAL_INDEX_SNAPSHOT_PATH.")
+
+    client = qdrant_service._get_qdrant_client()
+    if client is None:
+        raise SystemExit("Cliente Qdrant no disponible.")
+    start = time.perf_counter()
+    index = await LocalVectorIndex.from_qdrant(
+        client, settings.QDRANT_COLLECTION_NAME, distance=settings.DISTANCE_METRIC,
+        hnsw_threshold=settings.LOCAL_INDEX_HNSW_THRESHOLD, ef_search=settings.LOCAL_INDEX_HNSW_EF_SEARCH,
+    )
+    index.save(args.output)
+    print(f"{len(index)} puntos (dim {index.dim}, modo {index.mode}) en {time.perf_counter() - start:.1f}s -> {args.output}")
+
+    if args.compare:
+        queries = [line.strip() for line in args.compare.read_text(encoding="utf-8").splitlines() if line.strip()]
+        vectors = await embedding_service.embed_queries(queries)
+        overlap, qdrant_ms, local_ms = 0, 0.0, 0.0
+        for vector in vectors:
+            t0 = time.perf_counter()
+            remote = await client.search(collection_name=settings.QDRANT_COLLECTION_NAME, query_vector=vector, limit=args.k)
+            t1 = time.perf_counter()
+            local = index.search(vector, args.k)
+            t2 = time.perf_counter()
+            qdrant_ms += (t1 - t0) * 1000.0
+            local_ms += (t2 - t1) * 1000.0
+            overlap += len({str(p.id) for p in remote} & {str(r["id"]) for r in local})
+        n = len(queries)
+        print(f"Coincidencia top-{args.k}: {overlap / float(n * args.k):.4f} | "
+              f"Qdrant {qdrant_ms / n:.2f}ms/query | local {local_ms / n:.3f}ms/query")
+        embedding_service.shutdown_executor()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
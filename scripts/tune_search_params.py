@@ -0,0 +1,135 @@
+# scripts/tune_search_params.py
+# -*- coding: utf-8 -*-
+
+"""
+Ajusta los parámetros de búsqueda de Qdrant: recorre hnsw_ef, búsqueda exacta,
+oversampling/re-puntuado de cuantización y RAG_TOP_K sobre un conjunto fijo de
+preguntas y reporta recall@k (contra búsqueda exacta) junto a la latencia
+p50/p99. Con --write-env escribe la combinación elegida (la más rápida que
+alcanza --min-recall para --choose-top-k) en un archivo .env.
+
+Sin --url se usa la colección configurada (QDRANT_URL). Con --standin se mide
+un Qdrant en memoria (qdrant-client local) con puntos sintéticos: sirve para
+probar el harness, pero ese modo siempre busca en exacto e ignora hnsw_ef y la
+cuantización, así que sus recalls son 1.0.
+
+Uso:
+    python scripts/tune_search_params.py --questions data/preguntas.txt --hnsw-ef 16 32 64 128 --top-k 3 5
+    python scripts/tune_search_params.py --questions data/preguntas.txt --oversampling 1 2 3 --rescore on off \\
+        --min-recall 0.98 --write-env .env
+    python scripts/tune_search_params.py --standin --queries 200 --points 5000 --hnsw-ef 32 64
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+import numpy as np
+
+logging.basicConfig(level='WARNING', format='%(asctime)s - %(name)s [%(levelname)s] - %(message)s')
+logger = logging.getLogger("tune_search_params")
+
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from app.core.config import settings # noqa: E402
+from app.services import qdrant_service, search_tuning # noqa: E402
+
+STANDIN_COLLECTION = "tuning"
+RESCORE_CHOICES = {"on": True, "off": False, "default": None}
+
+
+def _unit_vectors(n: int, dim: int, seed: int) -> np.ndarray:
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+async def _standin_client(points: int, dim: int):
+    from qdrant_client import AsyncQdrantClient, models
+
+    client = AsyncQdrantClient(location=":memory:")
+    await client.create_collection(STANDIN_COLLECTION, vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE))
+    vectors = _unit_vectors(points, dim, seed=0)
+    for start in range(0, points, 1000):
+        await client.upsert(STANDIN_COLLECTION, points=models.Batch(
+            ids=list(range(start, min(points, start + 1000))), vectors=vectors[start:start + 1000].tolist()))
+    return client
+
+
+async def _query_vectors(args: argparse.Namespace, dim: int) -> np.ndarray:
+    if args.questions:
+        from app.services import embedding_service
+
+        questions = [line.strip() for line in args.questions.read_text(encoding="utf-8").splitlines() if line.strip()]
+        try:
+            return np.asarray(await embedding_service.embed_queries(questions), dtype=np.float32)
+        finally:
+            embedding_service.shutdown_executor()
+    return _unit_vectors(args.queries, dim, seed=1)
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description="Recall@k vs. latencia de los parámetros de búsqueda de Qdrant.")
+    parser.add_argument("--questions", type=Path, default=None, help="Preguntas (una por línea); sin él, vectores sintéticos.")
+    parser.add_argument("--queries", type=int, default=200, help="Vectores sintéticos si no hay --questions.")
+    parser.add_argument("--collection", default=settings.QDRANT_COLLECTION_NAME)
+    parser.add_argument("--standin", action="store_true", help="Qdrant en memoria con puntos sintéticos.")
+    parser.add_argument("--points", type=int, default=5000, help="Puntos del stand-in.")
+    parser.add_argument("--dim", type=int, default=settings.VECTOR_DIMENSION, help="Dimensión del stand-in / vectores sintéticos.")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[settings.RAG_TOP_K])
+    parser.add_argument("--hnsw-ef", type=int, nargs="+", default=[], help="Valores de hnsw_ef (además del default del servidor).")
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[], help="Oversampling de cuantización (colecciones cuantizadas).")
+    parser.add_argument("--rescore", nargs="+", choices=sorted(RESCORE_CHOICES), default=["default"])
+    parser.add_argument("--repeats", type=int, default=3, help="Repeticiones de cada query para las latencias.")
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    parser.add_argument("--choose-top-k", type=int, default=None, help="top_k para el que se elige (default: el primero de --top-k).")
+    parser.add_argument("--write-env", type=Path, default=None, help="Escribe la combinación elegida en este .env.")
+    args = parser.parse_args()
+
+    if args.standin:
+        client = await _standin_client(args.points, args.dim)
+        args.collection = STANDIN_COLLECTION
+    else:
+        client = qdrant_service._get_qdrant_client()
+        if client is None:
+            raise SystemExit("Cliente Qdrant no disponible.")
+    try:
+        vectors = await _query_vectors(args, args.dim)
+        grid = search_tuning.parameter_grid(
+            args.top_k,
+            hnsw_efs=[None, *args.hnsw_ef],
+            oversamplings=[None, *args.oversampling],
+            rescores=[RESCORE_CHOICES[r] for r in args.rescore],
+        )
+        print(f"{len(vectors)} queries, {len(grid)} combinaciones, colección '{args.collection}'")
+        results = await search_tuning.sweep(client, args.collection, vectors, grid, repeats=args.repeats)
+    finally:
+        if args.standin:
+            await client.close()
+        else:
+            await qdrant_service.close_client()
+
+    print(f"{'top_k':>5} {'parámetros':<28} {'recall':>7} {'p50':>9} {'p99':>9}")
+    for r in results:
+        print(f"{r['top_k']:>5} {search_tuning.describe(r):<28} {r['recall']:>7.3f} {r['p50_ms']:>7.2f}ms {r['p99_ms']:>7.2f}ms")
+
+    choose_top_k = args.choose_top_k if args.choose_top_k is not None else args.top_k[0]
+    best = search_tuning.choose_best(results, args.min_recall, top_k=choose_top_k)
+    if best is None:
+        print(f"Ninguna combinación alcanza recall {args.min_recall} con top_k={choose_top_k}.")
+        return 1
+    values = search_tuning.settings_for(best)
+    print(f"Elegida: top_k={best['top_k']} {search_tuning.describe(best)} (recall {best['recall']:.3f}, p99 {best['p99_ms']:.2f}ms)")
+    for key, value in values.items():
+        print(f"  {key}={value}")
+    if args.write_env:
+        search_tuning.write_env(args.write_env, values)
+        print(f"Escrito en {args.write_env}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,52 @@
+# tests/api/core/test_import_time.py
+# -*- coding: utf-8 -*-
+
+"""
+Presupuesto de importación: `import app.main` no debe arrastrar librerías
+pesadas (se cargan bajo demanda en el warm-up) y debe mantenerse por debajo
+de IMPORT_TIME_BUDGET_MS (default 1500ms).
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+
+HEAVY_MODULES = (
+    "torch", "sentence_transformers", "transformers", "qdrant_client", "openai",
+    "langchain_mongodb", "langchain_core", "onnxruntime", "tokenizers",
+)
+
+
+def _import_times(module: str) -> Dict[str, int]:
+    """Ejecuta `python -X importtime -c 'import <module>'` y devuelve {módulo: µs acumulados}."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    times: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cumulative, name = line.split("|")
+            times[name.strip()] = int(cumulative.strip())
+        except ValueError:
+            continue # Cabecera "self [us] | cumulative | imported package"
+    return times
+
+
+def test_app_import_skips_heavy_modules_and_fits_budget():
+    times = _import_times("app.main")
+    assert "app.main" in times
+
+    loaded_heavy = sorted({name.split(".")[0] for name in times} & set(HEAVY_MODULES))
+    assert not loaded_heavy, f"Importar app.main cargó librerías pesadas: {loaded_heavy}"
+
+    budget_ms = float(os.environ.get("IMPORT_TIME_BUDGET_MS", "1500"))
+    elapsed_ms = times["app.main"] / 1000.0
+    assert elapsed_ms < budget_ms, f"import app.main tardó {elapsed_ms:.0f}ms (presupuesto {budget_ms:.0f}ms)"
@@ -0,0 +1,54 @@
+# tests/api/endpoints/test_admin.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas de los endpoints de administración (app.api.v1.endpoints.admin).
+"""
+
+import pytest
+from httpx import AsyncClient
+from fastapi import status
+from unittest.mock import AsyncMock
+
+TEST_API_KEY = "test-api-key-123"
+HEADERS = {"Authorization": f"Bearer {TEST_API_KEY}"}
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_purge_response_caches(client: AsyncClient, mocker):
+    mocker.patch("app.api.deps.verify_api_key", return_value=TEST_API_KEY, new_callable=AsyncMock)
+    purge = mocker.patch("app.services.rag_pipeline.purge_response_cache", return_value={"memory": 3, "disk": 5})
+    clear = mocker.patch("app.services.rag_pipeline.clear_answer_cache", return_value=2)
+
+    response = await client.delete("/api/v1/admin/cache/responses", headers=HEADERS)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"purged": {"response_cache": {"memory": 3, "disk": 5}, "answer_cache": 2}}
+    purge.assert_called_once_with()
+    clear.assert_called_once_with()
+
+
+async def test_response_cache_stats(client: AsyncClient, mocker):
+    mocker.patch("app.api.deps.verify_api_key", return_value=TEST_API_KEY, new_callable=AsyncMock)
+
+    response = await client.get("/api/v1/admin/cache/responses", headers=HEADERS)
+
+    assert response.status_code == status.HTTP_200_OK
+    body = response.json()
+    assert {"hits", "memory_hits", "disk_hits", "misses", "hit_rate"} <= set(body["response_cache"])
+    assert "hit_rate" in body["answer_cache"]
+
+
+async def test_single_flight_stats(client: AsyncClient, mocker):
+    mocker.patch("app.api.deps.verify_api_key", return_value=TEST_API_KEY, new_callable=AsyncMock)
+
+    response = await client.get("/api/v1/admin/single-flight", headers=HEADERS)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert {"embed_query", "search_documents", "call_llm"} <= set(response.json())
+
+
+async def test_admin_requires_api_key(client: AsyncClient):
+    response = await client.delete("/api/v1/admin/cache/responses")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
@@ -127,4 +127,39 @@ async def test_chat_endpoint_rag_service_error(client: AsyncClient, mocker):
     assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
     json_response = response.json()
     assert "detail" in json_response
-    assert "Ocurrió un error interno" in json_response["detail"]
\ No newline at end of file
+    assert "Ocurrió un error interno" in json_response["detail"]
+
+async def test_chat_stream_endpoint_emits_sse_events(client: AsyncClient, mocker):
+    """Prueba que POST /api/v1/chat/stream emite los eventos del pipeline como SSE."""
+    mocker.patch("app.api.deps.verify_api_key", return_value=TEST_API_KEY, new_callable=AsyncMock)
+
+    async def fake_stream(question, session_id):
+        yield {"event": "sources", "sources": MOCKED_RAG_RESPONSE["sources"]}
+        yield {"event": "delta", "text": "Respuesta "}
+        yield {"event": "delta", "text": "simulada."}
+        yield {"event": "done", "answer": "Respuesta simulada.", "sources": MOCKED_RAG_RESPONSE["sources"]}
+
+    mocker.patch("app.services.rag_pipeline.generate_response_stream", side_effect=fake_stream)
+
+    response = await client.post("/api/v1/chat/stream", json=VALID_CHAT_PAYLOAD, headers=HEADERS)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    assert [lines[0] for lines in events] == ["event: sources", "event: delta", "event: delta", "event: done"]
+    assert events[1][1] == 'data: {"text": "Respuesta "}'
+    assert '"answer": "Respuesta simulada."' in events[3][1]
+
+
+async def test_chat_stream_endpoint_reports_errors_as_event(client: AsyncClient, mocker):
+    """Un fallo a mitad del stream se informa con un evento 'error' (la respuesta ya empezó con 200)."""
+    mocker.patch("app.api.deps.verify_api_key", return_value=TEST_API_KEY, new_callable=AsyncMock)
+
+    async def failing_stream(question, session_id):
+        yield {"event": "delta", "text": "Hola"}
+        raise RuntimeError("Error simulado en RAG")
+
+    mocker.patch("app.services.rag_pipeline.generate_response_stream", side_effect=failing_stream)
+
+    response = await client.post("/api/v1/chat/stream", json=VALID_CHAT_PAYLOAD, headers=HEADERS)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.text.strip().split("\n\n")[-1].startswith("event: error")
@@ -43,4 +43,57 @@ async def test_get_health_status(client: AsyncClient):
     json_response = response.json()
     assert json_response["status"] == "ok"
     # Verificar que el mensaje sea el esperado para /health
-    assert json_response["message"] == "API healthy."
\ No newline at end of file
+    assert json_response["message"] == "API healthy."
+
+async def test_get_ready_status_before_and_after_warmup(client: AsyncClient):
+    """Verifica que GET /ready responda 503 hasta que el warm-up termine."""
+    from app.services import warmup_service
+
+    async def _ok():
+        return None
+
+    async def _fail():
+        raise ConnectionError("sin conexión")
+
+    warmup_service.reset()
+    response = await client.get("/ready")
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    # Un componente requerido falla -> sigue en 503 con el detalle
+    assert await warmup_service.run_warmup({"embeddings": _ok, "qdrant": _fail}, max_attempts=1) is False
+    response = await client.get("/ready")
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()["checks"]["qdrant"].startswith("error")
+
+    # Componentes opcionales (llm) pueden fallar sin bloquear el readiness
+    assert await warmup_service.run_warmup({"embeddings": _ok, "qdrant": _ok, "llm": _fail}) is True
+    response = await client.get("/ready")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["status"] == "ok"
+    warmup_service.reset()
+
+async def test_ready_recovers_after_failed_warmup_retry(client: AsyncClient):
+    """Verifica que un componente requerido que falla se reintente y /ready pase de 503 a 200."""
+    from app.services import warmup_service
+
+    calls = {"embeddings": 0, "qdrant": 0}
+    seen = []
+
+    async def _embeddings():
+        calls["embeddings"] += 1
+
+    async def _qdrant():
+        calls["qdrant"] += 1
+        if calls["qdrant"] == 1:
+            seen.append(None)
+            raise ConnectionError("sin conexión")
+        seen.append((await client.get("/ready")).status_code) # Antes del reintento exitoso
+
+    warmup_service.reset()
+    assert await warmup_service.run_warmup({"embeddings": _embeddings, "qdrant": _qdrant}, retry_initial_seconds=0.01) is True
+    assert seen == [None, status.HTTP_503_SERVICE_UNAVAILABLE] # Entre intentos estaba en 'failed'
+    assert calls == {"embeddings": 1, "qdrant": 2} # Solo se reintenta lo que falló
+    response = await client.get("/ready")
+    assert response.status_code == status.HTTP_200_OK
+    assert warmup_service.get_readiness()["attempts"] == 2
+    warmup_service.reset()
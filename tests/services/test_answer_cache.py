@@ -0,0 +1,152 @@
+# tests/services/test_answer_cache.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas de SemanticAnswerCache y de su uso en rag_pipeline: paráfrasis con las
+mismas fuentes no llaman al LLM.
+"""
+
+import numpy as np
+import pytest
+
+from app.services import llm_service, rag_pipeline
+from app.services.answer_cache import SemanticAnswerCache
+
+BASE = np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float32)
+PARAPHRASE = np.array([0.98, 0.1, 0.0, 0.0], dtype=np.float32) # coseno ≈ 0.995
+OTHER = np.array([0.0, 1.0, 0.0, 0.0], dtype=np.float32)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hit_requires_similarity_and_same_sources():
+    cache = SemanticAnswerCache(max_size=4, ttl_seconds=0, similarity_threshold=0.97)
+    cache.set(BASE, ["FAQ-1", "FAQ-2"], "Respuesta", [{"source_id": "FAQ-1"}], version=0)
+
+    hit = cache.get(PARAPHRASE, ["FAQ-1", "FAQ-2"], version=0)
+    assert hit["answer"] == "Respuesta" and hit["similarity"] > 0.97
+    assert cache.get(PARAPHRASE, ["FAQ-2", "FAQ-1"], version=0) is None # Otro orden de fuentes
+    assert cache.get(OTHER, ["FAQ-1", "FAQ-2"], version=0) is None
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["source_mismatches"]) == (1, 2, 1)
+
+
+def test_ttl_lru_and_version_invalidation():
+    clock = FakeClock()
+    cache = SemanticAnswerCache(max_size=2, ttl_seconds=10, similarity_threshold=0.99, clock=clock)
+    vectors = np.eye(4, dtype=np.float32)
+    cache.set(vectors[0], ["a"], "A", [], version=1)
+    cache.set(vectors[1], ["b"], "B", [], version=1)
+    assert cache.get(vectors[0], ["a"], version=1)["answer"] == "A" # 'a' pasa a ser la más reciente
+    cache.set(vectors[2], ["c"], "C", [], version=1) # Expulsa 'b'
+    assert cache.get(vectors[1], ["b"], version=1) is None
+    assert len(cache) == 2 and cache.get_stats()["evictions"] == 1
+
+    cache.set(vectors[2], ["c"], "C2", [], version=1) # Reemplaza, no duplica
+    assert len(cache) == 2 and cache.get(vectors[2], ["c"], version=1)["answer"] == "C2"
+
+    clock.now = 11.0
+    assert cache.get(vectors[0], ["a"], version=1) is None
+    assert cache.get_stats()["expirations"] == 1
+
+    assert cache.get(vectors[2], ["c"], version=2) is None # Reindexado: todo se descarta
+    assert len(cache) == 0 and cache.get_stats()["invalidations"] == 1
+
+
+def test_disabled_and_invalid_threshold():
+    cache = SemanticAnswerCache(max_size=0, ttl_seconds=0, similarity_threshold=0.9)
+    cache.set(BASE, ["a"], "A", [])
+    assert cache.get(BASE, ["a"]) is None and len(cache) == 0
+    with pytest.raises(ValueError):
+        SemanticAnswerCache(max_size=1, ttl_seconds=0, similarity_threshold=0.0)
+
+
+async def test_pipeline_serves_paraphrase_without_llm(monkeypatch):
+    vectors = {"¿Cómo activo MiAdminXML?": BASE, "¿Cómo se activa MiAdminXML?": PARAPHRASE, "¿Y con historial?": BASE}
+    llm_calls = []
+
+    async def no_priority(question):
+        return None
+
+    async def embed_query(question):
+        return vectors[question]
+
+    async def search_documents(vector, top_k):
+        return [{"id": "p1", "score": 0.9, "payload": {"source_id": "FAQ-1", "text": "Ayuda > Activar."}}]
+
+    async def call_llm_completion(messages, temperature=0.5, max_tokens=1500):
+        llm_calls.append(messages)
+        return llm_service.LLMCompletion("Entra a **Ayuda > Activar**.", "stop")
+
+    async def get_chat_history(session_id, max_messages=6):
+        return [type("Msg", (), {"type": "human", "content": "hola"})()] if session_id == "con-historial" else []
+
+    async def add_chat_messages(session_id, human, ai):
+        pass
+
+    monkeypatch.setattr(rag_pipeline.priority_context_service, "find_priority_answer", no_priority)
+    monkeypatch.setattr(rag_pipeline.embedding_service, "embed_query", embed_query)
+    monkeypatch.setattr(rag_pipeline.qdrant_service, "search_documents", search_documents)
+    monkeypatch.setattr(rag_pipeline.hybrid_retrieval, "hybrid_enabled", lambda: False)
+    monkeypatch.setattr(rag_pipeline.llm_service, "call_llm_completion", call_llm_completion)
+    monkeypatch.setattr(rag_pipeline.history_service, "get_chat_history", get_chat_history)
+    monkeypatch.setattr(rag_pipeline.history_service, "add_chat_messages", add_chat_messages)
+    monkeypatch.setattr(rag_pipeline.settings, "MONGO_URI", "mongodb://test")
+    monkeypatch.setattr(rag_pipeline, "_answer_cache", SemanticAnswerCache(max_size=8, ttl_seconds=0, similarity_threshold=0.97))
+
+    first = await rag_pipeline.generate_response("¿Cómo activo MiAdminXML?", "s1")
+    second = await rag_pipeline.generate_response("¿Cómo se activa MiAdminXML?", "s2")
+    assert first["answer"] == second["answer"] == "Entra a <b>Ayuda > Activar</b>."
+    assert second["sources"][0].source_id == "FAQ-1"
+    assert len(llm_calls) == 1
+
+    await rag_pipeline.generate_response("¿Y con historial?", "con-historial") # Con historial no se usa la caché
+    assert len(llm_calls) == 2
+    assert rag_pipeline.get_answer_cache_stats()["hits"] == 1
+
+
+async def test_cut_stream_does_not_feed_semantic_cache(monkeypatch):
+    async def no_priority(question):
+        return None
+
+    async def embed_query(question):
+        return BASE
+
+    async def search_documents(vector, top_k):
+        return [{"id": "p1", "score": 0.9, "payload": {"source_id": "FAQ-1", "text": "Ayuda > Activar."}}]
+
+    async def get_chat_history(session_id, max_messages=6):
+        return []
+
+    class TruncatedStream: # Como LLMStream cortado por max_tokens
+        finish_reason = None
+
+        async def _deltas(self):
+            yield "Entra a Ayuda.\n"
+            self.finish_reason = "length"
+
+        def __aiter__(self):
+            return self._deltas()
+
+    def truncated_stream(messages, temperature=0.5, max_tokens=1500):
+        return TruncatedStream()
+
+    monkeypatch.setattr(rag_pipeline.priority_context_service, "find_priority_answer", no_priority)
+    monkeypatch.setattr(rag_pipeline.embedding_service, "embed_query", embed_query)
+    monkeypatch.setattr(rag_pipeline.qdrant_service, "search_documents", search_documents)
+    monkeypatch.setattr(rag_pipeline.hybrid_retrieval, "hybrid_enabled", lambda: False)
+    monkeypatch.setattr(rag_pipeline.llm_service, "call_llm_stream", truncated_stream)
+    monkeypatch.setattr(rag_pipeline.history_service, "get_chat_history", get_chat_history)
+    monkeypatch.setattr(rag_pipeline.settings, "MONGO_URI", None)
+    cache = SemanticAnswerCache(max_size=8, ttl_seconds=0, similarity_threshold=0.97)
+    monkeypatch.setattr(rag_pipeline, "_answer_cache", cache)
+
+    events = [e async for e in rag_pipeline.generate_response_stream("¿Cómo activo MiAdminXML?", "s1")]
+    assert events[-1]["event"] == "done" and events[-1]["incomplete"] is True
+    assert len(cache) == 0
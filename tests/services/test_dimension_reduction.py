@@ -0,0 +1,78 @@
+# tests/services/test_dimension_reduction.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas para la reducción de dimensión de embeddings
+(app.services.dimension_reduction).
+"""
+
+import numpy as np
+import pytest
+
+from app.services.dimension_reduction import (
+    DimensionReducer,
+    effective_vector_dimension,
+    fit_pca,
+    recall_at_k,
+)
+
+
+def _low_rank_sample(n: int = 200, dim: int = 32, rank: int = 4, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return (rng.normal(size=(n, rank)) @ rng.normal(size=(rank, dim))).astype(np.float32)
+
+
+def test_pca_preserves_neighbours_of_low_rank_data_and_roundtrips(tmp_path):
+    sample = _low_rank_sample()
+    reducer = fit_pca(sample, output_dim=4, model_name="model-a")
+    reduced = reducer.transform(sample)
+
+    assert reduced.shape == (200, 4)
+    assert reduced.dtype == np.float32
+    assert np.allclose(np.linalg.norm(reduced, axis=1), 1.0, atol=1e-5)
+    assert recall_at_k(sample[20:], sample[:20], reduced[20:], reduced[:20], k=5) > 0.95
+
+    loaded = DimensionReducer.load(reducer.save(tmp_path / "pca.npz"))
+    assert (loaded.mode, loaded.output_dim, loaded.model_name) == ("pca", 4, "model-a")
+    assert np.allclose(loaded.transform(sample[0]), reduced[0], atol=1e-5)
+
+
+def test_truncate_keeps_prefix_and_renormalizes():
+    reducer = DimensionReducer("truncate", input_dim=4, output_dim=2)
+    out = reducer.transform(np.array([3.0, 4.0, 9.0, 9.0], dtype=np.float32))
+    assert np.allclose(out, [0.6, 0.8])
+    with pytest.raises(ValueError):
+        DimensionReducer("truncate", input_dim=4, output_dim=4)
+
+
+def test_effective_vector_dimension():
+    class S:
+        VECTOR_DIMENSION = 384
+        EMBEDDING_REDUCTION = "none"
+        EMBEDDING_REDUCED_DIMENSION = 128
+
+    assert effective_vector_dimension(S()) == 384
+    S.EMBEDDING_REDUCTION = "pca"
+    assert effective_vector_dimension(S()) == 128
+
+
+def test_refit_at_same_dimension_changes_embedding_cache_tag(tmp_path, monkeypatch):
+    from app.services import embedding_service
+
+    pca_path = tmp_path / "pca.npz"
+    monkeypatch.setattr(embedding_service.settings, "EMBEDDING_REDUCTION", "pca", raising=False)
+    monkeypatch.setattr(embedding_service.settings, "EMBEDDING_PCA_PATH", str(pca_path), raising=False)
+    monkeypatch.setattr(embedding_service.settings, "VECTOR_DIMENSION", 32, raising=False)
+    monkeypatch.setattr(embedding_service.settings, "EMBEDDING_REDUCED_DIMENSION", 4, raising=False)
+
+    tags = []
+    for seed in (0, 1):
+        reducer = fit_pca(_low_rank_sample(seed=seed), output_dim=4)
+        reducer.save(pca_path)
+        embedding_service.get_dimension_reducer.cache_clear()
+        assert DimensionReducer.load(pca_path).fingerprint == reducer.fingerprint
+        tags.append(embedding_service._model_tag())
+    embedding_service.get_dimension_reducer.cache_clear()
+
+    assert tags[0][1] == tags[1][1] == 4
+    assert tags[0][0] != tags[1][0]
@@ -0,0 +1,57 @@
+# tests/services/test_embed_queries.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas para la codificación en lote de embedding_service
+(embed_queries / iter_embed_queries).
+"""
+
+import numpy as np
+import pytest
+
+from app.services import embedding_service
+
+pytestmark = pytest.mark.asyncio
+
+DIM = 3
+
+
+@pytest.fixture
+def fake_encoder(monkeypatch):
+    """Sustituye el ejecutor por uno que codifica cada texto como [len, len, len]."""
+    calls = []
+
+    async def _fake_encode_batch(texts, reduce=True):
+        calls.append(list(texts))
+        return np.array([[len(t)] * DIM for t in texts], dtype=np.float32)
+
+    monkeypatch.setattr(embedding_service, "_encode_batch", _fake_encode_batch)
+    monkeypatch.setattr(embedding_service, "_model_tag", lambda: ("fake-model", DIM))
+    return calls
+
+
+async def test_embed_queries_sorts_by_length_and_keeps_input_order(fake_encoder):
+    texts = ["aaaa", "a", "aaaaaaa", "aa", "aaaaa"]
+    matrix = await embedding_service.embed_queries(texts, chunk_size=2)
+
+    assert matrix.shape == (5, DIM)
+    assert matrix.dtype == np.float32
+    assert matrix[:, 0].tolist() == [4, 1, 7, 2, 5]
+    # Bloques de textos de longitud similar
+    assert fake_encoder == [["a", "aa"], ["aaaa", "aaaaa"], ["aaaaaaa"]]
+
+
+async def test_iter_embed_queries_matches_embed_queries(fake_encoder):
+    texts = [("x" * (i % 7 + 1)) for i in range(23)]
+    chunks = [m async for m in embedding_service.iter_embed_queries(iter(texts), chunk_size=4, window_chunks=2)]
+
+    assert [m.shape[0] for m in chunks] == [8, 8, 7]
+    full = await embedding_service.embed_queries(texts, chunk_size=4)
+    assert np.array_equal(np.vstack(chunks), full)
+
+
+async def test_embed_queries_rejects_invalid_texts(fake_encoder):
+    with pytest.raises(ValueError):
+        await embedding_service.embed_queries(["ok", ""])
+    empty = await embedding_service.embed_queries([])
+    assert empty.shape == (0, DIM)
@@ -0,0 +1,69 @@
+# tests/services/test_embedding_batcher.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas para el coalescedor de embeddings (app.services.embedding_batcher).
+"""
+
+import asyncio
+import pytest
+import numpy as np
+
+from app.services.embedding_batcher import EmbeddingBatcher
+
+pytestmark = pytest.mark.asyncio
+
+
+class FakeEncoder:
+    """Codificador falso: cada texto se convierte en [len(texto), índice de lote]."""
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, texts):
+        self.calls.append(list(texts))
+        batch_id = len(self.calls)
+        return np.array([[len(t), batch_id] for t in texts], dtype=np.float32)
+
+
+async def test_concurrent_queries_are_coalesced_into_one_batch():
+    """Peticiones dentro de la ventana deben ir en una sola llamada y volver a su llamador."""
+    encoder = FakeEncoder()
+    batcher = EmbeddingBatcher(encoder, window_ms=20, max_batch_size=16)
+
+    texts = ["a", "bb", "ccc", "dddd"]
+    results = await asyncio.gather(*(batcher.submit(t) for t in texts))
+
+    assert len(encoder.calls) == 1
+    assert encoder.calls[0] == texts
+    for text, row in zip(texts, results):
+        assert row[0] == len(text)
+
+    stats = batcher.get_stats()
+    assert stats["total_batches"] == 1
+    assert stats["total_items"] == 4
+    assert stats["batch_size_histogram"] == {4: 1}
+    assert stats["queue_wait_ms_p99"] >= 0.0
+
+
+async def test_max_batch_size_splits_bursts():
+    """Una ráfaga mayor que max_batch_size se reparte en varios lotes."""
+    encoder = FakeEncoder()
+    batcher = EmbeddingBatcher(encoder, window_ms=1000, max_batch_size=3)
+
+    texts = [f"q{i}" for i in range(7)]
+    results = await asyncio.wait_for(asyncio.gather(*(batcher.submit(t) for t in texts)), timeout=2)
+
+    assert [len(c) for c in encoder.calls] == [3, 3, 1]
+    assert len(results) == 7
+    assert batcher.get_stats()["max_batch_size_seen"] == 3
+
+
+async def test_encode_errors_propagate_to_every_caller():
+    """Si la codificación del lote falla, todos los llamadores reciben la excepción."""
+    async def failing_encoder(texts):
+        raise RuntimeError("modelo caído")
+
+    batcher = EmbeddingBatcher(failing_encoder, window_ms=5, max_batch_size=8)
+    results = await asyncio.gather(batcher.submit("x"), batcher.submit("y"), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
@@ -0,0 +1,83 @@
+# tests/services/test_embedding_cache.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas para la caché LRU+TTL (app.services.ttl_cache) y la caché de
+embeddings de queries (app.services.embedding_cache).
+"""
+
+import numpy as np
+
+from app.services.ttl_cache import TTLCache
+from app.services.embedding_cache import EmbeddingCache, normalize_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_query_folds_case_accents_and_whitespace():
+    assert normalize_query("  Cómo   activo\tMiAdminXML ") == "como activo miadminxml"
+    assert normalize_query("HOLA") == normalize_query("hola")
+    assert normalize_query("¿Qué es CFDI?") == "¿que es cfdi?"
+
+
+def test_ttl_cache_lru_eviction_and_counters():
+    cache = TTLCache(max_size=2, ttl_seconds=0)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1 # "a" pasa a ser la más reciente
+    cache.set("c", 3) # Expulsa "b"
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    stats = cache.get_stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+
+
+def test_ttl_cache_expires_entries():
+    clock = FakeClock()
+    cache = TTLCache(max_size=10, ttl_seconds=60, clock=clock)
+    cache.set("k", "v")
+    clock.now = 59
+    assert cache.get("k") == "v"
+    clock.now = 121
+    assert cache.get("k") is None
+    assert cache.get_stats()["expirations"] == 1
+
+
+def test_embedding_cache_hits_on_normalized_query():
+    cache = EmbeddingCache(max_size=10, ttl_seconds=0)
+    tag = ("model-a", 3)
+    cache.set("No descarga mis XML", np.ones(3, dtype=np.float32), tag)
+
+    hit = cache.get("no   descarga mis xml", tag)
+    assert hit is not None
+    assert hit.dtype == np.float32
+
+
+def test_embedding_cache_invalidated_on_model_change():
+    cache = EmbeddingCache(max_size=10, ttl_seconds=0)
+    cache.set("hola", np.zeros(3, dtype=np.float32), ("model-a", 3))
+
+    assert cache.get("hola", ("model-b", 3)) is None
+    assert len(cache) == 0
+    assert cache.get_stats()["invalidations"] == 1
+
+
+async def test_embed_query_cache_hit_returns_float32_array(monkeypatch):
+    from app.services import embedding_service
+
+    cache = EmbeddingCache(max_size=10, ttl_seconds=0)
+    cache.set("hola", np.ones(3, dtype=np.float32), embedding_service._model_tag())
+    monkeypatch.setattr(embedding_service, "_embedding_cache", cache)
+
+    vector = await embedding_service.embed_query("Hola")
+    assert isinstance(vector, np.ndarray)
+    assert vector.dtype == np.float32
@@ -0,0 +1,79 @@
+# tests/services/test_embedding_process_pool.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas de app.services.embedding_process_pool con un modelo falso: el paquete
+`sentence_transformers` se sustituye por uno mínimo en sys.path, que también
+ven los workers 'spawn' (heredan sys.path del proceso principal).
+"""
+
+import sys
+import textwrap
+
+import numpy as np
+import pytest
+
+from app.services import embedding_process_pool
+from app.services.embedding_process_pool import EmbeddingProcessPool
+
+TEXTS = ["hola", "¿Cómo activo MiAdminXML?", "xml"]
+
+FAKE_MODULE = '''
+import numpy as np
+
+
+class SentenceTransformer:
+    """Modelo falso: fila = (longitud del texto, primer carácter, 1.0) en float64."""
+
+    def __init__(self, model_name_or_path, device):
+        self.model_name = model_name_or_path
+
+    def encode(self, texts, batch_size, show_progress_bar, convert_to_numpy):
+        return np.array([[len(t), ord(t[0]), 1.0] for t in texts], dtype=np.float64)
+'''
+
+
+def _expected(texts):
+    return np.array([[len(t), ord(t[0]), 1.0] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def fake_sentence_transformers(tmp_path, monkeypatch):
+    package = tmp_path / "sentence_transformers"
+    package.mkdir()
+    (package / "__init__.py").write_text(textwrap.dedent(FAKE_MODULE), encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "sentence_transformers", raising=False)
+    monkeypatch.setattr(embedding_process_pool, "_worker_model", None)
+
+
+def test_worker_encode_returns_float32_buffer_in_row_order(fake_sentence_transformers):
+    with pytest.raises(RuntimeError):
+        embedding_process_pool._encode_in_worker(TEXTS)
+
+    embedding_process_pool._init_worker("modelo-falso", "cpu", 0)
+    buffer, rows, dim = embedding_process_pool._encode_in_worker(TEXTS)
+
+    assert (rows, dim) == (3, 3)
+    matrix = np.frombuffer(buffer, dtype=np.float32).reshape(rows, dim)
+    np.testing.assert_array_equal(matrix, _expected(TEXTS))
+
+
+async def test_pool_encodes_in_spawned_worker_and_shuts_down(fake_sentence_transformers):
+    with pytest.raises(ValueError):
+        EmbeddingProcessPool(workers=0, model_name="modelo-falso")
+
+    pool = EmbeddingProcessPool(workers=1, model_name="modelo-falso", torch_threads=1)
+    try:
+        await pool.warm_up()
+        matrix = await pool.encode(TEXTS)
+        assert matrix.dtype == np.float32 and matrix.shape == (3, 3)
+        np.testing.assert_array_equal(matrix, _expected(TEXTS))
+
+        single = await pool.encode(TEXTS[1:2])
+        np.testing.assert_array_equal(single, _expected(TEXTS[1:2]))
+    finally:
+        pool.shutdown()
+
+    with pytest.raises(RuntimeError): # Ya no admite trabajos
+        await pool.encode(TEXTS)
@@ -0,0 +1,56 @@
+# tests/services/test_embedding_store.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas para el almacén de embeddings mmap compartido
+(app.services.embedding_store).
+"""
+
+import numpy as np
+
+from app.services.embedding_store import EmbeddingStore
+
+
+def _vector(value: float, dim: int = 4) -> np.ndarray:
+    return np.full(dim, value, dtype=np.float32)
+
+
+def test_store_shared_between_instances_and_persistent(tmp_path):
+    path = tmp_path / "store.bin"
+    tag = ("model-a", 4)
+    writer = EmbeddingStore(path, "model-a", 4, capacity=16)
+    reader = EmbeddingStore(path, "model-a", 4, capacity=16) # Otro "worker" con su propio mmap
+
+    assert writer.set("¿Cómo activo MiAdminXML?", _vector(0.5), tag) is True
+    hit = reader.get("¿como  ACTIVO miadminxml?", tag)
+    assert hit is not None and hit.dtype == np.float32
+    assert np.allclose(hit, 0.5)
+    writer.close(); reader.close()
+
+    reopened = EmbeddingStore(path, "model-a", 4, capacity=16)
+    assert len(reopened) == 1
+    assert reopened.get("¿Cómo activo MiAdminXML?", tag) is not None
+    reopened.close()
+
+
+def test_store_never_serves_vectors_from_another_model(tmp_path):
+    path = tmp_path / "store.bin"
+    store = EmbeddingStore(path, "model-a", 4, capacity=16)
+    store.set("hola", _vector(1.0), ("model-a", 4))
+    assert store.get("hola", ("model-b", 4)) is None
+    store.close()
+
+    # Abrir con otro modelo recrea el archivo
+    other = EmbeddingStore(path, "model-b", 4, capacity=16)
+    assert len(other) == 0
+    assert other.get("hola", ("model-b", 4)) is None
+    other.close()
+
+
+def test_store_stops_accepting_entries_when_full(tmp_path):
+    store = EmbeddingStore(tmp_path / "store.bin", "model-a", 4, capacity=4)
+    tag = ("model-a", 4)
+    written = [store.set(f"pregunta {i}", _vector(float(i)), tag) for i in range(6)]
+    assert written == [True, True, True, False, False, False]
+    assert all(np.allclose(store.get(f"pregunta {i}", tag), float(i)) for i in range(3))
+    store.close()
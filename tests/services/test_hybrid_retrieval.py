@@ -0,0 +1,89 @@
+# tests/services/test_hybrid_retrieval.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas para el índice BM25 (app.services.bm25_index) y la recuperación
+híbrida con reciprocal-rank fusion (app.services.hybrid_retrieval).
+"""
+
+import asyncio
+
+import numpy as np
+
+from app.services import hybrid_retrieval
+from app.services.bm25_index import BM25Index, tokenize
+from app.services.hybrid_retrieval import reciprocal_rank_fusion
+
+POINTS = [
+    (1, {"source_id": "faq-1", "question": "¿Cómo activo MiAdminXML?", "text": "Entra a Licencias y captura tu clave de activación."}),
+    (2, {"source_id": "faq-2", "question": "¿Cómo cancelo un CFDI?", "answer_full": "Desde el portal del SAT selecciona el CFDI y cancélalo."}),
+    (3, {"source_id": "faq-3", "text": "El error E-1043 aparece cuando la e.firma está vencida."}),
+    (4, {"source_id": "faq-4", "text": "Para descargar tus XML configura la contraseña del SAT."}),
+]
+
+
+def test_tokenize_normalizes_and_keeps_codes():
+    assert tokenize("¿Qué es el CFDI 4.0 de MiAdminXML?") == ["cfdi", "4", "0", "miadminxml"]
+    assert tokenize("Error E-1043 en la e.firma") == ["error", "1043", "firma"]
+
+
+def test_bm25_ranks_exact_terms_first():
+    index = BM25Index.from_points(POINTS)
+
+    results = index.search("no puedo activar miadminxml", top_k=3)
+    assert [r["id"] for r in results] == [1]
+    assert results[0]["payload"] == {"source_id": "faq-1", "text": "Entra a Licencias y captura tu clave de activación."}
+
+    assert index.search("me sale el E-1043", top_k=3)[0]["id"] == 3
+    assert [r["id"] for r in index.search("cfdi sat", top_k=2)] == [2, 4]
+    assert index.search("nada relacionado", top_k=3) == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    dense = [{"id": "a", "score": 0.9, "payload": {"x": 1}}, {"id": "b", "score": 0.8}, {"id": "c", "score": 0.7}]
+    sparse = [{"id": "c", "score": 12.0, "payload": {"y": 1}}, {"id": "d", "score": 3.0}]
+
+    fused = reciprocal_rank_fusion({"dense": dense, "bm25": sparse}, top_k=3, k=60)
+    assert [r["id"] for r in fused] == ["c", "a", "b"] # Empate b/d: gana la lista anterior
+    assert fused[0]["ranks"] == {"dense": 3, "bm25": 1}
+    assert fused[0]["payload"] == {} # Payload de la primera lista que trae el id (dense, sin payload)
+    assert np.isclose(fused[0]["score"], 1 / 63 + 1 / 61)
+
+
+async def test_retrieve_runs_retrievers_concurrently_and_reports_latency(monkeypatch):
+    async def fake_embed(question):
+        await asyncio.sleep(0.05)
+        return np.ones(4, dtype=np.float32)
+
+    async def fake_search(vector, top_k):
+        await asyncio.sleep(0.05)
+        return [{"id": 4, "score": 0.9, "payload": dict(POINTS[3][1])}]
+
+    index = BM25Index.from_points(POINTS)
+
+    async def slow_sparse(question, candidates):
+        await asyncio.sleep(0.1)
+        return index.search(question, candidates)
+
+    monkeypatch.setattr(hybrid_retrieval.embedding_service, "embed_query", fake_embed)
+    monkeypatch.setattr(hybrid_retrieval.qdrant_service, "search_documents", fake_search)
+    monkeypatch.setattr(hybrid_retrieval, "_sparse", slow_sparse)
+
+    results, timings = await hybrid_retrieval.retrieve("error E-1043 al descargar XML", top_k=2)
+
+    assert {r["id"] for r in results} == {3, 4}
+    assert results[0]["id"] == 4 # Aparece en ambas listas
+    assert set(timings) >= {"embedding", "dense_search", "dense", "bm25", "fusion", "total"}
+    assert timings["total"] < 180 # En paralelo: ~100ms, no 200ms
+    assert hybrid_retrieval.get_retrieval_stats()["bm25"]["calls"] >= 1
+
+
+async def test_retrieve_falls_back_when_a_retriever_fails(monkeypatch):
+    async def broken_embed(question):
+        raise RuntimeError("modelo no disponible")
+
+    monkeypatch.setattr(hybrid_retrieval.embedding_service, "embed_query", broken_embed)
+    monkeypatch.setattr(hybrid_retrieval, "_bm25_index", BM25Index.from_points(POINTS))
+
+    results, _ = await hybrid_retrieval.retrieve("activar MiAdminXML", top_k=3)
+    assert [r["id"] for r in results] == [1]
@@ -0,0 +1,320 @@
+# tests/services/test_ingestion_service.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas de la ingesta masiva (app.services.ingestion_service): chunking,
+lectura de fuentes y upserts paralelos acotados.
+"""
+
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from app.services import ingestion_service
+from app.services.ingestion_service import chunk_text, iter_chunk_records, iter_source_documents
+
+
+class FakeClient:
+    def __init__(self, fail_after=None):
+        self.upserts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.created = []
+        self.fail_after = fail_after
+
+    async def collection_exists(self, collection_name):
+        return False
+
+    async def create_collection(self, collection_name, vectors_config):
+        self.created.append((collection_name, vectors_config))
+
+    async def upsert(self, collection_name, points, wait):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if self.fail_after is not None and len(self.upserts) >= self.fail_after:
+                raise RuntimeError("Qdrant caído")
+            self.upserts.append(points)
+        finally:
+            self.in_flight -= 1
+
+
+def test_chunk_text_respects_size_and_overlap():
+    text = " ".join(f"palabra{i}" for i in range(300))
+    chunks = chunk_text(text, chunk_size=200, chunk_overlap=50)
+
+    assert len(chunks) > 1
+    assert all(len(c) <= 200 for c in chunks)
+    assert all(not c.startswith(" ") and not c.endswith(" ") for c in chunks)
+    for previous, current in zip(chunks, chunks[1:]):
+        assert previous[-30:].split()[-1] in current # El solape repite el final del chunk anterior
+    assert chunks[0].startswith("palabra0 ") and chunks[-1].endswith("palabra299")
+    assert chunk_text("corto", 200, 50) == ["corto"]
+    with pytest.raises(ValueError):
+        chunk_text(text, chunk_size=100, chunk_overlap=100)
+
+
+def test_iter_source_documents_reads_all_formats(tmp_path):
+    (tmp_path / "manual.md").write_text("# Manual\nInstalación de MiAdminXML.", encoding="utf-8")
+    (tmp_path / "faqs.jsonl").write_text(
+        json.dumps({"id": "faq-1", "question": "¿Cómo cancelo?", "answer": "Desde el portal."}) + "\n\n"
+        + json.dumps({"question": "Sin respuesta"}) + "\n", encoding="utf-8")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "priority.json").write_text(
+        '{\n  "faqs": [\n    // comentario\n    {"q": "Hola", "a": "Hola, soy Kely."}\n  ]\n}', encoding="utf-8")
+    (tmp_path / "ignorado.bin").write_bytes(b"\x00")
+
+    documents = list(iter_source_documents([tmp_path]))
+    assert [d["source_id"] for d in documents] == ["faq-1", "manual.md", "sub/priority.json:0"]
+    assert documents[0]["question"] == "¿Cómo cancelo?"
+    assert documents[2] == {"source_id": "sub/priority.json:0", "text": "Hola, soy Kely.", "question": "Hola"}
+
+
+def test_chunk_records_have_rag_payload_and_stable_ids():
+    documents = [{"source_id": "faq-1", "text": "uno dos tres cuatro cinco seis", "question": "¿Qué?"},
+                 {"source_id": "doc.md", "text": "texto del manual", "question": None}]
+    records = list(iter_chunk_records(documents, chunk_size=12, chunk_overlap=4))
+
+    faq = [r for r in records if r[2]["source_id"] == "faq-1"]
+    assert len(faq) > 1
+    assert faq[0][1].startswith("¿Qué?\n")
+    assert faq[0][2]["answer_chunks"] == [r[2]["text"] for r in faq]
+    assert len(records[-1][2].pop("content_hash")) == 64
+    assert records[-1][2] == {"source_id": "doc.md", "chunk_index": 1, "chunk_count": 2,
+                              "text": "del manual", "answer_chunks": ["del manual"]}
+    assert [r[0] for r in iter_chunk_records(documents, 12, 4)] == [r[0] for r in records]
+
+
+async def test_ingest_upserts_in_bounded_parallel_batches(monkeypatch, tmp_path):
+    source = tmp_path / "faqs.jsonl"
+    source.write_text("\n".join(json.dumps({"id": f"faq-{i}", "q": f"Pregunta {i}", "a": f"Respuesta {i}"}) for i in range(50)),
+                      encoding="utf-8")
+    embedded_windows = []
+
+    async def fake_embed_queries(texts):
+        embedded_windows.append(len(texts))
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+    reindexed = []
+
+    async def fake_reindexed(collection_name):
+        reindexed.append(collection_name)
+
+    monkeypatch.setattr(ingestion_service.embedding_service, "embed_queries", fake_embed_queries)
+    monkeypatch.setattr(ingestion_service.qdrant_service, "on_collection_reindexed", fake_reindexed)
+    monkeypatch.setattr(ingestion_service, "effective_vector_dimension", lambda _settings: 4)
+    client = FakeClient()
+
+    stats = await ingestion_service.ingest([source], collection_name="kelly", client=client,
+                                           embed_batch_size=20, upsert_batch_size=5, parallelism=2)
+
+    assert embedded_windows == [20, 20, 10]
+    assert len(client.upserts) == 10 and sum(len(b) for b in client.upserts) == 50
+    assert client.max_in_flight == 2
+    assert client.created[0][1].size == 4
+    point = client.upserts[0][0]
+    assert point.payload["source_id"].startswith("faq-") and point.payload["answer_chunks"]
+    assert (stats["documents"], stats["chunks"], stats["points"]) == (50, 50, 50)
+    assert stats["documents_per_second"] > 0 and stats["peak_memory_mb"] > 0
+    assert reindexed == ["kelly"]
+
+
+async def test_ingest_stops_when_an_upsert_fails(monkeypatch, tmp_path):
+    source = tmp_path / "doc.txt"
+    source.write_text(" ".join(f"palabra{i}" for i in range(400)), encoding="utf-8")
+
+    async def fake_embed_queries(texts):
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+    monkeypatch.setattr(ingestion_service.embedding_service, "embed_queries", fake_embed_queries)
+    monkeypatch.setattr(ingestion_service, "effective_vector_dimension", lambda _settings: 4)
+
+    with pytest.raises(RuntimeError, match="Qdrant caído"):
+        await ingestion_service.ingest([source], client=FakeClient(fail_after=1), chunk_size=100, chunk_overlap=10,
+                                       embed_batch_size=4, upsert_batch_size=1, parallelism=2)
+
+
+@pytest.fixture
+def memory_qdrant(monkeypatch):
+    qdrant_client = pytest.importorskip("qdrant_client")
+
+    async def fake_embed_queries(texts):
+        embedded.extend(texts)
+        return np.array([[len(t) % 7 + 1.0, 1.0, 0.5, 0.25] for t in texts], dtype=np.float32)
+
+    reindexed = []
+
+    async def fake_reindexed(collection_name):
+        reindexed.append(collection_name)
+
+    embedded = []
+    monkeypatch.setattr(ingestion_service.embedding_service, "embed_queries", fake_embed_queries)
+    monkeypatch.setattr(ingestion_service.qdrant_service, "on_collection_reindexed", fake_reindexed)
+    monkeypatch.setattr(ingestion_service, "effective_vector_dimension", lambda _settings: 4)
+    client = qdrant_client.AsyncQdrantClient(location=":memory:")
+    return client, embedded, reindexed
+
+
+def _write_faqs(path, answers):
+    path.write_text("\n".join(json.dumps({"id": source_id, "q": f"¿{source_id}?", "a": answer})
+                              for source_id, answer in answers.items()), encoding="utf-8")
+
+
+async def _payloads(client, collection_name):
+    points, _ = await client.scroll(collection_name=collection_name, limit=100, with_payload=True)
+    return sorted((p.payload["source_id"], p.payload["chunk_index"], p.payload["text"]) for p in points)
+
+
+async def test_incremental_reindex_only_touches_changed_sources(memory_qdrant, tmp_path):
+    client, embedded, reindexed = memory_qdrant
+    source = tmp_path / "faqs.jsonl"
+    long_answer = " ".join(f"paso{i}" for i in range(40))
+    _write_faqs(source, {"faq-1": "Respuesta uno.", "faq-2": long_answer, "faq-3": "Respuesta tres."})
+    options = {"collection_name": "kb", "client": client, "chunk_size": 100, "chunk_overlap": 20}
+
+    first = await ingestion_service.reindex_incremental([source], **options)
+    assert (first["added"], first["changed"], first["unchanged"]) == (3, 0, 0)
+    long_chunks = len(chunk_text(long_answer, 100, 20))
+    assert long_chunks > 1
+    assert first["points"] == len(embedded) == 2 + long_chunks
+
+    embedded.clear()
+    _write_faqs(source, {"faq-1": "Respuesta uno.", "faq-2": "Ahora es corta.", "faq-4": "Nueva."})
+    second = await ingestion_service.reindex_incremental([source], **options)
+
+    assert (second["added"], second["changed"], second["unchanged"], second["removed"]) == (1, 1, 1, 1)
+    assert len(embedded) == 2 # Solo faq-2 (cambiada) y faq-4 (nueva)
+    assert second["deleted_points"] == (long_chunks - 1) + 1 # Chunks sobrantes de faq-2 + faq-3
+    assert await _payloads(client, "kb") == [("faq-1", 0, "Respuesta uno."), ("faq-2", 0, "Ahora es corta."),
+                                             ("faq-4", 0, "Nueva.")]
+
+    embedded.clear()
+    third = await ingestion_service.reindex_incremental([source], **options)
+    assert (third["unchanged"], third["points"], embedded) == (3, 0, [])
+    assert reindexed == ["kb", "kb"] # Sin cambios no se refrescan los derivados
+
+
+async def test_incremental_reindex_keeps_sources_of_unreadable_files(memory_qdrant, tmp_path):
+    client, _, _ = memory_qdrant
+    faqs, manual = tmp_path / "faqs.jsonl", tmp_path / "manual.md"
+    _write_faqs(faqs, {"faq-1": "Respuesta uno.", "faq-2": "Respuesta dos."})
+    manual.write_text("Guía de activación.", encoding="utf-8")
+    options = {"collection_name": "kb", "client": client}
+    await ingestion_service.reindex_incremental([faqs, manual], **options)
+
+    faqs.write_text(faqs.read_text(encoding="utf-8") + "\n{no es json", encoding="utf-8") # Línea corrupta
+    manual.unlink() # Esta fuente sí se eliminó
+    stats = await ingestion_service.reindex_incremental([faqs], **options)
+    assert len(stats["failed_files"]) == 1 and (stats["removed"], stats["kept_missing"]) == (0, 1)
+    assert [p[0] for p in await _payloads(client, "kb")] == ["faq-1", "faq-2", "manual.md"]
+
+    stats = await ingestion_service.reindex_incremental([faqs], force=True, **options)
+    assert stats["removed"] == 1
+    assert [p[0] for p in await _payloads(client, "kb")] == ["faq-1", "faq-2"]
+
+
+async def test_blue_green_rebuild_aborts_on_unreadable_files(memory_qdrant, monkeypatch, tmp_path):
+    client, _, _ = memory_qdrant
+    source = tmp_path / "faqs.jsonl"
+    _write_faqs(source, {"faq-1": "Versión uno."})
+    await ingestion_service.rebuild_blue_green([source], alias="kb", client=client)
+    current = (await client.get_aliases()).aliases[0].collection_name
+
+    source.write_text("{roto", encoding="utf-8")
+    monkeypatch.setattr(ingestion_service.time, "strftime", lambda _fmt: "29990101000000")
+    with pytest.raises(RuntimeError):
+        await ingestion_service.rebuild_blue_green([source], alias="kb", client=client)
+    assert (await client.get_aliases()).aliases[0].collection_name == current
+    assert not await client.collection_exists("kb_29990101000000")
+
+
+async def test_blue_green_rebuild_switches_alias_atomically(memory_qdrant, monkeypatch, tmp_path):
+    client, _, reindexed = memory_qdrant
+    source = tmp_path / "faqs.jsonl"
+    _write_faqs(source, {"faq-1": "Versión uno."})
+    times = iter(["20260101000000", "20260102000000"])
+    monkeypatch.setattr(ingestion_service.time, "strftime", lambda _fmt: next(times))
+
+    first = await ingestion_service.rebuild_blue_green([source], alias="kb", client=client)
+    assert (first["collection"], first["previous_collection"]) == ("kb_20260101000000", None)
+
+    _write_faqs(source, {"faq-1": "Versión dos."})
+    second = await ingestion_service.rebuild_blue_green([source], alias="kb", client=client)
+    assert second["previous_collection"] == "kb_20260101000000"
+
+    aliases = (await client.get_aliases()).aliases
+    assert [(a.alias_name, a.collection_name) for a in aliases] == [("kb", "kb_20260102000000")]
+    assert not await client.collection_exists("kb_20260101000000")
+    assert await _payloads(client, "kb") == [("faq-1", 0, "Versión dos.")]
+    assert reindexed == ["kb", "kb"]
+
+
+async def test_blue_green_rebuild_failure_keeps_current_alias(memory_qdrant, monkeypatch, tmp_path):
+    client, _, _ = memory_qdrant
+    source = tmp_path / "faqs.jsonl"
+    _write_faqs(source, {"faq-1": "Versión uno."})
+    await ingestion_service.rebuild_blue_green([source], alias="kb", client=client)
+    current = (await client.get_aliases()).aliases[0].collection_name
+
+    async def broken_embed(texts):
+        raise ValueError("Error interno al generar embeddings.")
+
+    monkeypatch.setattr(ingestion_service.embedding_service, "embed_queries", broken_embed)
+    monkeypatch.setattr(ingestion_service.time, "strftime", lambda _fmt: "29990101000000")
+    with pytest.raises(ValueError):
+        await ingestion_service.rebuild_blue_green([source], alias="kb", client=client)
+
+    assert (await client.get_aliases()).aliases[0].collection_name == current
+    assert not await client.collection_exists("kb_29990101000000")
+
+
+async def test_blue_green_rebuild_requires_migrate_for_physical_collection(memory_qdrant, monkeypatch, tmp_path):
+    client, embedded, _ = memory_qdrant
+    source = tmp_path / "faqs.jsonl"
+    _write_faqs(source, {"faq-1": "Versión uno."})
+    await ingestion_service.ingest([source], collection_name="kb", client=client)
+    embedded.clear()
+    monkeypatch.setattr(ingestion_service.time, "strftime", lambda _fmt: "20260101000000")
+
+    with pytest.raises(ValueError):
+        await ingestion_service.rebuild_blue_green([source], alias="kb", client=client)
+    assert embedded == [] # Falla antes de ingresar
+    assert await _payloads(client, "kb") == [("faq-1", 0, "Versión uno.")] # La colección física sigue intacta
+    assert (await client.get_aliases()).aliases == []
+
+    stats = await ingestion_service.rebuild_blue_green([source], alias="kb", client=client, migrate=True)
+    assert (stats["collection"], stats["previous_collection"]) == ("kb_20260101000000", None)
+    assert [(a.alias_name, a.collection_name) for a in (await client.get_aliases()).aliases] == [("kb", "kb_20260101000000")]
+
+
+async def test_alias_switch_from_another_process_refreshes_derived_state(memory_qdrant, monkeypatch, tmp_path):
+    client, _, reindexed = memory_qdrant
+    qdrant_service = ingestion_service.qdrant_service
+    source = tmp_path / "faqs.jsonl"
+    _write_faqs(source, {"faq-1": "Versión uno."})
+    times = iter(["20260101000000", "20260102000000"])
+    monkeypatch.setattr(ingestion_service.time, "strftime", lambda _fmt: next(times))
+    monkeypatch.setattr(qdrant_service, "_get_qdrant_client", lambda: client)
+    monkeypatch.setattr(qdrant_service.settings, "QDRANT_COLLECTION_NAME", "kb")
+
+    await ingestion_service.rebuild_blue_green([source], alias="kb", client=client)
+    monkeypatch.setattr(qdrant_service, "_alias_target", None)
+    await qdrant_service._check_alias_target() # Primera lectura: solo registra el destino
+    await ingestion_service.rebuild_blue_green([source], alias="kb", client=client, keep_old=True)
+    monkeypatch.setattr(qdrant_service, "_alias_target", "kb_20260101000000") # Este worker no hizo el cambio
+    reindexed.clear()
+
+    await qdrant_service._check_alias_target()
+    assert reindexed == ["kb"]
+    assert qdrant_service._alias_target == "kb_20260102000000"
+
+
+async def test_on_collection_reindexed_bumps_collection_version():
+    from app.services import qdrant_service
+
+    version = qdrant_service.get_collection_version("kb-version")
+    await qdrant_service.on_collection_reindexed("kb-version")
+    assert qdrant_service.get_collection_version("kb-version") == version + 1
@@ -0,0 +1,130 @@
+# tests/services/test_local_vector_index.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas para el índice vectorial local (app.services.local_vector_index),
+la evaluación de filtros de payload (app.services.payload_filter) y el
+backend local de qdrant_service.search_documents.
+"""
+
+import numpy as np
+import pytest
+from qdrant_client import models
+
+from app.services import qdrant_service
+from app.services.local_vector_index import LocalVectorIndex
+from app.services.payload_filter import matches_filter
+
+DIM = 16
+
+
+def _corpus(n: int = 300, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, DIM)).astype(np.float32)
+    payloads = [{"category": ["ventas", "soporte", "facturas"][i % 3], "rank": i, "tags": ["a"] if i % 2 else ["b", "c"]}
+                for i in range(n)]
+    return list(range(n)), vectors, payloads
+
+
+@pytest.mark.parametrize("distance", ["Cosine", "Dot", "Euclid"])
+def test_exact_search_matches_brute_force(distance):
+    ids, vectors, payloads = _corpus()
+    index = LocalVectorIndex(ids, vectors, payloads, distance=distance)
+    query = np.random.default_rng(1).normal(size=DIM).astype(np.float32)
+
+    if distance == "Cosine":
+        normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        scores = normed @ (query / np.linalg.norm(query))
+        expected = np.argsort(-scores)[:5]
+    elif distance == "Dot":
+        scores = vectors @ query
+        expected = np.argsort(-scores)[:5]
+    else:
+        scores = np.linalg.norm(vectors - query, axis=1)
+        expected = np.argsort(scores)[:5]
+
+    results = index.search(query, top_k=5)
+    assert [r["id"] for r in results] == expected.tolist()
+    assert np.allclose([r["score"] for r in results], scores[expected], atol=1e-4)
+    assert results[0]["payload"] == payloads[expected[0]]
+
+
+def test_filtered_search_only_returns_matching_points():
+    ids, vectors, payloads = _corpus()
+    index = LocalVectorIndex(ids, vectors, payloads)
+    query_filter = models.Filter(
+        must=[models.FieldCondition(key="category", match=models.MatchValue(value="soporte"))],
+        must_not=[models.FieldCondition(key="rank", range=models.Range(gte=200))],
+    )
+    results = index.search(vectors[4], top_k=10, query_filter=query_filter)
+
+    assert len(results) == 10
+    assert results[0]["id"] == 4 # El propio punto cumple el filtro
+    assert all(r["payload"]["category"] == "soporte" and r["payload"]["rank"] < 200 for r in results)
+    assert index.search(vectors[0], 3, {"must": [{"key": "category", "match": {"value": "otra"}}]}) == []
+
+
+@pytest.mark.parametrize("query_filter, expected", [
+    (models.Filter(must=[models.FieldCondition(key="meta.lang", match=models.MatchValue(value="es"))]), True),
+    (models.Filter(must=[models.FieldCondition(key="tags", match=models.MatchAny(any=["x", "b"]))]), True),
+    (models.Filter(must=[models.FieldCondition(key="tags", match=models.MatchExcept(**{"except": ["b", "c"]}))]), False),
+    (models.Filter(should=[models.FieldCondition(key="count", range=models.Range(gt=10)),
+                           models.FieldCondition(key="flag", match=models.MatchValue(value=True))]), True),
+    (models.Filter(must=[models.FieldCondition(key="count", match=models.MatchValue(value=True))]), False),
+    (models.Filter(must=[models.IsEmptyCondition(is_empty=models.PayloadField(key="missing"))]), True),
+    (models.Filter(must=[models.IsNullCondition(is_null=models.PayloadField(key="nothing"))]), True),
+    (models.Filter(must=[models.HasIdCondition(has_id=[7, 8])]), True),
+    (models.Filter(must=[models.NestedCondition(nested=models.Nested(key="items", filter=models.Filter(
+        must=[models.FieldCondition(key="sku", match=models.MatchValue(value="B2")),
+              models.FieldCondition(key="qty", range=models.Range(gte=2))])))]), False),
+    (models.Filter(min_should=models.MinShould(min_count=2, conditions=[
+        models.FieldCondition(key="flag", match=models.MatchValue(value=True)),
+        models.FieldCondition(key="meta.lang", match=models.MatchText(text="e"))])), True),
+    ({"must": [{"key": "items[].sku", "match": {"any": ["B2"]}}], "must_not": [{"key": "flag", "match": {"value": False}}]}, True),
+])
+def test_payload_filter_semantics(query_filter, expected):
+    payload = {
+        "meta": {"lang": "es"}, "tags": ["b", "c"], "count": 1, "flag": True, "nothing": None,
+        "items": [{"sku": "A1", "qty": 5}, {"sku": "B2", "qty": 1}],
+    }
+    assert matches_filter(payload, query_filter, point_id=7) is expected
+
+
+def test_unsupported_condition_raises():
+    geo = models.Filter(must=[models.FieldCondition(key="loc", geo_radius=models.GeoRadius(
+        center=models.GeoPoint(lon=0.0, lat=0.0), radius=10.0))])
+    with pytest.raises(ValueError):
+        matches_filter({"loc": {"lon": 0.0, "lat": 0.0}}, geo)
+
+
+def test_snapshot_roundtrip(tmp_path):
+    ids, vectors, payloads = _corpus(n=20)
+    ids = [f"00000000-0000-0000-0000-{i:012d}" for i in ids]
+    index = LocalVectorIndex(ids, vectors, payloads, distance="Dot")
+    loaded = LocalVectorIndex.load(index.save(tmp_path / "index.npz"))
+
+    assert (len(loaded), loaded.dim, loaded.distance) == (20, DIM, "Dot")
+    assert loaded.search(vectors[3], 3) == index.search(vectors[3], 3)
+
+
+def test_hnsw_mode_agrees_with_exact_search():
+    pytest.importorskip("hnswlib")
+    ids, vectors, payloads = _corpus(n=500)
+    exact = LocalVectorIndex(ids, vectors, payloads)
+    ann = LocalVectorIndex(ids, vectors, payloads, hnsw_threshold=100, ef_search=200)
+    assert ann.mode == "hnsw"
+
+    query = vectors[10] + 0.01
+    assert [r["id"] for r in ann.search(query, 5)] == [r["id"] for r in exact.search(query, 5)]
+
+
+async def test_search_documents_uses_local_backend(monkeypatch):
+    ids, vectors, payloads = _corpus(n=50)
+    monkeypatch.setattr(qdrant_service.settings, "VECTOR_SEARCH_BACKEND", "local", raising=False)
+    monkeypatch.setattr(qdrant_service, "effective_vector_dimension", lambda _settings: DIM)
+    monkeypatch.setattr(qdrant_service, "_local_index", LocalVectorIndex(ids, vectors, payloads))
+
+    results = await qdrant_service.search_documents(vectors[7], top_k=2)
+    assert results[0]["id"] == 7 and len(results) == 2
+    assert await qdrant_service.probe_collection() is True
+    assert await qdrant_service.search_documents(vectors[7][:4], top_k=2) == []
@@ -0,0 +1,37 @@
+# tests/services/test_onnx_embedding_backend.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas para la verificación de paridad del backend ONNX
+(app.services.onnx_embedding_backend.check_parity).
+"""
+
+import numpy as np
+
+from app.services.onnx_embedding_backend import check_parity
+
+
+class FakeModel:
+    def __init__(self, matrix):
+        self.matrix = np.asarray(matrix, dtype=np.float32)
+
+    def get_sentence_embedding_dimension(self):
+        return self.matrix.shape[1]
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        return self.matrix[:len(sentences)]
+
+
+def test_check_parity_identical_models():
+    matrix = np.random.default_rng(0).normal(size=(3, 4))
+    dim_ok, min_cosine = check_parity(FakeModel(matrix), FakeModel(matrix), 4, sentences=["a", "b", "c"])
+    assert dim_ok
+    assert min_cosine > 0.9999
+
+
+def test_check_parity_detects_divergence_and_dimension():
+    reference = FakeModel([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+    candidate = FakeModel([[1.0, 0.0, 0.0], [1.0, 0.0, 0.0]])
+    dim_ok, min_cosine = check_parity(candidate, reference, 384, sentences=["a", "b"])
+    assert not dim_ok
+    assert min_cosine < 0.5
@@ -0,0 +1,84 @@
+# tests/services/test_payload_store.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas para el almacén local de payloads (app.services.payload_store) y las
+búsquedas sin payload de qdrant_service (SEARCH_PAYLOAD_MODE=ids|source_id).
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services import payload_store as payload_store_module
+from app.services import qdrant_service
+from app.services.payload_store import PayloadStore
+from app.services.search_cache import SearchResultCache
+
+POINTS = [
+    ("p1", {"source_id": "faq-1", "text": "Activa MiAdminXML desde el menú Licencias.", "question": "¿Cómo activo?"}),
+    ("p2", {"source_id": "faq-1", "text": "Chunk repetido de la misma fuente."}),
+    (3, {"original_faq_id": "faq-2", "answer_chunks": ["Descarga ", "los XML del SAT."]}),
+    ("p4", {"source_id": "faq-3"}), # Sin contenido
+]
+
+
+def test_write_and_read_roundtrip(tmp_path):
+    path = tmp_path / "payloads.bin"
+    assert PayloadStore.write(path, POINTS, meta={"collection": "faq"}) == (2, 4)
+    store = PayloadStore(path)
+
+    assert len(store) == 2
+    assert store.get("faq-1") == "Activa MiAdminXML desde el menú Licencias."
+    assert store.get("faq-2") == "Descarga \nlos XML del SAT."
+    assert store.get("faq-3") is None
+    assert store.source_id_for("p2") == "faq-1"
+    assert store.source_id_for(3) == "faq-2"
+    assert store.meta == {"collection": "faq"}
+
+    with pytest.raises(ValueError):
+        (tmp_path / "bad.bin").write_bytes(b"nada")
+        PayloadStore(tmp_path / "bad.bin")
+
+
+def test_reload_if_changed_picks_up_rewritten_file(tmp_path, monkeypatch):
+    path = tmp_path / "payloads.bin"
+    PayloadStore.write(path, POINTS[:1])
+    store = PayloadStore(path)
+    PayloadStore.write(path, [("p9", {"source_id": "faq-9", "text": "Nuevo"})])
+
+    monkeypatch.setattr(payload_store_module, "RELOAD_CHECK_SECONDS", 0.0)
+    assert store.reload_if_changed() is True
+    assert store.get("faq-9") == "Nuevo" and store.get("faq-1") is None
+    assert store.reload_if_changed() is False
+
+
+@pytest.mark.parametrize("mode, expected_with_payload", [("ids", False), ("source_id", ["source_id", "original_faq_id"])])
+async def test_search_hydrates_payloads_from_store(tmp_path, monkeypatch, mode, expected_with_payload):
+    PayloadStore.write(tmp_path / "payloads.bin", POINTS)
+    calls = {}
+
+    class FakeClient:
+        async def search(self, **kwargs):
+            calls["search"] = kwargs
+            projected = {"source_id": "faq-1"} if mode == "source_id" else None
+            return [SimpleNamespace(id="p1", score=0.9, payload=projected),
+                    SimpleNamespace(id="p5", score=0.5, payload=None)] # p5 no está en el almacén
+
+        async def retrieve(self, **kwargs):
+            calls["retrieve"] = kwargs
+            return [SimpleNamespace(id="p5", payload={"source_id": "faq-5", "text": "Desde Qdrant"})]
+
+    monkeypatch.setattr(qdrant_service.settings, "SEARCH_PAYLOAD_MODE", mode, raising=False)
+    monkeypatch.setattr(qdrant_service, "_get_qdrant_client", lambda: FakeClient())
+    monkeypatch.setattr(qdrant_service, "effective_vector_dimension", lambda _settings: 4)
+    monkeypatch.setattr(qdrant_service, "_search_cache", SearchResultCache(max_size=0, ttl_seconds=0))
+    monkeypatch.setattr(qdrant_service, "_payload_store", PayloadStore(tmp_path / "payloads.bin"))
+
+    results = await qdrant_service.search_documents(np.ones(4, dtype=np.float32), top_k=2)
+
+    assert calls["search"]["with_payload"] == expected_with_payload
+    assert results[0]["payload"] == {"source_id": "faq-1", "text": "Activa MiAdminXML desde el menú Licencias."}
+    assert results[1]["payload"] == {"source_id": "faq-5", "text": "Desde Qdrant"}
+    assert calls["retrieve"]["ids"] == ["p5"]
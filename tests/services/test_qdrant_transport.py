@@ -0,0 +1,75 @@
+# tests/services/test_qdrant_transport.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas de la configuración de transporte del cliente Qdrant
+(gRPC, pool de conexiones, timeouts) y de su cierre al apagar.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.core.lazy_imports import optional_import
+from app.services import qdrant_service
+from app.services.search_cache import SearchResultCache
+
+
+class FakeAsyncQdrantClient:
+    instances = []
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.closed = False
+        FakeAsyncQdrantClient.instances.append(self)
+
+    async def search(self, **kwargs):
+        await asyncio.sleep(1)
+        return []
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_client_module(monkeypatch):
+    def fake_optional_import(name):
+        if name == "qdrant_client":
+            return SimpleNamespace(AsyncQdrantClient=FakeAsyncQdrantClient)
+        return optional_import(name)
+
+    FakeAsyncQdrantClient.instances.clear()
+    monkeypatch.setattr(qdrant_service, "optional_import", fake_optional_import)
+    qdrant_service._get_qdrant_client.cache_clear()
+    yield
+    qdrant_service._get_qdrant_client.cache_clear()
+
+
+async def test_client_uses_transport_settings_and_is_closed(monkeypatch, fake_client_module):
+    for name, value in {"QDRANT_PREFER_GRPC": True, "QDRANT_GRPC_PORT": 7334, "QDRANT_POOL_MAX_CONNECTIONS": 8,
+                        "QDRANT_POOL_MAX_KEEPALIVE": 4, "QDRANT_TIMEOUT_SECONDS": 3}.items():
+        monkeypatch.setattr(qdrant_service.settings, name, value)
+
+    client = qdrant_service._get_qdrant_client()
+    assert client.kwargs["prefer_grpc"] is True
+    assert client.kwargs["grpc_port"] == 7334
+    assert client.kwargs["timeout"] == 3
+    limits = client.kwargs["limits"]
+    assert (limits.max_connections, limits.max_keepalive_connections) == (8, 4)
+
+    await qdrant_service.close_client()
+    assert client.closed
+    assert qdrant_service._get_qdrant_client.cache_info().currsize == 0
+    await qdrant_service.close_client() # Sin cliente creado no hace nada
+    assert len(FakeAsyncQdrantClient.instances) == 1
+
+
+async def test_search_timeout_returns_empty(monkeypatch, fake_client_module):
+    monkeypatch.setattr(qdrant_service.settings, "QDRANT_SEARCH_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(qdrant_service, "effective_vector_dimension", lambda _settings: 4)
+    monkeypatch.setattr(qdrant_service, "_search_cache", SearchResultCache(max_size=0, ttl_seconds=0))
+
+    assert await qdrant_service.search_documents(np.ones(4, dtype=np.float32), top_k=1) == []
+    assert FakeAsyncQdrantClient.instances[0].kwargs["url"]
@@ -0,0 +1,217 @@
+# tests/services/test_rag_stream.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas de rag_pipeline.generate_response_stream y llm_service.call_llm_stream:
+orden de eventos, postprocesado final e historial guardado al terminar el stream.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import llm_service, rag_pipeline
+
+SEARCH_RESULTS = [{"id": "p1", "score": 0.9, "payload": {"source_id": "FAQ-1", "text": "Se activa desde Ayuda > Activar."}}]
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    history = []
+
+    async def no_priority(question):
+        return None
+
+    async def embed_query(question):
+        return [0.1, 0.2]
+
+    async def search_documents(vector, top_k):
+        return SEARCH_RESULTS
+
+    async def add_chat_messages(session_id, human, ai):
+        history.append((session_id, human, ai))
+
+    monkeypatch.setattr(rag_pipeline.priority_context_service, "find_priority_answer", no_priority)
+    monkeypatch.setattr(rag_pipeline.embedding_service, "embed_query", embed_query)
+    monkeypatch.setattr(rag_pipeline.qdrant_service, "search_documents", search_documents)
+    monkeypatch.setattr(rag_pipeline.hybrid_retrieval, "hybrid_enabled", lambda: False)
+    monkeypatch.setattr(rag_pipeline.history_service, "add_chat_messages", add_chat_messages)
+    monkeypatch.setattr(rag_pipeline.settings, "MONGO_URI", "mongodb://test")
+    monkeypatch.setattr(rag_pipeline.history_service, "get_chat_history", lambda *a, **k: _empty_history())
+    return history
+
+
+async def _empty_history():
+    return []
+
+
+def _llm_stream(parts, events):
+    async def fake(messages, temperature=0.5, max_tokens=1500):
+        for part in parts:
+            events.append(("llm", part))
+            yield part
+    return fake
+
+
+class _TruncatedStream:
+    """Como LLMStream: produce `parts` y termina con finish_reason 'length'."""
+
+    def __init__(self, parts):
+        self._parts = parts
+        self.finish_reason = None
+
+    async def _deltas(self):
+        for part in self._parts:
+            yield part
+        self.finish_reason = "length"
+
+    def __aiter__(self):
+        return self._deltas()
+
+
+async def test_stream_emits_sources_deltas_and_processed_done(pipeline, monkeypatch):
+    order = []
+    parts = ["**Hola**, entra", " a Ayuda.\n", "Lo siento, ", "no hay más.\n", "## Listo"]
+    monkeypatch.setattr(rag_pipeline.llm_service, "call_llm_stream", _llm_stream(parts, order))
+
+    events = []
+    async for event in rag_pipeline.generate_response_stream("¿Cómo activo?", "s1"):
+        order.append(("event", event["event"]))
+        events.append(event)
+
+    assert [e["event"] for e in events] == ["sources", "delta", "delta", "done"]
+    assert events[0]["sources"] == [{"source_id": "FAQ-1", "score": 0.9}]
+    assert [e["text"] for e in events if e["event"] == "delta"] == ["<b>Hola</b>, entra a Ayuda.", "\nListo"]
+    assert events[-1]["answer"] == rag_pipeline._post_process_llm_answer("".join(parts))
+    # La primera línea sale en cuanto termina, antes de pedir el siguiente fragmento al LLM
+    assert order[:4] == [("event", "sources"), ("llm", parts[0]), ("llm", parts[1]), ("event", "delta")]
+    assert pipeline == [("s1", "¿Cómo activo?", "<b>Hola</b>, entra a Ayuda.\nListo")]
+
+
+async def test_stream_without_llm_output_and_priority_answer(pipeline, monkeypatch):
+    monkeypatch.setattr(rag_pipeline.llm_service, "call_llm_stream", _llm_stream([], []))
+    events = [e async for e in rag_pipeline.generate_response_stream("¿Algo?", "s2")]
+    assert events[-1]["answer"] == rag_pipeline.DEFAULT_ERROR_MESSAGE
+    assert events[-2] == {"event": "delta", "text": rag_pipeline.DEFAULT_ERROR_MESSAGE}
+
+    async def priority(question):
+        return "Respuesta **fija**"
+
+    monkeypatch.setattr(rag_pipeline.priority_context_service, "find_priority_answer", priority)
+    events = [e async for e in rag_pipeline.generate_response_stream("¿Horario?", "s3")]
+    assert [e["event"] for e in events] == ["sources", "delta", "done"]
+    assert events[-1]["answer"] == "Respuesta <b>fija</b>"
+    assert events[0]["sources"] == [{"source_id": "priority_context", "score": 1.0}]
+    assert [h[0] for h in pipeline] == ["s2", "s3"]
+
+
+async def test_call_llm_stream_yields_deltas_and_closes(monkeypatch):
+    closed = []
+
+    class FakeStream:
+        def __init__(self, chunks):
+            self._chunks = iter(chunks)
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            try:
+                return next(self._chunks)
+            except StopIteration:
+                raise StopAsyncIteration
+
+        async def close(self):
+            closed.append(True)
+
+    def chunk(text, finish=None):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text), finish_reason=finish)])
+
+    async def create(**kwargs):
+        assert kwargs["stream"] is True
+        return FakeStream([chunk("Ho"), SimpleNamespace(choices=[]), chunk(None), chunk("la", "stop")])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(llm_service, "_get_llm_client", lambda: client)
+
+    stream = llm_service.call_llm_stream([{"role": "user", "content": "hola"}])
+    parts = [p async for p in stream]
+    assert parts == ["Ho", "la"] and closed == [True] and stream.complete
+
+
+def _failing_stream(parts, error):
+    async def fake(messages, temperature=0.5, max_tokens=1500):
+        for part in parts:
+            yield part
+        raise error
+    return fake
+
+
+async def test_stream_cut_midway_emits_error_and_saves_nothing(pipeline, monkeypatch):
+    error = llm_service.LLMStreamError("Error en el stream del LLM: conexión cortada")
+    monkeypatch.setattr(rag_pipeline.llm_service, "call_llm_stream", _failing_stream(["Entra a Ayuda.\n", "Luego"], error))
+
+    events = [e async for e in rag_pipeline.generate_response_stream("¿Cómo activo?", "s4")]
+    assert [e["event"] for e in events] == ["sources", "delta", "error"]
+    assert pipeline == []
+
+    # Si falla antes de mostrar nada, se responde con el mensaje de error (como /chat)
+    monkeypatch.setattr(rag_pipeline.llm_service, "call_llm_stream", _failing_stream(["Sin salto"], error))
+    events = [e async for e in rag_pipeline.generate_response_stream("¿Cómo activo?", "s5")]
+    assert events[-1]["answer"] == rag_pipeline.DEFAULT_ERROR_MESSAGE
+
+
+async def test_truncated_stream_emits_incomplete_done_and_saves_history(pipeline, monkeypatch):
+    monkeypatch.setattr(rag_pipeline.llm_service, "call_llm_stream",
+                        lambda messages, temperature=0.5, max_tokens=1500: _TruncatedStream(["Entra a **Ayuda**.\n", "Luego"]))
+    cache = rag_pipeline.ResponseCache(max_size=8, ttl_seconds=0)
+    monkeypatch.setattr(rag_pipeline, "_response_cache", cache)
+
+    events = [e async for e in rag_pipeline.generate_response_stream("¿Cómo activo?", "s6")]
+    assert [e["event"] for e in events] == ["sources", "delta", "delta", "done"]
+    done = events[-1]
+    assert done["answer"] == "Entra a <b>Ayuda</b>.\nLuego"
+    assert (done["incomplete"], done["finish_reason"]) == (True, "length")
+    assert pipeline == [("s6", "¿Cómo activo?", done["answer"])] # Se guarda en el historial...
+    assert len(cache) == 0 # ...pero no se cachea
+
+
+async def test_call_llm_stream_reports_truncation_and_raises_on_error(monkeypatch):
+    def chunk(text, finish=None):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text), finish_reason=finish)])
+
+    class FakeStream:
+        def __init__(self, items):
+            self._items = iter(items)
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            item = next(self._items, None)
+            if item is None:
+                raise StopAsyncIteration
+            if isinstance(item, Exception):
+                raise item
+            return item
+
+    def install(items):
+        async def create(**kwargs):
+            return FakeStream(items)
+
+        client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        monkeypatch.setattr(llm_service, "_get_llm_client", lambda: client)
+
+    # Cortada por max_tokens: termina sin error y lo indica en finish_reason
+    install([chunk("Ho"), chunk("la", "length")])
+    stream = llm_service.call_llm_stream([{"role": "user", "content": "hola"}])
+    assert [part async for part in stream] == ["Ho", "la"]
+    assert stream.finish_reason == "length" and not stream.complete
+
+    # Error de conexión a mitad del stream: LLMStreamError tras los fragmentos ya producidos
+    install([chunk("Ho"), RuntimeError("conexión cortada")])
+    parts = []
+    with pytest.raises(llm_service.LLMStreamError):
+        async for part in llm_service.call_llm_stream([{"role": "user", "content": "hola"}]):
+            parts.append(part)
+    assert parts == ["Ho"]
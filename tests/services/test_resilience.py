@@ -0,0 +1,207 @@
+# tests/services/test_resilience.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas de app.services.resilience (deadline, hedging, circuit breaker) y de
+su uso en qdrant_service.search_documents.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services import qdrant_service
+from app.services.local_vector_index import LocalVectorIndex
+from app.services.resilience import (
+    CircuitBreaker, LatencyTracker, call_timeout, hedged, remaining_budget, request_deadline,
+)
+from app.services.search_cache import SearchResultCache
+
+VECTOR = np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float32)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeQdrant:
+    """Cliente con latencias programadas por llamada; 'error' lanza una excepción."""
+
+    def __init__(self, delays):
+        self.delays = list(delays)
+        self.calls = 0
+
+    async def search(self, **kwargs):
+        delay = self.delays[min(self.calls, len(self.delays) - 1)]
+        self.calls += 1
+        if delay == "error":
+            raise ConnectionError("Qdrant caído")
+        await asyncio.sleep(delay)
+        return [SimpleNamespace(id=f"p{self.calls}", score=0.9, payload={"text": f"respuesta {self.calls}"})]
+
+
+@pytest.fixture
+def fake_qdrant(monkeypatch):
+    def install(delays, threshold=3, cooldown=30.0, clock=None, cache_ttl=300.0):
+        client = FakeQdrant(delays)
+        breaker = CircuitBreaker("qdrant", threshold, cooldown, **({"clock": clock} if clock else {}))
+        monkeypatch.setattr(qdrant_service, "_get_qdrant_client", lambda: client)
+        monkeypatch.setattr(qdrant_service, "effective_vector_dimension", lambda _settings: 4)
+        monkeypatch.setattr(qdrant_service, "_search_cache", SearchResultCache(max_size=16, ttl_seconds=cache_ttl))
+        monkeypatch.setattr(qdrant_service, "_breaker", breaker)
+        monkeypatch.setattr(qdrant_service, "_latency", LatencyTracker(window=50, min_samples=5))
+        monkeypatch.setattr(qdrant_service, "_resilience_counters", {"hedged": 0, "degraded": 0, "deadline_exceeded": 0})
+        monkeypatch.setattr(qdrant_service, "_local_index", None)
+        monkeypatch.setattr(qdrant_service.settings, "QDRANT_ALIAS_CHECK_SECONDS", 0)
+        monkeypatch.setattr(qdrant_service.settings, "QDRANT_SEARCH_TIMEOUT_SECONDS", 1.0)
+        monkeypatch.setattr(qdrant_service.settings, "LOCAL_INDEX_SNAPSHOT_PATH", None)
+        return client
+    return install
+
+
+# --- Primitivas ---
+
+async def test_request_deadline_bounds_call_timeout_and_nests():
+    assert remaining_budget() is None
+    assert call_timeout(5.0) == 5.0
+    with request_deadline(0.5):
+        assert 0.4 < call_timeout(5.0) <= 0.5
+        with request_deadline(10.0): # Un deadline interno más largo no amplía el externo
+            assert call_timeout(5.0) <= 0.5
+        await asyncio.sleep(0.05)
+        assert call_timeout(5.0) < 0.46
+    assert remaining_budget() is None
+
+
+def test_latency_tracker_percentiles():
+    tracker = LatencyTracker(window=100, min_samples=10)
+    for ms in range(1, 10):
+        tracker.record(ms / 1000.0)
+    assert tracker.percentile(95) is None # Pocas muestras
+    for ms in range(10, 101):
+        tracker.record(ms / 1000.0)
+    assert tracker.percentile(50) == pytest.approx(0.050, abs=0.002)
+    assert tracker.percentile(95) == pytest.approx(0.095, abs=0.002)
+
+
+async def test_hedged_sends_second_request_only_when_first_is_slow():
+    delays = iter([0.5, 0.01])
+    hedges = []
+
+    async def call():
+        delay = next(delays)
+        await asyncio.sleep(delay)
+        return delay
+
+    assert await hedged(call, delay=0.05, on_hedge=lambda: hedges.append(1)) == 0.01
+    assert hedges == [1]
+
+    async def fast():
+        return "ok"
+
+    assert await hedged(fast, delay=0.05, on_hedge=lambda: hedges.append(1)) == "ok"
+    assert hedges == [1]
+
+    async def failing():
+        await asyncio.sleep(0.1)
+        raise ConnectionError("caído")
+
+    with pytest.raises(ConnectionError):
+        await hedged(failing, delay=0.01)
+
+
+def test_circuit_breaker_opens_probes_and_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker("qdrant", failure_threshold=2, cooldown_seconds=10.0, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now = 10.0
+    assert breaker.allow() # Una sola llamada de prueba
+    assert not breaker.allow()
+    breaker.record_failure() # La prueba falla: se vuelve a abrir
+    assert breaker.state == "open"
+
+    clock.now = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+    assert breaker.get_stats()["opened"] == 2
+
+
+# --- search_documents ---
+
+async def test_search_uses_remaining_deadline_and_serves_stale_cache(fake_qdrant):
+    client = fake_qdrant([0.0, 0.5], cache_ttl=0.01)
+    first = await qdrant_service.search_documents(VECTOR, top_k=1)
+    assert first[0]["id"] == "p1"
+    await asyncio.sleep(0.02) # El resultado cacheado expira
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    with request_deadline(0.1):
+        degraded = await qdrant_service.search_documents(VECTOR, top_k=1)
+    assert loop.time() - start < 0.3 # No espera el timeout de 1s de Qdrant
+    assert degraded == first # Resultado cacheado aunque expiró
+    assert client.calls == 2
+
+    with request_deadline(0.1):
+        await asyncio.sleep(0.11)
+        assert await qdrant_service.search_documents(VECTOR, top_k=1) == first
+    assert client.calls == 2 # Sin presupuesto no se llama a Qdrant
+    stats = qdrant_service.get_resilience_stats()
+    assert (stats["degraded"], stats["deadline_exceeded"]) == (2, 2)
+    assert qdrant_service._breaker.get_stats()["consecutive_failures"] == 0 # El corte fue del deadline, no de Qdrant
+
+
+async def test_only_configured_timeout_counts_as_breaker_failure(fake_qdrant):
+    fake_qdrant([0.5], threshold=1, cache_ttl=0.0)
+    with request_deadline(0.05):
+        await qdrant_service.search_documents(VECTOR, top_k=1)
+    assert qdrant_service._breaker.state == "closed"
+
+    qdrant_service.settings.QDRANT_SEARCH_TIMEOUT_SECONDS = 0.05 # Restaurado por monkeypatch
+    await qdrant_service.search_documents(VECTOR, top_k=1)
+    assert qdrant_service._breaker.state == "open"
+
+
+async def test_breaker_skips_qdrant_and_uses_local_index(fake_qdrant, monkeypatch):
+    clock = FakeClock()
+    client = fake_qdrant(["error"], threshold=2, cooldown=30.0, clock=clock)
+    local = LocalVectorIndex(["local-1"], np.array([[1.0, 0.0, 0.0, 0.0]], dtype=np.float32), [{"text": "local"}])
+    monkeypatch.setattr(qdrant_service, "_local_index", local)
+
+    for _ in range(2):
+        results = await qdrant_service.search_documents(VECTOR, top_k=1)
+        assert results[0]["id"] == "local-1"
+    assert qdrant_service._breaker.state == "open"
+
+    results = await qdrant_service.search_documents(VECTOR, top_k=1)
+    assert results[0]["id"] == "local-1"
+    assert client.calls == 2 # Circuito abierto: Qdrant no se llama
+
+    client.delays = [0.0]
+    clock.now = 30.0
+    results = await qdrant_service.search_documents(VECTOR, top_k=1)
+    assert results[0]["id"] == "p3" and qdrant_service._breaker.state == "closed"
+
+
+async def test_hedged_search_beats_slow_replica(fake_qdrant, monkeypatch):
+    client = fake_qdrant([0.5, 0.0])
+    monkeypatch.setattr(qdrant_service.settings, "QDRANT_HEDGING_ENABLED", True)
+    monkeypatch.setattr(qdrant_service.settings, "QDRANT_HEDGE_MIN_DELAY_MS", 20.0)
+
+    start = asyncio.get_running_loop().time()
+    results = await qdrant_service.search_documents(VECTOR, top_k=1)
+    assert asyncio.get_running_loop().time() - start < 0.3
+    assert results[0]["id"] == "p2" and client.calls == 2
+    assert qdrant_service.get_resilience_stats()["hedged"] == 1
@@ -0,0 +1,208 @@
+# tests/services/test_response_cache.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas de app.services.response_cache (clave, niveles memoria/SQLite, TTL y
+purga) y de su uso en rag_pipeline: el mismo prompt no vuelve a llamar al LLM.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import llm_service, rag_pipeline, response_cache
+from app.services.response_cache import ResponseCache
+
+KEY_ARGS = dict(source_ids=["FAQ-1", "FAQ-2"], context="Ayuda > Activar", history="",
+                model="deepseek-chat", temperature=0.5, max_tokens=1500, prompt_template="{question}")
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_key_normalizes_question_and_covers_every_part():
+    key = response_cache.make_key("¿Cómo activo  MiAdminXML?", **KEY_ARGS)
+    assert key == response_cache.make_key("¿como activo miadminxml?", **KEY_ARGS)
+    for name, value in [("source_ids", ["FAQ-2", "FAQ-1"]), ("context", "Ayuda > Licencia"), ("history", "Usuario: hola"),
+                        ("model", "otro"), ("temperature", 0.0), ("max_tokens", 500), ("prompt_template", "{context}")]:
+        assert key != response_cache.make_key("¿Cómo activo MiAdminXML?", **{**KEY_ARGS, name: value}), name
+
+
+async def test_memory_tier_ttl_and_purge():
+    clock = FakeClock()
+    cache = ResponseCache(max_size=2, ttl_seconds=10, clock=clock)
+    await cache.set("k1", "A")
+    assert await cache.get("k1") == "A"
+    assert await cache.get("k2") is None
+    clock.now += 11
+    assert await cache.get("k1") is None
+    stats = cache.get_stats()
+    assert (stats["memory_hits"], stats["misses"], stats["expirations"]) == (1, 2, 1)
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+
+    await cache.set("k1", "A")
+    assert cache.purge() == {"memory": 1, "disk": 0}
+    assert await cache.get("k1") is None
+
+
+async def test_sqlite_tier_survives_restart_and_keeps_expiry(tmp_path):
+    clock = FakeClock()
+    path = tmp_path / "cache" / "responses.sqlite3"
+    first = ResponseCache(max_size=4, ttl_seconds=60, sqlite_path=path, clock=clock)
+    await first.set("k1", "Respuesta")
+    first.close()
+
+    second = ResponseCache(max_size=4, ttl_seconds=60, sqlite_path=path, clock=clock)
+    assert await second.get("k1") == "Respuesta" # Desde disco
+    assert await second.get("k1") == "Respuesta" # Promovida a memoria
+    stats = second.get_stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["disk_size"]) == (1, 1, 1)
+
+    clock.now += 61 # La entrada promovida conserva su expiración original
+    assert await second.get("k1") is None
+    assert second.purge() == {"memory": 0, "disk": 1}
+    second.close()
+
+
+async def test_unusable_sqlite_path_degrades_to_memory(tmp_path):
+    blocker = tmp_path / "archivo"
+    blocker.write_text("no es un directorio", encoding="utf-8")
+    cache = ResponseCache(max_size=4, ttl_seconds=0, sqlite_path=blocker / "responses.sqlite3")
+    await cache.set("k1", "A")
+    assert await cache.get("k1") == "A"
+    stats = cache.get_stats()
+    assert stats["disk_enabled"] is False and stats["disk_errors"] == 1
+
+
+async def test_pipeline_serves_identical_prompt_without_llm(monkeypatch):
+    llm_calls = []
+    history = {"s1": [], "s2": [], "s3": [type("Msg", (), {"type": "human", "content": "hola"})()]}
+
+    async def no_priority(question):
+        return None
+
+    async def embed_query(question):
+        return [0.1, 0.2]
+
+    async def search_documents(vector, top_k):
+        return [{"id": "p1", "score": 0.9, "payload": {"source_id": "FAQ-1", "text": "Ayuda > Activar."}}]
+
+    async def call_llm_completion(messages, temperature=0.5, max_tokens=1500):
+        llm_calls.append((temperature, max_tokens))
+        return llm_service.LLMCompletion("Entra a **Ayuda > Activar**.", "stop")
+
+    async def get_chat_history(session_id, max_messages=6):
+        return history[session_id]
+
+    async def add_chat_messages(session_id, human, ai):
+        pass
+
+    monkeypatch.setattr(rag_pipeline.priority_context_service, "find_priority_answer", no_priority)
+    monkeypatch.setattr(rag_pipeline.embedding_service, "embed_query", embed_query)
+    monkeypatch.setattr(rag_pipeline.qdrant_service, "search_documents", search_documents)
+    monkeypatch.setattr(rag_pipeline.hybrid_retrieval, "hybrid_enabled", lambda: False)
+    monkeypatch.setattr(rag_pipeline.llm_service, "call_llm_completion", call_llm_completion)
+    monkeypatch.setattr(rag_pipeline.history_service, "get_chat_history", get_chat_history)
+    monkeypatch.setattr(rag_pipeline.history_service, "add_chat_messages", add_chat_messages)
+    monkeypatch.setattr(rag_pipeline.settings, "MONGO_URI", "mongodb://test")
+    monkeypatch.setattr(rag_pipeline, "_response_cache", ResponseCache(max_size=8, ttl_seconds=0))
+
+    first = await rag_pipeline.generate_response("¿Cómo activo MiAdminXML?", "s1")
+    second = await rag_pipeline.generate_response("¿cómo activo  MiAdminXML?", "s2")
+    assert first["answer"] == second["answer"] == "Entra a <b>Ayuda > Activar</b>."
+    assert second["sources"][0].source_id == "FAQ-1"
+    assert llm_calls == [(rag_pipeline.LLM_TEMPERATURE, rag_pipeline.LLM_MAX_TOKENS)]
+
+    await rag_pipeline.generate_response("¿Cómo activo MiAdminXML?", "s3") # Otro historial, otra clave
+    assert len(llm_calls) == 2
+    stats = rag_pipeline.get_response_cache_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+async def test_interrupted_stream_is_not_cached_nor_saved(monkeypatch):
+    saved = []
+
+    async def no_priority(question):
+        return None
+
+    async def embed_query(question):
+        return [0.1, 0.2]
+
+    async def search_documents(vector, top_k):
+        return [{"id": "p1", "score": 0.9, "payload": {"source_id": "FAQ-1", "text": "Ayuda > Activar."}}]
+
+    async def get_chat_history(session_id, max_messages=6):
+        return []
+
+    async def add_chat_messages(session_id, human, ai):
+        saved.append(ai)
+
+    async def broken_stream(messages, temperature=0.5, max_tokens=1500):
+        yield "Entra a Ayuda.\n"
+        yield "Después a"
+        raise llm_service.LLMStreamError("Error en el stream del LLM: conexión cortada")
+
+    monkeypatch.setattr(rag_pipeline.priority_context_service, "find_priority_answer", no_priority)
+    monkeypatch.setattr(rag_pipeline.embedding_service, "embed_query", embed_query)
+    monkeypatch.setattr(rag_pipeline.qdrant_service, "search_documents", search_documents)
+    monkeypatch.setattr(rag_pipeline.hybrid_retrieval, "hybrid_enabled", lambda: False)
+    monkeypatch.setattr(rag_pipeline.llm_service, "call_llm_stream", broken_stream)
+    monkeypatch.setattr(rag_pipeline.history_service, "get_chat_history", get_chat_history)
+    monkeypatch.setattr(rag_pipeline.history_service, "add_chat_messages", add_chat_messages)
+    monkeypatch.setattr(rag_pipeline.settings, "MONGO_URI", "mongodb://test")
+    cache = ResponseCache(max_size=8, ttl_seconds=0)
+    monkeypatch.setattr(rag_pipeline, "_response_cache", cache)
+
+    events = [e async for e in rag_pipeline.generate_response_stream("¿Cómo activo MiAdminXML?", "s1")]
+    assert [e["event"] for e in events] == ["sources", "delta", "error"]
+    assert len(cache) == 0 and saved == []
+
+
+async def test_truncated_llm_answer_is_served_but_not_cached(monkeypatch):
+    saved = []
+
+    async def create(**kwargs):
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Entra a Ayuda"), finish_reason="length")])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    completion = await llm_service._complete(client, "modelo", [{"role": "user", "content": "hola"}], 0.5, 10)
+    assert completion == ("Entra a Ayuda", "length") and not completion.complete
+
+    async def no_priority(question):
+        return None
+
+    async def embed_query(question):
+        return [0.1, 0.2]
+
+    async def search_documents(vector, top_k):
+        return [{"id": "p1", "score": 0.9, "payload": {"source_id": "FAQ-1", "text": "Ayuda > Activar."}}]
+
+    async def call_llm_completion(messages, temperature=0.5, max_tokens=1500):
+        return completion
+
+    async def get_chat_history(session_id, max_messages=6):
+        return []
+
+    async def add_chat_messages(session_id, human, ai):
+        saved.append(ai)
+
+    monkeypatch.setattr(rag_pipeline.priority_context_service, "find_priority_answer", no_priority)
+    monkeypatch.setattr(rag_pipeline.embedding_service, "embed_query", embed_query)
+    monkeypatch.setattr(rag_pipeline.qdrant_service, "search_documents", search_documents)
+    monkeypatch.setattr(rag_pipeline.hybrid_retrieval, "hybrid_enabled", lambda: False)
+    monkeypatch.setattr(rag_pipeline.llm_service, "call_llm_completion", call_llm_completion)
+    monkeypatch.setattr(rag_pipeline.history_service, "get_chat_history", get_chat_history)
+    monkeypatch.setattr(rag_pipeline.history_service, "add_chat_messages", add_chat_messages)
+    monkeypatch.setattr(rag_pipeline.settings, "MONGO_URI", "mongodb://test")
+    cache = ResponseCache(max_size=8, ttl_seconds=0)
+    monkeypatch.setattr(rag_pipeline, "_response_cache", cache)
+
+    result = await rag_pipeline.generate_response("¿Cómo activo MiAdminXML?", "s1")
+    assert result["answer"] == "Entra a Ayuda" # El usuario recibe la respuesta parcial...
+    assert saved == ["Entra a Ayuda"] # ...se guarda en el historial...
+    assert len(cache) == 0 # ...pero no se cachea
@@ -0,0 +1,101 @@
+# tests/services/test_search_batch.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas de qdrant_service.search_documents_batch: varias queries en una sola
+petición search_batch, resultados por query y caché por query.
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services import qdrant_service
+from app.services.resilience import CircuitBreaker, LatencyTracker
+from app.services.search_cache import SearchResultCache
+
+VECTORS = [
+    np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float32),
+    np.array([0.0, 1.0, 0.0, 0.0], dtype=np.float32),
+    np.array([0.0, 0.0, 1.0, 0.0], dtype=np.float32),
+]
+
+
+class FakeBatchQdrant:
+    """Responde cada SearchRequest con un punto cuyo id identifica el eje del vector."""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.batches = []
+        self.single_calls = 0
+
+    async def search_batch(self, collection_name, requests, timeout=None):
+        self.batches.append(requests)
+        if self.fail:
+            raise ConnectionError("Qdrant caído")
+        return [
+            [SimpleNamespace(id=f"eje-{int(np.argmax(r.vector))}", score=0.9, payload={"text": f"r{int(np.argmax(r.vector))}"})][:r.limit]
+            for r in requests
+        ]
+
+    async def search(self, **kwargs):
+        self.single_calls += 1
+        return []
+
+
+@pytest.fixture
+def fake_batch(monkeypatch):
+    pytest.importorskip("qdrant_client")
+    client = FakeBatchQdrant()
+    monkeypatch.setattr(qdrant_service, "_get_qdrant_client", lambda: client)
+    monkeypatch.setattr(qdrant_service, "effective_vector_dimension", lambda _settings: 4)
+    monkeypatch.setattr(qdrant_service, "_search_cache", SearchResultCache(max_size=16, ttl_seconds=300.0))
+    monkeypatch.setattr(qdrant_service, "_breaker", CircuitBreaker("qdrant", 3, 30.0))
+    monkeypatch.setattr(qdrant_service, "_latency", LatencyTracker(window=50, min_samples=5))
+    monkeypatch.setattr(qdrant_service, "_resilience_counters", {"hedged": 0, "degraded": 0, "deadline_exceeded": 0})
+    monkeypatch.setattr(qdrant_service, "_local_index", None)
+    monkeypatch.setattr(qdrant_service.settings, "QDRANT_ALIAS_CHECK_SECONDS", 0)
+    monkeypatch.setattr(qdrant_service.settings, "QDRANT_SEARCH_TIMEOUT_SECONDS", 1.0)
+    monkeypatch.setattr(qdrant_service.settings, "LOCAL_INDEX_SNAPSHOT_PATH", None)
+    monkeypatch.setattr(qdrant_service, "_payload_mode", lambda: "full")
+    return client
+
+
+async def test_batch_sends_one_request_and_keeps_query_order(fake_batch):
+    results = await qdrant_service.search_documents_batch(VECTORS, top_k=1)
+    assert [r[0]["id"] for r in results] == ["eje-0", "eje-1", "eje-2"]
+    assert len(fake_batch.batches) == 1 and len(fake_batch.batches[0]) == 3
+    assert fake_batch.single_calls == 0
+
+
+async def test_batch_only_sends_cache_misses(fake_batch):
+    await qdrant_service.search_documents_batch(VECTORS[:1], top_k=1)
+    results = await qdrant_service.search_documents_batch(VECTORS, top_k=1)
+
+    assert [len(batch) for batch in fake_batch.batches] == [1, 2] # VECTORS[0] ya estaba en caché
+    assert results[0][0]["id"] == "eje-0" and results[2][0]["id"] == "eje-2"
+
+    await qdrant_service.search_documents_batch(VECTORS, top_k=1)
+    assert len(fake_batch.batches) == 2 # Todo servido desde caché
+
+
+async def test_batch_invalid_vector_and_filters(fake_batch):
+    with pytest.raises(ValueError):
+        await qdrant_service.search_documents_batch(VECTORS, top_k=1, query_filters=[None])
+
+    results = await qdrant_service.search_documents_batch([VECTORS[0], np.zeros(3, dtype=np.float32)], top_k=1)
+    assert results[0][0]["id"] == "eje-0" and results[1] == []
+    assert len(fake_batch.batches[-1]) == 1
+
+
+async def test_batch_failure_degrades_per_query(fake_batch):
+    await qdrant_service.search_documents_batch(VECTORS[:2], top_k=1)
+    fake_batch.fail = True
+    results = await qdrant_service.search_documents_batch(VECTORS, top_k=1)
+
+    # Las dos primeras salen de la caché; la tercera falla y se degrada a []
+    assert [r[0]["id"] for r in results[:2]] == ["eje-0", "eje-1"] and results[2] == []
+    assert len(fake_batch.batches[-1]) == 1
+    assert qdrant_service._breaker.get_stats()["consecutive_failures"] == 1
+    assert qdrant_service.get_resilience_stats()["degraded"] == 1
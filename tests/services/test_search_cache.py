@@ -0,0 +1,79 @@
+# tests/services/test_search_cache.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas para la caché de resultados de búsqueda (app.services.search_cache)
+y su uso en qdrant_service.search_documents.
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+from qdrant_client import models
+
+from app.services import qdrant_service
+from app.services.search_cache import SearchResultCache, filter_fingerprint
+
+DIM = 8
+
+
+def _vector(seed: int = 0) -> np.ndarray:
+    vector = np.random.default_rng(seed).normal(size=DIM).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_near_identical_vectors_share_key_and_filters_separate_keys():
+    cache = SearchResultCache(max_size=10, ttl_seconds=60, quantization_step=1e-3)
+    vector = _vector()
+    key = cache.make_key("faq", 3, vector)
+
+    assert cache.make_key("faq", 3, vector + np.float32(1e-6)) == key
+    assert cache.make_key("faq", 3, _vector(seed=1)) != key
+    assert cache.make_key("faq", 4, vector) != key
+    assert cache.make_key("otra", 3, vector) != key
+
+    typed = models.Filter(must=[models.FieldCondition(key="category", match=models.MatchValue(value="ventas"))])
+    as_dict = {"must": [{"key": "category", "match": {"value": "ventas"}}]}
+    assert filter_fingerprint(typed) == filter_fingerprint(as_dict) != ""
+    assert cache.make_key("faq", 3, vector, typed) != key
+
+
+def test_invalidate_by_collection_and_copies_results():
+    cache = SearchResultCache(max_size=10, ttl_seconds=60)
+    vector = _vector()
+    faq_key, other_key = cache.make_key("faq", 3, vector), cache.make_key("otra", 3, vector)
+    cache.set(faq_key, [{"id": 1, "score": 0.9, "payload": {"text": "a"}}])
+    cache.set(other_key, [])
+
+    cached = cache.get(faq_key)
+    cached[0]["score"] = 0.0
+    assert cache.get(faq_key)[0]["score"] == 0.9 # Mutar la copia no altera la caché
+
+    cache.invalidate("faq")
+    assert cache.get(cache.make_key("faq", 3, vector)) is None
+    assert cache.get(cache.make_key("otra", 3, vector)) == []
+    assert cache.invalidate() == 2
+
+
+async def test_search_documents_serves_repeated_queries_from_cache(monkeypatch):
+    calls = []
+
+    class FakeClient:
+        async def search(self, **kwargs):
+            calls.append(kwargs)
+            return [SimpleNamespace(id="p1", score=0.8, payload={"text": "hola"})]
+
+    monkeypatch.setattr(qdrant_service, "_get_qdrant_client", lambda: FakeClient())
+    monkeypatch.setattr(qdrant_service, "effective_vector_dimension", lambda _settings: DIM)
+    monkeypatch.setattr(qdrant_service, "_search_cache", SearchResultCache(max_size=10, ttl_seconds=60))
+
+    vector = _vector()
+    first = await qdrant_service.search_documents(vector, top_k=1)
+    second = await qdrant_service.search_documents(vector + np.float32(1e-6), top_k=1)
+    assert first == second == [{"id": "p1", "score": 0.8, "payload": {"text": "hola"}}]
+    assert len(calls) == 1
+
+    qdrant_service.invalidate_search_cache(qdrant_service.settings.QDRANT_COLLECTION_NAME)
+    await qdrant_service.search_documents(vector, top_k=1)
+    assert len(calls) == 2
+    assert qdrant_service.get_search_cache_stats()["hits"] == 1
@@ -0,0 +1,77 @@
+# tests/services/test_search_tuning.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas de app.services.search_tuning (recall@k, elección de parámetros y
+escritura del .env) y de los parámetros de búsqueda en qdrant_service.
+"""
+
+import numpy as np
+import pytest
+
+from app.services import qdrant_service, search_tuning
+
+
+def test_recall_at_k():
+    assert search_tuning.recall_at_k([1, 2, 3], [3, 9, 1], 3) == pytest.approx(2 / 3)
+    assert search_tuning.recall_at_k([1, 2, 3, 4], [1, 2, 7, 3], 2) == 1.0
+    assert search_tuning.recall_at_k([], [1], 3) == 1.0
+
+
+def test_grid_choice_and_settings():
+    grid = search_tuning.parameter_grid([3, 5], hnsw_efs=[None, 64], oversamplings=[None, 2.0])
+    assert len(grid) == 2 * (1 + 4)
+    assert sum(1 for c in grid if c["exact"]) == 2
+
+    results = [
+        {"top_k": 3, "hnsw_ef": None, "exact": True, "rescore": None, "oversampling": None, "recall": 1.0, "p50_ms": 4.0, "p99_ms": 9.0},
+        {"top_k": 3, "hnsw_ef": 32, "exact": False, "rescore": None, "oversampling": None, "recall": 0.90, "p50_ms": 1.0, "p99_ms": 2.0},
+        {"top_k": 3, "hnsw_ef": 64, "exact": False, "rescore": True, "oversampling": 2.0, "recall": 0.99, "p50_ms": 1.5, "p99_ms": 3.0},
+        {"top_k": 5, "hnsw_ef": 64, "exact": False, "rescore": None, "oversampling": None, "recall": 0.99, "p50_ms": 1.0, "p99_ms": 1.0},
+    ]
+    best = search_tuning.choose_best(results, min_recall=0.95, top_k=3)
+    assert best is results[2]
+    assert search_tuning.choose_best(results, min_recall=1.01) is None
+    assert search_tuning.settings_for(best) == {
+        "RAG_TOP_K": "3", "QDRANT_HNSW_EF": "64", "QDRANT_EXACT_SEARCH": "false",
+        "QDRANT_QUANTIZATION_RESCORE": "true", "QDRANT_QUANTIZATION_OVERSAMPLING": "2",
+    }
+
+
+def test_write_env_replaces_appends_and_clears(tmp_path):
+    env = tmp_path / ".env"
+    env.write_text("# QDRANT_HNSW_EF=128\nRAG_TOP_K=3\nQDRANT_HNSW_EF=16\nQDRANT_URL=http://q:6333\n", encoding="utf-8")
+    search_tuning.write_env(env, {"RAG_TOP_K": "5", "QDRANT_HNSW_EF": "", "QDRANT_EXACT_SEARCH": "false"})
+    assert env.read_text(encoding="utf-8").splitlines() == [
+        "# QDRANT_HNSW_EF=128", "RAG_TOP_K=5", "QDRANT_URL=http://q:6333", "QDRANT_EXACT_SEARCH=false",
+    ]
+
+
+async def test_sweep_against_in_memory_qdrant():
+    pytest.importorskip("qdrant_client")
+    from qdrant_client import AsyncQdrantClient, models
+
+    client = AsyncQdrantClient(location=":memory:")
+    vectors = np.random.default_rng(0).normal(size=(50, 8)).astype(np.float32)
+    await client.create_collection("tuning", vectors_config=models.VectorParams(size=8, distance=models.Distance.COSINE))
+    await client.upsert("tuning", points=models.Batch(ids=list(range(50)), vectors=vectors.tolist()))
+
+    grid = search_tuning.parameter_grid([3], hnsw_efs=[None, 16])
+    results = await search_tuning.sweep(client, "tuning", vectors[:5], grid, repeats=2)
+    await client.close()
+    assert [search_tuning.describe(r) for r in results] == ["exact", "ef=default", "ef=16"]
+    assert all(r["recall"] == 1.0 and r["p99_ms"] >= r["p50_ms"] > 0 for r in results)
+
+
+def test_search_params_from_settings(monkeypatch):
+    pytest.importorskip("qdrant_client")
+    for name in ("QDRANT_HNSW_EF", "QDRANT_QUANTIZATION_RESCORE", "QDRANT_QUANTIZATION_OVERSAMPLING"):
+        monkeypatch.setattr(qdrant_service.settings, name, None, raising=False)
+    monkeypatch.setattr(qdrant_service.settings, "QDRANT_EXACT_SEARCH", False, raising=False)
+    assert qdrant_service._search_params() is None
+
+    monkeypatch.setattr(qdrant_service.settings, "QDRANT_HNSW_EF", 128)
+    monkeypatch.setattr(qdrant_service.settings, "QDRANT_QUANTIZATION_OVERSAMPLING", 2.0)
+    params = qdrant_service._search_params()
+    assert params.hnsw_ef == 128 and params.exact is False
+    assert params.quantization.oversampling == 2.0 and params.quantization.rescore is None
@@ -0,0 +1,138 @@
+# tests/services/test_single_flight.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas de app.services.single_flight y de su uso en embed_query,
+search_documents y call_llm: llamadas idénticas simultáneas hacen un solo
+trabajo.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services import embedding_service, llm_service, qdrant_service
+from app.services.embedding_cache import EmbeddingCache
+from app.services.search_cache import SearchResultCache
+from app.services.single_flight import SingleFlight, get_single_flight_stats
+
+
+def _slow(calls, value, delay=0.01):
+    async def work():
+        calls.append(value)
+        await asyncio.sleep(delay)
+        return value
+    return work
+
+
+async def test_concurrent_calls_share_one_execution():
+    group = SingleFlight("prueba")
+    calls = []
+    results = await asyncio.gather(
+        group.do("a", _slow(calls, 1)), group.do("a", _slow(calls, 2)), group.do("b", _slow(calls, 3)),
+    )
+    assert results == [1, 1, 3] and calls == [1, 3]
+    assert group.in_flight() == 0 # La clave se olvida al terminar: no es una caché
+    assert await group.do("a", _slow(calls, 4)) == 4
+    stats = get_single_flight_stats()["prueba"]
+    assert (stats["executions"], stats["shared"]) == (3, 1)
+
+
+async def test_exception_reaches_every_waiter():
+    group = SingleFlight("prueba-error")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("caído")
+
+    results = await asyncio.gather(group.do("k", fail), group.do("k", fail), return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+    assert group.get_stats()["executions"] == 1
+
+
+async def test_cancelled_waiter_does_not_cancel_shared_work():
+    group = SingleFlight("prueba-cancelacion")
+    calls = []
+    leader = asyncio.ensure_future(group.do("k", _slow(calls, "ok", delay=0.05)))
+    follower = asyncio.ensure_future(group.do("k", _slow(calls, "otro")))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await follower == "ok"
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+    alone = asyncio.ensure_future(group.do("j", _slow(calls, "nadie", delay=1.0)))
+    await asyncio.sleep(0)
+    task = group._calls["j"]["task"]
+    alone.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await alone
+    await asyncio.sleep(0)
+    assert task.cancelled() and group.in_flight() == 0 # Sin nadie esperando, el trabajo se cancela
+
+
+async def test_disabled_group_runs_every_call():
+    group = SingleFlight("prueba-desactivado", enabled=False)
+    calls = []
+    await asyncio.gather(group.do("a", _slow(calls, 1)), group.do("a", _slow(calls, 2)))
+    assert calls == [1, 2]
+
+
+async def test_embed_query_coalesces_identical_queries(monkeypatch):
+    calls = []
+
+    async def embed_uncached(query, tag):
+        calls.append(query)
+        await asyncio.sleep(0.01)
+        return np.ones(3, dtype=np.float32)
+
+    monkeypatch.setattr(embedding_service, "_embedding_cache", EmbeddingCache(max_size=0, ttl_seconds=0))
+    monkeypatch.setattr(embedding_service, "_embed_uncached", embed_uncached)
+    monkeypatch.setattr(embedding_service, "_single_flight", SingleFlight("embed_query"))
+
+    vectors = await asyncio.gather(*(embedding_service.embed_query(q) for q in ["Cómo activo", "como  ACTIVO", "Otra"]))
+    assert vectors[0] is vectors[1]
+    assert calls == ["Cómo activo", "Otra"]
+
+
+async def test_search_documents_coalesces_without_cache(monkeypatch):
+    calls = []
+
+    class FakeClient:
+        async def search(self, **kwargs):
+            calls.append(kwargs)
+            await asyncio.sleep(0.01)
+            return [SimpleNamespace(id="p1", score=0.8, payload={"text": "hola"})]
+
+    monkeypatch.setattr(qdrant_service, "_get_qdrant_client", lambda: FakeClient())
+    monkeypatch.setattr(qdrant_service, "effective_vector_dimension", lambda _settings: 4)
+    monkeypatch.setattr(qdrant_service, "_search_cache", SearchResultCache(max_size=0, ttl_seconds=0))
+    monkeypatch.setattr(qdrant_service, "_search_flight", SingleFlight("search_documents"))
+
+    vector = np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float32)
+    first, second = await asyncio.gather(qdrant_service.search_documents(vector, top_k=1),
+                                         qdrant_service.search_documents(vector, top_k=1))
+    assert first == second == [{"id": "p1", "score": 0.8, "payload": {"text": "hola"}}]
+    assert first is not second # Cada llamador recibe su propia lista
+    assert len(calls) == 1
+
+
+async def test_call_llm_coalesces_identical_prompts(monkeypatch):
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=" Hola "), finish_reason="stop")])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(llm_service, "_get_llm_client", lambda: client)
+    monkeypatch.setattr(llm_service, "_single_flight", SingleFlight("call_llm"))
+
+    messages = [{"role": "system", "content": "prompt"}]
+    answers = await asyncio.gather(llm_service.call_llm(messages), llm_service.call_llm(list(messages)),
+                                   llm_service.call_llm(messages, temperature=0.0))
+    assert answers == ["Hola", "Hola", "Hola"]
+    assert len(calls) == 2 # Otra temperatura, otra llamada
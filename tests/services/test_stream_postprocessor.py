@@ -0,0 +1,97 @@
+# tests/services/test_stream_postprocessor.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas de StreamingPostProcessor: propiedades aleatorias (con semilla fija)
+que comparan la salida incremental con rag_pipeline._post_process_llm_answer
+para el mismo texto final, partido en fragmentos arbitrarios.
+"""
+
+import random
+import re
+
+import pytest
+
+from app.services import rag_pipeline, stream_postprocessor
+from app.services.stream_postprocessor import StreamingPostProcessor
+
+# Piezas con las que se arman respuestas: marcadores, encabezados, saltos de línea
+# de todo tipo, espacios Unicode y frases prohibidas
+TOKENS = [
+    "*", "**", "***", "#", "## ", " ", "  ", "\t", "\n", "\n\n", "\r\n", "\r", " ", "\xa0",
+    "Hola", "paso", "XML", "é", "1.", "-", "lo siento", "Disculpa", "Lamentablemente", "<b>x</b>",
+]
+
+
+def _random_text(rng: random.Random, max_tokens: int = 40) -> str:
+    return "".join(rng.choice(TOKENS) for _ in range(rng.randint(0, max_tokens)))
+
+
+def _random_chunks(rng: random.Random, text: str):
+    chunks, i = [], 0
+    while i < len(text):
+        n = rng.randint(1, 6)
+        chunks.append(text[i:i + n])
+        i += n
+    return chunks
+
+
+def _stream(chunks, **kwargs):
+    processor = StreamingPostProcessor(**kwargs)
+    fragments = [processor.feed(chunk) for chunk in chunks]
+    fragments.append(processor.finish())
+    return fragments, processor
+
+
+@pytest.mark.parametrize("max_span", [stream_postprocessor.EMPHASIS_MAX_CHARS, 8, 1, 0])
+def test_matches_batch_for_random_texts_and_splits(monkeypatch, max_span):
+    monkeypatch.setattr(stream_postprocessor, "EMPHASIS_MAX_CHARS", max_span)
+    rng = random.Random(1234 + max_span)
+    for _ in range(1500):
+        text = _random_text(rng)
+        fragments, processor = _stream(_random_chunks(rng, text))
+        expected = rag_pipeline._post_process_llm_answer(text)
+        assert "".join(fragments) == expected, repr(text)
+        assert processor.text == expected
+
+
+def test_fragments_never_leave_emphasis_tags_open():
+    rng = random.Random(99)
+    tokens = [t for t in TOKENS if "<" not in t] # Sin etiquetas literales en el texto del LLM
+    for _ in range(1000):
+        text = "".join(rng.choice(tokens) for _ in range(rng.randint(0, 40)))
+        fragments, _ = _stream(_random_chunks(rng, text))
+        for fragment in fragments:
+            for tag in ("b", "i"):
+                assert len(re.findall(f"<{tag}>", fragment)) == len(re.findall(f"</{tag}>", fragment)), repr(text)
+
+
+def test_literal_unclosed_tag_does_not_hold_output():
+    processor = StreamingPostProcessor()
+    assert processor.feed("Usa la etiqueta <b> para negritas.\n") == "Usa la etiqueta <b> para negritas."
+    for n in range(5):
+        assert processor.feed(f"Paso {n}.\n") == f"\nPaso {n}." # Se emite antes de finish()
+    assert processor.feed("Y **esto") == "" # Solo retiene lo que abre el propio postprocesado
+    assert processor.feed("** también.\n") == "\nY <b>esto</b> también."
+    assert processor.finish() == ""
+
+
+def test_emits_each_line_as_soon_as_it_completes():
+    processor = StreamingPostProcessor()
+    assert processor.feed("## Pasos para **activar") == ""
+    assert processor.feed("**:\n1. Abre") == "Pasos para <b>activar</b>:"
+    assert processor.feed(" el menú\nLo siento, no") == "\n1. Abre el menú" # La línea prohibida aún no termina
+    assert processor.feed(" sé más.\n") == "" # ...y al terminar se descarta
+    assert processor.feed("Fin") == ""
+    assert processor.finish() == "\nFin"
+
+
+def test_lookahead_is_bounded_by_max_span():
+    processor = StreamingPostProcessor(max_span=10)
+    assert processor.feed("Precio*\n") == "Precio" # Retiene desde el * por un posible cierre
+    out = processor.feed("a" * 12 + "\n")
+    assert out.startswith("*\n") # Sin cierre en 10 caracteres: el * queda literal
+    processor.finish()
+    assert processor.text == "Precio*\n" + "a" * 12
+    with pytest.raises(RuntimeError):
+        processor.feed("más")
@@ -0,0 +1,42 @@
+# tests/services/test_vector_utils.py
+# -*- coding: utf-8 -*-
+
+"""
+Pruebas para la conversión de vectores de consulta a float32
+(app.services.vector_utils).
+"""
+
+import numpy as np
+import pytest
+
+from app.services.vector_utils import as_float32_vector, freeze, to_wire
+
+
+def test_as_float32_vector_does_not_copy_contiguous_float32():
+    vector = np.arange(4, dtype=np.float32)
+    assert as_float32_vector(vector) is vector
+
+
+def test_as_float32_vector_accepts_memoryview_and_lists():
+    buffer = np.arange(3, dtype=np.float32)
+    from_view = as_float32_vector(memoryview(buffer))
+    assert from_view.dtype == np.float32
+    assert np.shares_memory(from_view, buffer)
+
+    from_list = as_float32_vector([0.5, 1.5, 2.5], expected_dim=3)
+    assert from_list.dtype == np.float32
+    assert to_wire(from_list) == [0.5, 1.5, 2.5]
+
+
+@pytest.mark.parametrize("bad", [None, [], [[1.0, 2.0], [3.0, 4.0]], [1.0, float("nan")], "texto"])
+def test_as_float32_vector_rejects_invalid(bad):
+    with pytest.raises(ValueError):
+        as_float32_vector(bad)
+
+
+def test_as_float32_vector_checks_dimension_and_freeze():
+    with pytest.raises(ValueError):
+        as_float32_vector(np.zeros(3, dtype=np.float32), expected_dim=4)
+    frozen = freeze(np.zeros(3, dtype=np.float32))
+    with pytest.raises(ValueError):
+        frozen[0] = 1.0